@@ -0,0 +1,17 @@
+-- Typed bronze column with a fallback to _raw
+-- Files written before the typed Parquet schema carry only _raw, so models
+-- read with union_by_name=true (missing columns become NULL) and take the
+-- value from the JSON when the typed column is NULL. Set the
+-- bronze_raw_fallback var to false once no such files remain and the
+-- ingestor runs with LAKE_INCLUDE_RAW=false, since no file then has _raw.
+{% macro bronze_field(column, json_path, cast_type=none) %}
+  {%- set raw_value = "json_extract_string(_raw, '" ~ json_path ~ "')" -%}
+  {%- if cast_type -%}
+    {%- set raw_value = "TRY_CAST(" ~ raw_value ~ " AS " ~ cast_type ~ ")" -%}
+  {%- endif -%}
+  {%- if var('bronze_raw_fallback', true) -%}
+    COALESCE({{ column }}, {{ raw_value }})
+  {%- else -%}
+    {{ column }}
+  {%- endif -%}
+{% endmacro %}
@@ -1,45 +1,45 @@
 {{ config(materialized='incremental', unique_key='event_id') }}
 
+-- Pre-typed files only carry _raw; see macros/bronze_field.sql
 SELECT
-  json_extract_scalar(_raw, '$.headers.tenant_id')        AS tenant_id,
-  json_extract_scalar(_raw, '$.headers.project_tag')      AS project_tag,
-  json_extract_scalar(_raw, '$.headers.agent_run_id')     AS agent_run_id,
-  json_extract_scalar(_raw, '$.headers.occurred_at')      AS occurred_at,
-  json_extract_scalar(_raw, '$.payload.agent_name')       AS agent_name,
-  json_extract_scalar(_raw, '$.payload.agent_type')       AS agent_type,
-  json_extract_scalar(_raw, '$.payload.parent_run_id')    AS parent_run_id,
-  json_extract_scalar(_raw, '$.payload.status')           AS status,
-  json_extract_scalar(_raw, '$.payload.started_at')       AS started_at,
-  json_extract_scalar(_raw, '$.payload.ended_at')         AS ended_at,
-  CAST(json_extract_scalar(_raw, '$.payload.duration_ms') AS INTEGER) AS duration_ms,
-  json_extract_scalar(_raw, '$.payload.input.prompt')     AS input_prompt,
-  json_extract_scalar(_raw, '$.payload.output.response')  AS output_response,
-  json_extract_scalar(_raw, '$.payload.output.data')      AS output_data,
-  json_extract_scalar(_raw, '$.payload.tools')            AS tools_json,
-  json_extract_scalar(_raw, '$.payload.model_config.provider') AS model_provider,
-  json_extract_scalar(_raw, '$.payload.model_config.model') AS model_name,
-  CAST(json_extract_scalar(_raw, '$.payload.model_config.temperature') AS DOUBLE) AS model_temperature,
-  CAST(json_extract_scalar(_raw, '$.payload.model_config.max_tokens') AS INTEGER) AS model_max_tokens,
-  json_extract_scalar(_raw, '$.payload.tokens_used.prompt') AS tokens_prompt,
-  json_extract_scalar(_raw, '$.payload.tokens_used.completion') AS tokens_completion,
-  json_extract_scalar(_raw, '$.payload.tokens_used.total') AS tokens_total,
-  CAST(json_extract_scalar(_raw, '$.payload.cost') AS DOUBLE) AS cost_usd,
-  json_extract_scalar(_raw, '$.payload.memory_operations.kv_reads') AS kv_reads,
-  json_extract_scalar(_raw, '$.payload.memory_operations.kv_writes') AS kv_writes,
-  json_extract_scalar(_raw, '$.payload.memory_operations.doc_searches') AS doc_searches,
-  json_extract_scalar(_raw, '$.payload.memory_operations.doc_writes') AS doc_writes,
-  json_extract_scalar(_raw, '$.payload.memory_operations.insights_generated') AS insights_generated,
-  json_extract_scalar(_raw, '$.payload.error.message') AS error_message,
-  json_extract_scalar(_raw, '$.payload.error.type') AS error_type,
-  json_extract_scalar(_raw, '$.payload.error.stack_trace') AS error_stack_trace,
-  CAST(json_extract_scalar(_raw, '$.payload.error.retry_count') AS INTEGER) AS error_retry_count,
-  json_extract_scalar(_raw, '$.payload.metadata') AS metadata,
+  {{ bronze_field('tenant_id', '$.headers.tenant_id') }} AS tenant_id,
+  {{ bronze_field('project_tag', '$.headers.project_tag') }} AS project_tag,
+  {{ bronze_field('agent_run_id', '$.headers.agent_run_id') }} AS agent_run_id,
+  {{ bronze_field('occurred_at', '$.headers.occurred_at', 'TIMESTAMPTZ') }} AS occurred_at,
+  {{ bronze_field('payload.agent_name', '$.payload.agent_name') }} AS agent_name,
+  {{ bronze_field('payload.agent_type', '$.payload.agent_type') }} AS agent_type,
+  {{ bronze_field('payload.parent_run_id', '$.payload.parent_run_id') }} AS parent_run_id,
+  {{ bronze_field('payload.status', '$.payload.status') }} AS status,
+  {{ bronze_field('payload.started_at', '$.payload.started_at', 'TIMESTAMPTZ') }} AS started_at,
+  {{ bronze_field('payload.ended_at', '$.payload.ended_at', 'TIMESTAMPTZ') }} AS ended_at,
+  {{ bronze_field('payload.duration_ms', '$.payload.duration_ms', 'BIGINT') }} AS duration_ms,
+  {{ bronze_field('payload.input.prompt', '$.payload.input.prompt') }} AS input_prompt,
+  {{ bronze_field('payload.output.response', '$.payload.output.response') }} AS output_response,
+  {{ bronze_field('payload.output.data', '$.payload.output.data') }} AS output_data,
+  {{ bronze_field('payload.tools', '$.payload.tools') }} AS tools_json,
+  {{ bronze_field('payload.model_config.provider', '$.payload.model_config.provider') }} AS model_provider,
+  {{ bronze_field('payload.model_config.model', '$.payload.model_config.model') }} AS model_name,
+  {{ bronze_field('payload.model_config.temperature', '$.payload.model_config.temperature', 'DOUBLE') }} AS model_temperature,
+  {{ bronze_field('payload.model_config.max_tokens', '$.payload.model_config.max_tokens', 'INTEGER') }} AS model_max_tokens,
+  {{ bronze_field('payload.tokens_used.prompt', '$.payload.tokens_used.prompt', 'BIGINT') }} AS tokens_prompt,
+  {{ bronze_field('payload.tokens_used.completion', '$.payload.tokens_used.completion', 'BIGINT') }} AS tokens_completion,
+  {{ bronze_field('payload.tokens_used.total', '$.payload.tokens_used.total', 'BIGINT') }} AS tokens_total,
+  {{ bronze_field('payload.cost', '$.payload.cost', 'DOUBLE') }} AS cost_usd,
+  {{ bronze_field('payload.memory_operations.kv_reads', '$.payload.memory_operations.kv_reads', 'BIGINT') }} AS kv_reads,
+  {{ bronze_field('payload.memory_operations.kv_writes', '$.payload.memory_operations.kv_writes', 'BIGINT') }} AS kv_writes,
+  {{ bronze_field('payload.memory_operations.doc_searches', '$.payload.memory_operations.doc_searches', 'BIGINT') }} AS doc_searches,
+  {{ bronze_field('payload.memory_operations.doc_writes', '$.payload.memory_operations.doc_writes', 'BIGINT') }} AS doc_writes,
+  {{ bronze_field('payload.memory_operations.insights_generated', '$.payload.memory_operations.insights_generated', 'BIGINT') }} AS insights_generated,
+  {{ bronze_field('payload.error.message', '$.payload.error.message') }} AS error_message,
+  {{ bronze_field('payload.error.type', '$.payload.error.type') }} AS error_type,
+  {{ bronze_field('payload.error.stack_trace', '$.payload.error.stack_trace') }} AS error_stack_trace,
+  {{ bronze_field('payload.error.retry_count', '$.payload.error.retry_count', 'INTEGER') }} AS error_retry_count,
+  {{ bronze_field('payload.metadata', '$.payload.metadata') }} AS metadata,
   event_id,
-  _raw,
   CURRENT_TIMESTAMP AS _loaded_at
 
-FROM read_parquet('s3://lake/bronze/topic=Continuum_Overworld.Orion_Reasoner--Analysis__PROD@v1.events/*/*/*/*.parquet')
+FROM read_parquet('s3://lake/bronze/topic=Continuum_Overworld.Orion_Reasoner--Analysis__PROD@v1.events/*/*/*/*.parquet', union_by_name=true)
 
 {% if is_incremental() %}
   WHERE _loaded_at > (SELECT MAX(_loaded_at) FROM {{ this }})
-{% endif %}
\ No newline at end of file
+{% endif %}
@@ -1,34 +1,34 @@
 {{ config(materialized='incremental', unique_key='event_id') }}
 
+-- Pre-typed files only carry _raw; see macros/bronze_field.sql
 SELECT
-  json_extract_scalar(_raw, '$.headers.tenant_id')        AS tenant_id,
-  json_extract_scalar(_raw, '$.headers.project_tag')      AS project_tag,
-  json_extract_scalar(_raw, '$.headers.agent_run_id')     AS agent_run_id,
-  json_extract_scalar(_raw, '$.headers.occurred_at')      AS occurred_at,
-  json_extract_scalar(_raw, '$.payload.org_id')           AS org_id,
-  json_extract_scalar(_raw, '$.payload.doc_id')           AS doc_id,
-  json_extract_scalar(_raw, '$.payload.metrics[0].metric_type')  AS metric_type,
-  json_extract_scalar(_raw, '$.payload.metrics[0].metric_name')  AS metric_name,
-  CAST(json_extract_scalar(_raw, '$.payload.metrics[0].value') AS DOUBLE) AS metric_value,
-  json_extract_scalar(_raw, '$.payload.metrics[0].unit')     AS unit,
-  CAST(json_extract_scalar(_raw, '$.payload.metrics[0].period_start') AS DATE) AS period_start,
-  CAST(json_extract_scalar(_raw, '$.payload.metrics[0].period_end') AS DATE) AS period_end,
-  CAST(json_extract_scalar(_raw, '$.payload.metrics[0].confidence') AS DOUBLE) AS confidence,
-  json_extract_scalar(_raw, '$.payload.metrics[0].method')   AS method,
-  json_extract_scalar(_raw, '$.payload.metrics[0].model_version') AS model_version,
-  json_extract_scalar(_raw, '$.payload.metrics[0].page_reference') AS page_reference,
-  json_extract_scalar(_raw, '$.payload.metrics[0].text_snippet') AS text_snippet,
-  json_extract_scalar(_raw, '$.payload.document_metadata.title') AS document_title,
-  json_extract_scalar(_raw, '$.payload.document_metadata.document_type') AS document_type,
-  CAST(json_extract_scalar(_raw, '$.payload.document_metadata.reporting_year') AS INTEGER) AS reporting_year,
-  json_extract_scalar(_raw, '$.payload.document_metadata.source_uri') AS source_uri,
-  json_extract_scalar(_raw, '$.payload.document_metadata.hash') AS document_hash,
+  {{ bronze_field('tenant_id', '$.headers.tenant_id') }} AS tenant_id,
+  {{ bronze_field('project_tag', '$.headers.project_tag') }} AS project_tag,
+  {{ bronze_field('agent_run_id', '$.headers.agent_run_id') }} AS agent_run_id,
+  {{ bronze_field('occurred_at', '$.headers.occurred_at', 'TIMESTAMPTZ') }} AS occurred_at,
+  {{ bronze_field('payload.org_id', '$.payload.org_id') }} AS org_id,
+  {{ bronze_field('payload.doc_id', '$.payload.doc_id') }} AS doc_id,
+  {{ bronze_field('payload.metrics[1].metric_type', '$.payload.metrics[0].metric_type') }} AS metric_type,
+  {{ bronze_field('payload.metrics[1].metric_name', '$.payload.metrics[0].metric_name') }} AS metric_name,
+  {{ bronze_field('payload.metrics[1].value', '$.payload.metrics[0].value', 'DOUBLE') }} AS metric_value,
+  {{ bronze_field('payload.metrics[1].unit', '$.payload.metrics[0].unit') }} AS unit,
+  {{ bronze_field('payload.metrics[1].period_start', '$.payload.metrics[0].period_start', 'DATE') }} AS period_start,
+  {{ bronze_field('payload.metrics[1].period_end', '$.payload.metrics[0].period_end', 'DATE') }} AS period_end,
+  {{ bronze_field('payload.metrics[1].confidence', '$.payload.metrics[0].confidence', 'DOUBLE') }} AS confidence,
+  {{ bronze_field('payload.metrics[1].method', '$.payload.metrics[0].method') }} AS method,
+  {{ bronze_field('payload.metrics[1].model_version', '$.payload.metrics[0].model_version') }} AS model_version,
+  {{ bronze_field('payload.metrics[1].page_reference', '$.payload.metrics[0].page_reference') }} AS page_reference,
+  {{ bronze_field('payload.metrics[1].text_snippet', '$.payload.metrics[0].text_snippet') }} AS text_snippet,
+  {{ bronze_field('payload.document_metadata.title', '$.payload.document_metadata.title') }} AS document_title,
+  {{ bronze_field('payload.document_metadata.document_type', '$.payload.document_metadata.document_type') }} AS document_type,
+  {{ bronze_field('payload.document_metadata.reporting_year', '$.payload.document_metadata.reporting_year', 'INTEGER') }} AS reporting_year,
+  {{ bronze_field('payload.document_metadata.source_uri', '$.payload.document_metadata.source_uri') }} AS source_uri,
+  {{ bronze_field('payload.document_metadata.hash', '$.payload.document_metadata.hash') }} AS document_hash,
   event_id,
-  _raw,
   CURRENT_TIMESTAMP AS _loaded_at
 
-FROM read_parquet('s3://lake/bronze/topic=Continuum_Overworld.Oracle_Calculator--ESG__PROD@v1.events/*/*/*/*.parquet')
+FROM read_parquet('s3://lake/bronze/topic=Continuum_Overworld.Oracle_Calculator--ESG__PROD@v1.events/*/*/*/*.parquet', union_by_name=true)
 
 {% if is_incremental() %}
   WHERE _loaded_at > (SELECT MAX(_loaded_at) FROM {{ this }})
-{% endif %}
\ No newline at end of file
+{% endif %}
@@ -1,53 +1,53 @@
 {{ config(materialized='incremental', unique_key='event_id') }}
 
+-- Pre-typed files only carry _raw; see macros/bronze_field.sql
 SELECT
-  json_extract_scalar(_raw, '$.headers.tenant_id')        AS tenant_id,
-  json_extract_scalar(_raw, '$.headers.project_tag')      AS project_tag,
-  json_extract_scalar(_raw, '$.headers.agent_run_id')     AS agent_run_id,
-  json_extract_scalar(_raw, '$.headers.occurred_at')      AS occurred_at,
-  json_extract_scalar(_raw, '$.payload.shipment_code')    AS shipment_code,
-  json_extract_scalar(_raw, '$.payload.batch_code')       AS batch_code,
-  CAST(json_extract_scalar(_raw, '$.payload.leg_number') AS INTEGER) AS leg_number,
-  json_extract_scalar(_raw, '$.payload.mode')             AS mode,
-  json_extract_scalar(_raw, '$.payload.from_location.name') AS from_location,
-  json_extract_scalar(_raw, '$.payload.to_location.name')   AS to_location,
-  json_extract_scalar(_raw, '$.payload.from_location.code') AS from_code,
-  json_extract_scalar(_raw, '$.payload.to_location.code')   AS to_code,
-  CAST(json_extract_scalar(_raw, '$.payload.distance_km') AS DOUBLE) AS distance_km,
-  CAST(json_extract_scalar(_raw, '$.payload.payload.mass_kg') AS DOUBLE) AS payload_mass_kg,
-  CAST(json_extract_scalar(_raw, '$.payload.payload.volume_m3') AS DOUBLE) AS payload_volume_m3,
-  json_extract_scalar(_raw, '$.payload.payload.commodity') AS commodity,
-  json_extract_scalar(_raw, '$.payload.payload.hs_code') AS hs_code,
-  json_extract_scalar(_raw, '$.payload.vehicle.class') AS vehicle_class,
-  json_extract_scalar(_raw, '$.payload.vehicle.fuel_type') AS fuel_type,
-  json_extract_scalar(_raw, '$.payload.vehicle.euro_standard') AS euro_standard,
-  CAST(json_extract_scalar(_raw, '$.payload.vehicle.load_factor_pct') AS DOUBLE) AS load_factor_pct,
-  json_extract_scalar(_raw, '$.payload.vehicle.backhaul') AS backhaul,
-  json_extract_scalar(_raw, '$.payload.carrier.name') AS carrier_name,
-  json_extract_scalar(_raw, '$.payload.carrier.code') AS carrier_code,
-  json_extract_scalar(_raw, '$.payload.carrier.vessel_name') AS vessel_name,
-  json_extract_scalar(_raw, '$.payload.carrier.flight_number') AS flight_number,
-  json_extract_scalar(_raw, '$.payload.timing.scheduled_departure') AS scheduled_departure,
-  json_extract_scalar(_raw, '$.payload.timing.actual_departure') AS actual_departure,
-  json_extract_scalar(_raw, '$.payload.timing.scheduled_arrival') AS scheduled_arrival,
-  json_extract_scalar(_raw, '$.payload.timing.actual_arrival') AS actual_arrival,
-  CAST(json_extract_scalar(_raw, '$.payload.timing.duration_hours') AS DOUBLE) AS duration_hours,
-  CAST(json_extract_scalar(_raw, '$.payload.emissions.co2e_kg') AS DOUBLE) AS co2e_kg,
-  CAST(json_extract_scalar(_raw, '$.payload.emissions.ttw_kg') AS DOUBLE) AS ttw_kg,
-  CAST(json_extract_scalar(_raw, '$.payload.emissions.wtt_kg') AS DOUBLE) AS wtt_kg,
-  json_extract_scalar(_raw, '$.payload.emissions.calculation_method') AS calculation_method,
-  json_extract_scalar(_raw, '$.payload.emissions.factor_source') AS factor_source,
-  json_extract_scalar(_raw, '$.payload.emissions.rf_applied') AS rf_applied,
-  json_extract_scalar(_raw, '$.payload.temperature.controlled') AS temperature_controlled,
-  json_extract_scalar(_raw, '$.payload.temperature.range_celsius.min') AS temp_min_celsius,
-  json_extract_scalar(_raw, '$.payload.temperature.range_celsius.max') AS temp_max_celsius,
-  json_extract_scalar(_raw, '$.payload.status') AS status,
+  {{ bronze_field('tenant_id', '$.headers.tenant_id') }} AS tenant_id,
+  {{ bronze_field('project_tag', '$.headers.project_tag') }} AS project_tag,
+  {{ bronze_field('agent_run_id', '$.headers.agent_run_id') }} AS agent_run_id,
+  {{ bronze_field('occurred_at', '$.headers.occurred_at', 'TIMESTAMPTZ') }} AS occurred_at,
+  {{ bronze_field('payload.shipment_code', '$.payload.shipment_code') }} AS shipment_code,
+  {{ bronze_field('payload.batch_code', '$.payload.batch_code') }} AS batch_code,
+  {{ bronze_field('payload.leg_number', '$.payload.leg_number', 'INTEGER') }} AS leg_number,
+  {{ bronze_field('payload.mode', '$.payload.mode') }} AS mode,
+  {{ bronze_field('payload.from_location.name', '$.payload.from_location.name') }} AS from_location,
+  {{ bronze_field('payload.to_location.name', '$.payload.to_location.name') }} AS to_location,
+  {{ bronze_field('payload.from_location.code', '$.payload.from_location.code') }} AS from_code,
+  {{ bronze_field('payload.to_location.code', '$.payload.to_location.code') }} AS to_code,
+  {{ bronze_field('payload.distance_km', '$.payload.distance_km', 'DOUBLE') }} AS distance_km,
+  {{ bronze_field('payload.payload.mass_kg', '$.payload.payload.mass_kg', 'DOUBLE') }} AS payload_mass_kg,
+  {{ bronze_field('payload.payload.volume_m3', '$.payload.payload.volume_m3', 'DOUBLE') }} AS payload_volume_m3,
+  {{ bronze_field('payload.payload.commodity', '$.payload.payload.commodity') }} AS commodity,
+  {{ bronze_field('payload.payload.hs_code', '$.payload.payload.hs_code') }} AS hs_code,
+  {{ bronze_field('payload.vehicle."class"', '$.payload.vehicle.class') }} AS vehicle_class,
+  {{ bronze_field('payload.vehicle.fuel_type', '$.payload.vehicle.fuel_type') }} AS fuel_type,
+  {{ bronze_field('payload.vehicle.euro_standard', '$.payload.vehicle.euro_standard') }} AS euro_standard,
+  {{ bronze_field('payload.vehicle.load_factor_pct', '$.payload.vehicle.load_factor_pct', 'DOUBLE') }} AS load_factor_pct,
+  {{ bronze_field('payload.vehicle.backhaul', '$.payload.vehicle.backhaul', 'BOOLEAN') }} AS backhaul,
+  {{ bronze_field('payload.carrier.name', '$.payload.carrier.name') }} AS carrier_name,
+  {{ bronze_field('payload.carrier.code', '$.payload.carrier.code') }} AS carrier_code,
+  {{ bronze_field('payload.carrier.vessel_name', '$.payload.carrier.vessel_name') }} AS vessel_name,
+  {{ bronze_field('payload.carrier.flight_number', '$.payload.carrier.flight_number') }} AS flight_number,
+  {{ bronze_field('payload.timing.scheduled_departure', '$.payload.timing.scheduled_departure', 'TIMESTAMPTZ') }} AS scheduled_departure,
+  {{ bronze_field('payload.timing.actual_departure', '$.payload.timing.actual_departure', 'TIMESTAMPTZ') }} AS actual_departure,
+  {{ bronze_field('payload.timing.scheduled_arrival', '$.payload.timing.scheduled_arrival', 'TIMESTAMPTZ') }} AS scheduled_arrival,
+  {{ bronze_field('payload.timing.actual_arrival', '$.payload.timing.actual_arrival', 'TIMESTAMPTZ') }} AS actual_arrival,
+  {{ bronze_field('payload.timing.duration_hours', '$.payload.timing.duration_hours', 'DOUBLE') }} AS duration_hours,
+  {{ bronze_field('payload.emissions.co2e_kg', '$.payload.emissions.co2e_kg', 'DOUBLE') }} AS co2e_kg,
+  {{ bronze_field('payload.emissions.ttw_kg', '$.payload.emissions.ttw_kg', 'DOUBLE') }} AS ttw_kg,
+  {{ bronze_field('payload.emissions.wtt_kg', '$.payload.emissions.wtt_kg', 'DOUBLE') }} AS wtt_kg,
+  {{ bronze_field('payload.emissions.calculation_method', '$.payload.emissions.calculation_method') }} AS calculation_method,
+  {{ bronze_field('payload.emissions.factor_source', '$.payload.emissions.factor_source') }} AS factor_source,
+  {{ bronze_field('payload.emissions.rf_applied', '$.payload.emissions.rf_applied', 'BOOLEAN') }} AS rf_applied,
+  {{ bronze_field('payload.temperature.controlled', '$.payload.temperature.controlled', 'BOOLEAN') }} AS temperature_controlled,
+  {{ bronze_field('payload.temperature.range_celsius.min', '$.payload.temperature.range_celsius.min', 'DOUBLE') }} AS temp_min_celsius,
+  {{ bronze_field('payload.temperature.range_celsius.max', '$.payload.temperature.range_celsius.max', 'DOUBLE') }} AS temp_max_celsius,
+  {{ bronze_field('payload.status', '$.payload.status') }} AS status,
   event_id,
-  _raw,
   CURRENT_TIMESTAMP AS _loaded_at
 
-FROM read_parquet('s3://lake/bronze/topic=Continuum_Overworld.Atlas_Planner--Airfreight__KE-DE@v0.9.2.events/*/*/*/*.parquet')
+FROM read_parquet('s3://lake/bronze/topic=Continuum_Overworld.Atlas_Planner--Airfreight__KE-DE@v0.9.2.events/*/*/*/*.parquet', union_by_name=true)
 
 {% if is_incremental() %}
   WHERE _loaded_at > (SELECT MAX(_loaded_at) FROM {{ this }})
-{% endif %}
\ No newline at end of file
+{% endif %}
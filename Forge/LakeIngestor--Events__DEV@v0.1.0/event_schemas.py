@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+"""
+Arrow schemas for bronze lake events
+Flattens event headers into typed columns and stores payloads as nested structs
+"""
+
+import json
+from datetime import date, datetime, timezone
+from typing import Dict, List, Any, Optional
+
+import pyarrow as pa
+
+TIMESTAMP = pa.timestamp('us', tz='UTC')
+
+# Envelope headers shared by every Continuum_Overworld event
+HEADER_FIELDS = [
+    pa.field('tenant_id', pa.string()),
+    pa.field('project_tag', pa.string()),
+    pa.field('occurred_at', TIMESTAMP),
+    pa.field('world', pa.string()),
+    pa.field('division', pa.string()),
+    pa.field('capability', pa.string()),
+    pa.field('role', pa.string()),
+    pa.field('qualifier', pa.string()),
+    pa.field('version', pa.string()),
+    pa.field('agent_run_id', pa.string()),
+    pa.field('payload_schema', pa.string()),
+    pa.field('correlation_id', pa.string()),
+    pa.field('causation_id', pa.string()),
+]
+
+# Columns added by the ingestor itself
+INGEST_FIELDS = [
+    pa.field('event_id', pa.string()),
+    pa.field('topic', pa.string()),
+    pa.field('partition', pa.int32()),
+    pa.field('offset', pa.int64()),
+    pa.field('ingested_at', TIMESTAMP),
+]
+
+RAW_FIELD = pa.field('_raw', pa.string())
+
+# Payload contracts, keyed by headers.payload_schema
+_DOCUMENT_METADATA = pa.struct([
+    ('title', pa.string()),
+    ('document_type', pa.string()),
+    ('reporting_year', pa.int32()),
+    ('source_uri', pa.string()),
+    ('hash', pa.string()),
+])
+
+_LOCATION = pa.struct([
+    ('name', pa.string()),
+    ('code', pa.string()),
+])
+
+PAYLOAD_CONTRACTS: Dict[str, pa.DataType] = {
+    'csr.ingested.v1': pa.struct([
+        ('doc_id', pa.string()),
+        ('org_id', pa.string()),
+        ('org_code', pa.string()),
+        ('source_uri', pa.string()),
+        ('hash', pa.string()),
+        ('document_metadata', _DOCUMENT_METADATA),
+    ]),
+    'esg.metric.v1': pa.struct([
+        ('doc_id', pa.string()),
+        ('org_id', pa.string()),
+        ('org_code', pa.string()),
+        ('metrics', pa.list_(pa.struct([
+            ('metric_type', pa.string()),
+            ('metric_name', pa.string()),
+            ('value', pa.float64()),
+            ('unit', pa.string()),
+            ('period_start', pa.date32()),
+            ('period_end', pa.date32()),
+            ('confidence', pa.float64()),
+            ('method', pa.string()),
+            ('model_version', pa.string()),
+            ('page_reference', pa.string()),
+            ('text_snippet', pa.string()),
+        ]))),
+        ('document_metadata', _DOCUMENT_METADATA),
+    ]),
+    'shipment.leg.v1': pa.struct([
+        ('shipment_code', pa.string()),
+        ('batch_code', pa.string()),
+        ('leg_number', pa.int32()),
+        ('mode', pa.string()),
+        ('from_location', _LOCATION),
+        ('to_location', _LOCATION),
+        ('distance_km', pa.float64()),
+        ('payload', pa.struct([
+            ('mass_kg', pa.float64()),
+            ('volume_m3', pa.float64()),
+            ('commodity', pa.string()),
+            ('hs_code', pa.string()),
+        ])),
+        ('vehicle', pa.struct([
+            ('class', pa.string()),
+            ('fuel_type', pa.string()),
+            ('euro_standard', pa.string()),
+            ('load_factor_pct', pa.float64()),
+            ('backhaul', pa.bool_()),
+        ])),
+        ('carrier', pa.struct([
+            ('name', pa.string()),
+            ('code', pa.string()),
+            ('vessel_name', pa.string()),
+            ('flight_number', pa.string()),
+        ])),
+        ('timing', pa.struct([
+            ('scheduled_departure', TIMESTAMP),
+            ('actual_departure', TIMESTAMP),
+            ('scheduled_arrival', TIMESTAMP),
+            ('actual_arrival', TIMESTAMP),
+            ('duration_hours', pa.float64()),
+        ])),
+        ('emissions', pa.struct([
+            ('co2e_kg', pa.float64()),
+            ('ttw_kg', pa.float64()),
+            ('wtt_kg', pa.float64()),
+            ('calculation_method', pa.string()),
+            ('factor_source', pa.string()),
+            ('rf_applied', pa.bool_()),
+        ])),
+        ('temperature', pa.struct([
+            ('controlled', pa.bool_()),
+            ('range_celsius', pa.struct([
+                ('min', pa.float64()),
+                ('max', pa.float64()),
+            ])),
+        ])),
+        ('status', pa.string()),
+    ]),
+    'agent.run.v1': pa.struct([
+        ('agent_name', pa.string()),
+        ('agent_type', pa.string()),
+        ('parent_run_id', pa.string()),
+        ('status', pa.string()),
+        ('started_at', TIMESTAMP),
+        ('ended_at', TIMESTAMP),
+        ('duration_ms', pa.int64()),
+        ('input', pa.struct([('prompt', pa.string())])),
+        ('output', pa.struct([
+            ('response', pa.string()),
+            ('data', pa.string()),
+        ])),
+        ('tools', pa.string()),
+        ('model_config', pa.struct([
+            ('provider', pa.string()),
+            ('model', pa.string()),
+            ('temperature', pa.float64()),
+            ('max_tokens', pa.int32()),
+        ])),
+        ('tokens_used', pa.struct([
+            ('prompt', pa.int64()),
+            ('completion', pa.int64()),
+            ('total', pa.int64()),
+        ])),
+        ('cost', pa.float64()),
+        ('memory_operations', pa.struct([
+            ('kv_reads', pa.int64()),
+            ('kv_writes', pa.int64()),
+            ('doc_searches', pa.int64()),
+            ('doc_writes', pa.int64()),
+            ('insights_generated', pa.int64()),
+        ])),
+        ('error', pa.struct([
+            ('message', pa.string()),
+            ('type', pa.string()),
+            ('stack_trace', pa.string()),
+            ('retry_count', pa.int32()),
+        ])),
+        ('metadata', pa.string()),
+    ]),
+}
+
+# Topics bound to a payload contract; unbound topics keep headers + _raw only
+TOPIC_CONTRACTS: Dict[str, str] = {
+    'Continuum_Overworld.Forge_Ingestor--CSR__EU-DE@v1.events': 'csr.ingested.v1',
+    'Continuum_Overworld.Oracle_Calculator--ESG__PROD@v1.events': 'esg.metric.v1',
+    'Continuum_Overworld.Atlas_Planner--Airfreight__KE-DE@v0.9.2.events': 'shipment.leg.v1',
+    'Continuum_Overworld.Orion_Reasoner--Analysis__PROD@v1.events': 'agent.run.v1',
+}
+
+_SCHEMA_CACHE: Dict[tuple, pa.Schema] = {}
+
+
+def payload_type_for_topic(topic: str) -> Optional[pa.DataType]:
+    """Return the payload struct type bound to a topic, if any"""
+    contract = TOPIC_CONTRACTS.get(topic)
+    return PAYLOAD_CONTRACTS.get(contract) if contract else None
+
+
+def schema_for_topic(topic: str, include_raw: bool = False) -> pa.Schema:
+    """Build the bronze Parquet schema for a topic"""
+    key = (topic, include_raw)
+    if key in _SCHEMA_CACHE:
+        return _SCHEMA_CACHE[key]
+
+    payload_type = payload_type_for_topic(topic)
+    fields = list(HEADER_FIELDS) + list(INGEST_FIELDS)
+    if payload_type is not None:
+        fields.append(pa.field('payload', payload_type))
+    # Without a contract the payload only survives in _raw
+    if include_raw or payload_type is None:
+        fields.append(RAW_FIELD)
+
+    schema = pa.schema(fields, metadata={
+        'payload_schema': TOPIC_CONTRACTS.get(topic, ''),
+    })
+    _SCHEMA_CACHE[key] = schema
+    return schema
+
+
+def _parse_timestamp(value: Any) -> Optional[datetime]:
+    """Parse ISO-8601 strings and epoch numbers into aware datetimes"""
+    if isinstance(value, datetime):
+        return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return datetime.fromtimestamp(value, tz=timezone.utc)
+    if isinstance(value, str):
+        dt = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+    return None
+
+
+def _parse_bool(value: Any) -> Optional[bool]:
+    """Interpret common truthy/falsy encodings"""
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, (int, float)):
+        return bool(value)
+    if isinstance(value, str):
+        lowered = value.strip().lower()
+        if lowered in ('true', '1', 'yes', 'y'):
+            return True
+        if lowered in ('false', '0', 'no', 'n'):
+            return False
+    return None
+
+
+def coerce_value(value: Any, dtype: pa.DataType) -> Any:
+    """Coerce a decoded JSON value to a Python value Arrow accepts for dtype
+
+    Values that cannot be converted become null rather than failing the batch;
+    the original is still available through _raw when it is enabled.
+    """
+    if value is None:
+        return None
+    try:
+        if pa.types.is_struct(dtype):
+            if not isinstance(value, dict):
+                return None
+            return {
+                dtype.field(i).name: coerce_value(value.get(dtype.field(i).name), dtype.field(i).type)
+                for i in range(dtype.num_fields)
+            }
+        if pa.types.is_list(dtype):
+            if not isinstance(value, list):
+                return None
+            return [coerce_value(item, dtype.value_type) for item in value]
+        if pa.types.is_string(dtype):
+            if isinstance(value, (dict, list)):
+                return json.dumps(value, sort_keys=True)
+            return str(value)
+        if pa.types.is_boolean(dtype):
+            return _parse_bool(value)
+        if pa.types.is_integer(dtype):
+            if isinstance(value, bool):
+                return int(value)
+            return int(float(value))
+        if pa.types.is_floating(dtype):
+            return float(value)
+        if pa.types.is_timestamp(dtype):
+            return _parse_timestamp(value)
+        if pa.types.is_date(dtype):
+            if isinstance(value, date) and not isinstance(value, datetime):
+                return value
+            return _parse_timestamp(value).date()
+    except (TypeError, ValueError, AttributeError, OverflowError):
+        return None
+    return value
+
+
+def build_row(event: Dict[str, Any], topic: str, partition: int, offset: int,
+              include_raw: bool = False) -> Dict[str, Any]:
+    """Flatten a decoded event into a row matching schema_for_topic"""
+    headers = event.get('headers', {}) or {}
+    row = {
+        field.name: coerce_value(headers.get(field.name), field.type)
+        for field in HEADER_FIELDS
+    }
+    row.update({
+        'event_id': event.get('event_id', headers.get('agent_run_id')),
+        'topic': topic,
+        'partition': partition,
+        'offset': offset,
+        'ingested_at': datetime.now(timezone.utc),
+    })
+
+    payload_type = payload_type_for_topic(topic)
+    if payload_type is not None:
+        row['payload'] = coerce_value(event.get('payload'), payload_type)
+    if include_raw or payload_type is None:
+        row['_raw'] = json.dumps(event)
+
+    return row
+
+
+def rows_to_table(topic: str, rows: List[Dict[str, Any]], include_raw: bool = False) -> pa.Table:
+    """Convert buffered rows into a typed table sorted for row-group pruning"""
+    schema = schema_for_topic(topic, include_raw)
+    table = pa.Table.from_pylist(rows, schema=schema)
+    # Clustering on the common filter columns keeps min/max statistics tight
+    return table.sort_by([
+        ('tenant_id', 'ascending'),
+        ('project_tag', 'ascending'),
+        ('occurred_at', 'ascending'),
+    ])
@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+Lake Compactor for The_Bridge bronze layer
+Merges small Parquet files per topic/tenant_id/project_tag/ds partition
+into target-sized files and removes the originals
+"""
+
+import argparse
+import json
+import os
+import sys
+from datetime import date, timedelta
+from typing import Dict, List, Any, Optional
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+import s3fs
+import structlog
+from dotenv import load_dotenv
+
+from event_schemas import schema_for_topic
+from lake_layout import (
+    MANIFEST_PREFIX, MANIFEST_SUFFIX, STAGING_PREFIX, STAGING_SUFFIX,
+    manifest_file_name, partition_dir, parse_partition_dir, part_file_name, staging_file_name,
+)
+
+load_dotenv()
+
+# Configuration
+BUCKET = os.getenv('LAKE_BUCKET', 'lake')
+SMALL_FILE_BYTES = int(os.getenv('COMPACT_SMALL_FILE_BYTES', str(32 * 1024 * 1024)))
+TARGET_FILE_BYTES = int(os.getenv('COMPACT_TARGET_FILE_BYTES', str(256 * 1024 * 1024)))
+MIN_FILES = int(os.getenv('COMPACT_MIN_FILES', '4'))
+ROW_GROUP_SIZE = int(os.getenv('ROW_GROUP_SIZE', '65536'))
+# Leave the current day alone by default; the ingestor is still writing to it
+LOOKBACK_DAYS = int(os.getenv('COMPACT_LOOKBACK_DAYS', '7'))
+SKIP_RECENT_DAYS = int(os.getenv('COMPACT_SKIP_RECENT_DAYS', '1'))
+
+# S3/MinIO configuration
+S3_ENDPOINT = os.getenv('S3_ENDPOINT', 'http://localhost:9000')
+S3_ACCESS_KEY = os.getenv('S3_ACCESS_KEY', 'bridge_admin')
+S3_SECRET_KEY = os.getenv('S3_SECRET_KEY', 'bridge_secure_2025')
+
+# Setup logging
+logger = structlog.get_logger("lake_compactor")
+
+SORT_KEYS = [
+    ('tenant_id', 'ascending'),
+    ('project_tag', 'ascending'),
+    ('occurred_at', 'ascending'),
+]
+
+
+class LakeCompactor:
+    def __init__(self, fs=None, bucket: str = BUCKET):
+        self.fs = fs or s3fs.S3FileSystem(
+            endpoint_url=S3_ENDPOINT,
+            key=S3_ACCESS_KEY,
+            secret=S3_SECRET_KEY,
+            use_ssl=False
+        )
+        self.bucket = bucket
+
+    def list_partitions(self, topic: str = '*', tenant_id: str = '*',
+                        project_tag: str = '*', ds: str = '*') -> List[str]:
+        """List partition directories matching the given key patterns"""
+        pattern = partition_dir(self.bucket, (topic, tenant_id, project_tag, ds))
+        return sorted(self.fs.glob(pattern))
+
+    def _small_files(self, partition: str) -> List[Dict[str, Any]]:
+        """Return Parquet files in a partition that are below the small-file threshold"""
+        files = []
+        for info in self.fs.ls(partition, detail=True):
+            name = info['name'].rsplit('/', 1)[-1]
+            if info.get('type') != 'file' or not name.endswith('.parquet'):
+                continue
+            if info.get('size', 0) < SMALL_FILE_BYTES:
+                files.append(info)
+        return sorted(files, key=lambda info: info['name'])
+
+    @staticmethod
+    def _cast_column(column: pa.ChunkedArray, dtype: pa.DataType) -> pa.ChunkedArray:
+        """Cast a column to its contract type"""
+        if pa.types.is_string(column.type) and pa.types.is_timestamp(dtype) and dtype.tz:
+            try:
+                return column.cast(dtype)
+            except pa.ArrowInvalid:
+                # Files from before the typed schema hold naive UTC ISO strings
+                return pc.assume_timezone(column.cast(pa.timestamp(dtype.unit)), dtype.tz)
+        return column.cast(dtype)
+
+    def _read_files(self, partition: str, files: List[Dict[str, Any]]) -> pa.Table:
+        """Read and concatenate files, unifying schemas that evolved over time
+
+        Columns of the topic's contract are cast to their contract type first
+        (e.g. ingested_at was a string before the typed schema), since
+        concatenation cannot promote between unrelated types.
+        """
+        contract = schema_for_topic(parse_partition_dir(partition)[0], include_raw=True)
+        tables = []
+        for info in files:
+            # Partition values are already columns; don't re-derive them from the path
+            table = pq.read_table(info['name'], filesystem=self.fs, partitioning=None)
+            for index, name in enumerate(table.column_names):
+                target = contract.field(name) if name in contract.names else None
+                if target is not None and table.field(index).type != target.type:
+                    table = table.set_column(index, target, self._cast_column(table.column(index), target.type))
+            tables.append(table)
+        return pa.concat_tables(tables, promote_options='permissive')
+
+    @staticmethod
+    def _deduplicate(table: pa.Table) -> pa.Table:
+        """Drop rows already present under the same Kafka coordinates
+
+        A batch whose offsets were not committed after it was written is
+        redelivered and written again, so one record can be in two files.
+        """
+        if not {'topic', 'partition', 'offset'}.issubset(table.column_names):
+            return table
+        seen = set()
+        keep = []
+        coordinates = zip(
+            table.column('topic').to_pylist(),
+            table.column('partition').to_pylist(),
+            table.column('offset').to_pylist(),
+        )
+        for index, key in enumerate(coordinates):
+            if key not in seen:
+                seen.add(key)
+                keep.append(index)
+        if len(keep) == table.num_rows:
+            return table
+        return table.take(pa.array(keep, type=pa.int64()))
+
+    def _write_staging(self, partition: str, table: pa.Table) -> str:
+        """Write a table under a staging name, invisible to readers"""
+        staging = f"{partition}/{staging_file_name()}"
+        with self.fs.open(staging, 'wb') as f:
+            pq.write_table(table, f, compression='zstd',
+                           row_group_size=ROW_GROUP_SIZE,
+                           write_statistics=True)
+        return staging
+
+    def _finish(self, manifest_path: str, manifest: Dict[str, Any]) -> List[str]:
+        """Publish a committed compaction's outputs, then remove its inputs
+
+        Every step is skipped when already done, so it can be repeated after
+        a crash at any point.
+        """
+        for staging, final in manifest['outputs']:
+            if self.fs.exists(staging):
+                self.fs.mv(staging, final)
+        remaining = [path for path in manifest['inputs'] if self.fs.exists(path)]
+        if remaining:
+            self.fs.rm(remaining)
+        self.fs.rm(manifest_path)
+        return [final for _, final in manifest['outputs']]
+
+    def _recover(self, partition: str):
+        """Finish compactions that crashed after their commit point
+
+        Staging files not named by a manifest belong to a compaction that
+        never committed (its originals are intact) and are removed.
+        """
+        names = [name.rstrip('/') for name in self.fs.ls(partition, detail=False)]
+        committed = set()
+        for path in sorted(names):
+            base = path.rsplit('/', 1)[-1]
+            if base.startswith(MANIFEST_PREFIX) and base.endswith(MANIFEST_SUFFIX):
+                manifest = json.loads(self.fs.cat_file(path))
+                committed.update(staging for staging, _ in manifest['outputs'])
+                logger.warning("Finishing interrupted compaction", partition=partition, manifest=path)
+                self._finish(path, manifest)
+        orphans = [
+            path for path in names
+            if path.rsplit('/', 1)[-1].startswith(STAGING_PREFIX)
+            and path.endswith(STAGING_SUFFIX) and path not in committed
+        ]
+        if orphans:
+            self.fs.rm(orphans)
+
+    def compact_partition(self, partition: str, dry_run: bool = False) -> Dict[str, Any]:
+        """Compact the small files of one partition
+
+        Outputs are staged, then a manifest naming inputs and outputs is
+        written as the commit point before anything becomes visible. A
+        rerun after a crash either finishes the committed compaction or
+        discards the uncommitted staging files, so no record is compacted
+        twice.
+        """
+        if not dry_run:
+            self._recover(partition)
+        files = self._small_files(partition)
+        result = {
+            'partition': partition,
+            'input_files': len(files),
+            'input_bytes': sum(info.get('size', 0) for info in files),
+            'output_files': [],
+            'rows': 0,
+        }
+        if len(files) < MIN_FILES:
+            return result
+        if dry_run:
+            logger.info("Would compact partition", **result)
+            return result
+
+        table = self._deduplicate(self._read_files(partition, files))
+        if 'occurred_at' in table.column_names:
+            table = table.sort_by([key for key in SORT_KEYS if key[0] in table.column_names])
+
+        # Split into roughly target-sized outputs based on the observed bytes/row
+        bytes_per_row = max(1, result['input_bytes'] // max(1, table.num_rows))
+        rows_per_file = max(ROW_GROUP_SIZE, TARGET_FILE_BYTES // bytes_per_row)
+
+        staged = []
+        manifest_path = f"{partition}/{manifest_file_name()}"
+        try:
+            for start in range(0, table.num_rows, rows_per_file):
+                staged.append(self._write_staging(partition, table.slice(start, rows_per_file)))
+            manifest = {
+                'inputs': [info['name'] for info in files],
+                'outputs': [[path, f"{partition}/{part_file_name('compacted')}"] for path in staged],
+            }
+            self.fs.pipe_file(manifest_path, json.dumps(manifest).encode('utf-8'))
+        except Exception as e:
+            logger.error("Compaction write failed, keeping originals",
+                         partition=partition, error=str(e))
+            for path in staged:
+                self.fs.rm(path)
+            raise
+
+        written = self._finish(manifest_path, manifest)
+
+        result['output_files'] = written
+        result['rows'] = table.num_rows
+        logger.info("Compacted partition", partition=partition,
+                    input_files=result['input_files'], output_files=len(written),
+                    rows=table.num_rows)
+        return result
+
+    def run(self, topic: str = '*', tenant_id: str = '*', project_tag: str = '*',
+            days: Optional[List[str]] = None, dry_run: bool = False) -> List[Dict[str, Any]]:
+        """Compact all matching partitions for the given days"""
+        if days is None:
+            today = date.today()
+            days = [
+                (today - timedelta(days=offset)).isoformat()
+                for offset in range(SKIP_RECENT_DAYS, SKIP_RECENT_DAYS + LOOKBACK_DAYS)
+            ]
+
+        results = []
+        for ds in days:
+            for partition in self.list_partitions(topic, tenant_id, project_tag, ds):
+                try:
+                    results.append(self.compact_partition(partition, dry_run=dry_run))
+                except Exception as e:
+                    logger.error("Failed to compact partition",
+                                 partition=parse_partition_dir(partition), error=str(e))
+        return results
+
+
+def main():
+    """Entry point"""
+    parser = argparse.ArgumentParser(description="Compact small bronze Parquet files")
+    parser.add_argument('--topic', default='*')
+    parser.add_argument('--tenant-id', default='*')
+    parser.add_argument('--project-tag', default='*')
+    parser.add_argument('--ds', action='append',
+                        help="Partition date (YYYY-MM-DD); repeatable, defaults to the lookback window")
+    parser.add_argument('--dry-run', action='store_true')
+    args = parser.parse_args()
+
+    try:
+        compactor = LakeCompactor()
+        results = compactor.run(args.topic, args.tenant_id, args.project_tag,
+                                days=args.ds, dry_run=args.dry_run)
+        compacted = [r for r in results if r['output_files']]
+        logger.info("Compaction finished", partitions_scanned=len(results),
+                    partitions_compacted=len(compacted),
+                    files_removed=sum(r['input_files'] for r in compacted))
+    except Exception as e:
+        logger.error("Fatal error", error=str(e))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
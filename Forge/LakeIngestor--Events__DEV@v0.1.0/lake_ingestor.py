@@ -7,19 +7,23 @@ Consumes events from Redpanda and writes partitioned Parquet to MinIO
 import json
 import os
 import sys
+from collections import deque
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Dict, List, Any
+from typing import Deque, Dict, List, Any
 import time
 import signal
 
-import pyarrow as pa
 import pyarrow.parquet as pq
 import s3fs
 import structlog
-from confluent_kafka import Consumer, KafkaException, KafkaError
+from confluent_kafka import Consumer, KafkaException, KafkaError, TopicPartition
 from dotenv import load_dotenv
 
+from event_schemas import build_row, rows_to_table
+from lake_layout import partition_dir, part_file_name
+from lake_uploader import UploadPool
+
 load_dotenv()
 
 # Configuration
@@ -27,7 +31,9 @@ KAFKA_CONFIG = {
     'bootstrap.servers': os.getenv('KAFKA_BOOTSTRAP_SERVERS', 'localhost:19092'),
     'group.id': os.getenv('CONSUMER_GROUP_ID', 'lake-ingestor'),
     'auto.offset.reset': os.getenv('AUTO_OFFSET_RESET', 'earliest'),
-    'enable.auto.commit': True,
+    # Offsets are committed by the ingestor once the data is durable
+    'enable.auto.commit': False,
+    'enable.auto.offset.store': False,
     'session.timeout.ms': 30000,
     'fetch.wait.max.ms': 1000
 }
@@ -36,6 +42,19 @@ TOPICS = os.getenv('TOPICS', 'continuum.events,continuum.memory,continuum.metric
 BUCKET = os.getenv('LAKE_BUCKET', 'lake')
 BATCH_SIZE = int(os.getenv('BATCH_SIZE', '100'))
 FLUSH_INTERVAL = int(os.getenv('FLUSH_INTERVAL_SECONDS', '30'))
+INCLUDE_RAW = os.getenv('LAKE_INCLUDE_RAW', 'true').lower() == 'true'
+ROW_GROUP_SIZE = int(os.getenv('ROW_GROUP_SIZE', '65536'))
+
+# Failed-write handling
+MAX_WRITE_ATTEMPTS = int(os.getenv('MAX_WRITE_ATTEMPTS', '5'))
+RETRY_BACKOFF_SECONDS = float(os.getenv('RETRY_BACKOFF_SECONDS', '2'))
+MAX_RETRY_BUFFERS = int(os.getenv('MAX_RETRY_BUFFERS', '50'))
+DEAD_LETTER_DIR = Path(os.getenv('DEAD_LETTER_DIR', './deadletter'))
+
+# Background uploads
+UPLOAD_WORKERS = int(os.getenv('UPLOAD_WORKERS', '8'))
+MAX_INFLIGHT_BYTES = int(os.getenv('MAX_INFLIGHT_BYTES', str(256 * 1024 * 1024)))
+MULTIPART_CHUNK_BYTES = int(os.getenv('MULTIPART_CHUNK_BYTES', str(16 * 1024 * 1024)))
 
 # S3/MinIO configuration
 S3_ENDPOINT = os.getenv('S3_ENDPOINT', 'http://localhost:9000')
@@ -54,7 +73,15 @@ class LakeIngestor:
             use_ssl=False
         )
         self.consumer = Consumer(KAFKA_CONFIG)
-        self.buffers: Dict[tuple, List[Dict[str, Any]]] = {}
+        # Buffers hold records plus the first offset seen per Kafka partition
+        self.buffers: Dict[tuple, Dict[str, Any]] = {}
+        self.uploads = UploadPool(self._write_parquet_batch,
+                                  max_workers=UPLOAD_WORKERS,
+                                  max_inflight_bytes=MAX_INFLIGHT_BYTES)
+        self.retry_queue: Deque[Dict[str, Any]] = deque()
+        self.consumed: Dict[tuple, int] = {}
+        self.committed: Dict[tuple, int] = {}
+        self.paused = False
         self.last_flush = time.time()
         self.running = True
         
@@ -95,17 +122,19 @@ class LakeIngestor:
         """Write batch of rows to Parquet file"""
         topic, tenant_id, project_tag, ds = partition_key
         
-        # Generate partition path
-        timestamp = int(time.time())
-        path = f"{BUCKET}/bronze/topic={topic}/tenant_id={tenant_id}/project_tag={project_tag}/ds={ds}/part-{timestamp}.parquet"
+        # Generate partition path with a collision-free part name
+        path = f"{partition_dir(BUCKET, partition_key)}/{part_file_name()}"
         
         try:
-            # Convert to PyArrow table
-            table = pa.Table.from_pylist(rows)
+            # Convert to typed PyArrow table
+            table = rows_to_table(topic, rows, include_raw=INCLUDE_RAW)
             
-            # Write to S3/MinIO with compression
-            with self.s3.open(path, 'wb') as f:
-                pq.write_table(table, f, compression='zstd')
+            # Write to S3/MinIO with compression and column statistics;
+            # files larger than one block go up as multipart uploads
+            with self.s3.open(path, 'wb', block_size=MULTIPART_CHUNK_BYTES) as f:
+                pq.write_table(table, f, compression='zstd',
+                               row_group_size=ROW_GROUP_SIZE,
+                               write_statistics=True)
             
             logger.info("Wrote parquet batch", 
                        path=path, records=len(rows), 
@@ -118,6 +147,10 @@ class LakeIngestor:
     
     def _process_message(self, msg):
         """Process a single Kafka message"""
+        # Every message counts as consumed, even if it is skipped below
+        kafka_partition = (msg.topic(), msg.partition())
+        self.consumed[kafka_partition] = msg.offset()
+        
         try:
             # Parse JSON event
             raw_event = json.loads(msg.value().decode('utf-8'))
@@ -130,21 +163,24 @@ class LakeIngestor:
             # Get partition key
             partition_key = self._get_partition_path(raw_event, msg.topic())
             
-            # Prepare record for storage
-            record = {
-                '_raw': json.dumps(raw_event),
-                'event_id': raw_event.get('event_id', raw_event.get('headers', {}).get('agent_run_id')),
-                'topic': msg.topic(),
-                'partition': msg.partition(),
-                'offset': msg.offset(),
-                'ingested_at': datetime.utcnow().isoformat()
-            }
+            # Prepare typed record for storage
+            record = build_row(raw_event, msg.topic(), msg.partition(),
+                               msg.offset(), include_raw=INCLUDE_RAW)
             
             # Add to buffer
             if partition_key not in self.buffers:
-                self.buffers[partition_key] = []
+                self.buffers[partition_key] = {
+                    'partition_key': partition_key,
+                    'records': [],
+                    'offsets': {},
+                    'bytes': 0,
+                    'attempts': 0,
+                }
             
-            self.buffers[partition_key].append(record)
+            buffer = self.buffers[partition_key]
+            buffer['records'].append(record)
+            buffer['offsets'].setdefault(kafka_partition, msg.offset())
+            buffer['bytes'] += len(msg.value())
             
         except json.JSONDecodeError as e:
             logger.error("Failed to parse message JSON", 
@@ -158,7 +194,7 @@ class LakeIngestor:
         current_time = time.time()
         
         # Flush if total records exceed batch size
-        total_records = sum(len(buffer) for buffer in self.buffers.values())
+        total_records = sum(len(buffer['records']) for buffer in self.buffers.values())
         if total_records >= BATCH_SIZE:
             logger.debug("Flushing due to batch size", total_records=total_records)
             return True
@@ -171,38 +207,194 @@ class LakeIngestor:
         return False
     
     def _flush_buffers(self):
-        """Flush all buffers to storage"""
+        """Hand all buffers to the upload pool without waiting for them"""
         if not self.buffers:
+            self.last_flush = time.time()
             return
         
-        flush_count = 0
-        for partition_key, records in list(self.buffers.items()):
-            if records:  # Only flush non-empty buffers
-                try:
-                    self._write_parquet_batch(partition_key, records)
-                    flush_count += len(records)
-                    self.buffers.pop(partition_key)
-                except Exception as e:
-                    logger.error("Failed to flush buffer", 
-                                partition_key=partition_key, error=str(e))
-        
-        if flush_count > 0:
-            logger.info("Flushed buffers", records_written=flush_count, 
-                       partitions_flushed=len(self.buffers))
+        submitted = 0
+        deferred = 0
+        buffers, self.buffers = self.buffers, {}
+        for partition_key, buffer in buffers.items():
+            if not buffer['records']:
+                continue
+            if not self.uploads.has_capacity(buffer['bytes']):
+                # Over the in-flight budget: keep buffering until uploads drain
+                self.buffers[partition_key] = buffer
+                deferred += 1
+                continue
+            self.uploads.submit(buffer)
+            submitted += len(buffer['records'])
+        
+        if submitted > 0:
+            logger.info("Submitted buffers for upload", records=submitted,
+                       partitions_deferred=deferred, **self.uploads.stats())
         
+        self._apply_backpressure()
         self.last_flush = time.time()
     
+    def _collect_uploads(self):
+        """Handle finished uploads: retry failures and commit what is durable"""
+        finished = self.uploads.completed()
+        if not finished:
+            return
+        
+        for entry, error in finished:
+            if error is not None:
+                # New records for this partition start a fresh buffer; the
+                # failed one is retried on its own so it cannot grow
+                entry['attempts'] += 1
+                self._schedule_retry(entry, error=str(error))
+        
+        self._commit_offsets()
+        self._apply_backpressure()
+    
+    def _drain_uploads(self):
+        """Wait for every in-flight upload and process the results"""
+        self.uploads.wait()
+        self._collect_uploads()
+    
+    def _schedule_retry(self, entry: Dict[str, Any], error: str):
+        """Queue a failed buffer for retry, or dead-letter it when exhausted"""
+        if entry['attempts'] >= MAX_WRITE_ATTEMPTS and self._dead_letter(entry, error):
+            return
+        
+        delay = RETRY_BACKOFF_SECONDS * (2 ** min(entry['attempts'] - 1, 6))
+        entry['next_attempt'] = time.time() + delay
+        self.retry_queue.append(entry)
+        logger.warning("Scheduled buffer retry",
+                      partition_key=entry['partition_key'], attempts=entry['attempts'],
+                      retry_in=delay, queued=len(self.retry_queue), error=error)
+    
+    def _process_retries(self):
+        """Resubmit failed buffers whose backoff has elapsed"""
+        if not self.retry_queue:
+            return
+        
+        now = time.time()
+        for _ in range(len(self.retry_queue)):
+            entry = self.retry_queue.popleft()
+            if entry['next_attempt'] > now or not self.uploads.has_capacity(entry['bytes']):
+                self.retry_queue.append(entry)
+                continue
+            self.uploads.submit(entry)
+    
+    def _dead_letter(self, entry: Dict[str, Any], error: str) -> bool:
+        """Persist an undeliverable buffer to the local dead-letter directory"""
+        topic, tenant_id, project_tag, ds = entry['partition_key']
+        directory = DEAD_LETTER_DIR / f"topic={topic}" / f"tenant_id={tenant_id}" / \
+            f"project_tag={project_tag}" / f"ds={ds}"
+        path = directory / part_file_name().replace('.parquet', '.jsonl')
+        
+        try:
+            directory.mkdir(parents=True, exist_ok=True)
+            with open(path, 'w', encoding='utf-8') as f:
+                for record in entry['records']:
+                    f.write(json.dumps(record, default=str) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            
+            logger.error("Dead-lettered buffer", path=str(path),
+                        records=len(entry['records']), attempts=entry['attempts'],
+                        error=error)
+            return True
+            
+        except Exception as e:
+            logger.error("Failed to dead-letter buffer",
+                        path=str(path), error=str(e))
+            return False
+    
+    def _commit_offsets(self):
+        """Commit, per Kafka partition, the offset below which all data is durable"""
+        # The oldest offset still sitting in a buffer or the retry queue
+        # bounds what can be committed for its Kafka partition
+        pending: Dict[tuple, int] = {}
+        entries = list(self.buffers.values()) + list(self.retry_queue) + \
+            self.uploads.pending_entries()
+        for entry in entries:
+            for kafka_partition, offset in entry['offsets'].items():
+                pending[kafka_partition] = min(offset, pending.get(kafka_partition, offset))
+        
+        offsets = []
+        for kafka_partition, last_offset in self.consumed.items():
+            commit_offset = pending.get(kafka_partition, last_offset + 1)
+            if commit_offset > self.committed.get(kafka_partition, -1):
+                offsets.append(TopicPartition(kafka_partition[0], kafka_partition[1], commit_offset))
+        
+        if not offsets:
+            return
+        
+        try:
+            self.consumer.commit(offsets=offsets, asynchronous=False)
+            for tp in offsets:
+                self.committed[(tp.topic, tp.partition)] = tp.offset
+            logger.debug("Committed offsets", partitions=len(offsets))
+        except KafkaException as e:
+            logger.error("Failed to commit offsets", error=str(e))
+    
+    def _apply_backpressure(self):
+        """Pause consumption while retries or unsent buffers exceed their bounds"""
+        buffered_bytes = sum(buffer['bytes'] for buffer in self.buffers.values())
+        saturated = (len(self.retry_queue) >= MAX_RETRY_BUFFERS
+                     or buffered_bytes >= MAX_INFLIGHT_BYTES)
+        if not self.paused and saturated:
+            self.consumer.pause(self.consumer.assignment())
+            self.paused = True
+            logger.warning("Paused consumption, upload backlog full",
+                          queued=len(self.retry_queue), buffered_bytes=buffered_bytes)
+        elif self.paused and not saturated:
+            self.consumer.resume(self.consumer.assignment())
+            self.paused = False
+            logger.info("Resumed consumption", queued=len(self.retry_queue))
+    
+    def _on_revoke(self, consumer, partitions):
+        """Flush and commit before partitions move to another consumer"""
+        logger.info("Partitions revoked", partitions=len(partitions))
+        self._flush_buffers()
+        while self.buffers:
+            self._drain_uploads()
+            self._flush_buffers()
+        self._drain_uploads()
+        
+        # Anything still unflushed is uncommitted and will be redelivered to
+        # the new owner, so local state for revoked partitions is dropped
+        revoked = {(tp.topic, tp.partition) for tp in partitions}
+        kept: Deque[Dict[str, Any]] = deque()
+        rewind: Dict[tuple, int] = {}
+        for entry in self.retry_queue:
+            if not revoked.intersection(entry['offsets']):
+                kept.append(entry)
+                continue
+            # Records of partitions we keep are re-read rather than lost
+            for kafka_partition, offset in entry['offsets'].items():
+                if kafka_partition not in revoked:
+                    rewind[kafka_partition] = min(offset, rewind.get(kafka_partition, offset))
+        self.retry_queue = kept
+        
+        for (topic, partition), offset in rewind.items():
+            consumer.seek(TopicPartition(topic, partition, offset))
+            self.consumed[(topic, partition)] = min(
+                self.consumed.get((topic, partition), offset), offset - 1)
+        for kafka_partition in revoked:
+            self.consumed.pop(kafka_partition, None)
+            self.committed.pop(kafka_partition, None)
+        self.paused = False
+    
     def run(self):
         """Main ingestion loop"""
         logger.info("Starting lake ingestion", topics=TOPICS)
         
-        self.consumer.subscribe(TOPICS)
+        self.consumer.subscribe(TOPICS, on_revoke=self._on_revoke)
         
         try:
             while self.running:
                 # Poll for messages
                 msg = self.consumer.poll(timeout=1.0)
                 
+                # Pick up finished uploads and retry failed ones when due
+                self._collect_uploads()
+                self._process_retries()
+                
                 if msg is None:
                     # Check if we should flush on timeout
                     if self._should_flush():
@@ -232,6 +424,16 @@ class LakeIngestor:
             # Flush remaining buffers
             logger.info("Shutting down, flushing remaining buffers")
             self._flush_buffers()
+            while self.buffers:
+                self._drain_uploads()
+                self._flush_buffers()
+            self._drain_uploads()
+            self.uploads.shutdown()
+            logger.info("Upload pool stopped", **self.uploads.stats())
+            if self.retry_queue:
+                logger.warning("Unflushed buffers left uncommitted at shutdown",
+                              buffers=len(self.retry_queue),
+                              records=sum(len(e['records']) for e in self.retry_queue))
             
             # Close consumer
             self.consumer.close()
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Bronze lake layout helpers
+Shared by the ingestor, compactor and readers so paths stay consistent
+"""
+
+import time
+import uuid
+from typing import Tuple
+
+# Hive partition columns, in path order (see LakeIngestor._get_partition_path)
+PARTITION_KEYS = ('topic', 'tenant_id', 'project_tag', 'ds')
+
+# Staging files are invisible to *.parquet globs and to pyarrow.dataset
+STAGING_PREFIX = '_staging-'
+STAGING_SUFFIX = '.parquet.tmp'
+
+# Compaction manifests record a compaction that is committed but not yet
+# finished, so a rerun after a crash can complete it instead of redoing it
+MANIFEST_PREFIX = '_compaction-'
+MANIFEST_SUFFIX = '.json'
+
+
+def partition_dir(bucket: str, partition_key: Tuple[str, str, str, str]) -> str:
+    """Directory holding the Parquet files of one partition"""
+    parts = '/'.join(f"{name}={value}" for name, value in zip(PARTITION_KEYS, partition_key))
+    return f"{bucket}/bronze/{parts}"
+
+
+def part_file_name(kind: str = 'part') -> str:
+    """Unique, time-ordered Parquet file name
+
+    Nanosecond time keeps names sortable; the random suffix prevents two
+    writers (or two flushes in the same tick) from overwriting each other.
+    """
+    return f"{kind}-{time.time_ns()}-{uuid.uuid4().hex[:8]}.parquet"
+
+
+def staging_file_name() -> str:
+    """Temporary name used while a file is being written"""
+    return f"{STAGING_PREFIX}{uuid.uuid4().hex}{STAGING_SUFFIX}"
+
+
+def manifest_file_name() -> str:
+    """Name of a compaction manifest within a partition directory"""
+    return f"{MANIFEST_PREFIX}{time.time_ns()}-{uuid.uuid4().hex[:8]}{MANIFEST_SUFFIX}"
+
+
+def parse_partition_dir(path: str) -> Tuple[str, str, str, str]:
+    """Recover the partition key tuple from a partition directory path"""
+    values = {}
+    for segment in path.rstrip('/').split('/'):
+        name, sep, value = segment.partition('=')
+        if sep and name in PARTITION_KEYS:
+            values[name] = value
+    return tuple(values[name] for name in PARTITION_KEYS)
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Lake Reader for The_Bridge bronze events
+Partition-pruned, lazily streamed reads over the layout written by LakeIngestor
+"""
+
+import json
+import os
+import time
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Any, Optional, Union
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+import s3fs
+import structlog
+from dotenv import load_dotenv
+
+from event_schemas import schema_for_topic
+from lake_layout import PARTITION_KEYS, partition_dir
+
+load_dotenv()
+
+# Configuration
+BUCKET = os.getenv('LAKE_BUCKET', 'lake')
+LISTING_CACHE_DIR = os.getenv('LAKE_LISTING_CACHE_DIR')
+LISTING_CACHE_TTL = int(os.getenv('LAKE_LISTING_CACHE_TTL_SECONDS', '300'))
+SCAN_BATCH_SIZE = int(os.getenv('LAKE_SCAN_BATCH_SIZE', '65536'))
+
+# S3/MinIO configuration
+S3_ENDPOINT = os.getenv('S3_ENDPOINT', 'http://localhost:9000')
+S3_ACCESS_KEY = os.getenv('S3_ACCESS_KEY', 'bridge_admin')
+S3_SECRET_KEY = os.getenv('S3_SECRET_KEY', 'bridge_secure_2025')
+
+# Setup logging
+logger = structlog.get_logger("lake_reader")
+
+PARTITIONING = ds.partitioning(
+    pa.schema([pa.field(name, pa.string()) for name in PARTITION_KEYS]),
+    flavor='hive'
+)
+
+Selector = Optional[Union[str, Iterable[str]]]
+
+
+def _as_list(value: Selector) -> Optional[List[str]]:
+    """Normalise a single value or an iterable of values"""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return [value]
+    return list(value)
+
+
+def _date_range(start_date: Union[str, date], end_date: Union[str, date]) -> List[str]:
+    """Inclusive list of ds values between two dates"""
+    start = date.fromisoformat(start_date) if isinstance(start_date, str) else start_date
+    end = date.fromisoformat(end_date) if isinstance(end_date, str) else end_date
+    return [(start + timedelta(days=i)).isoformat() for i in range((end - start).days + 1)]
+
+
+class ListingCache:
+    """Local JSON cache of directory listings with a TTL"""
+
+    def __init__(self, cache_dir: str, ttl: int = LISTING_CACHE_TTL):
+        self.path = Path(cache_dir) / 'lake_listing_cache.json'
+        self.ttl = ttl
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        if self.path.exists():
+            try:
+                self._entries = json.loads(self.path.read_text(encoding='utf-8'))
+            except (ValueError, OSError) as e:
+                logger.warning("Ignoring unreadable listing cache", path=str(self.path), error=str(e))
+
+    def get(self, directory: str) -> Optional[List[str]]:
+        entry = self._entries.get(directory)
+        if entry and time.time() - entry['fetched_at'] < self.ttl:
+            return entry['entries']
+        return None
+
+    def put(self, directory: str, entries: List[str]):
+        self._entries[directory] = {'fetched_at': time.time(), 'entries': entries}
+
+    def invalidate(self, prefix: str = ''):
+        for directory in [d for d in self._entries if d.startswith(prefix)]:
+            del self._entries[directory]
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix('.tmp')
+        tmp.write_text(json.dumps(self._entries), encoding='utf-8')
+        tmp.replace(self.path)
+
+
+class LakeReader:
+    def __init__(self, fs=None, bucket: str = BUCKET, cache_dir: Optional[str] = LISTING_CACHE_DIR,
+                 cache_ttl: int = LISTING_CACHE_TTL):
+        self.fs = fs or s3fs.S3FileSystem(
+            endpoint_url=S3_ENDPOINT,
+            key=S3_ACCESS_KEY,
+            secret=S3_SECRET_KEY,
+            use_ssl=False
+        )
+        self.bucket = bucket
+        self.base_dir = f"{bucket}/bronze"
+        self.cache = ListingCache(cache_dir, cache_ttl) if cache_dir else None
+
+    def _list(self, directory: str) -> List[str]:
+        """List one directory level, going through the cache when enabled"""
+        if self.cache is not None:
+            cached = self.cache.get(directory)
+            if cached is not None:
+                return cached
+        try:
+            entries = sorted(self.fs.ls(directory, detail=False))
+        except FileNotFoundError:
+            entries = []
+        if self.cache is not None:
+            self.cache.put(directory, entries)
+        return entries
+
+    def _expand(self, prefixes: List[str], key: str, values: Optional[List[str]]) -> List[str]:
+        """Descend one partition level, listing only when values are unknown"""
+        if values is not None:
+            return [f"{prefix}/{key}={value}" for prefix in prefixes for value in values]
+        expanded = []
+        for prefix in prefixes:
+            for entry in self._list(prefix):
+                name = entry.rstrip('/').rsplit('/', 1)[-1]
+                if name.startswith(f"{key}="):
+                    expanded.append(f"{prefix}/{name}")
+        return expanded
+
+    def partitions(self, topics: Selector = None, tenant_ids: Selector = None,
+                   project_tags: Selector = None, start_date: Union[str, date, None] = None,
+                   end_date: Union[str, date, None] = None) -> List[str]:
+        """Resolve the partition directories matching the selectors
+
+        Known values are turned into paths directly, so a fully specified
+        tenant-day touches only its own directory.
+        """
+        days = None
+        if start_date is not None or end_date is not None:
+            days = _date_range(start_date or end_date, end_date or start_date)
+
+        topics, tenant_ids, project_tags = map(_as_list, (topics, tenant_ids, project_tags))
+        if None not in (topics, tenant_ids, project_tags, days):
+            return [
+                partition_dir(self.bucket, (topic, tenant_id, project_tag, ds_value))
+                for topic in topics for tenant_id in tenant_ids
+                for project_tag in project_tags for ds_value in days
+            ]
+
+        prefixes = [self.base_dir]
+        for key, values in zip(PARTITION_KEYS, (topics, tenant_ids, project_tags, days)):
+            prefixes = self._expand(prefixes, key, values)
+        return prefixes
+
+    def files(self, partitions: List[str]) -> List[str]:
+        """Parquet files within the given partitions, skipping staging files"""
+        files = []
+        for partition in partitions:
+            for entry in self._list(partition):
+                name = entry.rsplit('/', 1)[-1]
+                if name.endswith('.parquet') and not name.startswith(('_', '.')):
+                    files.append(entry)
+        return files
+
+    def dataset(self, topics: Selector = None, tenant_ids: Selector = None,
+                project_tags: Selector = None, start_date: Union[str, date, None] = None,
+                end_date: Union[str, date, None] = None) -> ds.Dataset:
+        """Build a hive-partitioned dataset over only the matching files"""
+        partitions = self.partitions(topics, tenant_ids, project_tags, start_date, end_date)
+        files = self.files(partitions)
+        if self.cache is not None:
+            self.cache.save()
+
+        # Unify the contract schemas of the topics involved so files of
+        # different topics (or with/without _raw) read consistently
+        topic_names = sorted({
+            part.split('=', 1)[1]
+            for path in partitions for part in path.split('/')
+            if part.startswith('topic=')
+        })
+        schema = pa.unify_schemas(
+            [schema_for_topic(topic, include_raw=True) for topic in topic_names]
+            or [schema_for_topic('', include_raw=True)],
+            promote_options='permissive'
+        ).append(pa.field('ds', pa.string()))
+
+        logger.debug("Resolved lake dataset", partitions=len(partitions), files=len(files))
+        return ds.dataset(files, schema=schema, format='parquet', filesystem=self.fs,
+                          partitioning=PARTITIONING, partition_base_dir=self.base_dir)
+
+    def scan_batches(self, topics: Selector = None, tenant_ids: Selector = None,
+                     project_tags: Selector = None, start_date: Union[str, date, None] = None,
+                     end_date: Union[str, date, None] = None, columns: Optional[List[str]] = None,
+                     filter: Optional[ds.Expression] = None,
+                     batch_size: int = SCAN_BATCH_SIZE) -> Iterator[pa.RecordBatch]:
+        """Lazily stream record batches with column pruning and predicate pushdown
+
+        filter is an extra pyarrow expression, e.g.
+        ds.field('payload', 'distance_km') > 100 or ds.field('occurred_at') >= ts.
+        """
+        selectors = (topics, tenant_ids, project_tags, start_date, end_date)
+        for attempt in range(2):
+            dataset = self.dataset(*selectors)
+            yielded = False
+            try:
+                for batch in dataset.to_batches(columns=columns, filter=filter,
+                                                batch_size=batch_size):
+                    yielded = True
+                    yield batch
+                return
+            except FileNotFoundError:
+                # A cached listing went stale (e.g. after compaction); refresh once
+                if yielded or self.cache is None or attempt:
+                    raise
+                logger.info("Stale listing cache, refreshing")
+                self.cache.invalidate(self.base_dir)
+
+    def read_table(self, topics: Selector = None, tenant_ids: Selector = None,
+                   project_tags: Selector = None, start_date: Union[str, date, None] = None,
+                   end_date: Union[str, date, None] = None, columns: Optional[List[str]] = None,
+                   filter: Optional[ds.Expression] = None) -> pa.Table:
+        """Read the matching rows into a single table"""
+        dataset = self.dataset(topics, tenant_ids, project_tags, start_date, end_date)
+        return dataset.to_table(columns=columns, filter=filter)
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Background upload pool for the Lake Ingestor
+Encodes and uploads Parquet batches off the poll thread, many partitions at once
+"""
+
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Callable, Dict, List, Any, Optional, Tuple
+
+import structlog
+
+logger = structlog.get_logger("lake_uploader")
+
+# Upper bounds (seconds) of the upload latency histogram buckets
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, float('inf'))
+
+
+class UploadPool:
+    """Thread pool that runs write_fn(partition_key, records) for buffer entries
+
+    Entries are the ingestor's buffer dicts; each must carry an approximate
+    'bytes' size. The pool never holds more than max_inflight_bytes of
+    entries at once (a single oversized entry is still admitted when the
+    pool is idle). Results are handed back on the caller's thread through
+    completed(), so offset commits stay on the consumer thread.
+    """
+
+    def __init__(self, write_fn: Callable[[tuple, List[Dict[str, Any]]], None],
+                 max_workers: int, max_inflight_bytes: int):
+        self._write_fn = write_fn
+        self._executor = ThreadPoolExecutor(max_workers=max_workers,
+                                            thread_name_prefix='lake-upload')
+        self._max_inflight_bytes = max_inflight_bytes
+        self._lock = threading.Lock()
+        self._pending: Dict[Future, Dict[str, Any]] = {}
+        self._inflight_bytes = 0
+        self._latency_counts = [0] * len(LATENCY_BUCKETS)
+        self._latency_sum = 0.0
+        self._latency_max = 0.0
+        self._uploads_ok = 0
+        self._uploads_failed = 0
+        self._bytes_uploaded = 0
+
+    def has_capacity(self, nbytes: int) -> bool:
+        """Whether an entry of nbytes fits in the in-flight budget"""
+        with self._lock:
+            return not self._pending or self._inflight_bytes + nbytes <= self._max_inflight_bytes
+
+    def submit(self, entry: Dict[str, Any]) -> Future:
+        """Start uploading an entry in the background"""
+        with self._lock:
+            self._inflight_bytes += entry['bytes']
+            future = self._executor.submit(self._run, entry)
+            self._pending[future] = entry
+        return future
+
+    def _run(self, entry: Dict[str, Any]) -> float:
+        """Worker body: encode and upload, recording latency"""
+        started = time.perf_counter()
+        try:
+            self._write_fn(entry['partition_key'], entry['records'])
+        except Exception:
+            with self._lock:
+                self._uploads_failed += 1
+            raise
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self._uploads_ok += 1
+            self._bytes_uploaded += entry['bytes']
+            self._latency_sum += elapsed
+            self._latency_max = max(self._latency_max, elapsed)
+            for index, bound in enumerate(LATENCY_BUCKETS):
+                if elapsed <= bound:
+                    self._latency_counts[index] += 1
+                    break
+        return elapsed
+
+    def completed(self) -> List[Tuple[Dict[str, Any], Optional[BaseException]]]:
+        """Pop finished uploads as (entry, error) pairs"""
+        results = []
+        with self._lock:
+            for future in [f for f in self._pending if f.done()]:
+                entry = self._pending.pop(future)
+                self._inflight_bytes -= entry['bytes']
+                results.append((entry, future.exception()))
+        return results
+
+    def pending_entries(self) -> List[Dict[str, Any]]:
+        """Entries still being encoded or uploaded"""
+        with self._lock:
+            return list(self._pending.values())
+
+    def wait(self, timeout: Optional[float] = None):
+        """Block until every in-flight upload has finished"""
+        with self._lock:
+            futures = list(self._pending)
+        if futures:
+            wait(futures, timeout=timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        """Upload latency, throughput and queue depth metrics"""
+        with self._lock:
+            completed = self._uploads_ok
+            return {
+                'queue_depth': len(self._pending),
+                'inflight_bytes': self._inflight_bytes,
+                'uploads_ok': completed,
+                'uploads_failed': self._uploads_failed,
+                'bytes_uploaded': self._bytes_uploaded,
+                'latency_avg_s': round(self._latency_sum / completed, 4) if completed else 0.0,
+                'latency_max_s': round(self._latency_max, 4),
+                'latency_buckets': {
+                    ('+Inf' if bound == float('inf') else str(bound)): count
+                    for bound, count in zip(LATENCY_BUCKETS, self._latency_counts)
+                },
+            }
+
+    def shutdown(self):
+        """Wait for in-flight uploads and stop the workers"""
+        self._executor.shutdown(wait=True)
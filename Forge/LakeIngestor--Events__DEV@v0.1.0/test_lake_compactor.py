@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Tests for bronze compaction on a local filesystem
+"""
+
+import json
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+import pytest
+from fsspec.implementations.local import LocalFileSystem
+
+import lake_compactor
+from event_schemas import TIMESTAMP, build_row, rows_to_table
+from lake_compactor import LakeCompactor
+from lake_layout import partition_dir, part_file_name
+
+TOPIC = 'Continuum_Overworld.Orion_Reasoner--Analysis__PROD@v1.events'
+
+
+def _event(offset):
+    return {
+        'event_id': f"evt-{offset}",
+        'headers': {'tenant_id': 'GSG', 'project_tag': 'P1',
+                    'occurred_at': f"2024-05-01T10:00:{offset:02d}Z"},
+        'payload': {'agent_name': 'orion', 'duration_ms': offset},
+    }
+
+
+def _write_part(partition, offsets):
+    rows = [build_row(_event(offset), TOPIC, 0, offset) for offset in offsets]
+    pq.write_table(rows_to_table(TOPIC, rows), f"{partition}/{part_file_name()}")
+
+
+def _write_legacy_part(partition, offset):
+    """A file from before the typed schema: _raw plus a string ingested_at"""
+    pq.write_table(pa.Table.from_pylist([{
+        '_raw': json.dumps(_event(offset)),
+        'event_id': f"evt-{offset}",
+        'topic': TOPIC,
+        'partition': 0,
+        'offset': offset,
+        'ingested_at': '2024-05-01T10:05:00.123456',
+    }]), f"{partition}/{part_file_name()}")
+
+
+def _fail(*args):
+    raise OSError('killed')
+
+
+def _listing(partition):
+    return sorted(path.rsplit('/', 1)[-1] for path in LocalFileSystem().ls(partition, detail=False))
+
+
+@pytest.fixture
+def partition(tmp_path, monkeypatch):
+    monkeypatch.setattr(lake_compactor, 'MIN_FILES', 2)
+    path = partition_dir(str(tmp_path / 'lake'), (TOPIC, 'GSG', 'P1', '2024-05-01'))
+    LocalFileSystem().makedirs(path)
+    _write_part(path, [0, 1, 2])
+    # A redelivered batch: offsets 1-2 were written again
+    _write_part(path, [1, 2, 3])
+    _write_legacy_part(path, 4)
+    return path
+
+
+@pytest.fixture
+def compactor(tmp_path):
+    return LakeCompactor(fs=LocalFileSystem(), bucket=str(tmp_path / 'lake'))
+
+
+def _read_all(partition):
+    return pq.read_table([f"{partition}/{name}" for name in _listing(partition)], partitioning=None)
+
+
+def test_compaction_dedups_on_kafka_coordinates(partition, compactor):
+    result = compactor.compact_partition(partition)
+
+    assert result['input_files'] == 3 and result['rows'] == 5
+    (name,) = _listing(partition)
+    assert name.startswith('compacted-')
+    table = _read_all(partition)
+    assert sorted(table.column('offset').to_pylist()) == [0, 1, 2, 3, 4]
+    # The legacy string timestamp was cast to the contract type
+    assert table.schema.field('ingested_at').type == TIMESTAMP
+    legacy = table.filter(pc.equal(table.column('offset'), 4))
+    assert legacy.column('ingested_at')[0].as_py().isoformat() == '2024-05-01T10:05:00.123456+00:00'
+
+
+def test_crash_after_commit_is_finished_not_redone(partition, compactor, monkeypatch):
+    finish = compactor._finish
+    monkeypatch.setattr(compactor, '_finish', _fail)
+    with pytest.raises(OSError):
+        compactor.compact_partition(partition)
+    assert any(name.startswith('_compaction-') for name in _listing(partition))
+
+    # The rerun publishes the staged output and removes the originals
+    # instead of compacting them alongside it a second time
+    monkeypatch.setattr(compactor, '_finish', finish)
+    compactor.compact_partition(partition)
+
+    (name,) = _listing(partition)
+    assert name.startswith('compacted-')
+    assert sorted(_read_all(partition).column('offset').to_pylist()) == [0, 1, 2, 3, 4]
+
+
+def test_uncommitted_staging_files_are_discarded(partition, compactor, monkeypatch):
+    fs = LocalFileSystem(skip_instance_cache=True)
+    monkeypatch.setattr(fs, 'pipe_file', _fail)
+    with pytest.raises(OSError):
+        LakeCompactor(fs=fs, bucket=compactor.bucket).compact_partition(partition)
+    assert len(_listing(partition)) == 3
+
+    # A staging file left by a hard kill before the commit point
+    with open(f"{partition}/_staging-dead.parquet.tmp", 'wb') as f:
+        f.write(b'partial')
+    compactor.compact_partition(partition)
+    (name,) = _listing(partition)
+    assert name.startswith('compacted-')
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Tests for LakeIngestor offset commits against a local filesystem
+"""
+
+import json
+import threading
+
+import pyarrow.parquet as pq
+import pytest
+from fsspec.implementations.local import LocalFileSystem
+
+import lake_ingestor
+from lake_layout import partition_dir
+
+TOPIC = 'Continuum_Overworld.Orion_Reasoner--Analysis__PROD@v1.events'
+
+
+class FakeMessage:
+    def __init__(self, partition, offset):
+        self._partition = partition
+        self._offset = offset
+        self._value = json.dumps({
+            'event_id': f"evt-{partition}-{offset}",
+            'headers': {'tenant_id': 'GSG', 'project_tag': 'P1',
+                        'occurred_at': '2024-05-01T10:00:00Z'},
+            'payload': {'agent_name': 'orion'},
+        }).encode('utf-8')
+
+    def topic(self):
+        return TOPIC
+
+    def partition(self):
+        return self._partition
+
+    def offset(self):
+        return self._offset
+
+    def value(self):
+        return self._value
+
+    def error(self):
+        return None
+
+
+class FakeConsumer:
+    """Records commits together with the rows durable in the lake at that moment"""
+
+    def __init__(self, config, durable_rows):
+        self.durable_rows = durable_rows
+        self.commits = []
+
+    def commit(self, offsets, asynchronous):
+        for tp in offsets:
+            self.commits.append((tp.topic, tp.partition, tp.offset, self.durable_rows()))
+
+    def assignment(self):
+        return []
+
+    def pause(self, partitions):
+        pass
+
+    def resume(self, partitions):
+        pass
+
+
+@pytest.fixture
+def ingestor(tmp_path, monkeypatch):
+    bucket = str(tmp_path / 'lake')
+    fs = LocalFileSystem(auto_mkdir=True)
+
+    def durable_rows():
+        directory = partition_dir(bucket, (TOPIC, 'GSG', 'P1', '2024-05-01'))
+        files = fs.glob(f"{directory}/*.parquet")
+        return sum(pq.read_metadata(path).num_rows for path in files)
+
+    monkeypatch.setattr(lake_ingestor, 'BUCKET', bucket)
+    monkeypatch.setattr(lake_ingestor, 'RETRY_BACKOFF_SECONDS', 0)
+    monkeypatch.setattr(lake_ingestor.signal, 'signal', lambda *args: None)
+    monkeypatch.setattr(lake_ingestor.s3fs, 'S3FileSystem', lambda **kwargs: fs)
+    monkeypatch.setattr(lake_ingestor, 'Consumer', lambda config: FakeConsumer(config, durable_rows))
+    ingestor = lake_ingestor.LakeIngestor()
+    yield ingestor
+    ingestor.uploads.shutdown()
+
+
+def test_offsets_commit_only_after_the_write_is_durable(ingestor, monkeypatch):
+    release = threading.Event()
+    write = ingestor._write_parquet_batch
+
+    def slow_write(*args):
+        release.wait(5)
+        write(*args)
+
+    monkeypatch.setattr(ingestor.uploads, '_write_fn', slow_write)
+
+    for offset in range(3):
+        ingestor._process_message(FakeMessage(0, offset))
+    ingestor._flush_buffers()
+
+    # In flight: nothing beyond the first buffered offset may be committed
+    ingestor._collect_uploads()
+    ingestor._commit_offsets()
+    assert all(offset == 0 for _, _, offset, _ in ingestor.consumer.commits)
+
+    release.set()
+    ingestor._drain_uploads()
+    assert ingestor.consumer.commits[-1] == (TOPIC, 0, 3, 3)
+
+
+def test_failed_write_holds_offsets_until_retried(ingestor, monkeypatch):
+    attempts = []
+    write = ingestor._write_parquet_batch
+
+    def flaky_write(*args):
+        attempts.append(args)
+        if len(attempts) == 1:
+            raise OSError('connection reset')
+        write(*args)
+
+    monkeypatch.setattr(ingestor.uploads, '_write_fn', flaky_write)
+    for offset in range(5, 8):
+        ingestor._process_message(FakeMessage(1, offset))
+    ingestor._flush_buffers()
+    ingestor._drain_uploads()
+
+    assert len(ingestor.retry_queue) == 1
+    assert [commit[2] for commit in ingestor.consumer.commits] == [5]
+
+    ingestor._process_retries()
+    ingestor._drain_uploads()
+    assert not ingestor.retry_queue
+    assert ingestor.consumer.commits[-1] == (TOPIC, 1, 8, 3)
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Tests for partition-pruned LakeReader reads on a local filesystem
+"""
+
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+import pytest
+from fsspec.implementations.local import LocalFileSystem
+
+from event_schemas import build_row, rows_to_table
+from lake_layout import partition_dir, part_file_name
+from lake_reader import LakeReader
+
+TOPIC = 'Continuum_Overworld.Atlas_Planner--Airfreight__KE-DE@v0.9.2.events'
+DAYS = ['2024-05-01', '2024-05-02', '2024-05-03']
+
+
+class ListingFileSystem(LocalFileSystem):
+    """Local filesystem that records every directory listing"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.listed = []
+
+    def ls(self, path, detail=False, **kwargs):
+        self.listed.append(path)
+        return super().ls(path, detail=detail, **kwargs)
+
+
+@pytest.fixture
+def lake(tmp_path):
+    bucket = str(tmp_path / 'lake')
+    offset = 0
+    for tenant_id in ('GSG', 'DEMO'):
+        for ds_value in DAYS:
+            directory = partition_dir(bucket, (TOPIC, tenant_id, 'P1', ds_value))
+            LocalFileSystem().makedirs(directory)
+            rows = []
+            for _ in range(2):
+                event = {
+                    'event_id': f"evt-{offset}",
+                    'headers': {'tenant_id': tenant_id, 'project_tag': 'P1',
+                                'occurred_at': f"{ds_value}T10:00:00Z"},
+                    'payload': {'shipment_code': f"S{offset}", 'distance_km': 100.0 * offset},
+                }
+                rows.append(build_row(event, TOPIC, 0, offset))
+                offset += 1
+            pq.write_table(rows_to_table(TOPIC, rows), f"{directory}/{part_file_name()}")
+            # Files being written by the compactor must stay invisible
+            with open(f"{directory}/_staging-x.parquet.tmp", 'wb') as f:
+                f.write(b'partial')
+    return bucket
+
+
+def test_fully_specified_selectors_touch_only_their_partitions(lake):
+    fs = ListingFileSystem(skip_instance_cache=True)
+    reader = LakeReader(fs=fs, bucket=lake, cache_dir=None)
+
+    table = reader.read_table(topics=TOPIC, tenant_ids='GSG', project_tags='P1',
+                              start_date='2024-05-02', end_date='2024-05-03',
+                              columns=['event_id', 'ds'])
+
+    assert table.column_names == ['event_id', 'ds']
+    assert sorted(table.column('event_id').to_pylist()) == ['evt-2', 'evt-3', 'evt-4', 'evt-5']
+    assert sorted(set(table.column('ds').to_pylist())) == ['2024-05-02', '2024-05-03']
+    # Only the two tenant-day directories were listed, never a parent level
+    assert sorted(path.rsplit('/', 1)[-1] for path in fs.listed) == ['ds=2024-05-02', 'ds=2024-05-03']
+
+
+def test_unknown_levels_are_listed_and_filters_push_down(lake):
+    reader = LakeReader(fs=LocalFileSystem(), bucket=lake, cache_dir=None)
+
+    partitions = reader.partitions(topics=TOPIC, start_date='2024-05-01')
+    assert sorted(p.split('tenant_id=')[1].split('/')[0] for p in partitions) == ['DEMO', 'GSG']
+
+    batches = list(reader.scan_batches(topics=TOPIC, start_date='2024-05-01', end_date='2024-05-03',
+                                       columns=['tenant_id', 'payload'],
+                                       filter=ds.field('payload', 'distance_km') >= 1000))
+    rows = [row for batch in batches for row in batch.to_pylist()]
+    assert {row['tenant_id'] for row in rows} == {'DEMO'}
+    assert sorted(row['payload']['shipment_code'] for row in rows) == ['S10', 'S11']
+    assert all(batch.schema.names == ['tenant_id', 'payload'] for batch in batches)
+
+
+def test_missing_days_read_as_empty(lake):
+    reader = LakeReader(fs=LocalFileSystem(), bucket=lake, cache_dir=None)
+    table = reader.read_table(topics=TOPIC, tenant_ids='GSG', project_tags='P1',
+                              start_date='2024-06-01', end_date='2024-06-02')
+    assert table.num_rows == 0
@@ -1,3 +1,5 @@
+import * as fs from 'fs';
+import * as path from 'path';
 import * as cdk from 'aws-cdk-lib';
 import { Construct } from 'constructs';
 import * as dynamodb from 'aws-cdk-lib/aws-dynamodb';
@@ -47,6 +49,15 @@ export class FarmIngestStack extends cdk.Stack {
       removalPolicy: env === 'prod' ? cdk.RemovalPolicy.RETAIN : cdk.RemovalPolicy.DESTROY,
     });
 
+    // Sentinel-2 acquisitions the sat agent has already processed
+    const satAcquisitionsTable = new dynamodb.Table(this, 'SatAcquisitionsTable', {
+      tableName: `${prefix}-sat_acquisitions`,
+      partitionKey: { name: 'farm_id', type: dynamodb.AttributeType.STRING },
+      sortKey: { name: 'acquisition_date', type: dynamodb.AttributeType.STRING },
+      billingMode: dynamodb.BillingMode.PAY_PER_REQUEST,
+      removalPolicy: env === 'prod' ? cdk.RemovalPolicy.RETAIN : cdk.RemovalPolicy.DESTROY,
+    });
+
     // S3 Buckets
     const dataBucket = new s3.Bucket(this, 'DataBucket', {
       bucketName: `${prefix}-data-curated`,
@@ -131,7 +142,21 @@ export class FarmIngestStack extends cdk.Stack {
       functionName: `${prefix}-sat-agent`,
       runtime: lambda.Runtime.PYTHON_3_11,
       handler: 'sat_agent/index.handler',
-      code: lambda.Code.fromAsset('../../sat-agent/src'),
+      // The package plus the repo's farm registry (data/farms.json) for fleet mode
+      code: lambda.Code.fromAsset('../../sat-agent/src', {
+        assetHashType: cdk.AssetHashType.OUTPUT,
+        bundling: {
+          image: lambda.Runtime.PYTHON_3_11.bundlingImage,
+          local: {
+            tryBundle(outputDir: string) {
+              fs.cpSync('../../sat-agent/src', outputDir, { recursive: true });
+              fs.mkdirSync(path.join(outputDir, 'data'), { recursive: true });
+              fs.copyFileSync('../../../data/farms.json', path.join(outputDir, 'data', 'farms.json'));
+              return true;
+            },
+          },
+        },
+      }),
       timeout: cdk.Duration.minutes(5),
       memorySize: 1024,
       environment: {
@@ -151,6 +176,7 @@ export class FarmIngestStack extends cdk.Stack {
           }
         }),
         S3_BUCKET: dataBucket.bucketName,
+        ACQUISITION_CACHE_TABLE: satAcquisitionsTable.tableName,
       },
     });
 
@@ -218,6 +244,7 @@ export class FarmIngestStack extends cdk.Stack {
     // Grant permissions
     readingsTable.grantReadWriteData(weatherIngestLambda);
     readingsTable.grantReadWriteData(satAgentLambda);
+    satAcquisitionsTable.grantReadWriteData(satAgentLambda);
     readingsTable.grantReadData(summaryGetLambda);
     readingsTable.grantReadData(readingsGetLambda);
     readingsTable.grantReadData(alertsLambda);
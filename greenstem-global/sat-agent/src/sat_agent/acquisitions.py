@@ -0,0 +1,176 @@
+import os
+import json
+import threading
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+
+import requests
+
+# Configuration
+CATALOG_URL = 'https://services.sentinel-hub.com/api/v1/catalog/1.0.0/search'
+MAX_CLOUD_COVERAGE = int(os.environ.get('MAX_CLOUD_COVERAGE', '30'))
+ACQUISITION_CACHE = os.environ.get('ACQUISITION_CACHE', 'dynamodb')  # dynamodb | local | off
+ACQUISITION_CACHE_TABLE = os.environ.get('ACQUISITION_CACHE_TABLE', 'sat_acquisitions')
+ACQUISITION_CACHE_FILE = os.environ.get('ACQUISITION_CACHE_FILE', '/tmp/sat-agent-acquisitions.json')
+
+
+def search_acquisitions(token: str, polygon: Dict, start_date: datetime, end_date: datetime,
+                        max_cloud_coverage: int = MAX_CLOUD_COVERAGE,
+                        session: Optional[requests.Session] = None) -> List[Dict[str, Any]]:
+    """Sentinel-2 L2A acquisition dates over a polygon, from the Catalog API.
+
+    Catalog searches cost no processing units. Scenes from the same day
+    (adjacent tiles or orbits) collapse into one acquisition with the
+    earliest sensing time and the lowest cloud cover.
+    """
+    body = {
+        'collections': ['sentinel-2-l2a'],
+        'datetime': f"{start_date.strftime('%Y-%m-%dT00:00:00Z')}/{end_date.strftime('%Y-%m-%dT23:59:59Z')}",
+        'intersects': polygon['geometry'],
+        'filter': f'eo:cloud_cover <= {max_cloud_coverage}',
+        'filter-lang': 'cql2-text',
+        'fields': {'include': ['id', 'properties.datetime', 'properties.eo:cloud_cover'], 'exclude': []},
+        'limit': 100
+    }
+    headers = {
+        'Authorization': f'Bearer {token}',
+        'Content-Type': 'application/json'
+    }
+
+    by_date: Dict[str, Dict[str, Any]] = {}
+    while True:
+        response = (session or requests).post(CATALOG_URL, json=body, headers=headers)
+        response.raise_for_status()
+        page = response.json()
+        for feature in page.get('features', []):
+            properties = feature['properties']
+            sensed_at = properties['datetime']
+            cloud_cover = properties.get('eo:cloud_cover')
+            day = sensed_at[:10]
+            current = by_date.get(day)
+            if current is None:
+                by_date[day] = {'date': day, 'datetime': sensed_at, 'cloud_cover': cloud_cover}
+            else:
+                current['datetime'] = min(current['datetime'], sensed_at)
+                if cloud_cover is not None and (current['cloud_cover'] is None or cloud_cover < current['cloud_cover']):
+                    current['cloud_cover'] = cloud_cover
+
+        next_token = page.get('context', {}).get('next')
+        if not next_token:
+            break
+        body['next'] = next_token
+
+    return [by_date[day] for day in sorted(by_date)]
+
+
+class LocalAcquisitionCache:
+    """Processed (farm, acquisition date) pairs in a JSON file."""
+
+    def __init__(self, path: str = ACQUISITION_CACHE_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        try:
+            with open(path, encoding='utf-8') as f:
+                self._processed = json.load(f)
+        except FileNotFoundError:
+            self._processed = {}
+        except ValueError as e:
+            print(f"Ignoring unreadable acquisition cache {path}: {str(e)}")
+            self._processed = {}
+
+    def processed_dates(self, farm_id: str, dates: List[str]) -> set:
+        with self._lock:
+            done = self._processed.get(farm_id, {})
+            return {d for d in dates if d in done}
+
+    def mark_processed(self, farm_id: str, acquisitions: List[Dict[str, Any]]):
+        with self._lock:
+            done = self._processed.setdefault(farm_id, {})
+            for acquisition in acquisitions:
+                done[acquisition['date']] = {
+                    'datetime': acquisition.get('datetime'),
+                    'processed_at': datetime.now().isoformat()
+                }
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            tmp_path = f'{self.path}.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._processed, f)
+            os.replace(tmp_path, self.path)
+
+
+class DynamoAcquisitionCache:
+    """Processed (farm, acquisition date) pairs in DynamoDB (farm_id, acquisition_date keys)."""
+
+    def __init__(self, table_name: str = ACQUISITION_CACHE_TABLE, dynamodb=None):
+        import boto3
+        self.table_name = table_name
+        self.dynamodb = dynamodb or boto3.resource('dynamodb')
+        self.table = self.dynamodb.Table(table_name)
+
+    def processed_dates(self, farm_id: str, dates: List[str]) -> set:
+        done = set()
+        # BatchGetItem takes up to 100 keys per request
+        for start in range(0, len(dates), 100):
+            keys = [{'farm_id': farm_id, 'acquisition_date': d} for d in dates[start:start + 100]]
+            request = {self.table_name: {'Keys': keys, 'ProjectionExpression': 'acquisition_date'}}
+            while request:
+                response = self.dynamodb.batch_get_item(RequestItems=request)
+                done.update(item['acquisition_date'] for item in response['Responses'].get(self.table_name, []))
+                request = response.get('UnprocessedKeys')
+        return done
+
+    def mark_processed(self, farm_id: str, acquisitions: List[Dict[str, Any]]):
+        processed_at = datetime.now().isoformat()
+        with self.table.batch_writer() as batch:
+            for acquisition in acquisitions:
+                batch.put_item(Item={
+                    'farm_id': farm_id,
+                    'acquisition_date': acquisition['date'],
+                    'sensed_at': acquisition.get('datetime'),
+                    'processed_at': processed_at
+                })
+
+
+_cache: Dict[str, Any] = {}
+_cache_lock = threading.Lock()
+
+
+def acquisition_cache():
+    """Cache selected by ACQUISITION_CACHE, or None when disabled."""
+    with _cache_lock:
+        if 'cache' not in _cache:
+            if ACQUISITION_CACHE == 'off':
+                _cache['cache'] = None
+            elif ACQUISITION_CACHE == 'local':
+                _cache['cache'] = LocalAcquisitionCache()
+            else:
+                _cache['cache'] = DynamoAcquisitionCache()
+        return _cache['cache']
+
+
+def filter_new(farm_id: str, acquisitions: List[Dict[str, Any]], cache=None) -> List[Dict[str, Any]]:
+    """Drop acquisitions already processed for this farm.
+
+    A failing cache lookup is logged and treated as "nothing processed":
+    reprocessing is idempotent, skipping would lose data.
+    """
+    cache = cache if cache is not None else acquisition_cache()
+    if cache is None or not acquisitions:
+        return acquisitions
+    try:
+        done = cache.processed_dates(farm_id, [a['date'] for a in acquisitions])
+    except Exception as e:
+        print(f"Acquisition cache lookup failed for {farm_id}: {str(e)}")
+        return acquisitions
+    return [a for a in acquisitions if a['date'] not in done]
+
+
+def mark_processed(farm_id: str, acquisitions: List[Dict[str, Any]], cache=None):
+    """Record acquisitions whose readings have been written."""
+    cache = cache if cache is not None else acquisition_cache()
+    if cache is None or not acquisitions:
+        return
+    try:
+        cache.mark_processed(farm_id, acquisitions)
+    except Exception as e:
+        print(f"Could not record processed acquisitions for {farm_id}: {str(e)}")
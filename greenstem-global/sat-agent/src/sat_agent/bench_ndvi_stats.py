@@ -0,0 +1,58 @@
+"""Benchmark histogram NDVI statistics against the original float/percentile path.
+
+Usage (from src/): python -m sat_agent.bench_ndvi_stats [--sizes 512 2048 10000] [--legacy-max 4096]
+"""
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+
+from .ndvi_stats import ndvi_stats
+
+
+def legacy_stats(img_array: np.ndarray):
+    """The pre-histogram implementation of calculate_ndvi_stats, minus decoding."""
+    ndvi = (img_array / 255.0) * 2 - 1
+    valid_ndvi = ndvi[ndvi > -0.1]
+    if len(valid_ndvi) == 0:
+        return 0.0, 0.0, 0.0
+    return (float(np.mean(valid_ndvi)),
+            float(np.percentile(valid_ndvi, 10)),
+            float(np.percentile(valid_ndvi, 90)))
+
+
+def measure(fn, *args):
+    """Wall time and peak traced allocation of one call."""
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = fn(*args)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[512, 1024, 2048, 4096, 10000])
+    parser.add_argument('--legacy-max', type=int, default=4096,
+                        help="Largest tile side to run the legacy path on (it needs ~24 bytes/pixel)")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    print(f"{'size':>7} {'hist ms':>9} {'hist MB':>8} {'legacy ms':>10} {'legacy MB':>10} {'max diff':>9}")
+    for size in args.sizes:
+        tile = rng.integers(0, 256, size=(size, size), dtype=np.uint8)
+        stats, hist_s, hist_peak = measure(ndvi_stats, tile)
+        line = f"{size:>7} {hist_s * 1000:>9.1f} {hist_peak / 1e6:>8.1f}"
+        if size <= args.legacy_max:
+            legacy, legacy_s, legacy_peak = measure(legacy_stats, tile)
+            diff = max(abs(a - b) for a, b in zip(legacy, (stats['mean'], stats['p10'], stats['p90'])))
+            line += f" {legacy_s * 1000:>10.1f} {legacy_peak / 1e6:>10.1f} {diff:>9.1e}"
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
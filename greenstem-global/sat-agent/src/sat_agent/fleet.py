@@ -0,0 +1,225 @@
+import os
+import json
+import math
+import asyncio
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from . import index
+from .ndvi_cube import append_acquisition
+from .acquisitions import filter_new, mark_processed, search_acquisitions
+
+# Configuration
+# A relative registry path is tried against the Lambda asset root (src/, where
+# the stack bundles the repo's data/farms.json) and then the repository root,
+# never the Lambda working directory
+FARMS_FILE = os.environ.get('FARMS_FILE', 'data/farms.json')
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+REGISTRY_ROOTS = [
+    os.path.dirname(PACKAGE_DIR),
+    os.path.abspath(os.path.join(PACKAGE_DIR, '..', '..', '..', '..')),
+]
+FLEET_CONCURRENCY = int(os.environ.get('FLEET_CONCURRENCY', '8'))
+DEFAULT_WINDOW_DAYS = 3
+
+
+class SentinelHubService:
+    """Sentinel Hub access for fleet runs: one OAuth token, one pooled session."""
+
+    def __init__(self, pool_size: int = FLEET_CONCURRENCY):
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+
+    def acquisitions(self, polygon: Dict, start_date: datetime, end_date: datetime) -> List[Dict[str, Any]]:
+        """Catalog search for acquisition dates (no processing units)."""
+        token = index.get_sentinel_token(session=self.session)
+        return search_acquisitions(token, polygon, start_date, end_date, session=self.session)
+
+    def process(self, polygon: Dict, start_date: datetime, end_date: datetime) -> Dict[str, Any]:
+        """Run one process API request; the token is cached until it expires."""
+        token = index.get_sentinel_token(session=self.session)
+        return index.fetch_ndvi_data(token, polygon, start_date, end_date, session=self.session)
+
+
+class ReadingsSink:
+    """Destination for fleet results (S3 images, DynamoDB readings, NDVI cubes)."""
+
+    def save_image(self, farm_id: str, date_str: str, image_data: bytes) -> str:
+        return index.save_to_s3(image_data, date_str, farm_id=farm_id)
+
+    def write_items(self, items: List[Dict[str, Any]]):
+        index.write_readings(items)
+
+    def append_cube(self, farm_id: str, date_str: str, levels) -> None:
+        append_acquisition(farm_id, date_str, levels)
+
+
+def farm_polygon(farm: Dict[str, Any]) -> Dict[str, Any]:
+    """GeoJSON feature for a farm, approximated from its point and area when needed."""
+    if farm.get('polygon'):
+        return farm['polygon']
+    if farm.get('geometry'):
+        return {'type': 'Feature', 'geometry': farm['geometry']}
+
+    # farms.json stores [lat, lon] and an area; use a square of that area
+    lat, lon = farm['coordinates']
+    hectares = farm.get('size_hectares') or 1.0
+    half_side_m = math.sqrt(hectares * 10000) / 2
+    dlat = half_side_m / 111320
+    dlon = half_side_m / (111320 * math.cos(math.radians(lat)))
+    ring = [
+        [lon - dlon, lat - dlat],
+        [lon + dlon, lat - dlat],
+        [lon + dlon, lat + dlat],
+        [lon - dlon, lat + dlat],
+        [lon - dlon, lat - dlat],
+    ]
+    return {'type': 'Feature', 'geometry': {'type': 'Polygon', 'coordinates': [ring]}}
+
+
+def load_farms(path: str = FARMS_FILE) -> List[Dict[str, Any]]:
+    """Load active farms from the registry file (see REGISTRY_ROOTS for relative paths)."""
+    candidates = [path] if os.path.isabs(path) else [os.path.join(root, path) for root in REGISTRY_ROOTS]
+    found = next((candidate for candidate in candidates if os.path.isfile(candidate)), None)
+    if found is None:
+        raise FileNotFoundError(
+            f"Farm registry not found (tried {', '.join(candidates)}); "
+            f"set FARMS_FILE or pass 'farms' in the event")
+    with open(found, encoding='utf-8') as f:
+        farms = json.load(f)
+    return [farm for farm in farms if farm.get('status', 'active') == 'active']
+
+
+def _date_windows(date_ranges: Optional[List[Dict[str, str]]]) -> List[Tuple[datetime, datetime]]:
+    """Turn requested ranges into process windows; default is the last 3 days."""
+    if not date_ranges:
+        end_date = datetime.now()
+        return [(end_date - timedelta(days=DEFAULT_WINDOW_DAYS), end_date)]
+    return [
+        (datetime.fromisoformat(r['from']), datetime.fromisoformat(r['to']))
+        for r in date_ranges
+    ]
+
+
+async def process_fleet(farms: List[Dict[str, Any]],
+                        date_ranges: Optional[List[Dict[str, str]]] = None,
+                        sentinel: Optional[SentinelHubService] = None,
+                        sink: Optional[ReadingsSink] = None,
+                        concurrency: int = FLEET_CONCURRENCY,
+                        cache=None) -> Dict[str, Any]:
+    """Process every new acquisition of every farm with bounded concurrency.
+
+    Catalog searches run first for each (farm, date window); only acquisitions
+    missing from the processed cache reach the process API. `sentinel`,
+    `sink` and `cache` can be replaced by local stand-ins with the same methods.
+    """
+    sentinel = sentinel or SentinelHubService(pool_size=concurrency)
+    sink = sink or ReadingsSink()
+    semaphore = asyncio.Semaphore(concurrency)
+    windows = _date_windows(date_ranges)
+
+    async def search_one(farm: Dict[str, Any], start_date: datetime, end_date: datetime):
+        async with semaphore:
+            return await asyncio.to_thread(sentinel.acquisitions, farm_polygon(farm), start_date, end_date)
+
+    async def process_one(farm: Dict[str, Any], acquisition: Dict[str, Any]) -> Dict[str, Any]:
+        farm_id = farm.get('farm_id') or farm.get('farmId')
+        day = datetime.fromisoformat(acquisition['date'])
+        async with semaphore:
+            try:
+                polygon = farm_polygon(farm)
+                result = await asyncio.to_thread(sentinel.process, polygon, day, day)
+                stored = await asyncio.to_thread(
+                    index.store_acquisition, farm_id, polygon, farm.get('zones'), acquisition,
+                    result['image_data'], save_image=sink.save_image, append_cube=sink.append_cube)
+            except Exception as e:
+                print(f"Error processing NDVI for {farm_id} on {acquisition['date']}: {str(e)}")
+                return {'farm_id': farm_id, 'acquisition_date': acquisition['date'],
+                        'status': 'error', 'error': str(e)}
+
+        return {**stored, 'status': 'ok', 'acquisition': acquisition}
+
+    # Phase 1: which acquisitions exist, and which are new
+    searches = [(farm, start_date, end_date) for farm in farms for start_date, end_date in windows]
+    found = await asyncio.gather(*[search_one(*args) for args in searches], return_exceptions=True)
+
+    errors = []
+    per_farm: Dict[str, Dict[str, Any]] = {}
+    for (farm, _, _), acquisitions in zip(searches, found):
+        farm_id = farm.get('farm_id') or farm.get('farmId')
+        if isinstance(acquisitions, Exception):
+            print(f"Error searching acquisitions for {farm_id}: {str(acquisitions)}")
+            errors.append({'farm_id': farm_id, 'status': 'error', 'error': str(acquisitions)})
+            continue
+        entry = per_farm.setdefault(farm_id, {'farm': farm, 'acquisitions': {}})
+        for acquisition in acquisitions:
+            entry['acquisitions'][acquisition['date']] = acquisition
+
+    jobs = []
+    skipped = 0
+    for farm_id, entry in per_farm.items():
+        candidates = [entry['acquisitions'][d] for d in sorted(entry['acquisitions'])]
+        new = await asyncio.to_thread(filter_new, farm_id, candidates, cache)
+        skipped += len(candidates) - len(new)
+        jobs.extend((entry['farm'], acquisition) for acquisition in new)
+
+    # Phase 2: process API only for new acquisitions
+    results = list(await asyncio.gather(*[process_one(farm, acquisition) for farm, acquisition in jobs]))
+
+    # One batched DynamoDB write for the whole fleet, keyed by sensing time
+    timestamp = datetime.now().isoformat()
+    ok = [r for r in results if r['status'] == 'ok']
+    items = [item for result in ok for item in result.pop('items')]
+    if items:
+        await asyncio.to_thread(sink.write_items, items)
+
+    # Only now are the acquisitions safely stored
+    processed_by_farm: Dict[str, List[Dict[str, Any]]] = {}
+    for result in ok:
+        processed_by_farm.setdefault(result['farm_id'], []).append(result.pop('acquisition'))
+    for farm_id, acquisitions in processed_by_farm.items():
+        await asyncio.to_thread(mark_processed, farm_id, acquisitions, cache)
+
+    results.extend(errors)
+    return {
+        'timestamp': timestamp,
+        'processed': len(ok),
+        'skipped': skipped,
+        'failed': len(results) - len(ok),
+        'results': results
+    }
+
+
+def handle_fleet(event: Dict[str, Any]) -> Dict[str, Any]:
+    """Lambda entry point for fleet mode."""
+    farms = event.get('farms') or load_farms(event.get('farms_file', FARMS_FILE))
+    summary = asyncio.run(process_fleet(
+        farms,
+        date_ranges=event.get('date_ranges'),
+        concurrency=int(event.get('concurrency', FLEET_CONCURRENCY))
+    ))
+
+    index.send_event({
+        'mode': 'fleet',
+        'timestamp': summary['timestamp'],
+        'processed': summary['processed'],
+        'skipped': summary['skipped'],
+        'failed': summary['failed'],
+        'farms': [
+            {'farm_id': r['farm_id'], 'acquisition_date': r['acquisition_date'],
+             's3_path': r['s3_path'], 'zones': len(r['zones'])}
+            for r in summary['results'] if r['status'] == 'ok'
+        ]
+    })
+
+    return {
+        'statusCode': 200 if summary['failed'] == 0 else 207,
+        'body': json.dumps({
+            'message': 'NDVI fleet processing complete',
+            **summary
+        })
+    }
@@ -1,13 +1,17 @@
 import os
 import json
+import time
+import threading
 import boto3
 from datetime import datetime, timedelta
 import requests
-from typing import Dict, Any, Tuple
+from typing import Callable, Dict, Any, List, Optional, Tuple
 import base64
-import io
-from PIL import Image
-import numpy as np
+
+from .ndvi_stats import decode_ndvi_image, image_ndvi_stats, ndvi_stats
+from .zones import FARM_ZONES, zonal_ndvi_stats
+from .ndvi_cube import append_acquisition
+from .acquisitions import filter_new, mark_processed, search_acquisitions, MAX_CLOUD_COVERAGE
 
 # AWS clients
 dynamodb = boto3.resource('dynamodb')
@@ -19,50 +23,46 @@ ssm = boto3.client('ssm')
 FARM_ID = os.environ.get('FARM_ID', '2BH')
 FARM_POLYGON = json.loads(os.environ.get('FARM_POLYGON_GEOJSON', '{}'))
 S3_BUCKET = os.environ.get('S3_BUCKET', 'gsg-data-curated')
+ACQUISITION_LOOKBACK_DAYS = int(os.environ.get('ACQUISITION_LOOKBACK_DAYS', '3'))
 
-def get_sentinel_token() -> str:
-    """Get Sentinel Hub OAuth token."""
-    client_id = os.environ.get('SENTINELHUB_CLIENT_ID')
-    client_secret = os.environ.get('SENTINELHUB_CLIENT_SECRET')
-    
-    response = requests.post(
-        'https://services.sentinel-hub.com/oauth/token',
-        data={
-            'grant_type': 'client_credentials',
-            'client_id': client_id,
-            'client_secret': client_secret
-        }
-    )
-    response.raise_for_status()
-    return response.json()['access_token']
+# Refresh the OAuth token this many seconds before it actually expires
+TOKEN_EXPIRY_MARGIN = 60
+
+# Token cache, shared across invocations of a warm Lambda container
+_token_cache: Dict[str, Any] = {'token': None, 'expires_at': 0.0}
+_token_lock = threading.Lock()
+
+def get_sentinel_token(session: Optional[requests.Session] = None) -> str:
+    """Get Sentinel Hub OAuth token, reusing the cached one until it expires."""
+    with _token_lock:
+        if _token_cache['token'] and time.time() < _token_cache['expires_at']:
+            return _token_cache['token']
+        
+        client_id = os.environ.get('SENTINELHUB_CLIENT_ID')
+        client_secret = os.environ.get('SENTINELHUB_CLIENT_SECRET')
+        
+        response = (session or requests).post(
+            'https://services.sentinel-hub.com/oauth/token',
+            data={
+                'grant_type': 'client_credentials',
+                'client_id': client_id,
+                'client_secret': client_secret
+            }
+        )
+        response.raise_for_status()
+        body = response.json()
+        
+        _token_cache['token'] = body['access_token']
+        _token_cache['expires_at'] = time.time() + body.get('expires_in', 3600) - TOKEN_EXPIRY_MARGIN
+        return _token_cache['token']
 
 def calculate_ndvi_stats(image_data: bytes) -> Tuple[float, float, float]:
     """Calculate NDVI statistics from the image data."""
-    img = Image.open(io.BytesIO(image_data))
-    img_array = np.array(img)
-    
-    # Assuming the image has NDVI values normalized to 0-255
-    ndvi_normalized = img_array / 255.0
-    ndvi = (ndvi_normalized * 2) - 1  # Convert to -1 to 1 range
-    
-    # Filter valid NDVI values (land areas)
-    valid_ndvi = ndvi[ndvi > -0.1]  # Exclude water and invalid pixels
-    
-    if len(valid_ndvi) == 0:
-        return 0.0, 0.0, 0.0
-    
-    mean_val = float(np.mean(valid_ndvi))
-    p10_val = float(np.percentile(valid_ndvi, 10))
-    p90_val = float(np.percentile(valid_ndvi, 90))
-    
-    return mean_val, p10_val, p90_val
+    # Single-pass histogram over the 256 byte levels; see ndvi_stats
+    stats = image_ndvi_stats(image_data, percentiles=(10, 90))
+    return stats['mean'], stats['p10'], stats['p90']
 
-def fetch_ndvi_data(token: str, polygon: Dict) -> Dict[str, Any]:
-    """Fetch NDVI data from Sentinel Hub."""
-    end_date = datetime.now()
-    start_date = end_date - timedelta(days=3)
-    
-    evalscript = """
+EVALSCRIPT = """
     //VERSION=3
     function setup() {
         return {
@@ -105,8 +105,10 @@ def fetch_ndvi_data(token: str, polygon: Dict) -> Dict[str, Any]:
         };
     }
     """
-    
-    request_body = {
+
+def build_process_request(polygon: Dict, start_date: datetime, end_date: datetime) -> Dict[str, Any]:
+    """Build the Sentinel Hub process API request body for a polygon and date window."""
+    return {
         "input": {
             "bounds": {
                 "geometry": polygon['geometry']
@@ -119,7 +121,7 @@ def fetch_ndvi_data(token: str, polygon: Dict) -> Dict[str, Any]:
                             "from": start_date.strftime("%Y-%m-%dT00:00:00Z"),
                             "to": end_date.strftime("%Y-%m-%dT23:59:59Z")
                         },
-                        "maxCloudCoverage": 30
+                        "maxCloudCoverage": MAX_CLOUD_COVERAGE
                     }
                 }
             ]
@@ -136,15 +138,25 @@ def fetch_ndvi_data(token: str, polygon: Dict) -> Dict[str, Any]:
                 }
             ]
         },
-        "evalscript": evalscript
+        "evalscript": EVALSCRIPT
     }
+
+def fetch_ndvi_data(token: str, polygon: Dict,
+                    start_date: Optional[datetime] = None,
+                    end_date: Optional[datetime] = None,
+                    session: Optional[requests.Session] = None) -> Dict[str, Any]:
+    """Fetch NDVI data from Sentinel Hub (defaults to the last 3 days)."""
+    end_date = end_date or datetime.now()
+    start_date = start_date or end_date - timedelta(days=3)
+    
+    request_body = build_process_request(polygon, start_date, end_date)
     
     headers = {
         'Authorization': f'Bearer {token}',
         'Content-Type': 'application/json'
     }
     
-    response = requests.post(
+    response = (session or requests).post(
         'https://services.sentinel-hub.com/api/v1/process',
         json=request_body,
         headers=headers
@@ -156,9 +168,9 @@ def fetch_ndvi_data(token: str, polygon: Dict) -> Dict[str, Any]:
         'acquisition_date': end_date.strftime("%Y-%m-%d")
     }
 
-def save_to_s3(image_data: bytes, date_str: str) -> str:
+def save_to_s3(image_data: bytes, date_str: str, farm_id: str = FARM_ID) -> str:
     """Save NDVI image to S3."""
-    key = f"sat/{FARM_ID}/{date_str}/ndvi.png"
+    key = f"sat/{farm_id}/{date_str}/ndvi.png"
     
     s3.put_object(
         Bucket=S3_BUCKET,
@@ -166,7 +178,7 @@ def save_to_s3(image_data: bytes, date_str: str) -> str:
         Body=image_data,
         ContentType='image/png',
         Metadata={
-            'farm_id': FARM_ID,
+            'farm_id': farm_id,
             'acquisition_date': date_str,
             'processing_date': datetime.now().isoformat()
         }
@@ -174,47 +186,54 @@ def save_to_s3(image_data: bytes, date_str: str) -> str:
     
     return f"s3://{S3_BUCKET}/{key}"
 
-def save_to_dynamodb(timestamp: str, mean: float, p10: float, p90: float):
-    """Save NDVI metrics to DynamoDB."""
-    table = dynamodb.Table('readings')
-    
-    items = [
-        {
-            'pk': f'{FARM_ID}#{timestamp}',
-            'sk': 'sat.ndvi.mean',
-            'farm_id': FARM_ID,
-            'timestamp': timestamp,
-            'sensor': 'sat.ndvi.mean',
-            'value': mean,
-            'unit': 'index',
-            'created_at': datetime.now().isoformat()
-        },
-        {
-            'pk': f'{FARM_ID}#{timestamp}',
-            'sk': 'sat.ndvi.p10',
-            'farm_id': FARM_ID,
-            'timestamp': timestamp,
-            'sensor': 'sat.ndvi.p10',
-            'value': p10,
-            'unit': 'index',
-            'created_at': datetime.now().isoformat()
-        },
-        {
-            'pk': f'{FARM_ID}#{timestamp}',
-            'sk': 'sat.ndvi.p90',
-            'farm_id': FARM_ID,
+def build_ndvi_items(farm_id: str, timestamp: str, mean: float, p10: float, p90: float,
+                     zone_id: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Build the DynamoDB reading items for one set of NDVI statistics.
+
+    Zone readings keep the sat.ndvi.* sensor names and add the zone to the sort key.
+    """
+    created_at = datetime.now().isoformat()
+    items = []
+    for sensor, value in (
+        ('sat.ndvi.mean', mean),
+        ('sat.ndvi.p10', p10),
+        ('sat.ndvi.p90', p90),
+    ):
+        item = {
+            'pk': f'{farm_id}#{timestamp}',
+            'sk': sensor if zone_id is None else f'{sensor}#{zone_id}',
+            'farm_id': farm_id,
             'timestamp': timestamp,
-            'sensor': 'sat.ndvi.p90',
-            'value': p90,
+            'sensor': sensor,
+            'value': value,
             'unit': 'index',
-            'created_at': datetime.now().isoformat()
+            'created_at': created_at
         }
-    ]
+        if zone_id is not None:
+            item['zone_id'] = zone_id
+        items.append(item)
+    return items
+
+def build_zone_items(farm_id: str, timestamp: str, zone_stats: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Build reading items for every zone's NDVI statistics."""
+    items = []
+    for zone in zone_stats:
+        items.extend(build_ndvi_items(
+            farm_id, timestamp, zone['mean'], zone['p10'], zone['p90'], zone_id=zone['zone_id']))
+    return items
+
+def write_readings(items: List[Dict[str, Any]]):
+    """Write reading items to DynamoDB; batch_writer groups them 25 per request."""
+    table = dynamodb.Table('readings')
     
     with table.batch_writer() as batch:
         for item in items:
             batch.put_item(Item=item)
 
+def save_to_dynamodb(timestamp: str, mean: float, p10: float, p90: float, farm_id: str = FARM_ID):
+    """Save NDVI metrics to DynamoDB."""
+    write_readings(build_ndvi_items(farm_id, timestamp, mean, p10, p90))
+
 def send_event(detail: Dict[str, Any]):
     """Send completion event to EventBridge."""
     eventbridge.put_events(
@@ -228,55 +247,120 @@ def send_event(detail: Dict[str, Any]):
         ]
     )
 
+def process_acquisition(token: str, farm_id: str, polygon: Dict, zones: Optional[Dict],
+                        acquisition: Dict[str, Any],
+                        session: Optional[requests.Session] = None) -> Dict[str, Any]:
+    """Fetch, analyse and store the tile of one known acquisition date."""
+    day = datetime.fromisoformat(acquisition['date'])
+    ndvi_result = fetch_ndvi_data(token, polygon, day, day, session=session)
+    return store_acquisition(farm_id, polygon, zones, acquisition, ndvi_result['image_data'])
+
+def store_acquisition(farm_id: str, polygon: Dict, zones: Optional[Dict],
+                      acquisition: Dict[str, Any], image_data: bytes,
+                      save_image: Optional[Callable[[str, str, bytes], str]] = None,
+                      append_cube: Optional[Callable[[str, str, Any], None]] = None) -> Dict[str, Any]:
+    """Analyse and store one fetched tile; shared by single-farm and fleet runs.
+
+    save_image(farm_id, date_str, image_data) and append_cube(farm_id, date_str,
+    levels) default to S3 and the NDVI cube; fleet runs pass their sink's methods.
+    The reading items are returned, not written, so callers can batch them.
+    """
+    # Calculate farm-wide and per-zone statistics from one decode
+    levels = decode_ndvi_image(image_data)
+    stats = ndvi_stats(levels)
+    zone_stats = zonal_ndvi_stats(levels, polygon, zones) if zones else []
+    
+    # Save to S3 under the actual acquisition date
+    if save_image is None:
+        s3_path = save_to_s3(image_data, acquisition['date'], farm_id=farm_id)
+    else:
+        s3_path = save_image(farm_id, acquisition['date'], image_data)
+    
+    # Append the tile to the farm's NDVI time-series cube
+    (append_cube or append_acquisition)(farm_id, acquisition['date'], levels)
+    
+    # Readings are keyed by the sensing time so several acquisitions never collide
+    timestamp = acquisition.get('datetime') or acquisition['date']
+    items = (
+        build_ndvi_items(farm_id, timestamp, stats['mean'], stats['p10'], stats['p90'])
+        + build_zone_items(farm_id, timestamp, zone_stats)
+    )
+    
+    return {
+        'farm_id': farm_id,
+        'timestamp': timestamp,
+        'acquisition_date': acquisition['date'],
+        'cloud_cover': acquisition.get('cloud_cover'),
+        's3_path': s3_path,
+        'metrics': {'mean': stats['mean'], 'p10': stats['p10'], 'p90': stats['p90']},
+        'zones': zone_stats,
+        'items': items
+    }
+
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     """Lambda handler for satellite NDVI processing."""
+    # Fleet mode: many farms (and optionally historic date ranges) per invocation
+    if event.get('mode') == 'fleet' or event.get('farms'):
+        from .fleet import handle_fleet
+        return handle_fleet(event)
+    
     try:
         # Get Sentinel Hub token
         token = get_sentinel_token()
         
-        # Fetch NDVI data
-        ndvi_result = fetch_ndvi_data(token, FARM_POLYGON)
+        # Only process acquisitions that exist and have not been processed yet
+        end_date = datetime.now()
+        start_date = end_date - timedelta(days=ACQUISITION_LOOKBACK_DAYS)
+        found = search_acquisitions(token, FARM_POLYGON, start_date, end_date)
+        acquisitions = filter_new(FARM_ID, found)
         
-        # Calculate statistics
-        mean, p10, p90 = calculate_ndvi_stats(ndvi_result['image_data'])
+        if not acquisitions:
+            if found:
+                print(f"No new acquisitions for {FARM_ID} ({len(found)} already processed)")
+            else:
+                print(f"No acquisitions for {FARM_ID} in the last {ACQUISITION_LOOKBACK_DAYS} days")
+            return {
+                'statusCode': 200,
+                'body': json.dumps({
+                    'message': 'No new acquisitions',
+                    'farm_id': FARM_ID,
+                    'acquisitions_found': len(found)
+                })
+            }
         
-        # Save to S3
-        s3_path = save_to_s3(
-            ndvi_result['image_data'], 
-            ndvi_result['acquisition_date']
-        )
+        results = [
+            process_acquisition(token, FARM_ID, FARM_POLYGON, FARM_ZONES, acquisition)
+            for acquisition in acquisitions
+        ]
         
-        # Save to DynamoDB
-        timestamp = datetime.now().isoformat()
-        save_to_dynamodb(timestamp, mean, p10, p90)
+        # Save to DynamoDB, then remember the acquisitions as processed
+        write_readings([item for result in results for item in result['items']])
+        mark_processed(FARM_ID, acquisitions)
         
-        # Send completion event
-        send_event({
-            'farm_id': FARM_ID,
-            'timestamp': timestamp,
-            'acquisition_date': ndvi_result['acquisition_date'],
-            's3_path': s3_path,
-            'metrics': {
-                'mean': mean,
-                'p10': p10,
-                'p90': p90
-            }
-        })
+        # Send completion events
+        for result in results:
+            send_event({
+                'farm_id': FARM_ID,
+                'timestamp': result['timestamp'],
+                'acquisition_date': result['acquisition_date'],
+                's3_path': result['s3_path'],
+                'metrics': result['metrics'],
+                'zones': len(result['zones'])
+            })
         
+        latest = results[-1]
         return {
             'statusCode': 200,
             'body': json.dumps({
                 'message': 'NDVI processing complete',
                 'farm_id': FARM_ID,
-                'metrics': {
-                    'mean': mean,
-                    'p10': p10,
-                    'p90': p90
-                },
-                's3_path': s3_path
+                'acquisition_date': latest['acquisition_date'],
+                'metrics': latest['metrics'],
+                's3_path': latest['s3_path'],
+                'acquisitions': [r['acquisition_date'] for r in results]
             })
         }
         
     except Exception as e:
         print(f"Error processing NDVI: {str(e)}")
-        raise
\ No newline at end of file
+        raise
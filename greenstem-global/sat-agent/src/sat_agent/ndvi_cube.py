@@ -0,0 +1,443 @@
+import io
+import os
+import json
+import time
+import uuid
+import zlib
+import threading
+from contextlib import contextmanager
+from datetime import date
+from typing import Dict, Any, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .ndvi_stats import DEFAULT_PERCENTILES, LEVEL_NDVI, VALID_LEVELS, stats_from_histograms, zonal_histograms
+from .zones import zone_labels
+
+# Configuration
+# The cube is opt-in: set NDVI_CUBE_STORE=s3 (or local) to start writing it
+NDVI_CUBE_STORE = os.environ.get('NDVI_CUBE_STORE', 'off')  # s3 | local | off
+NDVI_CUBE_DIR = os.environ.get('NDVI_CUBE_DIR', 'data/ndvi-cubes')
+NDVI_CUBE_PREFIX = os.environ.get('NDVI_CUBE_PREFIX', 'sat-cubes')
+S3_ENDPOINT_URL = os.environ.get('S3_ENDPOINT_URL')  # e.g. MinIO
+
+# Chunks span many acquisitions of a small spatial block, so a pixel or zone
+# series over a season touches a handful of objects instead of one per date.
+TIME_CHUNK = int(os.environ.get('NDVI_CUBE_TIME_CHUNK', '32'))
+SPACE_CHUNK = int(os.environ.get('NDVI_CUBE_SPACE_CHUNK', '128'))
+
+# Appends hold a per-farm lock object in the store. It expires after
+# LOCK_TTL seconds (longer than the Lambda timeout) so a crashed writer
+# cannot block the farm forever.
+LOCK_TTL = float(os.environ.get('NDVI_CUBE_LOCK_TTL', '600'))
+LOCK_WAIT = float(os.environ.get('NDVI_CUBE_LOCK_WAIT', '120'))
+LOCK_POLL = 0.5
+
+
+def _lock_body(owner: str) -> bytes:
+    return json.dumps({'owner': owner, 'expires_at': time.time() + LOCK_TTL}).encode('utf-8')
+
+
+def _lock_expired(body: Optional[bytes]) -> bool:
+    try:
+        return json.loads(body)['expires_at'] < time.time()
+    except (TypeError, ValueError, KeyError):
+        return True
+
+
+@contextmanager
+def _held(backend, key: str):
+    """Hold backend lock `key`, polling until LOCK_WAIT runs out."""
+    owner = uuid.uuid4().hex
+    deadline = time.monotonic() + LOCK_WAIT
+    while not backend.try_lock(key, owner):
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"Timed out waiting for cube lock {key}")
+        time.sleep(LOCK_POLL)
+    try:
+        yield
+    finally:
+        backend.unlock(key, owner)
+
+
+class LocalCubeBackend:
+    """Cube objects as files under a local directory (tests, notebooks)."""
+
+    def __init__(self, root: str = NDVI_CUBE_DIR):
+        self.root = root
+
+    def get(self, key: str) -> Optional[bytes]:
+        try:
+            with open(os.path.join(self.root, key), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def put(self, key: str, data: bytes):
+        path = os.path.join(self.root, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def try_lock(self, key: str, owner: str) -> bool:
+        path = os.path.join(self.root, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write the body first and link it into place, so the lock file never
+        # exists without an owner and expiry (an empty one would look stale)
+        tmp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(_lock_body(owner))
+        try:
+            os.link(tmp_path, path)
+            return True
+        except FileExistsError:
+            body = self.get(key)
+            if body is not None and _lock_expired(body):
+                self._break_stale(path, body)
+            return False
+        finally:
+            os.remove(tmp_path)
+
+    @staticmethod
+    def _break_stale(path: str, body: bytes):
+        """Remove the expired lock `body`, but never a lock taken since it was read."""
+        # Only one of several racing breakers can move the file aside
+        claimed = f'{path}.{uuid.uuid4().hex}.stale'
+        try:
+            os.rename(path, claimed)
+        except FileNotFoundError:
+            return
+        with open(claimed, 'rb') as f:
+            taken = f.read() != body
+        if taken:
+            # A new owner got in between our read and the rename: put it back
+            try:
+                os.link(claimed, path)
+            except FileExistsError:
+                pass
+        os.remove(claimed)
+
+    def unlock(self, key: str, owner: str):
+        body = self.get(key)
+        if body and json.loads(body).get('owner') == owner:
+            os.remove(os.path.join(self.root, key))
+
+
+class S3CubeBackend:
+    """Cube objects in S3 (or MinIO via S3_ENDPOINT_URL)."""
+
+    def __init__(self, bucket: str, prefix: str = NDVI_CUBE_PREFIX, client=None):
+        import boto3
+        self.bucket = bucket
+        self.prefix = prefix.strip('/')
+        self.client = client or boto3.client('s3', endpoint_url=S3_ENDPOINT_URL)
+
+    def get(self, key: str) -> Optional[bytes]:
+        try:
+            response = self.client.get_object(Bucket=self.bucket, Key=f'{self.prefix}/{key}')
+        except self.client.exceptions.NoSuchKey:
+            return None
+        return response['Body'].read()
+
+    def put(self, key: str, data: bytes):
+        self.client.put_object(Bucket=self.bucket, Key=f'{self.prefix}/{key}', Body=data)
+
+    def try_lock(self, key: str, owner: str) -> bool:
+        """Create the lock object only if absent (or expired), using S3 conditional writes."""
+        from botocore.exceptions import ClientError
+        full_key = f'{self.prefix}/{key}'
+        try:
+            self.client.put_object(Bucket=self.bucket, Key=full_key, Body=_lock_body(owner), IfNoneMatch='*')
+            return True
+        except ClientError as e:
+            if e.response['Error']['Code'] not in ('PreconditionFailed', 'ConditionalRequestConflict'):
+                raise
+        try:
+            current = self.client.get_object(Bucket=self.bucket, Key=full_key)
+        except self.client.exceptions.NoSuchKey:
+            return False
+        if not _lock_expired(current['Body'].read()):
+            return False
+        # Take over a stale lock only if nobody replaced it since we read it
+        try:
+            self.client.put_object(Bucket=self.bucket, Key=full_key, Body=_lock_body(owner),
+                                   IfMatch=current['ETag'])
+            return True
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('PreconditionFailed', 'ConditionalRequestConflict', 'NoSuchKey'):
+                return False
+            raise
+
+    def unlock(self, key: str, owner: str):
+        full_key = f'{self.prefix}/{key}'
+        try:
+            current = self.client.get_object(Bucket=self.bucket, Key=full_key)
+        except self.client.exceptions.NoSuchKey:
+            return
+        if json.loads(current['Body'].read()).get('owner') == owner:
+            self.client.delete_object(Bucket=self.bucket, Key=full_key, IfMatch=current['ETag'])
+
+
+def _encode_chunk(chunk: np.ndarray) -> bytes:
+    buf = io.BytesIO()
+    np.save(buf, chunk, allow_pickle=False)
+    # Masked pixels are 0, so clipped/cloudy tiles compress very well
+    return zlib.compress(buf.getvalue(), 1)
+
+
+def _decode_chunk(data: bytes) -> np.ndarray:
+    return np.load(io.BytesIO(zlib.decompress(data)), allow_pickle=False)
+
+
+class NDVICube:
+    """Chunked (time, y, x) uint8 NDVI array for one farm.
+
+    Layout under {farm_id}/:
+      meta.json            shape, chunking and acquisition dates (slice order)
+      c/{t}.{y}.{x}.npy.z  zlib-compressed .npy chunk of up to
+                           TIME_CHUNK x SPACE_CHUNK x SPACE_CHUNK pixels
+
+    Slices are stored in arrival order so backfills can append older dates;
+    reads return them sorted by date. Re-appending an existing date
+    overwrites that slice, which makes reruns idempotent.
+    """
+
+    def __init__(self, backend, farm_id: str, time_chunk: int = TIME_CHUNK,
+                 space_chunk: int = SPACE_CHUNK):
+        self.backend = backend
+        self.farm_id = farm_id
+        self._lock = threading.Lock()
+        self._default_chunks = [time_chunk, space_chunk, space_chunk]
+        self.refresh()
+
+    def _load_meta(self) -> Dict[str, Any]:
+        # A new dict each time, so readers holding the previous one are unaffected
+        raw = self.backend.get(self._meta_key())
+        return json.loads(raw) if raw else {
+            'shape': None,
+            'chunks': list(self._default_chunks),
+            'dtype': 'uint8',
+            'times': []
+        }
+
+    def refresh(self) -> Dict[str, Any]:
+        """Reload metadata written by other processes (and return it)."""
+        self.meta = self._load_meta()
+        return self.meta
+
+    def _meta_key(self) -> str:
+        return f'{self.farm_id}/meta.json'
+
+    def _lock_key(self) -> str:
+        return f'{self.farm_id}/append.lock'
+
+    def _chunk_key(self, t: int, y: int, x: int) -> str:
+        return f'{self.farm_id}/c/{t}.{y}.{x}.npy.z'
+
+    @property
+    def times(self) -> List[str]:
+        return list(self.meta['times'])
+
+    @staticmethod
+    def _chunk_grid(meta: Dict[str, Any], rows: slice, cols: slice) -> List[Tuple[int, int]]:
+        _, cy, cx = meta['chunks']
+        return [
+            (y, x)
+            for y in range(rows.start // cy, (rows.stop - 1) // cy + 1)
+            for x in range(cols.start // cx, (cols.stop - 1) // cx + 1)
+        ]
+
+    def _load_chunk(self, meta: Dict[str, Any], t: int, y: int, x: int) -> np.ndarray:
+        ct, cy, cx = meta['chunks']
+        height, width = meta['shape']
+        raw = self.backend.get(self._chunk_key(t, y, x))
+        if raw is not None:
+            return _decode_chunk(raw)
+        return np.zeros((ct, min(cy, height - y * cy), min(cx, width - x * cx)), dtype=np.uint8)
+
+    def append(self, date_str: str, levels: np.ndarray) -> int:
+        """Store one acquisition as a time slice; returns its slice index."""
+        if levels.ndim != 2 or levels.dtype != np.uint8:
+            raise ValueError(f"Cube slices must be 2-D uint8, got {levels.dtype} {levels.shape}")
+
+        # The thread lock serialises this container; the store lock serialises
+        # concurrent invocations for the same farm, whose chunk
+        # read-modify-writes would otherwise overwrite each other
+        with self._lock, _held(self.backend, self._lock_key()):
+            # Meta is re-read under the lock: it may have changed since the last call
+            meta = self._load_meta()
+            if meta['shape'] is None:
+                meta['shape'] = list(levels.shape)
+            elif list(levels.shape) != meta['shape']:
+                raise ValueError(f"Slice shape {levels.shape} does not match cube shape {meta['shape']}")
+
+            times = meta['times']
+            index = times.index(date_str) if date_str in times else len(times)
+            ct, cy, cx = meta['chunks']
+            t, offset = divmod(index, ct)
+
+            # Read-modify-write the time chunk this slice lands in
+            height, width = levels.shape
+            for y, x in self._chunk_grid(meta, slice(0, height), slice(0, width)):
+                chunk = self._load_chunk(meta, t, y, x)
+                chunk[offset] = levels[y * cy:(y + 1) * cy, x * cx:(x + 1) * cx]
+                self.backend.put(self._chunk_key(t, y, x), _encode_chunk(chunk))
+
+            # Metadata last: readers never see a date whose chunks are not written
+            if index == len(times):
+                times.append(date_str)
+            self.backend.put(self._meta_key(), json.dumps(meta).encode('utf-8'))
+            self.meta = meta
+            return index
+
+    def read(self, rows: Optional[slice] = None, cols: Optional[slice] = None,
+             meta: Optional[Dict[str, Any]] = None) -> Tuple[List[str], np.ndarray]:
+        """Dates (sorted) and the (time, y, x) block for a pixel window.
+
+        Metadata is re-read first (unless given), so slices appended by
+        other invocations are included.
+        """
+        meta = meta or self.refresh()
+        times = meta['times']
+        if not times:
+            return [], np.zeros((0, 0, 0), dtype=np.uint8)
+        height, width = meta['shape']
+        rows = slice(*(rows or slice(0, height)).indices(height)[:2])
+        cols = slice(*(cols or slice(0, width)).indices(width)[:2])
+        ct, cy, cx = meta['chunks']
+
+        block = np.zeros((len(times), rows.stop - rows.start, cols.stop - cols.start), dtype=np.uint8)
+        for t in range((len(times) - 1) // ct + 1):
+            t0 = t * ct
+            t1 = min(t0 + ct, len(times))
+            for y, x in self._chunk_grid(meta, rows, cols):
+                chunk = self._load_chunk(meta, t, y, x)
+                # Intersection of this chunk with the requested window
+                r0, r1 = max(rows.start, y * cy), min(rows.stop, (y + 1) * cy)
+                c0, c1 = max(cols.start, x * cx), min(cols.stop, (x + 1) * cx)
+                block[t0:t1, r0 - rows.start:r1 - rows.start, c0 - cols.start:c1 - cols.start] = \
+                    chunk[:t1 - t0, r0 - y * cy:r1 - y * cy, c0 - x * cx:c1 - x * cx]
+
+        order = np.argsort(times, kind='stable')
+        return [times[i] for i in order], block[order]
+
+    def pixel_series(self, row: int, col: int) -> Tuple[List[str], np.ndarray]:
+        """NDVI values of one pixel over time; NaN where masked or invalid."""
+        dates, block = self.read(slice(row, row + 1), slice(col, col + 1))
+        levels = block[:, 0, 0]
+        return dates, np.where(VALID_LEVELS[levels], LEVEL_NDVI[levels], np.nan)
+
+    def zone_series(self, farm_polygon: Dict[str, Any], zones: Dict[str, Any],
+                    percentiles: Sequence[float] = DEFAULT_PERCENTILES) -> Dict[str, Any]:
+        """Per-zone NDVI statistics for every acquisition.
+
+        Only chunks overlapping the zones' bounding box are read, and each
+        time slice needs one bincount for all zones.
+        """
+        meta = self.refresh()
+        if not meta['times']:
+            return {'dates': [], 'zones': {}}
+        labels, ids = zone_labels(farm_polygon, zones, tuple(meta['shape']))
+        zoned_rows, zoned_cols = np.nonzero(labels)
+        if not ids or zoned_rows.size == 0:
+            return {'dates': sorted(meta['times']), 'zones': {}}
+
+        rows = slice(int(zoned_rows.min()), int(zoned_rows.max()) + 1)
+        cols = slice(int(zoned_cols.min()), int(zoned_cols.max()) + 1)
+        dates, block = self.read(rows, cols, meta=meta)
+        window_labels = labels[rows, cols]
+
+        per_time = [
+            stats_from_histograms(zonal_histograms(block[i], window_labels, len(ids))[1:], percentiles)
+            for i in range(len(dates))
+        ]
+        series = {}
+        for z, zid in enumerate(ids):
+            series[zid] = {
+                name: np.array([stats[name][z] for stats in per_time])
+                for name in per_time[0]
+            }
+            # Acquisitions without valid pixels in the zone are gaps, not zeros
+            empty = series[zid]['count'] == 0
+            for name, values in series[zid].items():
+                if name != 'count':
+                    values[empty] = np.nan
+        return {'dates': dates, 'zones': series}
+
+
+def rolling_mean(values: np.ndarray, window: int) -> np.ndarray:
+    """Trailing mean over the last `window` observations, ignoring NaN gaps."""
+    if window <= 0:
+        raise ValueError(f"window must be positive, got {window}")
+    values = np.asarray(values, dtype=np.float64)
+    valid = ~np.isnan(values)
+    sums = np.cumsum(np.where(valid, values, 0.0))
+    counts = np.cumsum(valid)
+    sums[window:] = sums[window:] - sums[:-window]
+    counts[window:] = counts[window:] - counts[:-window]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(counts > 0, sums / np.maximum(counts, 1), np.nan)
+
+
+def anomalies(dates: List[str], values: np.ndarray, window_days: int = 15) -> np.ndarray:
+    """Deviation of each observation from the same season in other years.
+
+    The baseline is the mean of observations from other years whose
+    day-of-year lies within window_days. With less than a year of history
+    the previous observations' mean is used instead.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    parsed = [date.fromisoformat(d[:10]) for d in dates]
+    doy = np.array([d.timetuple().tm_yday for d in parsed])
+    years = np.array([d.year for d in parsed])
+    valid = ~np.isnan(values)
+
+    result = np.full(values.shape, np.nan)
+    for i in range(len(values)):
+        if not valid[i]:
+            continue
+        distance = np.abs(doy - doy[i])
+        distance = np.minimum(distance, 366 - distance)
+        seasonal = valid & (years != years[i]) & (distance <= window_days)
+        baseline = seasonal if seasonal.any() else valid & (np.arange(len(values)) < i)
+        if baseline.any():
+            result[i] = values[i] - values[baseline].mean()
+    return result
+
+
+_cubes: Dict[Tuple[int, str], NDVICube] = {}
+_cubes_lock = threading.Lock()
+_default_backend: Dict[str, Any] = {}
+
+
+def default_backend():
+    """Backend selected by NDVI_CUBE_STORE, or None when the cube is disabled."""
+    with _cubes_lock:
+        if 'backend' not in _default_backend:
+            if NDVI_CUBE_STORE == 'off':
+                backend = None
+            elif NDVI_CUBE_STORE == 'local':
+                backend = LocalCubeBackend(NDVI_CUBE_DIR)
+            else:
+                backend = S3CubeBackend(os.environ.get('S3_BUCKET', 'gsg-data-curated'))
+            _default_backend['backend'] = backend
+        return _default_backend['backend']
+
+
+def get_cube(backend, farm_id: str) -> NDVICube:
+    """Shared cube per (backend, farm); appends also take the farm's store lock."""
+    with _cubes_lock:
+        key = (id(backend), farm_id)
+        if key not in _cubes:
+            _cubes[key] = NDVICube(backend, farm_id)
+        return _cubes[key]
+
+
+def append_acquisition(farm_id: str, date_str: str, levels: np.ndarray, backend=None) -> Optional[int]:
+    """Append a decoded NDVI tile to the farm's cube; no-op when the cube is disabled."""
+    backend = backend or default_backend()
+    if backend is None:
+        return None
+    return get_cube(backend, farm_id).append(date_str, levels)
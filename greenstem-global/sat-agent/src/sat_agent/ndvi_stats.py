@@ -0,0 +1,121 @@
+import io
+from typing import Dict, Any, List, Optional, Sequence, Union
+
+import numpy as np
+from PIL import Image
+
+# The evalscript writes NDVI as UINT8: byte = floor((ndvi + 1) * 127.5)
+LEVELS = 256
+DEFAULT_PERCENTILES = (10, 90)
+# Pixels at or below this NDVI are water, cloud-masked (0) or invalid
+MIN_VALID_NDVI = -0.1
+# Elements counted per bincount call; bounds the temporary index array
+CHUNK_ELEMENTS = 1 << 22
+
+# NDVI value of each byte level and which levels count as valid land pixels.
+# Using the same float expression as the original per-pixel code keeps the
+# valid/invalid boundary identical.
+LEVEL_NDVI = (np.arange(LEVELS) / 255.0) * 2 - 1
+VALID_LEVELS = LEVEL_NDVI > MIN_VALID_NDVI
+
+
+def decode_ndvi_image(image_data: bytes) -> np.ndarray:
+    """Decode a PNG/TIFF NDVI tile into a uint8 array."""
+    img = Image.open(io.BytesIO(image_data))
+    return np.asarray(img)
+
+
+def level_histogram(levels: np.ndarray, chunk_elements: int = CHUNK_ELEMENTS) -> np.ndarray:
+    """Count pixels per byte level in chunks, without a float copy of the array."""
+    if levels.dtype != np.uint8:
+        raise ValueError(f"NDVI array must be uint8, got {levels.dtype}")
+
+    flat = levels.reshape(-1)
+    counts = np.zeros(LEVELS, dtype=np.int64)
+    for start in range(0, flat.size, chunk_elements):
+        counts += np.bincount(flat[start:start + chunk_elements], minlength=LEVELS)
+    return counts
+
+
+def stats_from_histograms(counts: np.ndarray,
+                          percentiles: Sequence[float] = DEFAULT_PERCENTILES) -> Dict[str, np.ndarray]:
+    """Mean and percentiles of the valid NDVI pixels for each row of level histograms.
+
+    counts has shape (zones, 256). Percentiles match np.percentile's default
+    (linear) interpolation over the sorted valid pixel values, so results are
+    exact rather than binned. Rows without valid pixels get zeros.
+    """
+    valid = np.where(VALID_LEVELS, counts, 0)
+    totals = valid.sum(axis=1)
+    has_pixels = totals > 0
+    safe_totals = np.maximum(totals, 1)
+
+    stats = {
+        'count': totals,
+        'mean': np.where(has_pixels, valid @ LEVEL_NDVI / safe_totals, 0.0),
+    }
+
+    # cumulative[z, i] = valid pixels of zone z with level <= i; the k-th sorted
+    # value (0-based) is the first level whose cumulative count exceeds k
+    cumulative = np.cumsum(valid, axis=1)
+    for q in percentiles:
+        rank = q / 100 * (safe_totals - 1)
+        lower = np.floor(rank).astype(np.int64)
+        upper = np.minimum(lower + 1, safe_totals - 1)
+        lo_val = LEVEL_NDVI[(cumulative > lower[:, None]).argmax(axis=1)]
+        hi_val = LEVEL_NDVI[(cumulative > upper[:, None]).argmax(axis=1)]
+        stats[f"p{q:g}"] = np.where(has_pixels, lo_val + (hi_val - lo_val) * (rank - lower), 0.0)
+    return stats
+
+
+def stats_from_histogram(counts: np.ndarray,
+                         percentiles: Sequence[float] = DEFAULT_PERCENTILES) -> Dict[str, float]:
+    """Mean and percentiles of the valid NDVI pixels described by one level histogram."""
+    stats = stats_from_histograms(counts[None, :], percentiles)
+    return {
+        name: int(values[0]) if name == 'count' else float(values[0])
+        for name, values in stats.items()
+    }
+
+
+def zonal_histograms(levels: np.ndarray, labels: np.ndarray, n_zones: int,
+                     chunk_elements: int = CHUNK_ELEMENTS) -> np.ndarray:
+    """Level histograms for every zone of a label array in one bincount pass.
+
+    labels holds 0 for pixels outside every zone and 1..n_zones otherwise;
+    the result has shape (n_zones + 1, 256) with row 0 for unzoned pixels.
+    """
+    if levels.dtype != np.uint8:
+        raise ValueError(f"NDVI array must be uint8, got {levels.dtype}")
+    if labels.shape != levels.shape:
+        raise ValueError(f"Label shape {labels.shape} does not match image shape {levels.shape}")
+
+    flat_levels = levels.reshape(-1)
+    flat_labels = labels.reshape(-1)
+    size = (n_zones + 1) * LEVELS
+    counts = np.zeros(size, dtype=np.int64)
+    for start in range(0, flat_levels.size, chunk_elements):
+        stop = start + chunk_elements
+        keys = flat_labels[start:stop].astype(np.int64) * LEVELS + flat_levels[start:stop]
+        counts += np.bincount(keys, minlength=size)
+    return counts.reshape(n_zones + 1, LEVELS)
+
+
+def ndvi_stats(levels: np.ndarray, percentiles: Sequence[float] = DEFAULT_PERCENTILES,
+               axis: Optional[int] = None) -> Union[Dict[str, float], List[Dict[str, float]]]:
+    """NDVI statistics for a uint8 tile, band stack or time stack.
+
+    With axis=None all pixels are pooled (the original single-tile behaviour).
+    With an axis (e.g. 0 for a (time, height, width) stack or -1 for a
+    multi-band image) one stats dict is returned per slice along that axis.
+    """
+    if axis is None:
+        return stats_from_histogram(level_histogram(levels), percentiles)
+    slices = np.moveaxis(levels, axis, 0)
+    return [stats_from_histogram(level_histogram(s), percentiles) for s in slices]
+
+
+def image_ndvi_stats(image_data: bytes,
+                     percentiles: Sequence[float] = DEFAULT_PERCENTILES) -> Dict[str, Any]:
+    """Decode an NDVI tile and return its pooled statistics."""
+    return ndvi_stats(decode_ndvi_image(image_data), percentiles)
@@ -0,0 +1,154 @@
+import os
+import json
+import hashlib
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .ndvi_stats import DEFAULT_PERCENTILES, stats_from_histograms, zonal_histograms
+
+# Configuration
+FARM_ZONES = json.loads(os.environ.get('FARM_ZONES_GEOJSON', '{}'))
+ZONE_CACHE_DIR = os.environ.get('ZONE_CACHE_DIR', '/tmp/sat-agent-zones')
+ZONE_CACHE_SIZE = int(os.environ.get('ZONE_CACHE_SIZE', '32'))
+
+# Label arrays per (farm geometry, zones, raster shape); survives warm Lambda invocations
+_label_cache: 'OrderedDict[str, Tuple[np.ndarray, List[str]]]' = OrderedDict()
+
+
+def _polygons(geometry: Dict[str, Any]) -> List[List[List[List[float]]]]:
+    """Polygon ring lists of a Polygon or MultiPolygon geometry."""
+    if geometry['type'] == 'Polygon':
+        return [geometry['coordinates']]
+    if geometry['type'] == 'MultiPolygon':
+        return geometry['coordinates']
+    raise ValueError(f"Unsupported zone geometry type: {geometry['type']}")
+
+
+def _geometry(feature: Dict[str, Any]) -> Dict[str, Any]:
+    return feature.get('geometry', feature)
+
+
+def geometry_bounds(geometry: Dict[str, Any]) -> Tuple[float, float, float, float]:
+    """(min_lon, min_lat, max_lon, max_lat) of a geometry."""
+    points = np.array([
+        point for polygon in _polygons(geometry) for ring in polygon for point in ring
+    ], dtype=np.float64)
+    return (points[:, 0].min(), points[:, 1].min(), points[:, 0].max(), points[:, 1].max())
+
+
+def zone_features(zones: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Features of a zones FeatureCollection (or a plain list of features)."""
+    if not zones:
+        return []
+    if isinstance(zones, list):
+        return zones
+    return zones.get('features', [])
+
+
+def zone_id(feature: Dict[str, Any], index: int) -> str:
+    properties = feature.get('properties') or {}
+    return str(properties.get('zone_id') or properties.get('name') or feature.get('id') or f'zone-{index + 1}')
+
+
+def rasterize_zones(bounds: Tuple[float, float, float, float], shape: Tuple[int, int],
+                    features: List[Dict[str, Any]]) -> np.ndarray:
+    """Burn zone polygons into a label array aligned with the process API output.
+
+    The process API renders the farm's bounding box onto the output grid, so
+    pixel (row, col) covers that fraction of the bbox. A pixel belongs to a
+    zone when its centre is inside the polygon (even-odd rule, holes
+    respected). Zones later in the list win where polygons overlap.
+    """
+    height, width = shape
+    min_lon, min_lat, max_lon, max_lat = bounds
+    xs = min_lon + (np.arange(width) + 0.5) * (max_lon - min_lon) / width
+    ys = max_lat - (np.arange(height) + 0.5) * (max_lat - min_lat) / height
+
+    labels = np.zeros(shape, dtype=np.int32)
+    for index, feature in enumerate(features):
+        inside = np.zeros(shape, dtype=bool)
+        for polygon in _polygons(_geometry(feature)):
+            for ring in polygon:
+                ring = np.asarray(ring, dtype=np.float64)
+                x0, y0 = ring[:-1, 0], ring[:-1, 1]
+                x1, y1 = ring[1:, 0], ring[1:, 1]
+                # Edges crossing each row's centre line, and where they cross it
+                crosses = (y0[None, :] > ys[:, None]) != (y1[None, :] > ys[:, None])
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    cross_x = x0 + (ys[:, None] - y0) * (x1 - x0) / (y1 - y0)
+                for row in np.nonzero(crosses.any(axis=1))[0]:
+                    # Pixels left of an odd number of crossings are inside
+                    edge_x = np.sort(cross_x[row, crosses[row]])
+                    inside[row] ^= (np.searchsorted(edge_x, xs, side='right') % 2).astype(bool)
+        labels[inside] = index + 1
+    return labels
+
+
+def _cache_key(farm_geometry: Dict[str, Any], features: List[Dict[str, Any]],
+               shape: Tuple[int, int]) -> str:
+    payload = json.dumps([farm_geometry, [_geometry(f) for f in features], list(shape)], sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def zone_labels(farm_polygon: Dict[str, Any], zones: Optional[Dict[str, Any]],
+                shape: Tuple[int, int]) -> Tuple[np.ndarray, List[str]]:
+    """Cached label array and zone ids for a farm geometry, zone set and raster shape."""
+    features = zone_features(zones)
+    farm_geometry = _geometry(farm_polygon)
+    key = _cache_key(farm_geometry, features, shape)
+    ids = [zone_id(feature, i) for i, feature in enumerate(features)]
+
+    if key in _label_cache:
+        _label_cache.move_to_end(key)
+        return _label_cache[key][0], ids
+
+    path = os.path.join(ZONE_CACHE_DIR, f'{key}.npy') if ZONE_CACHE_DIR else None
+    labels = None
+    if path and os.path.exists(path):
+        try:
+            labels = np.load(path)
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable zone label cache {path}: {str(e)}")
+    if labels is None:
+        labels = rasterize_zones(geometry_bounds(farm_geometry), shape, features)
+        if path:
+            try:
+                os.makedirs(ZONE_CACHE_DIR, exist_ok=True)
+                tmp_path = f'{path}.{os.getpid()}.tmp'
+                with open(tmp_path, 'wb') as f:
+                    np.save(f, labels)
+                os.replace(tmp_path, path)
+            except OSError as e:
+                print(f"Could not persist zone labels to {path}: {str(e)}")
+
+    _label_cache[key] = (labels, ids)
+    while len(_label_cache) > ZONE_CACHE_SIZE:
+        _label_cache.popitem(last=False)
+    return labels, ids
+
+
+def zonal_ndvi_stats(levels: np.ndarray, farm_polygon: Dict[str, Any],
+                     zones: Optional[Dict[str, Any]],
+                     percentiles: Sequence[float] = DEFAULT_PERCENTILES) -> List[Dict[str, Any]]:
+    """Per-zone NDVI statistics for a uint8 tile covering the farm polygon's bbox.
+
+    One bincount over (zone, level) pairs feeds every zone, so the cost is
+    dominated by the pixel count rather than the number of zones.
+    """
+    if levels.ndim != 2:
+        raise ValueError(f"Zonal statistics need a single-band tile, got shape {levels.shape}")
+    labels, ids = zone_labels(farm_polygon, zones, levels.shape)
+    if not ids:
+        return []
+
+    stats = stats_from_histograms(zonal_histograms(levels, labels, len(ids))[1:], percentiles)
+    return [
+        {
+            'zone_id': zid,
+            **{name: int(values[i]) if name == 'count' else float(values[i])
+               for name, values in stats.items()}
+        }
+        for i, zid in enumerate(ids)
+    ]
@@ -0,0 +1,13 @@
+"""
+Test configuration for sat-agent.
+
+Lambda imports the handler as sat_agent.index from src/, so tests do the same.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+# index.py creates boto3 clients at import time
+os.environ.setdefault('AWS_DEFAULT_REGION', 'eu-west-1')
@@ -0,0 +1,129 @@
+"""
+Tests for Catalog acquisition search and the processed-acquisition caches.
+"""
+
+import copy
+import json
+from datetime import datetime
+
+from sat_agent import acquisitions
+
+POLYGON = {'type': 'Feature', 'geometry': {'type': 'Polygon', 'coordinates': [
+    [[35.26, 0.51], [35.27, 0.51], [35.27, 0.52], [35.26, 0.52], [35.26, 0.51]]]}}
+
+
+def _scene(sensed_at, cloud_cover):
+    return {'properties': {'datetime': sensed_at, 'eo:cloud_cover': cloud_cover}}
+
+
+class StubResponse:
+    def __init__(self, body):
+        self.body = body
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.body
+
+
+class StubSession:
+    """Serves Catalog pages in order and records each request body."""
+
+    def __init__(self, pages):
+        self.pages = list(pages)
+        self.requests = []
+
+    def post(self, url, json, headers):
+        self.requests.append((url, copy.deepcopy(json), headers))
+        return StubResponse(self.pages.pop(0))
+
+
+def test_catalog_pages_collapse_to_one_acquisition_per_day():
+    session = StubSession([
+        {'features': [_scene('2024-05-02T08:10:00Z', 20), _scene('2024-05-01T08:00:00Z', 12)],
+         'context': {'next': 'page-2'}},
+        {'features': [_scene('2024-05-02T08:05:00Z', None), _scene('2024-05-02T08:20:00Z', 4)],
+         'context': {}},
+    ])
+
+    found = acquisitions.search_acquisitions(
+        'token', POLYGON, datetime(2024, 5, 1), datetime(2024, 5, 3), max_cloud_coverage=25, session=session)
+
+    assert found == [
+        {'date': '2024-05-01', 'datetime': '2024-05-01T08:00:00Z', 'cloud_cover': 12},
+        # Earliest sensing time and lowest cloud cover of that day's scenes
+        {'date': '2024-05-02', 'datetime': '2024-05-02T08:05:00Z', 'cloud_cover': 4},
+    ]
+    (url, first, headers), (_, second, _) = session.requests
+    assert url == acquisitions.CATALOG_URL and headers['Authorization'] == 'Bearer token'
+    assert first['datetime'] == '2024-05-01T00:00:00Z/2024-05-03T23:59:59Z'
+    assert first['filter'] == 'eo:cloud_cover <= 25' and 'next' not in first
+    assert second['next'] == 'page-2'
+
+
+def test_local_cache_round_trip(tmp_path):
+    path = tmp_path / 'cache' / 'acquisitions.json'
+    cache = acquisitions.LocalAcquisitionCache(str(path))
+    found = [{'date': '2024-05-01', 'datetime': '2024-05-01T08:00:00Z'}, {'date': '2024-05-02'}]
+
+    assert acquisitions.filter_new('F1', found, cache) == found
+    acquisitions.mark_processed('F1', found[:1], cache)
+    assert acquisitions.filter_new('F1', found, cache) == found[1:]
+    assert acquisitions.filter_new('F2', found, cache) == found
+
+    # A new container reads what the previous one recorded
+    reloaded = acquisitions.LocalAcquisitionCache(str(path))
+    assert reloaded.processed_dates('F1', ['2024-05-01', '2024-05-02']) == {'2024-05-01'}
+    assert json.loads(path.read_text())['F1']['2024-05-01']['datetime'] == '2024-05-01T08:00:00Z'
+
+
+def test_unreadable_local_cache_starts_empty(tmp_path):
+    path = tmp_path / 'acquisitions.json'
+    path.write_text('{not json')
+    assert acquisitions.LocalAcquisitionCache(str(path)).processed_dates('F1', ['2024-05-01']) == set()
+
+
+class BrokenCache:
+    def processed_dates(self, farm_id, dates):
+        raise ConnectionError('table unavailable')
+
+    def mark_processed(self, farm_id, found):
+        raise ConnectionError('table unavailable')
+
+
+def test_cache_failures_fail_open():
+    found = [{'date': '2024-05-01'}]
+    # Nothing is skipped when the lookup fails, and recording never raises
+    assert acquisitions.filter_new('F1', found, BrokenCache()) == found
+    acquisitions.mark_processed('F1', found, BrokenCache())
+
+
+class StubDynamo:
+    """batch_get_item that leaves every other key unprocessed on the first call."""
+
+    def __init__(self, done):
+        self.done = done
+        self.calls = 0
+
+    def Table(self, name):
+        return None
+
+    def batch_get_item(self, RequestItems):
+        self.calls += 1
+        (table, request), = RequestItems.items()
+        keys = request['Keys']
+        served, unprocessed = (keys[::2], keys[1::2]) if self.calls == 1 else (keys, [])
+        items = [{'acquisition_date': k['acquisition_date']} for k in served if k['acquisition_date'] in self.done]
+        response = {'Responses': {table: items}}
+        if unprocessed:
+            response['UnprocessedKeys'] = {table: {**request, 'Keys': unprocessed}}
+        return response
+
+
+def test_dynamo_cache_retries_unprocessed_keys():
+    dynamo = StubDynamo({'2024-05-01', '2024-05-02'})
+    cache = acquisitions.DynamoAcquisitionCache('sat_acquisitions', dynamodb=dynamo)
+
+    assert cache.processed_dates('F1', ['2024-05-01', '2024-05-02', '2024-05-03']) == {'2024-05-01', '2024-05-02'}
+    assert dynamo.calls == 2
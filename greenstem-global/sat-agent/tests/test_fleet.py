@@ -0,0 +1,112 @@
+"""
+Tests for fleet processing with local stand-ins for Sentinel Hub and storage.
+"""
+
+import asyncio
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from sat_agent import fleet
+
+FARMS = [
+    {'farmId': 'farm-a', 'coordinates': [0.51, 35.27], 'size_hectares': 4},
+    {'farm_id': 'farm-b', 'coordinates': [0.60, 35.10], 'size_hectares': 2},
+]
+
+
+def _png(value: int) -> bytes:
+    buf = io.BytesIO()
+    Image.fromarray(np.full((8, 8), value, np.uint8)).save(buf, format='PNG')
+    return buf.getvalue()
+
+
+class StubSentinel:
+    """Two acquisitions per farm; processing farm-b on 2024-05-02 fails."""
+
+    def __init__(self):
+        self.processed = []
+
+    def acquisitions(self, polygon, start_date, end_date):
+        return [{'date': '2024-05-01', 'datetime': '2024-05-01T08:00:00Z', 'cloud_cover': 5},
+                {'date': '2024-05-02', 'datetime': '2024-05-02T08:00:00Z', 'cloud_cover': 10}]
+
+    def process(self, polygon, start_date, end_date):
+        lon = polygon['geometry']['coordinates'][0][0][0]
+        day = start_date.date().isoformat()
+        self.processed.append((round(lon, 1), day))
+        if lon < 35.2 and day == '2024-05-02':
+            raise RuntimeError('process API error')
+        return {'image_data': _png(200)}
+
+
+class StubSink:
+    def __init__(self):
+        self.images, self.items, self.cube = [], [], []
+
+    def save_image(self, farm_id, date_str, image_data):
+        self.images.append((farm_id, date_str))
+        return f's3://bucket/{farm_id}/{date_str}.png'
+
+    def write_items(self, items):
+        self.items.extend(items)
+
+    def append_cube(self, farm_id, date_str, levels):
+        self.cube.append((farm_id, date_str, levels.shape))
+
+
+class StubCache:
+    def __init__(self, done):
+        self.done = {farm_id: set(dates) for farm_id, dates in done.items()}
+
+    def processed_dates(self, farm_id, dates):
+        return {d for d in dates if d in self.done.get(farm_id, set())}
+
+    def mark_processed(self, farm_id, acquisitions):
+        self.done.setdefault(farm_id, set()).update(a['date'] for a in acquisitions)
+
+
+def test_process_fleet_with_stub_services():
+    sentinel, sink = StubSentinel(), StubSink()
+    cache = StubCache({'farm-a': ['2024-05-01']})
+
+    summary = asyncio.run(fleet.process_fleet(
+        FARMS, date_ranges=[{'from': '2024-05-01', 'to': '2024-05-03'}],
+        sentinel=sentinel, sink=sink, cache=cache, concurrency=2))
+
+    assert (summary['processed'], summary['skipped'], summary['failed']) == (2, 1, 1)
+    # The already-processed acquisition never reached the process API
+    assert len(sentinel.processed) == 3
+    assert sorted(sink.images) == [('farm-a', '2024-05-02'), ('farm-b', '2024-05-01')]
+    assert sorted(sink.cube) == [('farm-a', '2024-05-02', (8, 8)), ('farm-b', '2024-05-01', (8, 8))]
+    assert {item['pk'].split('#')[0] for item in sink.items} == {'farm-a', 'farm-b'}
+    # Only written acquisitions are remembered; the failed one is retried next run
+    assert cache.done == {'farm-a': {'2024-05-01', '2024-05-02'}, 'farm-b': {'2024-05-01'}}
+    failed = [r for r in summary['results'] if r['status'] == 'error']
+    assert failed[0]['farm_id'] == 'farm-b' and 'process API error' in failed[0]['error']
+
+
+def test_farm_registry_path_is_relative_to_the_registry_roots(tmp_path, monkeypatch):
+    (tmp_path / 'data').mkdir()
+    registry = tmp_path / 'data' / 'farms.json'
+    registry.write_text('[{"farmId": "a", "status": "active"}, {"farmId": "b", "status": "paused"}]')
+    monkeypatch.setattr(fleet, 'REGISTRY_ROOTS', [str(tmp_path / 'asset'), str(tmp_path)])
+
+    assert [farm['farmId'] for farm in fleet.load_farms('data/farms.json')] == ['a']
+    with pytest.raises(FileNotFoundError, match='FARMS_FILE'):
+        fleet.load_farms('missing.json')
+
+
+def test_default_registry_is_the_repo_farm_list():
+    farms = fleet.load_farms()
+    assert farms and all(farm['status'] == 'active' for farm in farms)
+
+    for farm in farms:
+        ring = fleet.farm_polygon(farm)['geometry']['coordinates'][0]
+        lat, lon = farm['coordinates']
+        assert ring[0] == ring[-1] and len(ring) == 5
+        # A square of the farm's area centred on its [lat, lon] point
+        assert min(p[0] for p in ring) < lon < max(p[0] for p in ring)
+        assert min(p[1] for p in ring) < lat < max(p[1] for p in ring)
@@ -0,0 +1,127 @@
+"""
+Tests for the NDVI cube store: concurrent appends, series reads and the
+time-series helpers.
+"""
+
+import multiprocessing
+from collections import OrderedDict
+
+import numpy as np
+import pytest
+
+from sat_agent import ndvi_cube, zones
+
+# A 4 x 4 farm over lon/lat 0..4, split into a west and an east zone
+FARM = {'type': 'Feature', 'geometry': {'type': 'Polygon', 'coordinates': [
+    [[0, 0], [4, 0], [4, 4], [0, 4], [0, 0]]]}}
+ZONES = {'type': 'FeatureCollection', 'features': [
+    {'type': 'Feature', 'properties': {'zone_id': zone_id},
+     'geometry': {'type': 'Polygon', 'coordinates': [[[x0, 0], [x1, 0], [x1, 4], [x0, 4], [x0, 0]]]}}
+    for zone_id, x0, x1 in [('west', 0, 2), ('east', 2, 4)]
+]}
+
+
+def _ndvi(level):
+    return level / 255 * 2 - 1
+
+
+def _append(root, i):
+    cube = ndvi_cube.NDVICube(ndvi_cube.LocalCubeBackend(root), 'F1', space_chunk=8)
+    cube.append(f'2024-01-{i + 1:02d}', np.full((16, 16), i + 1, np.uint8))
+
+
+def test_concurrent_invocations_do_not_overwrite_each_other(tmp_path):
+    """Separate processes (Lambda invocations) appending to one farm keep every slice."""
+    context = multiprocessing.get_context('fork')
+    workers = [context.Process(target=_append, args=(str(tmp_path), i)) for i in range(8)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    dates, block = ndvi_cube.NDVICube(ndvi_cube.LocalCubeBackend(str(tmp_path)), 'F1').read()
+    assert dates == [f'2024-01-{i + 1:02d}' for i in range(8)]
+    assert [int(block[i].min()) for i in range(8)] == list(range(1, 9))
+    assert not (tmp_path / 'F1' / 'append.lock').exists()
+
+
+def test_reads_see_appends_from_other_instances(tmp_path):
+    backend = ndvi_cube.LocalCubeBackend(str(tmp_path))
+    reader = ndvi_cube.NDVICube(backend, 'F1')
+    ndvi_cube.NDVICube(backend, 'F1').append('2024-02-01', np.ones((4, 4), np.uint8))
+
+    dates, block = reader.read()
+    assert dates == ['2024-02-01'] and block.shape == (1, 4, 4)
+
+
+def test_stale_locks_expire(tmp_path, monkeypatch):
+    backend = ndvi_cube.LocalCubeBackend(str(tmp_path))
+    assert backend.try_lock('F1/append.lock', 'live')
+    assert not backend.try_lock('F1/append.lock', 'next')
+    backend.unlock('F1/append.lock', 'live')
+
+    monkeypatch.setattr(ndvi_cube, 'LOCK_TTL', -1)
+    assert backend.try_lock('F1/append.lock', 'crashed')
+    # Expired: the first attempt clears it, the next one takes it
+    assert not backend.try_lock('F1/append.lock', 'next')
+    assert backend.try_lock('F1/append.lock', 'next')
+
+
+@pytest.fixture
+def small_cube(tmp_path, monkeypatch):
+    """Three acquisitions appended out of date order, in 2 x 2 spatial chunks."""
+    monkeypatch.setattr(zones, 'ZONE_CACHE_DIR', str(tmp_path / 'zones'))
+    monkeypatch.setattr(zones, '_label_cache', OrderedDict())
+    cube = ndvi_cube.NDVICube(ndvi_cube.LocalCubeBackend(str(tmp_path / 'cubes')), 'F1',
+                              time_chunk=2, space_chunk=2)
+
+    cloudy_west = np.full((4, 4), 191, np.uint8)
+    cloudy_west[:, :2] = 0
+    cube.append('2024-03-01', np.full((4, 4), 128, np.uint8))
+    cube.append('2024-01-01', np.full((4, 4), 255, np.uint8))
+    cube.append('2024-02-01', cloudy_west)
+    return cube
+
+
+def test_pixel_series_is_date_ordered_with_gaps(small_cube):
+    dates, values = small_cube.pixel_series(3, 0)
+    assert dates == ['2024-01-01', '2024-02-01', '2024-03-01']
+    np.testing.assert_allclose(values, [1.0, np.nan, _ndvi(128)])
+
+    _, values = small_cube.pixel_series(3, 3)
+    np.testing.assert_allclose(values, [1.0, _ndvi(191), _ndvi(128)])
+
+
+def test_zone_series_per_acquisition(small_cube):
+    series = small_cube.zone_series(FARM, ZONES, percentiles=(10, 90))
+
+    assert series['dates'] == ['2024-01-01', '2024-02-01', '2024-03-01']
+    west, east = series['zones']['west'], series['zones']['east']
+    assert list(west['count']) == [8, 0, 8] and list(east['count']) == [8, 8, 8]
+    # The fully clouded acquisition is a gap in the west zone, not a zero
+    np.testing.assert_allclose(west['mean'], [1.0, np.nan, _ndvi(128)])
+    np.testing.assert_allclose(west['p90'], [1.0, np.nan, _ndvi(128)])
+    np.testing.assert_allclose(east['p10'], [1.0, _ndvi(191), _ndvi(128)])
+
+    empty = ndvi_cube.NDVICube(small_cube.backend, 'F2')
+    assert empty.zone_series(FARM, ZONES) == {'dates': [], 'zones': {}}
+
+
+def test_rolling_mean_skips_gaps():
+    values = np.array([1.0, np.nan, 3.0, 5.0, np.nan, np.nan])
+    np.testing.assert_allclose(ndvi_cube.rolling_mean(values, 2), [1.0, 1.0, 3.0, 4.0, 5.0, np.nan])
+    np.testing.assert_allclose(ndvi_cube.rolling_mean(values, 1), values)
+    np.testing.assert_allclose(ndvi_cube.rolling_mean(values, 10), [1.0, 1.0, 2.0, 3.0, 3.0, 3.0])
+    for window in (0, -1):
+        with pytest.raises(ValueError, match='window'):
+            ndvi_cube.rolling_mean(values, window)
+
+
+def test_anomalies_against_same_season_or_history():
+    dates = ['2023-05-01', '2023-08-01', '2024-05-05', '2024-08-01']
+    values = [0.5, 0.7, 0.6, np.nan]
+
+    # May compares with the other year's May; August 2023 has no valid
+    # August in another year, so it falls back to the earlier observations
+    np.testing.assert_allclose(ndvi_cube.anomalies(dates, values), [-0.1, 0.2, 0.1, np.nan])
+    assert np.isnan(ndvi_cube.anomalies(['2024-01-01'], [0.3])).all()
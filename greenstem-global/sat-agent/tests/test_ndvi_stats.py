@@ -0,0 +1,85 @@
+"""
+Histogram NDVI statistics must equal the original per-pixel np.percentile code.
+"""
+
+import numpy as np
+import pytest
+
+from sat_agent import ndvi_stats as ns
+
+QUANTILES = (0, 0.5, 10, 33.3, 50, 90, 99.9, 100)
+
+
+def reference_stats(levels, percentiles):
+    """The original calculate_ndvi_stats, generalised to any percentiles."""
+    ndvi = (levels / 255.0) * 2 - 1
+    valid = ndvi[ndvi > -0.1]
+    if len(valid) == 0:
+        return {'mean': 0.0, **{f'p{q:g}': 0.0 for q in percentiles}}
+    return {
+        'mean': float(np.mean(valid)),
+        **{f'p{q:g}': float(np.percentile(valid, q)) for q in percentiles},
+    }
+
+
+def assert_matches(stats, expected):
+    for name, value in expected.items():
+        assert stats[name] == pytest.approx(value, abs=1e-12), name
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_percentiles_match_np_percentile_on_random_tiles(seed):
+    rng = np.random.default_rng(seed)
+    shape = tuple(rng.integers(1, 64, size=2))
+    levels = rng.integers(0, 256, size=shape, dtype=np.uint8)
+
+    stats = ns.ndvi_stats(levels, percentiles=QUANTILES)
+    assert_matches(stats, reference_stats(levels, QUANTILES))
+    assert stats['count'] == int(ns.VALID_LEVELS[levels].sum())
+
+
+def test_narrow_and_degenerate_tiles():
+    rng = np.random.default_rng(7)
+    # Levels clustered around the valid/invalid boundary (byte 114/115)
+    clustered = rng.integers(110, 120, size=(33, 17), dtype=np.uint8)
+    assert_matches(ns.ndvi_stats(clustered, QUANTILES), reference_stats(clustered, QUANTILES))
+
+    single = np.array([[200]], dtype=np.uint8)
+    assert_matches(ns.ndvi_stats(single, QUANTILES), reference_stats(single, QUANTILES))
+
+    masked = np.zeros((8, 8), dtype=np.uint8)
+    assert ns.ndvi_stats(masked, QUANTILES) == {'count': 0, 'mean': 0.0, **{f'p{q:g}': 0.0 for q in QUANTILES}}
+
+
+def test_chunked_histogram_equals_one_bincount():
+    levels = np.random.default_rng(3).integers(0, 256, size=(100, 70), dtype=np.uint8)
+    assert np.array_equal(ns.level_histogram(levels, chunk_elements=999),
+                          np.bincount(levels.ravel(), minlength=256))
+    with pytest.raises(ValueError, match='uint8'):
+        ns.level_histogram(levels.astype(np.int16))
+
+
+@pytest.mark.parametrize('axis', [0, -1])
+def test_axis_returns_one_result_per_slice(axis):
+    rng = np.random.default_rng(11)
+    stack = rng.integers(0, 256, size=(4, 20, 3), dtype=np.uint8)
+    stack[1] = 0  # A fully masked slice
+
+    results = ns.ndvi_stats(stack, percentiles=(10, 50, 90), axis=axis)
+    slices = np.moveaxis(stack, axis, 0)
+    assert len(results) == len(slices)
+    for stats, tile in zip(results, slices):
+        assert_matches(stats, reference_stats(tile, (10, 50, 90)))
+
+
+def test_zonal_histograms_match_per_zone_reference():
+    rng = np.random.default_rng(5)
+    levels = rng.integers(0, 256, size=(30, 40), dtype=np.uint8)
+    labels = rng.integers(0, 4, size=levels.shape, dtype=np.uint8)
+
+    counts = ns.zonal_histograms(levels, labels, n_zones=3, chunk_elements=257)
+    stats = ns.stats_from_histograms(counts[1:], percentiles=(10, 90))
+    for zone in range(1, 4):
+        expected = reference_stats(levels[labels == zone], (10, 90))
+        for name, value in expected.items():
+            assert stats[name][zone - 1] == pytest.approx(value, abs=1e-12)
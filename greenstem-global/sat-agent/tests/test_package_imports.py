@@ -0,0 +1,30 @@
+"""
+Smoke tests: the Lambda handler module imports as a package.
+
+farm-stack.ts deploys src/ with handler 'sat_agent/index.handler', so the
+runtime imports sat_agent.index; sibling modules must be imported
+relative to the package.
+"""
+
+import importlib
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+SRC = Path(__file__).resolve().parents[1] / 'src'
+
+
+@pytest.mark.parametrize('module', ['sat_agent.index', 'sat_agent.fleet', 'sat_agent.ndvi_cube', 'sat_agent.bench_ndvi_stats'])
+def test_module_imports_as_package(module):
+    importlib.import_module(module)
+
+
+def test_handler_imports_from_lambda_task_root():
+    """A fresh interpreter in src/ (the Lambda task root) can load the handler."""
+    result = subprocess.run(
+        [sys.executable, '-c', 'import sat_agent.index as m; assert callable(m.handler)'],
+        cwd=SRC, capture_output=True, text=True, env={'AWS_DEFAULT_REGION': 'eu-west-1', 'PATH': ''},
+    )
+    assert result.returncode == 0, result.stderr
@@ -0,0 +1,84 @@
+"""
+Tests for zone rasterisation, zonal statistics and the label cache.
+
+The farm bbox is lon 0..10, lat 0..10 on a 10 x 10 grid, so pixel (row, col)
+is centred on lon col + 0.5, lat 9.5 - row.
+"""
+
+from collections import OrderedDict
+
+import numpy as np
+import pytest
+
+from sat_agent import zones
+
+FARM = {'type': 'Feature', 'geometry': {'type': 'Polygon', 'coordinates': [
+    [[0, 0], [10, 0], [10, 10], [0, 10], [0, 0]]]}}
+
+
+def _zone(zone_id, *rings):
+    return {'type': 'Feature', 'properties': {'zone_id': zone_id},
+            'geometry': {'type': 'Polygon', 'coordinates': [list(ring) for ring in rings]}}
+
+
+SQUARE = _zone('square', [[2, 2], [5, 2], [5, 5], [2, 5], [2, 2]])
+HOLED = _zone('holed',
+              [[6, 0], [10, 0], [10, 10], [6, 10], [6, 0]],
+              [[7, 4], [9, 4], [9, 6], [7, 6], [7, 4]])
+OUTSIDE = _zone('outside', [[20, 20], [30, 20], [30, 30], [20, 30], [20, 20]])
+ZONES = {'type': 'FeatureCollection', 'features': [SQUARE, HOLED, OUTSIDE]}
+
+
+@pytest.fixture(autouse=True)
+def label_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(zones, 'ZONE_CACHE_DIR', str(tmp_path))
+    monkeypatch.setattr(zones, '_label_cache', OrderedDict())
+    return tmp_path
+
+
+def test_rasterize_square_hole_and_outside_zone():
+    labels = zones.rasterize_zones((0, 0, 10, 10), (10, 10), ZONES['features'])
+
+    expected = np.zeros((10, 10), dtype=np.int32)
+    expected[5:8, 2:5] = 1
+    expected[:, 6:10] = 2
+    expected[4:6, 7:9] = 0  # The hole
+    assert np.array_equal(labels, expected)
+    assert not (labels == 3).any()
+
+
+def test_zonal_ndvi_stats_per_zone():
+    levels = np.full((10, 10), 100, dtype=np.uint8)
+    levels[5:8, 2:5] = 255
+    levels[:, 6:10] = 191
+    levels[0, 6] = 0  # Masked pixel inside the holed zone
+
+    stats = {zone['zone_id']: zone for zone in zones.zonal_ndvi_stats(levels, FARM, ZONES)}
+
+    assert list(stats) == ['square', 'holed', 'outside']
+    assert stats['square']['count'] == 9 and stats['square']['mean'] == pytest.approx(1.0)
+    assert stats['holed']['count'] == 40 - 4 - 1
+    assert stats['holed']['p10'] == stats['holed']['p90'] == pytest.approx(191 / 255 * 2 - 1)
+    assert stats['outside'] == {'zone_id': 'outside', 'count': 0, 'mean': 0.0, 'p10': 0.0, 'p90': 0.0}
+    assert zones.zonal_ndvi_stats(levels, FARM, None) == []
+
+
+def test_label_cache_round_trips_through_npy(label_cache, monkeypatch):
+    labels, ids = zones.zone_labels(FARM, ZONES, (10, 10))
+    (path,) = label_cache.glob('*.npy')
+    assert ids == ['square', 'holed', 'outside']
+
+    # A new container: memory cache empty, labels come from the .npy file
+    rasterize = zones.rasterize_zones
+    monkeypatch.setattr(zones, '_label_cache', OrderedDict())
+    monkeypatch.setattr(zones, 'rasterize_zones', lambda *args: pytest.fail('re-rasterised'))
+    cached, _ = zones.zone_labels(FARM, ZONES, (10, 10))
+    assert np.array_equal(cached, labels)
+
+    # An unreadable file is ignored and rewritten
+    path.write_bytes(b'not an npy file')
+    monkeypatch.setattr(zones, '_label_cache', OrderedDict())
+    monkeypatch.setattr(zones, 'rasterize_zones', rasterize)
+    rebuilt, _ = zones.zone_labels(FARM, ZONES, (10, 10))
+    assert np.array_equal(rebuilt, labels)
+    assert np.array_equal(np.load(path), labels)
@@ -0,0 +1,166 @@
+"""
+Liaison Agent - Personalized outreach drafts.
+"""
+
+import time
+import logging
+from typing import Dict, Any, AsyncIterator
+
+from app.deps import LiaisonIn, LiaisonOut
+from tools.llm import get_llm_client, generate_text
+from tools.prompts import get_prompt_store
+from tools.run_logger import log_agent_run
+from tools.streaming import parse_sections, stream_sections
+
+logger = logging.getLogger(__name__)
+
+
+# Response headings -> LiaisonOut fields
+LIAISON_SECTIONS = {
+    "email": "email",
+    "linkedin comment": "linkedin_comment",
+    "twitter reply": "twitter_reply",
+    "dm": "dm_draft",
+}
+
+FALLBACK_SYSTEM_PROMPT = """You are Liaison, a warm but concise relationship builder.
+            Draft personalized outreach that leads with the recipient's interests,
+            uses the given hooks, and asks for one small next step. No hard sell."""
+
+
+class LiaisonAgent:
+    """
+    Agent responsible for personalized outreach drafts (emails, DMs, comments).
+
+    Like Scribe, instances are long-lived (see agents.registry).
+    """
+
+    def __init__(self):
+        self.prompts = get_prompt_store()
+
+    @property
+    def llm_client(self):
+        """The process-wide LLM client (created once by tools.llm)."""
+        return get_llm_client()
+
+    @property
+    def system_prompt(self) -> str:
+        """The current Liaison system prompt."""
+        return self.prompts.get("liaison.system", default=FALLBACK_SYSTEM_PROMPT)
+
+    async def run(self, payload: LiaisonIn, db=None) -> LiaisonOut:
+        """Run the Liaison agent to draft outreach."""
+        start_time = time.perf_counter()
+        logger.info(f"Liaison agent started for target: {payload.target_profile}")
+
+        if not self.llm_client:
+            content = self._generate_with_template(payload)
+        else:
+            try:
+                text = await generate_text(self._prepare_prompt(payload))
+                content = self._build_output(payload, parse_sections(text, LIAISON_SECTIONS))
+            except Exception as e:
+                logger.error(f"Liaison generation failed: {e}")
+                content = self._generate_with_template(payload)
+
+        if db:
+            self._log_run(payload, content, (time.perf_counter() - start_time) * 1000)
+        return content
+
+    async def stream(self, payload: LiaisonIn) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Run the Liaison agent, yielding "token", "section" and "done" events.
+
+        See ScribeAgent.stream for the event format.
+        """
+        logger.info(f"Liaison stream started for target: {payload.target_profile}")
+
+        if not self.llm_client:
+            content = self._generate_with_template(payload)
+            for name in LIAISON_SECTIONS.values():
+                yield {"event": "section", "data": {"name": name, "value": getattr(content, name)}}
+            yield {"event": "done", "data": content.dict()}
+            return
+
+        sections = {}
+        async for kind, value in stream_sections(self._prepare_prompt(payload), LIAISON_SECTIONS):
+            if kind == "token":
+                yield {"event": "token", "data": {"text": value}}
+            else:
+                name, text = value
+                sections[name] = text
+                yield {"event": "section", "data": {"name": name, "value": text}}
+
+        yield {"event": "done", "data": self._build_output(payload, sections).dict()}
+
+    def _prepare_prompt(self, payload: LiaisonIn) -> str:
+        """Prepare the prompt for LLM generation."""
+        return f"""
+{self.system_prompt}
+
+Target: {payload.target_profile}
+Goal: {payload.campaign_goal}
+Hooks: {'; '.join(payload.hooks)}
+Primary platform: {payload.platform.value}
+
+Write each draft under its own heading, exactly as below:
+### Email
+A short email with a subject line
+### LinkedIn Comment
+One comment on the target's recent post
+### Twitter Reply
+One reply under 280 characters
+### DM
+A direct message opening the conversation
+"""
+
+    def _build_output(self, payload: LiaisonIn, sections: Dict[str, str]) -> LiaisonOut:
+        """LiaisonOut from parsed LLM sections, or the template when nothing parsed."""
+        if not any(sections.values()):
+            logger.warning("LLM response had no outreach sections, using template")
+            return self._generate_with_template(payload)
+
+        return LiaisonOut(
+            **{name: sections.get(name) or None for name in LIAISON_SECTIONS.values()},
+            metadata={
+                "generation_method": "llm",
+                "platform": payload.platform.value,
+                "target_profile": payload.target_profile
+            }
+        )
+
+    def _generate_with_template(self, payload: LiaisonIn) -> LiaisonOut:
+        """Generate drafts using templates (fallback method)."""
+        hooks = "; ".join(payload.hooks)
+        return LiaisonOut(
+            email=f"Subject: Exploring {payload.campaign_goal}\n\nHello {payload.target_profile}, quick note on synergies: {hooks}",
+            linkedin_comment="Great point. Here's a buyer-side implication worth exploring.",
+            twitter_reply="DMs open to share pilot data.",
+            dm_draft=f"Hi {payload.target_profile}, I'd value 15 minutes to compare notes on {payload.campaign_goal}.",
+            metadata={
+                "generation_method": "template",
+                "platform": payload.platform.value,
+                "target_profile": payload.target_profile
+            }
+        )
+
+    def _log_run(self, payload: LiaisonIn, content: LiaisonOut, execution_time_ms: float) -> None:
+        """Queue the agent run for the write-behind run log."""
+        try:
+            log_agent_run("liaison", payload.dict(), content.dict(), execution_time_ms=execution_time_ms)
+        except Exception as e:
+            logger.warning(f"Failed to log agent run: {e}")
+
+
+# Convenience functions for direct usage
+async def run(payload: LiaisonIn, db=None) -> LiaisonOut:
+    """Run the Liaison agent (reusing this process's instance)."""
+    from agents.registry import get_agent
+    return await get_agent("liaison").run(payload, db)
+
+
+async def stream(payload: LiaisonIn) -> AsyncIterator[Dict[str, Any]]:
+    """Stream Liaison events (reusing this process's instance)."""
+    from agents.registry import get_agent
+    async for event in get_agent("liaison").stream(payload):
+        yield event
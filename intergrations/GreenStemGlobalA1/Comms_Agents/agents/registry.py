@@ -0,0 +1,71 @@
+"""
+Per-process agent registry.
+
+Agents are built once per worker process and reused by every task it runs.
+The registry remembers the pid it was filled in, so a forked celery child
+never reuses agents (and their clients) created in the parent.
+"""
+
+import os
+import logging
+import threading
+from importlib import import_module
+from typing import Any, Dict
+
+from tools.prompts import get_prompt_store
+
+logger = logging.getLogger(__name__)
+
+# Agent name -> "module:class"
+AGENT_CLASSES = {
+    "scribe": "agents.scribe:ScribeAgent",
+    "liaison": "agents.liaison:LiaisonAgent",
+}
+
+_agents: Dict[str, Any] = {}
+_agents_pid = os.getpid()
+_lock = threading.Lock()
+
+
+def get_agent(name: str):
+    """
+    Long-lived agent instance for this process.
+
+    Args:
+        name: Agent name, e.g. "scribe"
+
+    Returns:
+        The agent, created on first use
+    """
+    global _agents_pid
+
+    agent = _agents.get(name)
+    if agent is not None and _agents_pid == os.getpid():
+        return agent
+
+    with _lock:
+        if _agents_pid != os.getpid():
+            _agents.clear()
+            _agents_pid = os.getpid()
+        agent = _agents.get(name)
+        if agent is None:
+            if name not in AGENT_CLASSES:
+                raise KeyError(f"Unknown agent: {name}")
+            module_name, class_name = AGENT_CLASSES[name].split(":")
+            agent = getattr(import_module(module_name), class_name)()
+            _agents[name] = agent
+            logger.info(f"Created {name} agent for process {_agents_pid}")
+        return agent
+
+
+def warm_up(*names: str):
+    """Create agents and preload prompt templates, e.g. from a worker init hook."""
+    get_prompt_store().preload()
+    for name in names or AGENT_CLASSES:
+        get_agent(name)
+
+
+def reset_agents():
+    """Drop all cached agents (useful for testing)."""
+    with _lock:
+        _agents.clear()
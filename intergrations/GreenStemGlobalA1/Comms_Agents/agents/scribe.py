@@ -3,38 +3,61 @@ Scribe Agent - Content drafting and creation.
 """
 
 import os
+import time
+import asyncio
 import logging
-from typing import Dict, Any, List
-from pathlib import Path
+from itertools import product
+from typing import Dict, Any, AsyncIterator, List
 
-from app.deps import ScribeIn, ScribeOut
-from app.database import get_db_context
+from app.deps import ScribeIn, ScribeOut, ScribeBatchIn, ScribeBatchOut, ScribeVariant
 from tools.retriever import retrieve_context
-from tools.llm import get_llm_client
+from tools.llm import get_llm_client, count_tokens, generate_text
+from tools.prompts import get_prompt_store
+from tools.run_logger import log_agent_run
+from tools.streaming import parse_sections, split_items, stream_sections
 
 logger = logging.getLogger(__name__)
 
+# Variants generated at once by run_batch
+SCRIBE_BATCH_CONCURRENCY = int(os.getenv("SCRIBE_BATCH_CONCURRENCY", "4"))
+
+# Response headings -> ScribeOut fields
+SCRIBE_SECTIONS = {
+    "linkedin post": "linkedin_post",
+    "x thread": "x_thread",
+    "comments": "comments_pack",
+    "citations": "citations",
+}
+
+FALLBACK_SYSTEM_PROMPT = """You are Scribe, a boardroom-poetic strategist with skeptical edge and quick wit. 
+            Forward-looking, no fluff, cite sources. Output LinkedIn + X + 3 smart comments. 
+            Avoid promises; propose pilots."""
+
 
 class ScribeAgent:
-    """Agent responsible for drafting content across different platforms."""
+    """
+    Agent responsible for drafting content across different platforms.
+    
+    Instances are long-lived (see agents.registry): the system prompt comes
+    from the shared prompt store, which reloads it when the file changes.
+    """
     
     def __init__(self):
-        self.llm_client = get_llm_client()
-        self.system_prompt = self._load_system_prompt()
-    
-    def _load_system_prompt(self) -> str:
-        """Load the system prompt for the Scribe agent."""
-        prompt_path = Path("prompts/scribe.system.md")
-        if prompt_path.exists():
-            return prompt_path.read_text(encoding="utf-8")
-        else:
-            # Fallback prompt
-            return """You are Scribe, a boardroom-poetic strategist with skeptical edge and quick wit. 
-            Forward-looking, no fluff, cite sources. Output LinkedIn + X + 3 smart comments. 
-            Avoid promises; propose pilots."""
+        self.prompts = get_prompt_store()
+    
+    @property
+    def llm_client(self):
+        """The process-wide LLM client (created once by tools.llm)."""
+        return get_llm_client()
+    
+    @property
+    def system_prompt(self) -> str:
+        """The current Scribe system prompt."""
+        return self.prompts.get("scribe.system", default=FALLBACK_SYSTEM_PROMPT)
     
     async def run(self, payload: ScribeIn, db=None) -> ScribeOut:
         """Run the Scribe agent to create content."""
+        start_time = time.perf_counter()
         try:
             logger.info(f"Scribe agent started for issue: {payload.issue_card_path}")
             
@@ -46,7 +69,7 @@ class ScribeAgent:
             
             # Log the agent run
             if db:
-                await self._log_run(payload, content, db)
+                self._log_run(payload, content, (time.perf_counter() - start_time) * 1000)
             
             logger.info(f"Scribe agent completed successfully")
             return content
@@ -55,21 +78,145 @@ class ScribeAgent:
             logger.error(f"Scribe agent failed: {e}")
             raise
     
+    async def stream(self, payload: ScribeIn) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Run the Scribe agent, yielding events while the content is generated.
+        
+        Events are dicts with "event" and "data": "token" ({"text"}) for each
+        text delta, "section" ({"name", "value"}) as soon as a ScribeOut field
+        is complete, and finally "done" with the full ScribeOut.
+        
+        Args:
+            payload: Same input as run()
+        """
+        logger.info(f"Scribe stream started for issue: {payload.issue_card_path}")
+        context = await self._retrieve_context(payload.issue_card_path)
+        
+        if not self.llm_client:
+            content = self._generate_with_template(payload, context)
+            for name in SCRIBE_SECTIONS.values():
+                yield {"event": "section", "data": {"name": name, "value": getattr(content, name)}}
+            yield {"event": "done", "data": content.dict()}
+            return
+        
+        sections = {}
+        prompt = self._prepare_prompt(payload, context)
+        async for kind, value in stream_sections(prompt, SCRIBE_SECTIONS):
+            if kind == "token":
+                yield {"event": "token", "data": {"text": value}}
+            else:
+                name, text = value
+                sections[name] = text
+                yield {"event": "section", "data": {"name": name, "value": self._section_value(name, text)}}
+        
+        yield {"event": "done", "data": self._build_output(payload, context, sections).dict()}
+    
+    async def run_batch(self, payload: ScribeBatchIn, db=None) -> ScribeBatchOut:
+        """
+        Run the Scribe agent for every audience x tone combination of one card.
+        
+        The issue card is read and enhanced once; variants are then generated
+        concurrently (at most SCRIBE_BATCH_CONCURRENCY at a time) from that
+        shared context. A failed variant is reported with its error instead of
+        failing the whole batch.
+        
+        Args:
+            payload: Issue card plus the audiences and tones to cover
+            db: Database session for logging each variant (optional)
+            
+        Returns:
+            One variant per combination, in audience-major order, with
+            per-variant latency and token counts
+        """
+        start_time = time.perf_counter()
+        combinations = list(product(dict.fromkeys(payload.audiences), dict.fromkeys(payload.tones)))
+        logger.info(f"Scribe batch started for issue: {payload.issue_card_path} ({len(combinations)} variants)")
+        
+        context = await self._retrieve_context(payload.issue_card_path)
+        semaphore = asyncio.Semaphore(SCRIBE_BATCH_CONCURRENCY)
+        
+        async def generate(audience, tone) -> ScribeVariant:
+            variant_payload = ScribeIn(
+                issue_card_path=payload.issue_card_path,
+                audience=audience,
+                tone=tone,
+                campaign_id=payload.campaign_id,
+                metadata=payload.metadata,
+            )
+            async with semaphore:
+                return await self._run_variant(variant_payload, context, db)
+        
+        variants = await asyncio.gather(*(generate(audience, tone) for audience, tone in combinations))
+        
+        failed = sum(1 for variant in variants if variant.error)
+        if failed:
+            logger.warning(f"Scribe batch had {failed} failed variants")
+        logger.info(f"Scribe batch completed: {len(variants) - failed}/{len(variants)} variants")
+        
+        return ScribeBatchOut(
+            issue_card_path=payload.issue_card_path,
+            variants=variants,
+            total_latency_ms=round((time.perf_counter() - start_time) * 1000, 2),
+            prompt_tokens=sum(variant.prompt_tokens for variant in variants),
+            completion_tokens=sum(variant.completion_tokens for variant in variants),
+            metadata={"title": context.get("title"), "failed_variants": failed},
+        )
+    
+    async def _run_variant(self, payload: ScribeIn, context: Dict[str, Any], db=None) -> ScribeVariant:
+        """
+        Generate one batch variant from already-retrieved context.
+        
+        With an LLM client configured, a template fallback (the provider
+        call or parsing failed) counts as a failed variant.
+        """
+        start_time = time.perf_counter()
+        try:
+            content = await self._generate_content(payload, context)
+            if self.llm_client and content.metadata.get("generation_method") == "template":
+                raise RuntimeError("LLM generation failed, template fallback discarded")
+        except Exception as e:
+            logger.error(f"Scribe variant {payload.audience.value}/{payload.tone.value} failed: {e}")
+            return ScribeVariant(
+                audience=payload.audience,
+                tone=payload.tone,
+                latency_ms=round((time.perf_counter() - start_time) * 1000, 2),
+                error=str(e),
+            )
+        latency_ms = round((time.perf_counter() - start_time) * 1000, 2)
+        
+        # Template output costs no tokens; only count what an LLM produced
+        prompt_tokens = completion_tokens = 0
+        if content.metadata.get("generation_method") != "template":
+            prompt_tokens = count_tokens(self._prepare_prompt(payload, context))
+            completion_tokens = count_tokens(
+                "\n".join([content.linkedin_post, *content.x_thread, *content.comments_pack])
+            )
+        
+        if db:
+            self._log_run(payload, content, latency_ms)
+        
+        return ScribeVariant(
+            audience=payload.audience,
+            tone=payload.tone,
+            output=content,
+            latency_ms=latency_ms,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+        )
+    
     async def _retrieve_context(self, issue_card_path: str) -> Dict[str, Any]:
         """Retrieve context from issue card and knowledge base."""
+        # Get issue card content (cached per card until the file changes)
+        context = retrieve_context(issue_card_path)
+        
         try:
-            # Get issue card content
-            context = retrieve_context(issue_card_path)
-            
             # Enhance with knowledge base search
-            enhanced_context = await self._enhance_with_knowledge(context)
-            
-            return enhanced_context
+            return await self._enhance_with_knowledge(context)
             
         except Exception as e:
             logger.error(f"Failed to retrieve context: {e}")
             # Return basic context if enhancement fails
-            return retrieve_context(issue_card_path)
+            return context
     
     async def _enhance_with_knowledge(self, context: Dict[str, Any]) -> Dict[str, Any]:
         """Enhance context with knowledge base search."""
@@ -89,7 +236,7 @@ class ScribeAgent:
             
             # Generate content using LLM
             if self.llm_client:
-                content = await self._generate_with_llm(prompt, payload)
+                content = await self._generate_with_llm(prompt, payload, context)
             else:
                 # Fallback to template-based generation
                 content = self._generate_with_template(payload, context)
@@ -113,27 +260,54 @@ Sources: {', '.join(context.get('links', []))}
 Audience: {payload.audience.value}
 Tone: {payload.tone.value}
 
-Generate:
-1. A LinkedIn post (professional, engaging, with call-to-action)
-2. An X (Twitter) thread (2-3 tweets, engaging, shareable)
-3. Three thoughtful comment variations for engagement
-4. Proper citations and source attribution
+Write each part under its own heading, exactly as below:
+### LinkedIn Post
+A LinkedIn post (professional, engaging, with call-to-action)
+### X Thread
+An X (Twitter) thread of 2-3 engaging, shareable tweets, one per line
+### Comments
+Three thoughtful comment variations for engagement, one per line
+### Citations
+Source links, one per line
 
 Focus on actionable insights and avoid making promises or guarantees.
 """
         return prompt
     
-    async def _generate_with_llm(self, prompt: str, payload: ScribeIn) -> ScribeOut:
+    async def _generate_with_llm(self, prompt: str, payload: ScribeIn, context: Dict[str, Any]) -> ScribeOut:
         """Generate content using LLM."""
         try:
-            # This would integrate with your LLM provider
-            # For now, return a placeholder
-            logger.info("LLM generation requested (not implemented)")
-            return self._generate_with_template(payload, {})
+            text = await generate_text(prompt)
+            return self._build_output(payload, context, parse_sections(text, SCRIBE_SECTIONS))
             
         except Exception as e:
             logger.error(f"LLM generation failed: {e}")
-            return self._generate_with_template(payload, {})
+            return self._generate_with_template(payload, context)
+    
+    @staticmethod
+    def _section_value(name: str, text: str):
+        """ScribeOut value for a parsed section: lists for everything but the post."""
+        return text if name == "linkedin_post" else split_items(text)
+    
+    def _build_output(self, payload: ScribeIn, context: Dict[str, Any], sections: Dict[str, str]) -> ScribeOut:
+        """ScribeOut from parsed LLM sections, or the template when the post is missing."""
+        if not sections.get("linkedin_post"):
+            logger.warning("LLM response had no LinkedIn post section, using template")
+            return self._generate_with_template(payload, context)
+        
+        values = {name: self._section_value(name, sections.get(name, "")) for name in SCRIBE_SECTIONS.values()}
+        return ScribeOut(
+            linkedin_post=values["linkedin_post"],
+            x_thread=values["x_thread"],
+            comments_pack=values["comments_pack"],
+            citations=values["citations"] or context.get('links', []),
+            metadata={
+                "generation_method": "llm",
+                "audience": payload.audience.value,
+                "tone": payload.tone.value,
+                "issue_card": payload.issue_card_path
+            }
+        )
     
     def _generate_with_template(self, payload: ScribeIn, context: Dict[str, Any]) -> ScribeOut:
         """Generate content using templates (fallback method)."""
@@ -182,33 +356,36 @@ Sources: {', '.join(links) if links else 'Available upon request'}"""
             }
         )
     
-    async def _log_run(self, payload: ScribeIn, content: ScribeOut, db) -> None:
-        """Log the agent run to database."""
+    def _log_run(self, payload: ScribeIn, content: ScribeOut, execution_time_ms: float) -> None:
+        """Queue the agent run for the write-behind run log."""
         try:
-            from app.crud.agent_runs import create_agent_run
-            
-            await create_agent_run(
-                db,
-                "scribe",
-                payload.dict(),
-                content.dict()
-            )
-            
+            log_agent_run("scribe", payload.dict(), content.dict(), execution_time_ms=execution_time_ms)
         except Exception as e:
             logger.warning(f"Failed to log agent run: {e}")
 
 
 # Convenience function for direct usage
 async def run(payload: ScribeIn, db=None) -> ScribeOut:
-    """Run the Scribe agent."""
-    agent = ScribeAgent()
-    return await agent.run(payload, db)
+    """Run the Scribe agent (reusing this process's instance)."""
+    from agents.registry import get_agent
+    return await get_agent("scribe").run(payload, db)
+
+
+async def stream(payload: ScribeIn) -> AsyncIterator[Dict[str, Any]]:
+    """Stream Scribe events (reusing this process's instance)."""
+    from agents.registry import get_agent
+    async for event in get_agent("scribe").stream(payload):
+        yield event
+
+
+async def run_batch(payload: ScribeBatchIn, db=None) -> ScribeBatchOut:
+    """Run the Scribe agent across audiences and tones (reusing this process's instance)."""
+    from agents.registry import get_agent
+    return await get_agent("scribe").run_batch(payload, db)
 
 
 if __name__ == "__main__":
     # Test the agent
-    import asyncio
-    
     async def test():
         payload = ScribeIn(
             issue_card_path="issue_cards/eudr_smallholders.md",
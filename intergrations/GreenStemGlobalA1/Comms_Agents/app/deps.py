@@ -69,6 +69,15 @@ class ScribeIn(BaseModel):
     metadata: Optional[Dict[str, Any]] = Field(default_factory=dict, description="Additional metadata")
 
 
+class ScribeBatchIn(BaseModel):
+    """Input for a Scribe run over several audience/tone combinations of one issue card."""
+    issue_card_path: str = Field(..., description="Path to issue card file")
+    audiences: List[Audience] = Field(default_factory=lambda: list(Audience), description="Target audiences (default: all)")
+    tones: List[Tone] = Field(default_factory=lambda: list(Tone), description="Content tones (default: all)")
+    campaign_id: Optional[UUID] = Field(None, description="Associated campaign ID")
+    metadata: Optional[Dict[str, Any]] = Field(default_factory=dict, description="Additional metadata")
+
+
 class SignalIn(BaseModel):
     """Input for Signal agent."""
     focus_regions: Optional[List[str]] = Field(None, description="Geographic regions to focus on")
@@ -129,6 +138,27 @@ class ScribeOut(BaseModel):
     metadata: Optional[Dict[str, Any]] = Field(default_factory=dict, description="Additional metadata")
 
 
+class ScribeVariant(BaseModel):
+    """One audience/tone output of a batch Scribe run."""
+    audience: Audience = Field(..., description="Target audience")
+    tone: Tone = Field(..., description="Content tone and style")
+    output: Optional[ScribeOut] = Field(None, description="Generated content (None if the variant failed)")
+    latency_ms: float = Field(..., description="Generation time for this variant")
+    prompt_tokens: int = Field(0, description="Prompt tokens")
+    completion_tokens: int = Field(0, description="Completion tokens")
+    error: Optional[str] = Field(None, description="Error message if the variant failed")
+
+
+class ScribeBatchOut(BaseModel):
+    """Output from a batch Scribe run."""
+    issue_card_path: str = Field(..., description="Path to issue card file")
+    variants: List[ScribeVariant] = Field(..., description="One entry per audience/tone combination")
+    total_latency_ms: float = Field(..., description="Wall-clock time for the whole batch")
+    prompt_tokens: int = Field(0, description="Prompt tokens across variants")
+    completion_tokens: int = Field(0, description="Completion tokens across variants")
+    metadata: Optional[Dict[str, Any]] = Field(default_factory=dict, description="Additional metadata")
+
+
 class SignalOut(BaseModel):
     """Output from Signal agent."""
     pulse_digest: str = Field(..., description="Summary of current events")
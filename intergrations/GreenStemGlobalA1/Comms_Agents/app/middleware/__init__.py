@@ -4,12 +4,14 @@ Middleware package for Comms Agents Switchboard.
 
 from .logging import LoggingMiddleware
 from .metrics import MetricsMiddleware
+from .observability import ObservabilityMiddleware
 from .auth import AuthMiddleware
 from .cors import CORSMiddleware
 
 __all__ = [
     "LoggingMiddleware",
     "MetricsMiddleware",
+    "ObservabilityMiddleware",
     "AuthMiddleware",
     "CORSMiddleware",
 ]
@@ -1,115 +1,145 @@
 """
 Logging middleware for Comms Agents Switchboard.
+
+Every request gets one response log line. The verbose request record
+(query parameters, filtered headers, client) is only built for a sampled
+fraction of requests and for server errors, so headers are not copied on
+the hot path.
 """
 
+import os
 import time
+import random
 import logging
-import json
-from typing import Callable
-from fastapi import Request, Response
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.types import ASGIApp
+from typing import Optional
+from urllib.parse import parse_qsl
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
 logger = logging.getLogger(__name__)
 
+REQUEST_LOG_SAMPLE_RATE = float(os.getenv("REQUEST_LOG_SAMPLE_RATE", "0.01"))
+SLOW_REQUEST_SECONDS = float(os.getenv("SLOW_REQUEST_SECONDS", "1.0"))
 
-class LoggingMiddleware(BaseHTTPMiddleware):
-    """Middleware for logging HTTP requests and responses."""
-    
-    def __init__(self, app: ASGIApp):
-        super().__init__(app)
-    
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
-        """Process request and log details."""
-        start_time = time.time()
-        
-        # Log request
-        await self._log_request(request)
-        
-        # Process request
-        try:
-            response = await call_next(request)
-            process_time = time.time() - start_time
-            
-            # Log response
-            await self._log_response(request, response, process_time)
-            
-            return response
-            
-        except Exception as e:
-            process_time = time.time() - start_time
-            logger.error(
-                f"Request failed: {request.method} {request.url.path} - "
-                f"Error: {str(e)} - Duration: {process_time:.3f}s"
-            )
-            raise
-    
-    async def _log_request(self, request: Request):
-        """Log incoming request details."""
-        # Extract request information
-        method = request.method
-        url = str(request.url)
-        path = request.url.path
-        query_params = dict(request.query_params)
-        headers = dict(request.headers)
-        
-        # Filter sensitive headers
-        sensitive_headers = {"authorization", "cookie", "x-api-key"}
-        filtered_headers = {
-            k: v for k, v in headers.items() 
-            if k.lower() not in sensitive_headers
+SENSITIVE_HEADERS = frozenset({b"authorization", b"cookie", b"x-api-key"})
+
+
+def should_sample(rate: float) -> bool:
+    """Decide whether this request gets a verbose log record."""
+    return rate >= 1.0 or (rate > 0.0 and random.random() < rate)
+
+
+def _status_level(status_code: int) -> int:
+    if status_code >= 500:
+        return logging.ERROR
+    if status_code >= 400:
+        return logging.WARNING
+    return logging.INFO
+
+
+def log_request_details(scope: Scope, level: int = logging.INFO):
+    """Log the verbose request record; only called for sampled requests."""
+    if not logger.isEnabledFor(level):
+        return
+    headers = {}
+    user_agent = None
+    for name, value in scope["headers"]:
+        if name == b"user-agent":
+            user_agent = value.decode("latin-1")
+        if name not in SENSITIVE_HEADERS:
+            headers[name.decode("latin-1")] = value.decode("latin-1")
+    client = scope.get("client")
+    query_string = scope.get("query_string", b"").decode("latin-1")
+    logger.log(
+        level,
+        f"Request: {scope['method']} {scope['path']}",
+        extra={
+            "request_method": scope["method"],
+            "request_path": scope["path"],
+            "query_params": dict(parse_qsl(query_string)),
+            "headers": headers,
+            "client_ip": client[0] if client else None,
+            "user_agent": user_agent,
         }
-        
-        # Log request
-        logger.info(
-            f"Request: {method} {path}",
+    )
+
+
+def log_response(scope: Scope, status_code: int, process_time: float,
+                 response_size: Optional[int], verbose: bool = False):
+    """Log a finished request, plus the verbose record when sampled or failed."""
+    method = scope["method"]
+    path = scope["path"]
+    log_level = _status_level(status_code)
+
+    if verbose or status_code >= 500:
+        log_request_details(scope, log_level)
+
+    if logger.isEnabledFor(log_level):
+        logger.log(
+            log_level,
+            f"Response: {method} {path} - Status: {status_code} - Duration: {process_time:.3f}s",
             extra={
                 "request_method": method,
-                "request_url": url,
                 "request_path": path,
-                "query_params": query_params,
-                "headers": filtered_headers,
-                "client_ip": request.client.host if request.client else None,
-                "user_agent": request.headers.get("user-agent"),
+                "response_status": status_code,
+                "response_time": process_time,
+                "response_size": response_size,
             }
         )
-    
-    async def _log_response(self, request: Request, response: Response, process_time: float):
-        """Log response details."""
-        method = request.method
-        path = request.url.path
-        status_code = response.status_code
-        
-        # Determine log level based on status code
-        if status_code >= 500:
-            log_level = logging.ERROR
-        elif status_code >= 400:
-            log_level = logging.WARNING
-        else:
-            log_level = logging.INFO
-        
-        # Log response
-        logger.log(
-            log_level,
-            f"Response: {method} {path} - Status: {status_code} - Duration: {process_time:.3f}s",
+
+    # Log slow requests
+    if process_time > SLOW_REQUEST_SECONDS:
+        logger.warning(
+            f"Slow request: {method} {path} took {process_time:.3f}s",
             extra={
                 "request_method": method,
                 "request_path": path,
-                "response_status": status_code,
                 "response_time": process_time,
-                "response_size": len(response.body) if hasattr(response, 'body') else 0,
+                "threshold": SLOW_REQUEST_SECONDS,
             }
         )
-        
-        # Log slow requests
-        if process_time > 1.0:  # Log requests taking more than 1 second
-            logger.warning(
-                f"Slow request: {method} {path} took {process_time:.3f}s",
-                extra={
-                    "request_method": method,
-                    "request_path": path,
-                    "response_time": process_time,
-                    "threshold": 1.0,
-                }
-            )
 
+
+def log_failure(scope: Scope, error: BaseException, process_time: float):
+    """Log a request that raised before completing."""
+    logger.error(
+        f"Request failed: {scope['method']} {scope['path']} - "
+        f"Error: {str(error)} - Duration: {process_time:.3f}s"
+    )
+    log_request_details(scope, logging.ERROR)
+
+
+class LoggingMiddleware:
+    """ASGI middleware for logging HTTP requests and responses."""
+
+    def __init__(self, app: ASGIApp, sample_rate: float = REQUEST_LOG_SAMPLE_RATE):
+        self.app = app
+        self.sample_rate = sample_rate
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start_time = time.perf_counter()
+        status_code = 500
+        response_size = 0
+
+        async def send_wrapper(message: Message):
+            nonlocal status_code, response_size
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            elif message["type"] == "http.response.body":
+                response_size += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception as e:
+            log_failure(scope, e, time.perf_counter() - start_time)
+            raise
+
+        log_response(
+            scope, status_code, time.perf_counter() - start_time, response_size,
+            verbose=should_sample(self.sample_rate),
+        )
@@ -1,138 +1,291 @@
 """
 Metrics middleware for Prometheus monitoring in Comms Agents Switchboard.
+
+Requests are labelled by route template ("/agents/{agent_id}"), never by
+raw path, so label cardinality stays bounded. Latency and payload sizes
+are recorded in fixed-bucket histograms. Metrics are only updated from the
+event loop thread, so plain dict and list updates need no locks.
 """
 
 import time
 import logging
-from typing import Callable
-from fastapi import Request, Response
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.types import ASGIApp
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from fastapi import APIRouter, Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from tools.llm_cache import get_cache_stats
 
 logger = logging.getLogger(__name__)
 
-# Simple in-memory metrics (in production, use proper Prometheus client)
-_metrics = {
-    "http_requests_total": {},
-    "http_request_duration_seconds": {},
-    "http_request_size_bytes": {},
-    "http_response_size_bytes": {},
-    "http_requests_in_progress": 0,
-}
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Prometheus client defaults, in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 7.5, 10.0)
+SIZE_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+
+# Requests that matched no route share one label value
+UNMATCHED_ROUTE = "<unmatched>"
+KNOWN_METHODS = frozenset({"GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"})
+
+Labels = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Labels, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Counter:
+    """Monotonic counter per label set."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values: Dict[Labels, float] = {}
+
+    def inc(self, labels: Labels = (), amount: float = 1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def reset(self):
+        self.values = {}
+
+    def expose(self) -> Iterable[str]:
+        for labels, value in self.values.items():
+            yield f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+
+
+class Gauge(Counter):
+    """Value that can go up and down."""
+
+    kind = "gauge"
+
+    def dec(self, labels: Labels = (), amount: float = 1):
+        self.values[labels] = self.values.get(labels, 0) - amount
+
+    def expose(self) -> Iterable[str]:
+        if not self.values and not self.labelnames:
+            yield f"{self.name} 0"
+        yield from super().expose()
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram per label set.
+
+    Each series is a list of per-bucket counts (the last slot is +Inf)
+    followed by the running sum; buckets are made cumulative on exposition.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self.series: Dict[Labels, List[float]] = {}
+
+    def observe(self, labels: Labels, value: float):
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        # bisect_left puts a value equal to a bound in that bucket (le semantics)
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def reset(self):
+        self.series = {}
+
+    def snapshot(self, labels: Labels) -> Optional[Dict[str, Any]]:
+        """Cumulative bucket counts, count and sum for one label set."""
+        series = self.series.get(labels)
+        if series is None:
+            return None
+        cumulative, total = [], 0
+        for count in series[:-1]:
+            total += count
+            cumulative.append(total)
+        bounds = [*self.buckets, float("inf")]
+        return {"buckets": dict(zip(bounds, cumulative)), "count": total, "sum": series[-1]}
+
+    def expose(self) -> Iterable[str]:
+        for labels in list(self.series):
+            snapshot = self.snapshot(labels)
+            for bound, count in snapshot["buckets"].items():
+                le = "+Inf" if bound == float("inf") else _format_value(bound)
+                bucket_labels = _format_labels(self.labelnames, labels, f'le="{le}"')
+                yield f"{self.name}_bucket{bucket_labels} {count}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, labels)} {snapshot['count']}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(snapshot['sum'])}"
 
 
-class MetricsMiddleware(BaseHTTPMiddleware):
-    """Middleware for collecting Prometheus metrics."""
-    
+class Registry:
+    """Metrics and collector callbacks rendered together for scraping."""
+
+    def __init__(self):
+        self.metrics: List[Any] = []
+        self.collectors: List[Callable[[], Iterable[str]]] = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def register_collector(self, collector: Callable[[], Iterable[str]]):
+        self.collectors.append(collector)
+        return collector
+
+    def reset(self):
+        for metric in self.metrics:
+            metric.reset()
+
+    def expose(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.expose())
+        for collector in self.collectors:
+            try:
+                lines.extend(collector())
+            except Exception as e:
+                logger.warning(f"Metrics collector {collector.__name__} failed: {e}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+HTTP_REQUESTS = REGISTRY.register(Counter(
+    "http_requests_total", "HTTP requests by method, route and status", ("method", "route", "status")))
+HTTP_REQUEST_DURATION = REGISTRY.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency", ("method", "route"), LATENCY_BUCKETS))
+HTTP_REQUEST_SIZE = REGISTRY.register(Histogram(
+    "http_request_size_bytes", "HTTP request body size from Content-Length", ("method", "route"), SIZE_BUCKETS))
+HTTP_RESPONSE_SIZE = REGISTRY.register(Histogram(
+    "http_response_size_bytes", "HTTP response body size", ("method", "route"), SIZE_BUCKETS))
+HTTP_REQUESTS_IN_PROGRESS = REGISTRY.register(Gauge(
+    "http_requests_in_progress", "HTTP requests currently being served"))
+
+
+@REGISTRY.register_collector
+def _llm_cache_metrics() -> Iterable[str]:
+    for name, value in get_cache_stats().items():
+        yield f"# TYPE llm_cache_{name}_total counter"
+        yield f"llm_cache_{name}_total {value}"
+
+
+def route_template(scope: Scope) -> str:
+    """Route path template of a handled request (set by the router), or UNMATCHED_ROUTE."""
+    route = scope.get("route")
+    if route is None:
+        return UNMATCHED_ROUTE
+    return getattr(route, "path_format", None) or getattr(route, "path", UNMATCHED_ROUTE)
+
+
+def content_length(headers: Iterable[Tuple[bytes, bytes]]) -> Optional[int]:
+    """Content-Length from raw ASGI headers, if present and valid."""
+    for name, value in headers:
+        if name == b"content-length":
+            try:
+                return int(value)
+            except ValueError:
+                return None
+    return None
+
+
+def record_request(method: str, route: str, status: int, duration: float,
+                   request_size: Optional[int], response_size: Optional[int]):
+    """Record one finished request."""
+    if method not in KNOWN_METHODS:
+        method = "OTHER"
+    labels = (method, route)
+    HTTP_REQUESTS.inc((method, route, str(status)))
+    HTTP_REQUEST_DURATION.observe(labels, duration)
+    if request_size is not None:
+        HTTP_REQUEST_SIZE.observe(labels, request_size)
+    if response_size is not None:
+        HTTP_RESPONSE_SIZE.observe(labels, response_size)
+
+
+class MetricsMiddleware:
+    """ASGI middleware collecting Prometheus metrics."""
+
     def __init__(self, app: ASGIApp):
-        super().__init__(app)
-    
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
-        """Process request and collect metrics."""
-        start_time = time.time()
-        
-        # Increment requests in progress
-        _metrics["http_requests_in_progress"] += 1
-        
-        # Extract request information
-        method = request.method
-        path = request.url.path
-        status_code = 500  # Default to error
-        
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start_time = time.perf_counter()
+        status_code = 500  # Unless a response is started
+        response_size = None
+        streamed_size = 0
+
+        async def send_wrapper(message: Message):
+            nonlocal status_code, response_size, streamed_size
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                response_size = content_length(message.get("headers", ()))
+            elif message["type"] == "http.response.body" and response_size is None:
+                # No Content-Length (streaming): count the bytes sent
+                streamed_size += len(message.get("body", b""))
+            await send(message)
+
+        HTTP_REQUESTS_IN_PROGRESS.inc()
         try:
-            # Process request
-            response = await call_next(request)
-            status_code = response.status_code
-            process_time = time.time() - start_time
-            
-            # Collect metrics
-            self._collect_metrics(method, path, status_code, process_time, request, response)
-            
-            return response
-            
-        except Exception as e:
-            process_time = time.time() - start_time
-            status_code = 500
-            
-            # Collect error metrics
-            self._collect_metrics(method, path, status_code, process_time, request, None)
-            
-            raise
-        
+            await self.app(scope, receive, send_wrapper)
         finally:
-            # Decrement requests in progress
-            _metrics["http_requests_in_progress"] -= 1
-    
-    def _collect_metrics(self, method: str, path: str, status_code: int, 
-                         process_time: float, request: Request, response: Response):
-        """Collect various metrics from the request/response."""
-        # Request count
-        key = f"{method}_{path}_{status_code}"
-        _metrics["http_requests_total"][key] = _metrics["http_requests_total"].get(key, 0) + 1
-        
-        # Request duration
-        _metrics["http_request_duration_seconds"][key] = process_time
-        
-        # Request size (approximate)
-        request_size = len(str(request.url)) + len(str(dict(request.headers)))
-        if hasattr(request, 'body'):
-            try:
-                body = await request.body()
-                request_size += len(body)
-            except:
-                pass
-        
-        _metrics["http_request_size_bytes"][key] = request_size
-        
-        # Response size
-        if response:
-            response_size = len(response.body) if hasattr(response, 'body') else 0
-            _metrics["http_response_size_bytes"][key] = response_size
+            HTTP_REQUESTS_IN_PROGRESS.dec()
+            record_request(
+                scope["method"],
+                route_template(scope),
+                status_code,
+                time.perf_counter() - start_time,
+                content_length(scope["headers"]),
+                response_size if response_size is not None else streamed_size,
+            )
+
+
+# Mount with app.include_router(metrics_router)
+metrics_router = APIRouter()
+
+
+@metrics_router.get("/metrics", include_in_schema=False)
+async def metrics_endpoint() -> Response:
+    """Prometheus exposition endpoint."""
+    return Response(format_prometheus_metrics(), media_type=PROMETHEUS_CONTENT_TYPE)
 
 
 def get_metrics() -> dict:
-    """Get current metrics for Prometheus scraping."""
-    return _metrics
+    """Get current metric values keyed by metric name."""
+    return {
+        metric.name: dict(metric.series if isinstance(metric, Histogram) else metric.values)
+        for metric in REGISTRY.metrics
+    }
 
 
 def format_prometheus_metrics() -> str:
     """Format metrics in Prometheus text format."""
-    lines = []
-    
-    # HTTP requests total
-    for key, value in _metrics["http_requests_total"].items():
-        method, path, status = key.split("_", 2)
-        lines.append(f'http_requests_total{{method="{method}",path="{path}",status="{status}"}} {value}')
-    
-    # HTTP request duration
-    for key, value in _metrics["http_request_duration_seconds"].items():
-        method, path, status = key.split("_", 2)
-        lines.append(f'http_request_duration_seconds{{method="{method}",path="{path}",status="{status}"}} {value}')
-    
-    # HTTP request size
-    for key, value in _metrics["http_request_size_bytes"].items():
-        method, path, status = key.split("_", 2)
-        lines.append(f'http_request_size_bytes{{method="{method}",path="{path}",status="{status}"}} {value}')
-    
-    # HTTP response size
-    for key, value in _metrics["http_response_size_bytes"].items():
-        method, path, status = key.split("_", 2)
-        lines.append(f'http_response_size_bytes{{method="{method}",path="{path}",status="{status}"}} {value}')
-    
-    # HTTP requests in progress
-    lines.append(f'http_requests_in_progress {_metrics["http_requests_in_progress"]}')
-    
-    return "\n".join(lines)
+    return REGISTRY.expose()
 
 
 def reset_metrics():
     """Reset all metrics (useful for testing)."""
-    global _metrics
-    _metrics = {
-        "http_requests_total": {},
-        "http_request_duration_seconds": {},
-        "http_request_size_bytes": {},
-        "http_response_size_bytes": {},
-        "http_requests_in_progress": 0,
-    }
-
+    REGISTRY.reset()
@@ -0,0 +1,72 @@
+"""
+Combined timing, logging and metrics middleware for Comms Agents Switchboard.
+
+One ASGI wrapper and one send hook per request, instead of a middleware
+layer each for logging and metrics.
+"""
+
+import time
+from typing import Optional
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .logging import REQUEST_LOG_SAMPLE_RATE, log_failure, log_response, should_sample
+from .metrics import HTTP_REQUESTS_IN_PROGRESS, content_length, record_request, route_template
+
+
+class ObservabilityMiddleware:
+    """
+    ASGI middleware that logs and records metrics for each HTTP request.
+
+    Args:
+        app: ASGI application
+        sample_rate: Fraction of requests that get a verbose request log
+        enable_logging: Emit request/response logs
+        enable_metrics: Record Prometheus metrics
+    """
+
+    def __init__(self, app: ASGIApp, sample_rate: float = REQUEST_LOG_SAMPLE_RATE,
+                 enable_logging: bool = True, enable_metrics: bool = True):
+        self.app = app
+        self.sample_rate = sample_rate
+        self.enable_logging = enable_logging
+        self.enable_metrics = enable_metrics
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start_time = time.perf_counter()
+        status_code = 500  # Unless a response is started
+        response_size: Optional[int] = None
+        streamed_size = 0
+
+        async def send_wrapper(message: Message):
+            nonlocal status_code, response_size, streamed_size
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                response_size = content_length(message.get("headers", ()))
+            elif message["type"] == "http.response.body" and response_size is None:
+                streamed_size += len(message.get("body", b""))
+            await send(message)
+
+        HTTP_REQUESTS_IN_PROGRESS.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception as e:
+            if self.enable_logging:
+                log_failure(scope, e, time.perf_counter() - start_time)
+            raise
+        finally:
+            process_time = time.perf_counter() - start_time
+            HTTP_REQUESTS_IN_PROGRESS.dec()
+            size = response_size if response_size is not None else streamed_size
+            if self.enable_metrics:
+                record_request(
+                    scope["method"], route_template(scope), status_code, process_time,
+                    content_length(scope["headers"]), size,
+                )
+
+        if self.enable_logging:
+            log_response(scope, status_code, process_time, size, verbose=should_sample(self.sample_rate))
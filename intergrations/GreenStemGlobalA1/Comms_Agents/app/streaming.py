@@ -0,0 +1,54 @@
+"""
+Server-sent event endpoints for streamed agent output.
+
+Each endpoint emits "token" events as text arrives, a "section" event as
+soon as each output field is complete, then "done" with the full output (or
+"error"). Mount with app.include_router(streaming_router).
+"""
+
+import logging
+from typing import Any, AsyncIterator, Dict
+
+from fastapi import APIRouter
+from fastapi.responses import StreamingResponse
+
+from app.deps import ScribeIn, LiaisonIn
+from agents import scribe as scribe_agent
+from agents import liaison as liaison_agent
+from tools.streaming import sse_event
+
+logger = logging.getLogger(__name__)
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    # Stop nginx from buffering the stream
+    "X-Accel-Buffering": "no",
+}
+
+streaming_router = APIRouter()
+
+
+async def _sse(events: AsyncIterator[Dict[str, Any]]) -> AsyncIterator[str]:
+    try:
+        async for event in events:
+            yield sse_event(event["event"], event["data"])
+    except Exception as e:
+        logger.error(f"Streaming generation failed: {e}")
+        yield sse_event("error", {"error": str(e)})
+
+
+def event_stream(events: AsyncIterator[Dict[str, Any]]) -> StreamingResponse:
+    """SSE response for an agent's event generator."""
+    return StreamingResponse(_sse(events), media_type="text/event-stream", headers=SSE_HEADERS)
+
+
+@streaming_router.post("/draft/scribe/stream")
+async def draft_scribe_stream(payload: ScribeIn) -> StreamingResponse:
+    """Stream Scribe drafts as server-sent events."""
+    return event_stream(scribe_agent.stream(payload))
+
+
+@streaming_router.post("/outreach/liaison/stream")
+async def outreach_liaison_stream(payload: LiaisonIn) -> StreamingResponse:
+    """Stream Liaison outreach drafts as server-sent events."""
+    return event_stream(liaison_agent.stream(payload))
@@ -0,0 +1,3 @@
+"""
+Celery task modules for Comms Agents.
+"""
@@ -0,0 +1,50 @@
+"""
+Cartographer background tasks: knowledge base ingestion.
+"""
+
+import logging
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+from app.celery_app import celery_app
+from tools.retriever import KNOWLEDGE_EMBEDDINGS, embed_knowledge_base, sync_knowledge_base
+
+logger = logging.getLogger(__name__)
+
+# Directories ingested by the nightly knowledge base update
+KNOWLEDGE_ROOTS = [
+    root.strip()
+    for root in os.getenv("KNOWLEDGE_ROOTS", "knowledge,issue_cards").split(",")
+    if root.strip()
+]
+
+
+@celery_app.task(bind=True)
+def update_knowledge_base(self, roots: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    Incrementally update the knowledge index.
+    
+    Unchanged files are skipped by mtime/size or content hash, so the
+    nightly run only re-extracts what was added or edited. With
+    KNOWLEDGE_EMBEDDINGS=model, documents still lacking an embedding are
+    then embedded on the worker's event loop.
+    
+    Args:
+        roots: Directories to sync (defaults to KNOWLEDGE_ROOTS)
+        
+    Returns:
+        Counts of added, updated, unchanged and removed files (plus
+        embedded documents with model embeddings)
+    """
+    started = time.perf_counter()
+    roots = [root for root in (roots or KNOWLEDGE_ROOTS) if os.path.isdir(root)]
+    
+    totals = sync_knowledge_base(roots)
+    if KNOWLEDGE_EMBEDDINGS == "model":
+        from app.database import run_sync
+        totals["embedded"] = run_sync(embed_knowledge_base())
+    
+    duration = time.perf_counter() - started
+    logger.info(f"Knowledge base update finished in {duration:.2f}s: {totals}")
+    return {**totals, "roots": roots, "duration_seconds": round(duration, 3)}
@@ -1,171 +1,281 @@
 """
 Health check utilities for Comms Agents Switchboard.
+
+Checks run against long-lived clients (one HTTP client, one Redis pool, one
+Postgres connection) and their results are cached for HEALTH_CACHE_SECONDS.
+With the background refresher running, probes only read the cache.
 """
 
 import os
+import time
 import asyncio
 import logging
-from typing import Dict, Any
+from typing import Any, Awaitable, Callable, Dict, Optional
+
 import httpx
-import redis
-import psycopg
-from sqlalchemy.ext.asyncio import AsyncEngine
+import redis.asyncio as aioredis
 
 logger = logging.getLogger(__name__)
 
+HEALTH_CACHE_SECONDS = float(os.getenv("HEALTH_CACHE_SECONDS", "10"))
+HEALTH_CHECK_TIMEOUT = float(os.getenv("HEALTH_CHECK_TIMEOUT", "2.0"))
+
+SERVICES = ("database", "redis", "chromadb", "rabbitmq", "celery")
+
+
+class HealthChecker:
+    """
+    Dependency checks with pooled clients and cached results.
+
+    Args:
+        ttl: Seconds a result is served from cache (and the refresh interval)
+        timeout: Per-check timeout in seconds
+    """
+
+    def __init__(self, ttl: float = HEALTH_CACHE_SECONDS, timeout: float = HEALTH_CHECK_TIMEOUT):
+        self.ttl = ttl
+        self.timeout = timeout
+        self.checks: Dict[str, Callable[[], Awaitable[None]]] = {
+            "database": self.check_database,
+            "redis": self.check_redis,
+            "chromadb": self.check_chromadb,
+            "rabbitmq": self.check_rabbitmq,
+        }
+        self._results: Dict[str, Dict[str, Any]] = {}
+        self._refreshed_at: Optional[float] = None
+        self._refreshing: Optional[asyncio.Task] = None
+        self._refresher: Optional[asyncio.Task] = None
+        self._http: Optional[httpx.AsyncClient] = None
+        self._redis = None
+        self._db = None
+        self._db_lock = asyncio.Lock()
+
+    # Clients are created on first use and reused by every later check
+
+    def _http_client(self) -> httpx.AsyncClient:
+        if self._http is None:
+            self._http = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=4, max_keepalive_connections=2),
+            )
+        return self._http
+
+    def _redis_client(self):
+        if self._redis is None:
+            self._redis = aioredis.from_url(
+                os.getenv("REDIS_URL", "redis://localhost:6379/0"),
+                socket_timeout=self.timeout,
+                socket_connect_timeout=self.timeout,
+                max_connections=2,
+            )
+        return self._redis
+
+    async def _db_connection(self):
+        if self._db is None or self._db.closed:
+            import psycopg
+
+            database_url = os.getenv("DATABASE_URL")
+            if not database_url:
+                raise RuntimeError("DATABASE_URL not set")
+            # SQLAlchemy-style URLs carry a driver suffix psycopg does not accept
+            database_url = database_url.replace("postgresql+asyncpg://", "postgresql://")
+            self._db = await psycopg.AsyncConnection.connect(database_url, autocommit=True)
+        return self._db
+
+    # Checks return on success and raise on failure
+
+    async def check_database(self):
+        """Check PostgreSQL database health."""
+        async with self._db_lock:
+            try:
+                conn = await self._db_connection()
+                async with conn.cursor() as cur:
+                    await cur.execute("SELECT 1")
+                    result = await cur.fetchone()
+            except BaseException:
+                # Drop a broken (or timed-out) connection so the next check reconnects
+                if self._db is not None:
+                    db, self._db = self._db, None
+                    try:
+                        await db.close()
+                    except Exception as e:
+                        logger.debug(f"Closing health check connection failed: {e}")
+                raise
+        if result[0] != 1:
+            raise RuntimeError(f"SELECT 1 returned {result[0]}")
+
+    async def check_redis(self):
+        """Check Redis health."""
+        await self._redis_client().ping()
+
+    async def check_chromadb(self):
+        """Check ChromaDB health."""
+        chroma_host = os.getenv("CHROMA_HOST", "localhost")
+        chroma_port = os.getenv("CHROMA_PORT", "8001")
+        response = await self._http_client().get(f"http://{chroma_host}:{chroma_port}/api/v2/heartbeat")
+        response.raise_for_status()
+
+    async def check_rabbitmq(self):
+        """Check RabbitMQ health through the management API."""
+        rabbitmq_host = os.getenv("RABBITMQ_HOST", "localhost")
+        rabbitmq_port = os.getenv("RABBITMQ_MANAGEMENT_PORT", "15672")
+        response = await self._http_client().get(f"http://{rabbitmq_host}:{rabbitmq_port}/api/overview")
+        response.raise_for_status()
+
+    async def _timed(self, name: str) -> Dict[str, Any]:
+        start_time = time.perf_counter()
+        try:
+            await asyncio.wait_for(self.checks[name](), timeout=self.timeout)
+            status, error = "healthy", None
+        except Exception as e:
+            status, error = "unhealthy", str(e) or type(e).__name__
+        return {
+            "status": status,
+            "response_time_ms": round((time.perf_counter() - start_time) * 1000, 2),
+            "timestamp": time.time(),
+            "error": error,
+        }
+
+    async def _run_checks(self) -> Dict[str, Dict[str, Any]]:
+        names = list(self.checks)
+        results = dict(zip(names, await asyncio.gather(*(self._timed(name) for name in names))))
+        # Celery's broker is Redis; reuse that result rather than pinging twice
+        results["celery"] = {**results["redis"], "response_time_ms": 0.0, "via": "redis"}
+        # Log transitions only, so a refresher does not repeat the same error every cycle
+        for name, result in results.items():
+            previous = self._results.get(name, {}).get("status")
+            if result["status"] == "unhealthy" and previous != "unhealthy":
+                logger.error(f"Health check failed for {name}: {result['error']}")
+            elif result["status"] == "healthy" and previous == "unhealthy":
+                logger.info(f"{name} is healthy again")
+        self._results = results
+        self._refreshed_at = time.monotonic()
+        return results
+
+    async def refresh(self) -> Dict[str, Dict[str, Any]]:
+        """Run every check now; concurrent callers share one run."""
+        if self._refreshing is None or self._refreshing.done():
+            self._refreshing = asyncio.ensure_future(self._run_checks())
+        return await asyncio.shield(self._refreshing)
+
+    def is_fresh(self) -> bool:
+        return self._refreshed_at is not None and time.monotonic() - self._refreshed_at < self.ttl
+
+    async def get_results(self) -> Dict[str, Dict[str, Any]]:
+        """Cached results, refreshed first if older than the TTL."""
+        refreshing_in_background = self._refresher is not None and not self._refresher.done()
+        if self.is_fresh() or (refreshing_in_background and self._results):
+            return self._results
+        return await self.refresh()
+
+    def start(self):
+        """Refresh results in the background every ttl seconds."""
+        if self._refresher is None or self._refresher.done():
+            self._refresher = asyncio.ensure_future(self._refresh_forever())
+
+    async def _refresh_forever(self):
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.error(f"Health refresh failed: {e}")
+            await asyncio.sleep(self.ttl)
+
+    async def close(self):
+        """Stop the refresher and close pooled clients."""
+        if self._refresher is not None:
+            self._refresher.cancel()
+            self._refresher = None
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+        if self._redis is not None:
+            await self._redis.aclose()
+            self._redis = None
+        if self._db is not None:
+            await self._db.close()
+            self._db = None
+
+
+_checker: Optional[HealthChecker] = None
+
+
+def get_health_checker() -> HealthChecker:
+    """Process-wide checker shared by every probe."""
+    global _checker
+    if _checker is None:
+        _checker = HealthChecker()
+    return _checker
+
+
+async def start_health_checks():
+    """Start background refreshing; call from the app's startup hook."""
+    get_health_checker().start()
+
+
+async def stop_health_checks():
+    """Stop refreshing and close clients; call from the app's shutdown hook."""
+    global _checker
+    if _checker is not None:
+        await _checker.close()
+        _checker = None
+
 
 async def check_services_health() -> Dict[str, str]:
     """Check health of all services."""
-    health_checks = {
-        "database": "unknown",
-        "redis": "unknown",
-        "chromadb": "unknown",
-        "rabbitmq": "unknown",
-        "celery": "unknown",
-    }
-    
-    # Run health checks concurrently
-    tasks = [
-        check_database_health(),
-        check_redis_health(),
-        check_chromadb_health(),
-        check_rabbitmq_health(),
-        check_celery_health(),
-    ]
-    
-    results = await asyncio.gather(*tasks, return_exceptions=True)
-    
-    # Update health status
-    for i, result in enumerate(results):
-        service_name = list(health_checks.keys())[i]
-        if isinstance(result, Exception):
-            health_checks[service_name] = "unhealthy"
-            logger.error(f"Health check failed for {service_name}: {result}")
-        else:
-            health_checks[service_name] = "healthy"
-    
-    return health_checks
+    results = await get_health_checker().get_results()
+    return {name: result["status"] for name, result in results.items()}
+
+
+async def get_health_report() -> Dict[str, Any]:
+    """Per-service status, latency and error, plus the summary."""
+    results = await get_health_checker().get_results()
+    report = get_health_summary({name: result["status"] for name, result in results.items()})
+    report["services"] = results
+    return report
+
+
+async def _check_bool(name: str) -> bool:
+    results = await get_health_checker().get_results()
+    return results[name]["status"] == "healthy"
 
 
 async def check_database_health() -> bool:
     """Check PostgreSQL database health."""
-    try:
-        database_url = os.getenv("DATABASE_URL")
-        if not database_url:
-            logger.warning("DATABASE_URL not set")
-            return False
-        
-        # Use asyncpg for health check
-        async with psycopg.AsyncConnection.connect(database_url) as conn:
-            async with conn.cursor() as cur:
-                await cur.execute("SELECT 1")
-                result = await cur.fetchone()
-                return result[0] == 1
-                
-    except Exception as e:
-        logger.error(f"Database health check failed: {e}")
-        return False
+    return await _check_bool("database")
 
 
 async def check_redis_health() -> bool:
     """Check Redis health."""
-    try:
-        redis_url = os.getenv("REDIS_URL", "redis://localhost:6379/0")
-        
-        # Create Redis client
-        r = redis.from_url(redis_url)
-        
-        # Test connection
-        r.ping()
-        return True
-        
-    except Exception as e:
-        logger.error(f"Redis health check failed: {e}")
-        return False
+    return await _check_bool("redis")
 
 
 async def check_chromadb_health() -> bool:
     """Check ChromaDB health."""
-    try:
-        chroma_host = os.getenv("CHROMA_HOST", "localhost")
-        chroma_port = os.getenv("CHROMA_PORT", "8001")
-        
-        # Test HTTP connection
-        async with httpx.AsyncClient(timeout=5.0) as client:
-            response = await client.get(f"http://{chroma_host}:{chroma_port}/api/v2/heartbeat")
-            return response.status_code == 200
-            
-    except Exception as e:
-        logger.error(f"ChromaDB health check failed: {e}")
-        return False
+    return await _check_bool("chromadb")
 
 
 async def check_rabbitmq_health() -> bool:
     """Check RabbitMQ health."""
-    try:
-        rabbitmq_host = os.getenv("RABBITMQ_HOST", "localhost")
-        rabbitmq_port = os.getenv("RABBITMQ_MANAGEMENT_PORT", "15672")
-        
-        # Test HTTP connection to management interface
-        async with httpx.AsyncClient(timeout=5.0) as client:
-            response = await client.get(f"http://{rabbitmq_host}:{rabbitmq_port}/api/overview")
-            return response.status_code == 200
-            
-    except Exception as e:
-        logger.error(f"RabbitMQ health check failed: {e}")
-        return False
+    return await _check_bool("rabbitmq")
 
 
 async def check_celery_health() -> bool:
-    """Check Celery health."""
-    try:
-        # This is a basic check - in production you might want to check worker status
-        # For now, we'll assume it's healthy if Redis is healthy
-        return await check_redis_health()
-        
-    except Exception as e:
-        logger.error(f"Celery health check failed: {e}")
-        return False
+    """Check Celery health (its Redis broker)."""
+    return await _check_bool("celery")
 
 
 async def check_specific_service(service_name: str) -> Dict[str, Any]:
     """Check health of a specific service."""
-    health_checks = {
-        "database": check_database_health,
-        "redis": check_redis_health,
-        "chromadb": check_chromadb_health,
-        "rabbitmq": check_rabbitmq_health,
-        "celery": check_celery_health,
-    }
-    
-    if service_name not in health_checks:
+    if service_name not in SERVICES:
         return {
             "status": "unknown",
             "error": f"Unknown service: {service_name}",
             "timestamp": None
         }
-    
-    try:
-        start_time = asyncio.get_event_loop().time()
-        is_healthy = await health_checks[service_name]()
-        end_time = asyncio.get_event_loop().time()
-        
-        response_time = (end_time - start_time) * 1000  # Convert to milliseconds
-        
-        return {
-            "status": "healthy" if is_healthy else "unhealthy",
-            "response_time_ms": round(response_time, 2),
-            "timestamp": asyncio.get_event_loop().time(),
-            "error": None
-        }
-        
-    except Exception as e:
-        return {
-            "status": "unhealthy",
-            "error": str(e),
-            "timestamp": asyncio.get_event_loop().time(),
-            "response_time_ms": None
-        }
+
+    results = await get_health_checker().get_results()
+    return results[service_name]
 
 
 def get_health_summary(health_status: Dict[str, str]) -> Dict[str, Any]:
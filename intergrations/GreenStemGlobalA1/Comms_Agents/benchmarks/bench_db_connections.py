@@ -0,0 +1,90 @@
+"""
+Report Postgres connections used by forked workers under load.
+
+Forks --workers processes the way Celery prefork does. Each one calls
+init_worker() and runs --concurrency overlapping queries per task on its
+persistent loop. The parent samples connection_report() while they run and
+prints the peak server-side connections per application_name, next to the
+bound set by the pool configuration.
+
+Requires a reachable DATABASE_URL. Compare e.g.:
+    DB_POOL_MODE=queue python -m benchmarks.bench_db_connections --workers 8
+    DB_POOL_MODE=null  python -m benchmarks.bench_db_connections --workers 8   (behind PgBouncer)
+
+Usage: python -m benchmarks.bench_db_connections [--workers 8] [--concurrency 4] [--tasks 50]
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import time
+
+from sqlalchemy import text
+
+from app import database
+
+
+async def one_task(concurrency: int, query_seconds: float):
+    """A task that issues several queries at once (e.g. gather over variants)."""
+    async def query():
+        async with database.get_engine().connect() as conn:
+            await conn.execute(text("SELECT pg_sleep(:s)"), {"s": query_seconds})
+
+    await asyncio.gather(*(query() for _ in range(concurrency)))
+
+
+def worker(tasks: int, concurrency: int, query_seconds: float):
+    database.init_worker()
+    try:
+        for _ in range(tasks):
+            database.run_sync(one_task(concurrency, query_seconds))
+    finally:
+        database.shutdown_worker()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Connection counts under forked-worker load")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--tasks", type=int, default=50)
+    parser.add_argument("--query-seconds", type=float, default=0.02)
+    args = parser.parse_args()
+
+    # Touch the engine in the parent first, as the API process would before forking
+    database.run_sync(database.init_db())
+
+    context = multiprocessing.get_context("fork")
+    workers = [
+        context.Process(target=worker, args=(args.tasks, args.concurrency, args.query_seconds))
+        for _ in range(args.workers)
+    ]
+    started = time.perf_counter()
+    for process in workers:
+        process.start()
+
+    peak_total, peak_by_application = 0, {}
+    while any(process.is_alive() for process in workers):
+        server = database.run_sync(database.connection_report())["server"]
+        peak_total = max(peak_total, server["total"])
+        for application, states in server["by_application"].items():
+            peak_by_application[application] = max(peak_by_application.get(application, 0), sum(states.values()))
+        time.sleep(0.1)
+    elapsed = time.perf_counter() - started
+    for process in workers:
+        process.join()
+
+    if database.DB_POOL_MODE == "null":
+        bound = f"{args.workers * args.concurrency} (one per in-flight query, before PgBouncer)"
+    else:
+        bound = str(args.workers * (database.DB_WORKER_POOL_SIZE + database.DB_WORKER_MAX_OVERFLOW))
+    print(f"mode={database.DB_POOL_MODE} workers={args.workers} concurrency={args.concurrency} "
+          f"tasks/worker={args.tasks} elapsed={elapsed:.1f}s")
+    print(f"peak connections {peak_total} (worker bound {bound}, max_connections {server['max_connections']})")
+    for application, count in sorted(peak_by_application.items()):
+        print(f"  {application or '<none>':32s} {count}")
+
+    database.shutdown_worker()
+
+
+if __name__ == "__main__":
+    main()
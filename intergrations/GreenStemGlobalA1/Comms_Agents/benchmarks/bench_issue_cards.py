@@ -0,0 +1,117 @@
+"""
+Benchmark issue card parsing against the previous per-field regex pipeline.
+
+Usage: python -m benchmarks.bench_issue_cards [--cards 20000] [--size 4000]
+"""
+
+import argparse
+import re
+import time
+
+import numpy as np
+
+from tools.card_scanner import extract_entities, scan_card
+
+WORDS = (
+    "farm soil carbon Kenya Nairobi supply chain report harvest yield export buyer "
+    "traceability audit Green Stem Global investor update climate water"
+).split()
+MARKERS = [
+    "#{w}", "[{w}]", "Tags: {w}, {v}", "Source: {w} {v} annual report",
+    "References: {w} et al.", "Cited: {w}", "priority: 7", "This is important.",
+    "https://example.com/{w}/{v}.", "Urgent: {w} needs review",
+]
+
+
+def legacy_parse(content: str):
+    """The pre-scanner extraction: one re.findall/re.search per field and pattern."""
+    lines = [line.strip() for line in content.splitlines() if line.strip()]
+    heading = re.search(r'^#\s+(.+)$', content, re.MULTILINE)
+    title = heading.group(1).strip() if heading else None
+    tldr = next((line for line in lines if not line.startswith('#')
+                 and not line.startswith('http') and len(line) > 20), "No TL;DR available")
+    links = [link.rstrip('.,;:!?') for link in re.findall(r'https?://[^\s\)]+', content)]
+    tags = []
+    for pattern in (r'#(\w+)', r'\[(\w+)\]', r'tags?:\s*([^\n]+)'):
+        for tag in re.findall(pattern, content, re.IGNORECASE):
+            cleaned = tag.strip().lower()
+            if cleaned and cleaned not in tags:
+                tags.append(cleaned)
+    priority = "medium"
+    for pattern, value in ((r'priority:\s*(high|medium|low|urgent)', None),
+                           (r'priority:\s*(\d+)', 'score'),
+                           (r'urgent|critical', 'high'), (r'important', 'medium')):
+        match = re.search(pattern, content, re.IGNORECASE)
+        if match:
+            if value == 'score':
+                score = int(match.group(1))
+                priority = 'high' if score >= 8 else 'medium' if score >= 5 else 'low'
+            else:
+                priority = value or match.group(1).lower()
+            break
+    sources = []
+    for pattern in (r'source[s]?:\s*([^\n]+)', r'reference[s]?:\s*([^\n]+)', r'cite[d]?:\s*([^\n]+)'):
+        for source in re.findall(pattern, content, re.IGNORECASE):
+            cleaned = source.strip()
+            if cleaned and cleaned not in sources:
+                sources.append(cleaned)
+    entities = [e for e in re.findall(r'\b[A-Z][a-z]+(?:\s+[A-Z][a-z]+)*\b', content)
+                if e not in {'The', 'This', 'That', 'These', 'Those', 'And', 'Or', 'But',
+                             'In', 'On', 'At', 'To', 'For', 'Of', 'With', 'By'} and len(e) > 2][:20]
+    return {"title": title, "tldr": tldr, "links": links, "tags": tags,
+            "priority": priority, "sources": sources}, entities
+
+
+def new_parse(content: str):
+    return scan_card(content), extract_entities(content)
+
+
+def build_cards(n_cards: int, size: int, seed: int):
+    """Markdown cards of roughly `size` characters with markers sprinkled through."""
+    rng = np.random.default_rng(seed)
+    cards = []
+    for i in range(n_cards):
+        parts = [f"# Issue {i}: {rng.choice(WORDS)} {rng.choice(WORDS)}", ""]
+        length = 0
+        while length < size:
+            if rng.random() < 0.15:
+                line = str(rng.choice(MARKERS)).format(w=rng.choice(WORDS), v=rng.choice(WORDS))
+            else:
+                line = " ".join(rng.choice(WORDS, size=int(rng.integers(6, 16))))
+            parts.append(line)
+            length += len(line) + 1
+        cards.append("\n".join(parts))
+    return cards
+
+
+def run(parse, cards):
+    started = time.perf_counter()
+    results = [parse(card) for card in cards]
+    return results, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark issue card parsing")
+    parser.add_argument("--cards", type=int, default=20_000)
+    parser.add_argument("--size", type=int, default=4000, help="Approximate characters per card")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    cards = build_cards(args.cards, args.size, args.seed)
+    megabytes = sum(len(card) for card in cards) / 1e6
+
+    legacy, legacy_s = run(legacy_parse, cards)
+    scanned, scan_s = run(new_parse, cards)
+    mismatches = sum(
+        1 for (old, old_entities), (new, new_entities) in zip(legacy, scanned)
+        if old_entities != new_entities or any(old[k] != new[k] for k in old)
+    )
+
+    print(f"{args.cards} cards, {megabytes:.1f} MB")
+    print(f"legacy  {legacy_s:7.2f}s  {args.cards / legacy_s:9.0f} cards/s  {megabytes / legacy_s:6.1f} MB/s")
+    print(f"scanner {scan_s:7.2f}s  {args.cards / scan_s:9.0f} cards/s  {megabytes / scan_s:6.1f} MB/s")
+    print(f"speedup {legacy_s / scan_s:.2f}x, mismatches: {mismatches}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Measure the per-request overhead of the metrics middleware.
+
+Drives a no-op ASGI app directly (no server, no HTTP parsing) with and
+without MetricsMiddleware, so the difference is the middleware's own cost.
+
+Usage: python -m benchmarks.bench_metrics [--requests 200000]
+"""
+
+import argparse
+import asyncio
+import time
+
+from app.middleware.metrics import MetricsMiddleware, record_request, reset_metrics
+
+
+class Route:
+    path_format = "/cards/{card_id}"
+
+
+ROUTE = Route()
+RESPONSE_START = {
+    "type": "http.response.start",
+    "status": 200,
+    "headers": [(b"content-type", b"application/json"), (b"content-length", b"17")],
+}
+RESPONSE_BODY = {"type": "http.response.body", "body": b'{"status": "ok"}\n'}
+
+
+async def endpoint(scope, receive, send):
+    scope["route"] = ROUTE
+    await send(RESPONSE_START)
+    await send(RESPONSE_BODY)
+
+
+async def receive():
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+async def send(message):
+    pass
+
+
+def make_scope(i: int):
+    return {
+        "type": "http",
+        "method": "POST",
+        "path": f"/cards/{i}",
+        "headers": [(b"host", b"switchboard"), (b"content-type", b"application/json"),
+                    (b"content-length", b"128"), (b"user-agent", b"bench")],
+    }
+
+
+async def drive(app, n: int) -> float:
+    scopes = [make_scope(i % 1000) for i in range(1000)]
+    started = time.perf_counter()
+    for i in range(n):
+        await app(scopes[i % 1000], receive, send)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark MetricsMiddleware overhead")
+    parser.add_argument("--requests", type=int, default=200_000)
+    args = parser.parse_args()
+    n = args.requests
+
+    started = time.perf_counter()
+    for i in range(n):
+        record_request("POST", "/cards/{card_id}", 200, 0.0123, 128, 17)
+    record_s = time.perf_counter() - started
+    reset_metrics()
+
+    bare_s = asyncio.run(drive(endpoint, n))
+    wrapped_s = asyncio.run(drive(MetricsMiddleware(endpoint), n))
+
+    print(f"{n} requests")
+    print(f"record_request      {record_s / n * 1e6:6.2f} us/request")
+    print(f"bare ASGI app       {bare_s / n * 1e6:6.2f} us/request")
+    print(f"with middleware     {wrapped_s / n * 1e6:6.2f} us/request")
+    print(f"middleware overhead {(wrapped_s - bare_s) / n * 1e6:6.2f} us/request")
+
+
+if __name__ == "__main__":
+    main()
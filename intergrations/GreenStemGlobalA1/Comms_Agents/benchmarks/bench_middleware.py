@@ -0,0 +1,149 @@
+"""
+Requests/sec through the switchboard middleware stack, before and after the
+move to pure ASGI middleware.
+
+The app is a small FastAPI app with switchboard-shaped routes. Requests are
+driven straight into the ASGI callable so server and client costs do not
+hide the middleware's. Logs go to /dev/null through a real formatter.
+
+Usage: python -m benchmarks.bench_middleware [--requests 20000]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+
+from fastapi import FastAPI, Request
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from app.middleware.logging import LoggingMiddleware
+from app.middleware.metrics import MetricsMiddleware, reset_metrics
+from app.middleware.observability import ObservabilityMiddleware
+
+BODY = json.dumps({"issue_card_path": "issue_cards/eudr_smallholders.md", "audience": "buyer"}).encode()
+HEADERS = [
+    (b"host", b"switchboard"), (b"content-type", b"application/json"),
+    (b"content-length", str(len(BODY)).encode()), (b"user-agent", b"bench/1.0"),
+    (b"authorization", b"Bearer token"), (b"accept", b"*/*"), (b"accept-encoding", b"gzip"),
+    (b"x-request-id", b"4f1d2c"), (b"cookie", b"session=abc"),
+]
+
+
+class LegacyLoggingMiddleware(BaseHTTPMiddleware):
+    """The BaseHTTPMiddleware logging middleware this change replaced."""
+
+    async def dispatch(self, request: Request, call_next):
+        start_time = time.time()
+        headers = dict(request.headers)
+        sensitive_headers = {"authorization", "cookie", "x-api-key"}
+        logging.getLogger("app.middleware.logging").info(
+            f"Request: {request.method} {request.url.path}",
+            extra={
+                "request_method": request.method, "request_url": str(request.url),
+                "request_path": request.url.path, "query_params": dict(request.query_params),
+                "headers": {k: v for k, v in headers.items() if k.lower() not in sensitive_headers},
+                "client_ip": request.client.host if request.client else None,
+                "user_agent": request.headers.get("user-agent"),
+            }
+        )
+        response = await call_next(request)
+        process_time = time.time() - start_time
+        logging.getLogger("app.middleware.logging").info(
+            f"Response: {request.method} {request.url.path} - Status: {response.status_code} - "
+            f"Duration: {process_time:.3f}s",
+            extra={"response_status": response.status_code, "response_time": process_time},
+        )
+        return response
+
+
+class LegacyMetricsMiddleware(BaseHTTPMiddleware):
+    """Stand-in for the old BaseHTTPMiddleware metrics layer (last value per raw path)."""
+
+    values = {}
+
+    async def dispatch(self, request: Request, call_next):
+        start_time = time.time()
+        response = await call_next(request)
+        key = f"{request.method}_{request.url.path}_{response.status_code}"
+        self.values[key] = time.time() - start_time
+        return response
+
+
+def build_app() -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/health")
+    async def health():
+        return {"status": "healthy"}
+
+    @app.post("/agents/{agent_name}/run")
+    async def run_agent(agent_name: str, payload: dict):
+        return {"agent": agent_name, "status": "queued", "input": payload}
+
+    return app
+
+
+def make_scope(i: int):
+    agent = ("scribe", "signal", "sentinel")[i % 3]
+    return {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": "POST", "scheme": "http", "path": f"/agents/{agent}/run",
+        "raw_path": f"/agents/{agent}/run".encode(), "query_string": b"dry_run=1",
+        "root_path": "", "headers": HEADERS,
+        "client": ("10.0.0.1", 50000), "server": ("switchboard", 8000),
+    }
+
+
+async def drive(app, n: int) -> float:
+    async def send(message):
+        pass
+
+    started = time.perf_counter()
+    for i in range(n):
+        sent = False
+
+        async def receive():
+            nonlocal sent
+            if sent:
+                return {"type": "http.disconnect"}
+            sent = True
+            return {"type": "http.request", "body": BODY, "more_body": False}
+
+        await app(make_scope(i), receive, send)
+    return time.perf_counter() - started
+
+
+def stack(*middleware):
+    app = build_app()
+    for cls in middleware:
+        app.add_middleware(cls)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the switchboard middleware stack")
+    parser.add_argument("--requests", type=int, default=20_000)
+    args = parser.parse_args()
+
+    handler = logging.StreamHandler(open(os.devnull, "w"))
+    handler.setFormatter(logging.Formatter("%(asctime)s %(name)s %(levelname)s %(message)s"))
+    logging.basicConfig(level=logging.INFO, handlers=[handler])
+
+    stacks = {
+        "no middleware": stack(),
+        "before (BaseHTTPMiddleware x2)": stack(LegacyMetricsMiddleware, LegacyLoggingMiddleware),
+        "ASGI logging + metrics": stack(MetricsMiddleware, LoggingMiddleware),
+        "ObservabilityMiddleware": stack(ObservabilityMiddleware),
+    }
+    for name, app in stacks.items():
+        asyncio.run(drive(app, 500))  # warm up routing and pydantic
+        reset_metrics()
+        elapsed = asyncio.run(drive(app, args.requests))
+        print(f"{name:<32} {args.requests / elapsed:9.0f} req/s  {elapsed / args.requests * 1e6:7.1f} us/req")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Benchmark the hybrid retrieval index on a synthetic corpus.
+
+Usage: python -m benchmarks.bench_retriever [--docs 100000] [--queries 200]
+"""
+
+import argparse
+import tempfile
+import time
+
+import numpy as np
+
+from tools.search_index import SearchIndex
+
+
+def build_corpus(n_docs: int, vocab_size: int, seed: int):
+    """Zipf-distributed synthetic documents of 50-300 tokens."""
+    rng = np.random.default_rng(seed)
+    vocab = [f"term{i}" for i in range(vocab_size)]
+    for i in range(n_docs):
+        length = int(rng.integers(50, 300))
+        ids = np.minimum(rng.zipf(1.3, length) - 1, vocab_size - 1)
+        yield {"id": f"doc-{i}", "text": " ".join(vocab[j] for j in ids), "metadata": {"n": i}}
+
+
+def percentile_ms(samples, q):
+    return float(np.percentile(samples, q) * 1000)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark SearchIndex")
+    parser.add_argument("--docs", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--vocab", type=int, default=50_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    index = SearchIndex()
+    started = time.perf_counter()
+    index.add_many(build_corpus(args.docs, args.vocab, args.seed))
+    print(f"indexed {len(index)} docs in {time.perf_counter() - started:.1f}s")
+
+    rng = np.random.default_rng(args.seed + 1)
+    queries = [
+        " ".join(f"term{j}" for j in rng.integers(0, 2000, int(rng.integers(2, 6))))
+        for _ in range(args.queries)
+    ]
+    index.search(queries[0])  # build NumPy views once
+
+    for mode in ("bm25", "vector", "hybrid"):
+        samples = []
+        for query in queries:
+            started = time.perf_counter()
+            index.search(query, limit=10, mode=mode)
+            samples.append(time.perf_counter() - started)
+        print(
+            f"{mode:>7}: p50 {percentile_ms(samples, 50):.2f} ms  "
+            f"p95 {percentile_ms(samples, 95):.2f} ms"
+        )
+
+    with tempfile.TemporaryDirectory() as directory:
+        started = time.perf_counter()
+        index.save(directory)
+        saved = time.perf_counter() - started
+        started = time.perf_counter()
+        SearchIndex.load(directory)
+        print(f"save {saved:.2f}s  load {time.perf_counter() - started:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
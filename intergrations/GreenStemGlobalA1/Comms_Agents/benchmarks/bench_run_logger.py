@@ -0,0 +1,77 @@
+"""
+Measure the audit-log cost inside a request: awaited INSERT vs write-behind.
+
+The database is simulated by a writer that sleeps --insert-ms per statement
+(one round trip), so "inline" is one round trip per run and the write-behind
+logger pays one per batch, off the request path.
+
+Usage: python -m benchmarks.bench_run_logger [--runs 2000] [--insert-ms 2]
+"""
+
+import argparse
+import asyncio
+import statistics
+import tempfile
+import time
+
+from tools import run_logger
+from tools.run_logger import AgentRunLogger, log_agent_run
+
+INPUT = {"issue_card_path": "issue_cards/eudr_smallholders.md", "audience": "buyer", "tone": "boardroom"}
+OUTPUT = {"linkedin_post": "x" * 1200, "x_thread": ["y" * 240] * 5, "comments_pack": ["z" * 200] * 3}
+
+
+async def drive(log_call, runs: int, concurrency: int):
+    """Per-request latency of log_call under `concurrency` overlapping requests."""
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def request():
+        async with semaphore:
+            started = time.perf_counter()
+            await log_call()
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    await asyncio.gather(*(request() for _ in range(runs)))
+    latencies.sort()
+    return statistics.mean(latencies), latencies[int(len(latencies) * 0.99) - 1]
+
+
+async def main_async(args):
+    round_trips = 0
+
+    async def writer(records):
+        nonlocal round_trips
+        round_trips += 1
+        await asyncio.sleep(args.insert_ms / 1000)
+        return len(records)
+
+    async def inline():
+        await writer([{"input_data": INPUT, "output_data": OUTPUT}])
+
+    async def write_behind():
+        log_agent_run("scribe", INPUT, OUTPUT, execution_time_ms=1500)
+
+    inline_mean, inline_p99 = await drive(inline, args.runs, args.concurrency)
+    inline_trips, round_trips = round_trips, 0
+
+    with tempfile.TemporaryDirectory() as spill_dir:
+        run_logger._run_logger = AgentRunLogger(writer, spill_dir=spill_dir)
+        run_logger._run_logger_pid = run_logger.os.getpid()
+        behind_mean, behind_p99 = await drive(write_behind, args.runs, args.concurrency)
+        await run_logger.close_run_logger()
+
+    print(f"inline        mean {inline_mean:7.3f} ms  p99 {inline_p99:7.3f} ms  round trips {inline_trips}")
+    print(f"write-behind  mean {behind_mean:7.3f} ms  p99 {behind_p99:7.3f} ms  round trips {round_trips}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark agent-run logging on the request path")
+    parser.add_argument("--runs", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--insert-ms", type=float, default=2.0)
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Benchmark structured-output parsing against the previous first-{/last-} slice.
+
+Responses mimic real model output: bare JSON, fenced blocks, prose with
+braces, trailing commas and several candidate objects. "usable" counts
+responses that produce a dict with every schema key; the legacy parser's
+failures are what used to fall back to placeholder values and trigger
+re-generation.
+
+Usage: python -m benchmarks.bench_structured_output [--responses 50000]
+"""
+
+import argparse
+import json
+import time
+
+import numpy as np
+
+from tools.structured_output import StructuredOutputError, compile_schema
+
+SCHEMA = {
+    "title": {"type": "string"},
+    "summary": {"type": "string"},
+    "tags": {"type": "array", "items": {"type": "string"}},
+    "priority": {"type": "string", "enum": ["low", "medium", "high"]},
+}
+WORDS = "farm soil carbon Kenya export buyer traceability audit climate water cooperative".split()
+
+
+def legacy_parse(text: str):
+    """The previous generate_structured_output parsing."""
+    start, end = text.find("{"), text.rfind("}") + 1
+    if start < 0 or end <= start:
+        return None
+    try:
+        return json.loads(text[start:end])
+    except json.JSONDecodeError:
+        return None
+
+
+def build_responses(n: int, seed: int):
+    rng = np.random.default_rng(seed)
+    responses = []
+    for _ in range(n):
+        obj = {
+            "title": " ".join(rng.choice(WORDS, 4)),
+            "summary": " ".join(rng.choice(WORDS, int(rng.integers(20, 60)))),
+            "tags": list(rng.choice(WORDS, 3)),
+            "priority": str(rng.choice(["low", "medium", "high"])),
+        }
+        body = json.dumps(obj, indent=int(rng.integers(0, 3)) or None)
+        style = rng.integers(0, 5)
+        if style == 0:
+            responses.append(body)
+        elif style == 1:
+            responses.append(f"Here is the result:\n```json\n{body}\n```\nLet me know if you need changes.")
+        elif style == 2:
+            responses.append(f"Using the {{schema}} you gave: {body} (note: tags are {{approximate}})")
+        elif style == 3:
+            responses.append(body[:-1].rstrip() + ",\n}")
+        else:
+            responses.append(f'Draft: {{"title": "draft"}}\nFinal: {body}')
+    return responses
+
+
+def usable(result) -> bool:
+    return isinstance(result, dict) and all(key in result for key in SCHEMA)
+
+
+def run(parse, responses):
+    started = time.perf_counter()
+    results = [parse(text) for text in responses]
+    return results, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark structured-output parsing")
+    parser.add_argument("--responses", type=int, default=50_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    responses = build_responses(args.responses, args.seed)
+    validator = compile_schema(SCHEMA)
+
+    def new_parse(text):
+        try:
+            return validator.parse(text)
+        except StructuredOutputError:
+            return None
+
+    legacy, legacy_s = run(legacy_parse, responses)
+    parsed, new_s = run(new_parse, responses)
+
+    for name, results, seconds in (("legacy", legacy, legacy_s), ("new", parsed, new_s)):
+        ok = sum(usable(result) for result in results)
+        print(
+            f"{name:7s} {seconds:6.2f}s  {args.responses / seconds:9.0f} responses/s  "
+            f"usable {ok}/{args.responses} ({100 * ok / args.responses:.1f}%)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Tests for per-process engines, worker event loops and bulk inserts.
+"""
+
+import asyncio
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("sqlalchemy")
+
+from sqlalchemy import Column, Integer, MetaData, String, Table
+from sqlalchemy.pool import NullPool
+
+from app import database
+
+
+class FakeEngine:
+    def __init__(self, url, **options):
+        self.url, self.options = url, options
+        self.disposed = []
+        self.sync_engine = SimpleNamespace(dispose=lambda close=True: self.disposed.append(close))
+
+
+@pytest.fixture
+def fresh(monkeypatch):
+    """Module state of a process that has not touched the database yet."""
+    monkeypatch.setattr(database, "create_async_engine", FakeEngine)
+    for name, value in (("engine", None), ("async_session", None), ("_engine_pid", None),
+                        ("_role", "api"), ("_loop", None), ("_loop_pid", None)):
+        monkeypatch.setattr(database, name, value)
+    return database
+
+
+def test_pool_options_by_role_and_mode(fresh, monkeypatch):
+    assert fresh._engine_options()["pool_size"] == fresh.DB_POOL_SIZE
+    fresh.init_worker()
+    options = fresh._engine_options()
+    assert (options["pool_size"], options["max_overflow"]) == (fresh.DB_WORKER_POOL_SIZE, fresh.DB_WORKER_MAX_OVERFLOW)
+    assert options["connect_args"]["server_settings"]["application_name"].endswith(":worker")
+
+    monkeypatch.setattr(database, "DB_POOL_MODE", "null")
+    monkeypatch.setattr(database, "DB_PGBOUNCER", True)
+    options = fresh._engine_options()
+    assert options["poolclass"] is NullPool and "pool_size" not in options
+    assert options["connect_args"]["statement_cache_size"] == 0
+    assert fresh._async_url("postgresql://u@h/db") == "postgresql+asyncpg://u@h/db"
+
+
+def test_forked_process_builds_its_own_engine(fresh, monkeypatch):
+    parent = fresh.get_engine()
+    assert fresh.get_engine() is parent
+
+    monkeypatch.setattr(database.os, "getpid", lambda: -1)
+    child = fresh.get_engine()
+    assert child is not parent
+    # The parent's sockets are dropped, not closed under it
+    assert parent.disposed == [False]
+
+
+def test_run_sync_keeps_one_loop_per_process(fresh):
+    async def current_loop():
+        return asyncio.get_running_loop()
+
+    first = fresh.run_sync(current_loop())
+    assert fresh.run_sync(current_loop()) is first
+    fresh.shutdown_worker()
+    assert first.is_closed()
+    assert fresh.run_sync(current_loop()) is not first
+    fresh.shutdown_worker()
+
+
+@pytest.mark.asyncio
+async def test_bulk_insert_chunks_rows_in_one_transaction(fresh, monkeypatch):
+    statements = []
+    transactions = []
+
+    class Connection:
+        async def execute(self, statement, rows):
+            statements.append((statement.table.name, len(rows)))
+
+    @asynccontextmanager
+    async def begin():
+        transactions.append(1)
+        yield Connection()
+
+    monkeypatch.setattr(database, "get_engine", lambda: SimpleNamespace(begin=begin))
+    table = Table("agent_runs", MetaData(), Column("id", Integer), Column("agent_name", String))
+
+    count = await database.bulk_insert(table, [{"id": i, "agent_name": "scribe"} for i in range(7)], chunk_size=3)
+    assert count == 7
+    assert statements == [("agent_runs", 3), ("agent_runs", 3), ("agent_runs", 1)]
+    assert transactions == [1]
+    assert await database.bulk_insert(table, []) == 0
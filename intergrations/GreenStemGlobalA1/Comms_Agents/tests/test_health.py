@@ -0,0 +1,80 @@
+"""
+Tests for cached dependency health checks.
+"""
+
+import asyncio
+
+import pytest
+
+from app.utils import health
+
+
+@pytest.fixture
+def checker(monkeypatch):
+    """Checker whose dependency checks are counted fakes."""
+    checker = health.HealthChecker(ttl=60, timeout=0.05)
+    calls = {name: 0 for name in checker.checks}
+    failing = set()
+
+    def fake(name):
+        async def check():
+            calls[name] += 1
+            await asyncio.sleep(0.001)
+            if name in failing:
+                raise ConnectionError(f"{name} refused")
+        return check
+
+    checker.checks = {name: fake(name) for name in checker.checks}
+    monkeypatch.setattr(health, "_checker", checker)
+    checker.calls = calls
+    checker.failing = failing
+    return checker
+
+
+@pytest.mark.asyncio
+async def test_probes_share_one_cached_run(checker):
+    """Concurrent and repeated probes run each check once within the TTL."""
+    statuses = await asyncio.gather(*(health.check_services_health() for _ in range(20)))
+    await health.check_services_health()
+
+    assert statuses[0] == {name: "healthy" for name in health.SERVICES}
+    assert checker.calls == {"database": 1, "redis": 1, "chromadb": 1, "rabbitmq": 1}
+
+
+@pytest.mark.asyncio
+async def test_failures_report_status_latency_and_error(checker):
+    """A failing check is unhealthy (not just "not raised"), with its error."""
+    checker.failing.add("redis")
+    report = await health.get_health_report()
+
+    assert report["overall_status"] == "unhealthy"
+    assert report["services"]["redis"]["error"] == "redis refused"
+    assert report["services"]["celery"]["status"] == "unhealthy"
+    assert report["services"]["database"]["response_time_ms"] >= 0
+    assert await health.check_redis_health() is False
+
+
+@pytest.mark.asyncio
+async def test_slow_checks_time_out(checker):
+    async def hang():
+        await asyncio.sleep(1)
+
+    checker.checks["chromadb"] = hang
+    result = await health.check_specific_service("chromadb")
+    assert result["status"] == "unhealthy"
+    assert result["response_time_ms"] < 500
+
+
+@pytest.mark.asyncio
+async def test_background_refresher_serves_cached_results(checker):
+    """With the refresher running, stale results are served without checking inline."""
+    checker.ttl = 0.01
+    checker.start()
+    await asyncio.sleep(0.05)
+    runs = checker.calls["redis"]
+    assert runs >= 2
+
+    assert await health.check_redis_health() is True
+    assert checker.calls["redis"] - runs <= 1
+    await checker.close()
+    assert checker._refresher is None
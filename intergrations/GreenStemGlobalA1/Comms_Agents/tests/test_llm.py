@@ -0,0 +1,171 @@
+"""
+Tests for response caching and batched, cached embeddings in the LLM tool.
+"""
+
+import asyncio
+import time
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from tools import llm, llm_cache
+from tools.embedding_cache import EmbeddingCache
+from tools.llm_cache import LRUBackend, ResponseCache
+
+
+class FakeEmbeddings:
+    """Records batches and tracks how many calls overlap."""
+
+    def __init__(self, fail_on=None):
+        self.batches = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.fail_on = fail_on
+
+    async def create(self, model, input):
+        self.batches.append(list(input))
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+        if self.fail_on and self.fail_on in input:
+            raise RuntimeError("rate limited")
+        # Returned out of order on purpose; callers must sort by index
+        data = [SimpleNamespace(index=i, embedding=[float(len(text)), float(i)]) for i, text in enumerate(input)]
+        return SimpleNamespace(data=list(reversed(data)))
+
+
+@pytest.fixture
+def fake_client(monkeypatch):
+    embeddings = FakeEmbeddings()
+    monkeypatch.setattr(llm, "get_llm_client", lambda: SimpleNamespace(embeddings=embeddings))
+    return embeddings
+
+
+@pytest.mark.asyncio
+async def test_embed_texts_batches_and_caches(fake_client):
+    """Inputs are deduplicated and batched; a second run makes no API calls."""
+    cache = EmbeddingCache(":memory:")
+    texts = [f"document {i}" for i in range(10)] + ["document 0"]
+
+    vectors = await llm.embed_texts(texts, batch_size=3, concurrency=2, cache=cache)
+
+    assert vectors.shape == (11, 2)
+    assert vectors.dtype == np.float32
+    assert len(fake_client.batches) == 4
+    assert fake_client.max_in_flight == 2
+    assert np.array_equal(vectors[0], vectors[10])
+    assert len(cache) == 10
+
+    fake_client.batches.clear()
+    again = await llm.embed_texts(texts, batch_size=3, cache=cache)
+    assert fake_client.batches == []
+    assert np.array_equal(again, vectors)
+
+
+@pytest.mark.asyncio
+async def test_embed_texts_failures_are_explicit(fake_client, monkeypatch):
+    """Failed batches raise instead of returning zero vectors; finished batches stay cached."""
+    cache = EmbeddingCache(":memory:")
+    fake_client.fail_on = "bad"
+
+    with pytest.raises(llm.EmbeddingError):
+        await llm.embed_texts(["good one", "good two", "bad"], batch_size=2, concurrency=1, cache=cache)
+    assert len(cache) == 2
+
+    with pytest.raises(llm.EmbeddingError):
+        await llm.embed_texts(["  "], cache=cache)
+
+    monkeypatch.setattr(llm, "get_llm_client", lambda: None)
+    monkeypatch.setattr(llm, "get_embedding_cache", lambda: cache)
+    with pytest.raises(llm.EmbeddingError):
+        await llm.embed_text("uncached text")
+
+
+class FakeCompletions:
+    """Chat completions that count upstream calls."""
+
+    def __init__(self):
+        self.calls = 0
+        self.fail = False
+
+    async def create(self, model, messages, **params):
+        self.calls += 1
+        await asyncio.sleep(0.01)
+        if self.fail:
+            raise RuntimeError("provider down")
+        text = f"{model}: {messages[0]['content']}"
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=text))])
+
+
+@pytest.fixture
+def chat_client(monkeypatch):
+    completions = FakeCompletions()
+    client = SimpleNamespace(chat=SimpleNamespace(completions=completions), models=None)
+    monkeypatch.setattr(llm, "get_llm_client", lambda: client)
+    cache = ResponseCache(LRUBackend(max_entries=8, ttl=60))
+    monkeypatch.setattr(llm, "get_response_cache", lambda: cache)
+    return completions, cache
+
+
+@pytest.mark.asyncio
+async def test_generate_text_coalesces_and_caches(chat_client):
+    """Identical concurrent prompts make one call; repeats are served from cache."""
+    completions, cache = chat_client
+
+    results = await asyncio.gather(*(llm.generate_text("EUDR update") for _ in range(5)))
+    assert len(set(results)) == 1
+    assert completions.calls == 1
+
+    assert await llm.generate_text("EUDR update") == results[0]
+    assert completions.calls == 1
+    await llm.generate_text("EUDR update", temperature=0.2)
+    await llm.generate_text("EUDR update", cache=False)
+    assert completions.calls == 3
+
+    assert cache.stats.snapshot() == {
+        "hits": 1, "misses": 2, "coalesced": 4, "errors": 0, "requests": 7, "saved": 5,
+    }
+
+
+@pytest.mark.asyncio
+async def test_generate_text_does_not_cache_failures(chat_client):
+    """Placeholder text from a failed call is not stored."""
+    completions, cache = chat_client
+    completions.fail = True
+    assert "placeholder" in await llm.generate_text("Cold chain post")
+
+    completions.fail = False
+    assert "placeholder" not in await llm.generate_text("Cold chain post")
+    assert completions.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_lru_backend_evicts_and_expires(monkeypatch):
+    """Least recently used entries are evicted; expired entries are misses."""
+    backend = LRUBackend(max_entries=2, ttl=10)
+    await backend.set("a", "1")
+    await backend.set("b", "2")
+    await backend.get("a")
+    await backend.set("c", "3")
+    assert await backend.get("b") is None
+    assert await backend.get("a") == "1"
+
+    now = time.monotonic()
+    monkeypatch.setattr(llm_cache, "time", SimpleNamespace(monotonic=lambda: now + 11))
+    assert await backend.get("a") is None
+    assert len(backend) == 1
+
+
+def test_reset_llm_client_drops_inherited_clients(tmp_path, monkeypatch):
+    """A forked worker gets a new client and embedding cache on next use."""
+    monkeypatch.setattr(llm, "EMBEDDING_CACHE_PATH", str(tmp_path / "embeddings.db"))
+    monkeypatch.setattr(llm, "_llm_client", object())
+    monkeypatch.setattr(llm, "_embedding_cache", None)
+    inherited = llm.get_embedding_cache()
+
+    llm.reset_llm_client()
+
+    assert llm._llm_client is None
+    assert llm.get_embedding_cache() is not inherited
@@ -0,0 +1,83 @@
+"""
+Tests for the Prometheus metrics middleware.
+"""
+
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from app.middleware import metrics
+from app.middleware.metrics import Histogram, MetricsMiddleware, metrics_router
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+
+    @app.get("/cards/{card_id}")
+    async def card(card_id: str):
+        return {"id": card_id}
+
+    @app.post("/echo")
+    async def echo(body: dict):
+        return body
+
+    @app.get("/stream")
+    async def stream():
+        async def chunks():
+            for _ in range(3):
+                yield b"abcd"
+        return StreamingResponse(chunks())
+
+    app.include_router(metrics_router)
+    app.add_middleware(MetricsMiddleware)
+    metrics.reset_metrics()
+    yield TestClient(app)
+    metrics.reset_metrics()
+
+
+def test_histogram_buckets_are_cumulative():
+    """Values on a bound fall in that bucket; exposition is cumulative."""
+    histogram = Histogram("latency", "test", ("route",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(("/a",), value)
+
+    snapshot = histogram.snapshot(("/a",))
+    assert snapshot["buckets"] == {0.1: 2, 1.0: 3, float("inf"): 4}
+    assert snapshot["count"] == 4
+    assert snapshot["sum"] == pytest.approx(3.65)
+    assert 'latency_bucket{route="/a",le="+Inf"} 4' in list(histogram.expose())
+
+
+def test_requests_are_labelled_by_route_template(client):
+    """Paths with ids share one series; unmatched paths share another."""
+    for card_id in ("a1", "b2", "c3"):
+        client.get(f"/cards/{card_id}")
+    client.get("/does/not/exist")
+
+    totals = metrics.HTTP_REQUESTS.values
+    assert totals[("GET", "/cards/{card_id}", "200")] == 3
+    assert totals[("GET", metrics.UNMATCHED_ROUTE, "404")] == 1
+    assert metrics.HTTP_REQUEST_DURATION.snapshot(("GET", "/cards/{card_id}"))["count"] == 3
+
+
+def test_sizes_come_from_content_length(client):
+    """Request sizes use Content-Length; streamed responses count bytes sent."""
+    client.post("/echo", json={"tone": "boardroom"})
+    client.get("/stream")
+
+    assert metrics.HTTP_REQUEST_SIZE.snapshot(("POST", "/echo"))["sum"] == len('{"tone":"boardroom"}')
+    assert metrics.HTTP_RESPONSE_SIZE.snapshot(("POST", "/echo"))["sum"] == len('{"tone":"boardroom"}')
+    assert metrics.HTTP_RESPONSE_SIZE.snapshot(("GET", "/stream"))["sum"] == 12
+
+
+def test_metrics_endpoint(client):
+    """The exposition endpoint serves Prometheus text format."""
+    client.get("/cards/a1")
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert "# TYPE http_request_duration_seconds histogram" in response.text
+    assert 'http_requests_total{method="GET",route="/cards/{card_id}",status="200"} 1' in response.text
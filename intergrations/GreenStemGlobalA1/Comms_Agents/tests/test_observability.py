@@ -0,0 +1,98 @@
+"""
+Tests for the ASGI logging and combined observability middleware.
+"""
+
+import logging
+
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from app.middleware import metrics
+from app.middleware.logging import LoggingMiddleware
+from app.middleware.observability import ObservabilityMiddleware
+
+LOGGER = "app.middleware.logging"
+
+
+def build_app(middleware, **options):
+    app = FastAPI()
+
+    @app.get("/cards/{card_id}")
+    async def card(card_id: str):
+        return {"id": card_id}
+
+    @app.get("/boom")
+    async def boom():
+        raise RuntimeError("exploded")
+
+    @app.get("/stream")
+    async def stream():
+        async def chunks():
+            for chunk in (b"one", b"two"):
+                yield chunk
+        return StreamingResponse(chunks())
+
+    app.add_middleware(middleware, **options)
+    metrics.reset_metrics()
+    return TestClient(app, raise_server_exceptions=False)
+
+
+def messages(caplog):
+    return [record.getMessage() for record in caplog.records if record.name == LOGGER]
+
+
+def test_unsampled_requests_log_one_line(caplog):
+    """Without sampling only the response line is logged."""
+    client = build_app(LoggingMiddleware, sample_rate=0.0)
+    with caplog.at_level(logging.INFO, logger=LOGGER):
+        client.get("/cards/a1?tone=boardroom", headers={"Authorization": "Bearer secret"})
+
+    logged = messages(caplog)
+    assert len(logged) == 1
+    assert logged[0].startswith("Response: GET /cards/a1 - Status: 200 - Duration: ")
+
+
+def test_sampled_requests_log_filtered_details(caplog):
+    """Sampled requests log query params and headers, minus credentials."""
+    client = build_app(LoggingMiddleware, sample_rate=1.0)
+    with caplog.at_level(logging.INFO, logger=LOGGER):
+        client.get("/cards/a1?tone=boardroom", headers={"Authorization": "Bearer secret", "X-Trace": "t1"})
+
+    details = next(r for r in caplog.records if r.getMessage().startswith("Request:"))
+    assert details.query_params == {"tone": "boardroom"}
+    assert details.headers["x-trace"] == "t1"
+    assert "authorization" not in details.headers
+
+
+def test_streaming_responses_pass_through(caplog):
+    """Streamed bodies reach the client intact and are sized from the chunks sent."""
+    client = build_app(ObservabilityMiddleware, sample_rate=0.0)
+    with caplog.at_level(logging.INFO, logger=LOGGER):
+        response = client.get("/stream")
+
+    assert response.text == "onetwo"
+    assert metrics.HTTP_RESPONSE_SIZE.snapshot(("GET", "/stream"))["sum"] == 6
+    response_log = next(r for r in caplog.records if r.getMessage().startswith("Response:"))
+    assert response_log.response_size == 6
+
+
+def test_failures_are_logged_and_counted(caplog):
+    """Unhandled errors log the failure with request details and count as 500s."""
+    client = build_app(ObservabilityMiddleware, sample_rate=0.0)
+    with caplog.at_level(logging.INFO, logger=LOGGER):
+        assert client.get("/boom").status_code == 500
+
+    logged = messages(caplog)
+    assert any(m.startswith("Request failed: GET /boom - Error: exploded") for m in logged)
+    assert any(m.startswith("Request: GET /boom") for m in logged)
+    assert metrics.HTTP_REQUESTS.values[("GET", "/boom", "500")] == 1
+    assert metrics.HTTP_REQUESTS_IN_PROGRESS.values[()] == 0
+
+
+@pytest.mark.parametrize("enable_metrics", [True, False])
+def test_metrics_can_be_disabled(enable_metrics):
+    client = build_app(ObservabilityMiddleware, enable_metrics=enable_metrics, enable_logging=False)
+    client.get("/cards/a1")
+    assert (("GET", "/cards/{card_id}", "200") in metrics.HTTP_REQUESTS.values) is enable_metrics
@@ -0,0 +1,38 @@
+"""
+Tests for the prompt template store.
+"""
+
+import os
+
+from tools.prompts import PromptStore
+
+
+def test_missing_template_uses_default(tmp_path):
+    store = PromptStore(str(tmp_path), reload_interval=0)
+    assert store.get("scribe.system", default="fallback") == "fallback"
+
+
+def test_templates_hot_reload_on_change(tmp_path):
+    """Edits are picked up once the reload interval has passed."""
+    path = tmp_path / "scribe.system.md"
+    path.write_text("v1", encoding="utf-8")
+    store = PromptStore(str(tmp_path), reload_interval=3600)
+    assert store.preload() == 1
+
+    path.write_text("v2", encoding="utf-8")
+    os.utime(path, ns=(0, 10**18))
+    assert store.get("scribe.system") == "v1"
+
+    store.invalidate("scribe.system")
+    assert store.get("scribe.system") == "v2"
+
+
+def test_zero_interval_checks_mtime_every_lookup(tmp_path):
+    path = tmp_path / "liaison.system.md"
+    path.write_text("v1", encoding="utf-8")
+    store = PromptStore(str(tmp_path), reload_interval=0)
+    assert store.get("liaison.system") == "v1"
+
+    path.write_text("v2", encoding="utf-8")
+    os.utime(path, ns=(0, 10**18))
+    assert store.get("liaison.system") == "v2"
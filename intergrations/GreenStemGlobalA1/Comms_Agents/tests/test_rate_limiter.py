@@ -0,0 +1,146 @@
+"""
+Tests for provider rate limiting, throttling pauses and backoff.
+"""
+
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+
+from tools import llm, rate_limiter
+from tools.embedding_cache import EmbeddingCache
+from tools.rate_limiter import MemoryBackend, RateLimiter, call_with_limits, parse_limits, retry_after_seconds
+
+
+class ProviderError(Exception):
+    """Shaped like openai/anthropic/groq APIStatusError."""
+
+    def __init__(self, status_code, headers=None):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        self.response = SimpleNamespace(status_code=status_code, headers=headers or {})
+
+
+@pytest.fixture
+def limiter(monkeypatch):
+    limiter = RateLimiter(MemoryBackend(), parse_limits("openai=20/s,openai:gpt-4o=600/m"), max_concurrency=2)
+    monkeypatch.setattr(rate_limiter, "_limiter", limiter)
+    monkeypatch.setattr(rate_limiter, "LLM_BACKOFF_BASE", 0.01)
+    return limiter
+
+
+def test_parse_limits_prefers_model_entries(limiter):
+    assert parse_limits("openai=3500/m, groq=2/s,bad=0/m") == {"openai": 3500 / 60, "groq": 2.0}
+    assert limiter._key_and_rate("openai", "gpt-4o") == ("openai:gpt-4o", 10.0)
+    assert limiter._key_and_rate("openai", "gpt-3.5-turbo") == ("openai", 20.0)
+    assert limiter._key_and_rate("anthropic", "claude") == ("anthropic:claude", None)
+
+
+def test_retry_after_from_headers():
+    assert retry_after_seconds({"Retry-After": "3"}) == 3.0
+    assert retry_after_seconds({"retry-after-ms": "250", "retry-after": "9"}) == 0.25
+    assert retry_after_seconds({"x-ratelimit-remaining-requests": "0", "x-ratelimit-reset-requests": "1m2.5s",
+                                "x-ratelimit-remaining-tokens": "10", "x-ratelimit-reset-tokens": "5m"}) == 62.5
+    reset = (datetime.now(timezone.utc) + timedelta(seconds=30)).isoformat()
+    wait = retry_after_seconds({"anthropic-ratelimit-requests-remaining": "0", "anthropic-ratelimit-requests-reset": reset})
+    assert 28 < wait <= 30
+    assert retry_after_seconds({"x-ratelimit-remaining-requests": "5"}) is None
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_paces_calls(limiter):
+    """20/s with a burst of 20: the next 5 calls are spread over ~0.25s."""
+    async def call():
+        return time.monotonic()
+
+    start = time.monotonic()
+    for _ in range(20):
+        await call_with_limits("openai", "gpt-3.5-turbo", call)
+    assert time.monotonic() - start < 0.05
+
+    times = [await call_with_limits("openai", "gpt-3.5-turbo", call) for _ in range(5)]
+    assert times[-1] - start >= 0.2
+
+
+@pytest.mark.asyncio
+async def test_concurrency_is_capped_per_key(limiter):
+    in_flight = peak = 0
+
+    async def call():
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+
+    await asyncio.gather(*(call_with_limits("anthropic", "claude", call) for _ in range(6)))
+    assert peak == 2
+
+
+@pytest.mark.asyncio
+async def test_throttling_pauses_key_and_retries(limiter):
+    """A 429 pauses every caller of that key for Retry-After, then calls succeed."""
+    attempts = []
+
+    async def flaky():
+        attempts.append(time.monotonic())
+        if len(attempts) == 1:
+            raise ProviderError(429, {"retry-after": "0.2"})
+        return "ok"
+
+    async def other():
+        return time.monotonic()
+
+    start = time.monotonic()
+    first = asyncio.ensure_future(call_with_limits("openai", "gpt-4o", flaky))
+    await asyncio.sleep(0.01)
+    other_ran_at = await call_with_limits("openai", "gpt-4o", other)
+
+    assert await first == "ok"
+    assert attempts[1] - start >= 0.2
+    assert other_ran_at - start >= 0.2
+    # Halved on the 429, recovering additively on each success since
+    assert 0.5 < limiter._factor["openai:gpt-4o"] < 1
+
+
+@pytest.mark.asyncio
+async def test_non_retryable_errors_raise_immediately(limiter):
+    calls = 0
+
+    async def bad_request():
+        nonlocal calls
+        calls += 1
+        raise ProviderError(400)
+
+    with pytest.raises(ProviderError):
+        await call_with_limits("openai", "gpt-4o", bad_request)
+    assert calls == 1
+
+
+@pytest.mark.asyncio
+async def test_retries_are_bounded(limiter):
+    async def unavailable():
+        raise ProviderError(503)
+
+    with pytest.raises(ProviderError):
+        await call_with_limits("openai", "gpt-4o", unavailable, max_retries=2)
+
+
+@pytest.mark.asyncio
+async def test_embedding_requests_are_limited_and_retried(limiter, monkeypatch):
+    """Embeddings share the limiter, which retries them since SDK retries are off."""
+    attempts = []
+
+    async def create(model, input):
+        attempts.append(time.monotonic())
+        if len(attempts) == 1:
+            raise ProviderError(429, {"retry-after": "0.1"})
+        return SimpleNamespace(data=[SimpleNamespace(index=i, embedding=[1.0, 0.0]) for i in range(len(input))])
+
+    monkeypatch.setattr(llm, "get_llm_client", lambda: SimpleNamespace(embeddings=SimpleNamespace(create=create)))
+    vectors = await llm.embed_texts(["a", "b"], model="text-embedding-3-small", cache=EmbeddingCache(":memory:"))
+
+    assert vectors.shape == (2, 2)
+    assert attempts[1] - attempts[0] >= 0.1
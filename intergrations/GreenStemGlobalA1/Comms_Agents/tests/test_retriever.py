@@ -0,0 +1,238 @@
+"""
+Tests for the retriever tool and its hybrid search index.
+"""
+
+import numpy as np
+import pytest
+
+from tools import retriever
+from tools.search_index import SearchIndex, hash_embedding, tokenize
+
+
+@pytest.fixture
+def index():
+    """Small index with distinct topics."""
+    idx = SearchIndex()
+    idx.add("eudr", "EUDR deforestation due diligence for Kenyan smallholders", {"tags": ["eudr"]})
+    idx.add("mech", "Mechanization as a service for tractors and harvest", {"tags": ["mechanization"]})
+    idx.add("coffee", "Coffee smallholders traceability and cooperative payments", {"tags": ["coffee"]})
+    return idx
+
+
+def test_tokenize_drops_stopwords():
+    """Tokenizer lowercases and removes stopwords."""
+    assert tokenize("The EUDR and the Smallholders") == ["eudr", "smallholders"]
+
+
+def test_hash_embedding_is_normalised():
+    """Built-in embeddings are deterministic unit vectors."""
+    vector = hash_embedding("smallholder traceability")
+    assert np.isclose(np.linalg.norm(vector), 1.0)
+    assert np.array_equal(vector, hash_embedding("smallholder traceability"))
+
+
+def test_bm25_ranks_matching_document_first(index):
+    """Keyword search puts the best BM25 match first."""
+    results = index.search("tractors harvest", mode="bm25")
+    assert results[0]["id"] == "mech"
+    assert all(r["bm25"] > 0 for r in results)
+
+
+def test_hybrid_fuses_rankings(index):
+    """Hybrid search returns fused scores for documents from both rankings."""
+    results = index.search("smallholders", limit=2)
+    assert {r["id"] for r in results} == {"eudr", "coffee"}
+    assert results[0]["score"] >= results[1]["score"]
+
+
+def test_unrelated_query_returns_nothing(index):
+    """Documents without any keyword or vector similarity are not results."""
+    assert index.search("volcano") == []
+    assert index.search("volcano", mode="vector") == []
+
+
+def test_replace_and_remove(index):
+    """Re-adding an id replaces it; removed ids disappear from results."""
+    index.add("mech", "Solar irrigation pumps", {"tags": ["energy"]})
+    assert index.search("tractors", mode="bm25") == []
+    assert index.search("irrigation", mode="bm25")[0]["id"] == "mech"
+
+    assert index.remove("mech")
+    assert "mech" not in index
+    assert len(index) == 2
+
+
+def test_filter_fn(index):
+    """Metadata filters apply before ranking."""
+    results = index.search("smallholders", filter_fn=lambda m: "coffee" in m["tags"])
+    assert [r["id"] for r in results] == ["coffee"]
+
+
+def test_one_embedding_space_per_index(index, caplog):
+    """Vectors of another dimension are rejected; such queries rank by BM25."""
+    assert index.dim == 256
+    with pytest.raises(ValueError, match="dimension 1536"):
+        index.add("model", "Model embedded document", embedding=np.ones(1536))
+    assert "model" not in index
+
+    results = index.search("tractors", query_embedding=np.ones(1536))
+    assert results[0]["id"] == "mech"
+    assert results[0]["cosine"] is None
+    assert "ranking by BM25 only" in caplog.text
+
+
+def test_save_and_load_round_trip(index, tmp_path):
+    """A persisted index returns the same results after loading."""
+    index.remove("coffee")
+    index.save(str(tmp_path))
+    loaded = SearchIndex.load(str(tmp_path))
+
+    assert len(loaded) == len(index)
+    assert loaded.search("deforestation") == index.search("deforestation")
+
+
+@pytest.fixture
+def knowledge_store(tmp_path, monkeypatch):
+    """Point the retriever at a fresh on-disk knowledge store."""
+    monkeypatch.setattr(retriever, "KNOWLEDGE_DB_PATH", str(tmp_path / "knowledge.db"))
+    monkeypatch.setattr(retriever, "INDEX_DIR", None)
+    monkeypatch.setattr(retriever, "_STORE", None)
+    monkeypatch.setattr(retriever, "_SEARCH_INDEX", None)
+    retriever._INDEX.clear()
+    yield retriever._get_store()
+    retriever._get_store().close()
+
+
+def test_search_knowledge_with_tags(tmp_path, knowledge_store):
+    """search_knowledge uses the index and filters by tags."""
+    first = tmp_path / "eudr.md"
+    first.write_text("# EUDR\nDue diligence for smallholders #eudr", encoding="utf-8")
+    second = tmp_path / "mech.md"
+    second.write_text("# Tractors\nShared tractors for smallholders #mechanization", encoding="utf-8")
+    retriever.index_path(str(first))
+    retriever.index_path(str(second))
+
+    results = retriever.search_knowledge("smallholders", tags=["mechanization"])
+    assert [r["path"] for r in results] == [str(second)]
+
+    # A model-sized query vector against hash embeddings still gets keyword results
+    results = retriever.search_knowledge("tractors", query_embedding=[0.1] * 1536)
+    assert [r["path"] for r in results] == [str(second)]
+
+    # A model-sized document vector is rejected before the store records it
+    third = tmp_path / "coffee.md"
+    third.write_text("# Coffee\nTraceability for coffee cooperatives", encoding="utf-8")
+    assert retriever.index_path(str(third), embedding=[0.1] * 1536) == ([], 0)
+    assert knowledge_store.get(str(third)) is None
+
+    saved = retriever.save_index(str(tmp_path / "index"))
+    retriever.clear_index()
+    assert retriever.load_index(saved) == 2
+    assert retriever.get_index_stats()["total_files"] == 2
+
+
+def test_sync_knowledge_base_is_incremental(tmp_path, knowledge_store, monkeypatch):
+    """Only added or changed files are re-extracted on sync."""
+    cards = tmp_path / "cards"
+    cards.mkdir()
+    (cards / "a.md").write_text("# A\nSoil carbon credits for farmers", encoding="utf-8")
+    (cards / "b.md").write_text("# B\nCold chain logistics for exports", encoding="utf-8")
+
+    assert retriever.sync_knowledge_base([str(cards)])["added"] == 2
+
+    extracted = []
+    original = retriever._extract_metadata
+    monkeypatch.setattr(knowledge_store, "extractor", lambda c: extracted.append(c) or original(c))
+
+    (cards / "b.md").write_text("# B\nCold chain logistics for avocado exports", encoding="utf-8")
+    (cards / "a.md").unlink()
+    totals = retriever.sync_knowledge_base([str(cards)])
+
+    assert totals == {"added": 0, "updated": 1, "unchanged": 0, "removed": 1}
+    assert len(extracted) == 1
+    assert [r["path"] for r in retriever.search_knowledge("avocado")] == [str(cards / "b.md")]
+    assert retriever.search_knowledge("carbon", mode="bm25") == []
+
+    record = knowledge_store.get(str(cards / "b.md"))
+    assert record["last_indexed"] != "now"
+
+
+@pytest.mark.asyncio
+async def test_sync_with_model_embeddings(tmp_path, knowledge_store, monkeypatch):
+    """Model mode embeds new and changed documents; a hash-built index is rebuilt."""
+    cards = tmp_path / "cards"
+    cards.mkdir()
+    (cards / "a.md").write_text("# A\nSoil carbon credits for farmers", encoding="utf-8")
+    (cards / "b.md").write_text("# B\nCold chain logistics for exports", encoding="utf-8")
+    retriever.sync_knowledge_base([str(cards)])
+    assert retriever._get_search_index().dim == 256
+
+    embedded = []
+
+    async def embed_texts(texts):
+        embedded.append(len(texts))
+        return np.stack([hash_embedding(text, dim=8) for text in texts])
+
+    monkeypatch.setattr(retriever, "KNOWLEDGE_EMBEDDINGS", "model")
+    monkeypatch.setattr(retriever, "embed_texts", embed_texts)
+    retriever.sync_knowledge_base([str(cards)])
+    assert await retriever.embed_knowledge_base() == 2
+    assert retriever._get_search_index().dim == 8
+
+    (cards / "b.md").write_text("# B\nCold chain logistics for avocado exports", encoding="utf-8")
+    assert retriever.sync_knowledge_base([str(cards)])["updated"] == 1
+    # Until embedded, the changed document is not searchable
+    assert retriever.search_knowledge("avocado", mode="bm25") == []
+    assert await retriever.embed_knowledge_base() == 1
+    assert await retriever.embed_knowledge_base() == 0
+
+    assert embedded == [2, 1]
+    hits = retriever.search_knowledge("avocado", query_embedding=hash_embedding("avocado", dim=8))
+    assert hits[0]["path"] == str(cards / "b.md") and hits[0]["cosine"] is not None
+
+
+def test_parse_issue_card_fields(tmp_path):
+    """Every field is extracted; explicit priority levels are returned as-is."""
+    content = (
+        "# Buyer onboarding\n"
+        "Onboard the Kenyan avocado buyer before harvest.\n"
+        "Tags: Exports #EUDR [eudr]\n"
+        "Priority: High, this is also urgent\n"
+        "Source: Green Stem field report\n"
+        "See https://example.com/eudr.\n"
+    )
+    card = retriever._parse_issue_card(content, tmp_path / "buyer_card.md")
+
+    assert card["title"] == "Buyer onboarding"
+    assert card["tldr"] == "Onboard the Kenyan avocado buyer before harvest."
+    assert card["tags"] == ["eudr", "exports #eudr [eudr]"]
+    assert card["priority"] == "high"
+    assert card["sources"] == ["Green Stem field report"]
+    assert card["links"] == ["https://example.com/eudr"]
+
+
+def test_parse_issue_card_falls_back_to_file_name(tmp_path):
+    """Cards without a heading are titled from the file name."""
+    card = retriever._parse_issue_card("Priority: 6 Référence: none", tmp_path / "cold_chain.md")
+    assert card["title"] == "Cold Chain"
+    assert card["priority"] == "medium"
+    assert card["tags"] == []
+
+
+def test_retrieve_context_is_cached_until_card_changes(tmp_path, monkeypatch):
+    """Repeated lookups reuse the parsed card; editing the file re-parses it."""
+    retriever.clear_index()
+    card = tmp_path / "card.md"
+    card.write_text("# First\nOriginal summary.", encoding="utf-8")
+    parses = []
+    parse = retriever._parse_issue_card
+    monkeypatch.setattr(retriever, "_parse_issue_card", lambda *a: parses.append(1) or parse(*a))
+
+    first = retriever.retrieve_context(str(card))
+    first["links"].append("mutated")
+    assert retriever.retrieve_context(str(card))["links"] == []
+    assert len(parses) == 1
+
+    card.write_text("# Second title\nEdited summary.", encoding="utf-8")
+    assert retriever.retrieve_context(str(card))["title"] == "Second title"
+    assert len(parses) == 2
@@ -0,0 +1,113 @@
+"""
+Tests for write-behind agent run logging.
+"""
+
+import asyncio
+import json
+
+import pytest
+
+from tools import run_logger
+from tools.run_logger import AgentRunLogger, log_agent_run
+
+
+class FakeWriter:
+    """Records batches; raises while .down is set."""
+
+    def __init__(self, delay: float = 0):
+        self.batches = []
+        self.down = False
+        self.delay = delay
+
+    async def __call__(self, records):
+        await asyncio.sleep(self.delay)
+        if self.down:
+            raise ConnectionError("database unavailable")
+        self.batches.append(list(records))
+        return len(records)
+
+    @property
+    def written(self):
+        return [record for batch in self.batches for record in batch]
+
+
+@pytest.fixture
+def writer():
+    return FakeWriter()
+
+
+@pytest.fixture
+def run_log(monkeypatch, tmp_path, writer):
+    """A process-wide logger with a fake writer and a temporary spill dir."""
+    logger = AgentRunLogger(writer, batch_size=10, flush_interval=60, spill_dir=str(tmp_path))
+    monkeypatch.setattr(run_logger, "_run_logger", logger)
+    monkeypatch.setattr(run_logger, "_run_logger_pid", run_logger.os.getpid())
+    monkeypatch.setattr(run_logger, "RUN_LOG_RETRY_SECONDS", 60)
+    return logger
+
+
+@pytest.mark.asyncio
+async def test_full_batches_flush_without_blocking_the_caller(run_log, writer):
+    writer.delay = 0.05
+    payload = {"audience": "buyer"}
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    for i in range(25):
+        log_agent_run("scribe", payload, {"n": i}, execution_time_ms=12.7)
+    payload["audience"] = "changed"
+    assert loop.time() - started < 0.05
+    assert writer.batches == []
+
+    # The first full batch wakes the flusher, which drains the queue
+    await asyncio.sleep(0.3)
+    assert [len(batch) for batch in writer.batches] == [10, 10, 5]
+    assert run_log.pending == 0
+
+    await run_logger.close_run_logger()
+    record = writer.written[0]
+    assert len(writer.written) == 25
+    assert record["input_data"] == {"audience": "buyer"}
+    assert record["execution_time_ms"] == 12
+    assert record["completed_at"] > record["started_at"]
+
+
+@pytest.mark.asyncio
+async def test_partial_batches_flush_on_the_interval(run_log, writer):
+    run_log.flush_interval = 0.02
+    log_agent_run("liaison", {}, {})
+    await asyncio.sleep(0.1)
+    assert len(writer.written) == 1
+    await run_log.close()
+
+
+@pytest.mark.asyncio
+async def test_unavailable_database_spills_to_disk_then_replays(run_log, writer, tmp_path, monkeypatch):
+    writer.down = True
+    for i in range(15):
+        log_agent_run("scribe", {"i": i}, {})
+    assert await run_log.flush() == 0
+    spilled = [json.loads(line) for path in tmp_path.glob("agent_runs-*.jsonl") for line in path.open()]
+    assert [record["input_data"]["i"] for record in spilled] == list(range(15))
+
+    # While backing off, new runs go straight to disk
+    log_agent_run("scribe", {"i": 15}, {})
+    await run_log.flush()
+    assert writer.batches == []
+
+    writer.down = False
+    monkeypatch.setattr(run_log, "_retry_at", 0)
+    log_agent_run("scribe", {"i": 16}, {})
+    assert await run_log.close() == 17
+    assert [record["input_data"]["i"] for record in writer.written] == list(range(17))
+    assert writer.written[0]["started_at"].tzinfo is not None
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_runs_queued_without_a_loop_are_spilled_at_exit(run_log, tmp_path):
+    log_agent_run("scribe", {"i": 0}, {"post": "draft"})
+    assert run_log.pending == 1
+
+    run_logger._spill_at_exit()
+    (path,) = tmp_path.glob("agent_runs-*.jsonl")
+    assert json.loads(path.read_text())["output_data"] == {"post": "draft"}
+    assert run_log.pending == 0
@@ -72,3 +72,70 @@ def test_scribe_output_structure():
     assert len(output.citations) == 1
     assert output.metadata["test"] == "data"
 
+
+
+@pytest.mark.asyncio
+async def test_scribe_batch_covers_matrix_with_one_card_read(monkeypatch):
+    """A batch run reads the card once and returns every audience x tone variant."""
+    from agents import scribe
+    from app.deps import Audience, Tone, ScribeBatchIn
+
+    reads = []
+    context = {"title": "EUDR", "tldr": "Smallholder due diligence.", "links": ["https://example.com"]}
+    monkeypatch.setattr(scribe, "retrieve_context", lambda path: reads.append(path) or dict(context))
+
+    result = await ScribeAgent().run_batch(ScribeBatchIn(issue_card_path="issue_cards/eudr.md"))
+
+    assert reads == ["issue_cards/eudr.md"]
+    assert len(result.variants) == len(Audience) * len(Tone)
+    assert {(v.audience, v.tone) for v in result.variants} == {(a, t) for a in Audience for t in Tone}
+    assert all(v.output.metadata["tone"] == v.tone.value for v in result.variants)
+    assert all(v.latency_ms >= 0 for v in result.variants)
+    assert result.metadata["failed_variants"] == 0
+
+
+@pytest.mark.asyncio
+async def test_scribe_batch_reports_tokens_and_failures(monkeypatch):
+    """LLM variants carry token counts; a failing variant does not sink the batch."""
+    from agents import scribe
+    from app.deps import ScribeBatchIn
+
+    monkeypatch.setattr(scribe, "retrieve_context", lambda path: {"title": "EUDR", "tldr": "", "links": []})
+    agent = ScribeAgent()
+
+    async def generate(payload, context):
+        if payload.tone.value == "humor-light":
+            raise RuntimeError("provider down")
+        return ScribeOut(linkedin_post="Post body", x_thread=["One", "Two"], comments_pack=[], citations=[],
+                         metadata={"generation_method": "llm"})
+
+    monkeypatch.setattr(agent, "_generate_content", generate)
+    result = await agent.run_batch(ScribeBatchIn(
+        issue_card_path="issue_cards/eudr.md", audiences=["buyer"], tones=["boardroom", "humor-light"],
+    ))
+
+    ok, failed = result.variants
+    assert ok.prompt_tokens > 0 and ok.completion_tokens > 0
+    assert failed.output is None and failed.error == "provider down"
+    assert result.prompt_tokens == ok.prompt_tokens
+    assert result.metadata["failed_variants"] == 1
+
+
+@pytest.mark.asyncio
+async def test_scribe_batch_counts_template_fallback_as_failure(monkeypatch):
+    """With an LLM configured, a variant that fell back to the template is a failure."""
+    from agents import scribe
+    from app.deps import ScribeBatchIn
+
+    async def generate_text(prompt, **kwargs):
+        return "[Generated content placeholder]"
+
+    monkeypatch.setattr(scribe, "retrieve_context", lambda path: {"title": "EUDR", "tldr": "", "links": []})
+    monkeypatch.setattr(scribe, "get_llm_client", lambda: object())
+    monkeypatch.setattr(scribe, "generate_text", generate_text)
+    result = await ScribeAgent().run_batch(ScribeBatchIn(
+        issue_card_path="issue_cards/eudr.md", audiences=["buyer"], tones=["boardroom", "humor-light"],
+    ))
+
+    assert all(v.output is None and "template fallback" in v.error for v in result.variants)
+    assert result.metadata["failed_variants"] == 2
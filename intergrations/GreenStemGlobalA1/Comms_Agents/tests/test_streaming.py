@@ -0,0 +1,130 @@
+"""
+Tests for streamed LLM output, incremental sections and SSE endpoints.
+"""
+
+import json
+from types import SimpleNamespace
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from agents import liaison, scribe
+from app.deps import ScribeIn
+from app.streaming import streaming_router
+from tools import llm
+from tools.llm_cache import LRUBackend, ResponseCache
+from tools.streaming import SectionParser, split_items
+
+SCRIBE_RESPONSE = (
+    "Sure, here you go.\n"
+    "### LinkedIn Post\nEUDR is coming.\nAre you ready?\n"
+    "### X Thread\n1/ EUDR is coming\n2/ Smallholders need help\n"
+    "### Comments\n- Good point\n- Agreed\n- Timelines?\n"
+    "### Citations\n- https://example.com/eudr"
+)
+
+
+class FakeCompletions:
+    """OpenAI-style streaming completions that split a response into chunks."""
+
+    def __init__(self, text, chunk_size=5):
+        self.text = text
+        self.chunk_size = chunk_size
+        self.calls = 0
+
+    async def create(self, model, messages, max_tokens, temperature, stream=False, **kwargs):
+        self.calls += 1
+        assert stream
+
+        async def chunks():
+            for i in range(0, len(self.text), self.chunk_size):
+                delta = SimpleNamespace(content=self.text[i:i + self.chunk_size])
+                yield SimpleNamespace(choices=[SimpleNamespace(delta=delta)])
+
+        return chunks()
+
+
+@pytest.fixture
+def streaming_client(monkeypatch):
+    completions = FakeCompletions(SCRIBE_RESPONSE)
+    client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    for module in (llm, scribe, liaison):
+        monkeypatch.setattr(module, "get_llm_client", lambda: client)
+    cache = ResponseCache(LRUBackend())
+    monkeypatch.setattr(llm, "get_response_cache", lambda: cache)
+    return completions
+
+
+def test_section_parser_handles_any_chunking():
+    """Sections complete when the next heading arrives, however the text is split."""
+    parser = SectionParser(scribe.SCRIBE_SECTIONS)
+    completed = []
+    for i, char in enumerate(SCRIBE_RESPONSE):
+        for name, _ in parser.feed(char):
+            completed.append((name, i))
+    completed.extend((name, None) for name, _ in parser.close())
+
+    assert [name for name, _ in completed] == ["linkedin_post", "x_thread", "comments_pack", "citations"]
+    assert completed[0][1] == SCRIBE_RESPONSE.index("### X Thread") + len("### X Thread")
+    assert parser.sections["linkedin_post"] == "EUDR is coming.\nAre you ready?"
+    assert split_items(parser.sections["x_thread"]) == ["EUDR is coming", "Smallholders need help"]
+
+
+@pytest.mark.asyncio
+async def test_stream_text_yields_chunks_and_caches(streaming_client):
+    chunks = [chunk async for chunk in llm.stream_text("prompt")]
+    assert len(chunks) > 1 and "".join(chunks) == SCRIBE_RESPONSE
+
+    cached = [chunk async for chunk in llm.stream_text("prompt")]
+    assert cached == [SCRIBE_RESPONSE]
+    assert streaming_client.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_stream_text_anthropic_events(monkeypatch):
+    async def create(model, messages, max_tokens, temperature, stream=False, **kwargs):
+        async def events():
+            yield SimpleNamespace(type="message_start")
+            for text in ("Hel", "lo"):
+                yield SimpleNamespace(type="content_block_delta", delta=SimpleNamespace(text=text))
+        return events()
+
+    client = SimpleNamespace(messages=SimpleNamespace(create=create))
+    monkeypatch.setattr(llm, "get_llm_client", lambda: client)
+    assert [chunk async for chunk in llm.stream_text("prompt", cache=False)] == ["Hel", "lo"]
+
+
+@pytest.mark.asyncio
+async def test_scribe_stream_emits_sections_before_completion(streaming_client):
+    payload = ScribeIn(issue_card_path="issue_cards/eudr_smallholders.md", audience="buyer", tone="boardroom")
+    events = [event async for event in scribe.ScribeAgent().stream(payload)]
+
+    kinds = [event["event"] for event in events]
+    first_section = kinds.index("section")
+    assert "token" in kinds[first_section:]
+    assert events[first_section]["data"] == {"name": "linkedin_post", "value": "EUDR is coming.\nAre you ready?"}
+
+    done = events[-1]
+    assert done["event"] == "done"
+    assert done["data"]["x_thread"] == ["EUDR is coming", "Smallholders need help"]
+    assert done["data"]["citations"] == ["https://example.com/eudr"]
+    assert done["data"]["metadata"]["generation_method"] == "llm"
+
+
+def test_liaison_sse_endpoint_in_fallback_mode(monkeypatch):
+    """Without an LLM the endpoint still streams template sections, then done."""
+    monkeypatch.setattr(liaison, "get_llm_client", lambda: None)
+    app = FastAPI()
+    app.include_router(streaming_router)
+
+    response = TestClient(app).post("/outreach/liaison/stream", json={
+        "target_profile": "Jane", "campaign_goal": "pilot", "hooks": ["coffee"], "platform": "linkedin",
+    })
+
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = [block.split("\n") for block in response.text.strip().split("\n\n")]
+    names = [lines[0].removeprefix("event: ") for lines in events]
+    assert names == ["section"] * 4 + ["done"]
+    done = json.loads(events[-1][1].removeprefix("data: "))
+    assert done["email"].startswith("Subject: Exploring pilot")
@@ -0,0 +1,154 @@
+"""
+Tests for JSON extraction, schema validation and structured generation.
+"""
+
+from types import SimpleNamespace
+
+import pytest
+
+from tools import llm
+from tools.llm_cache import LRUBackend, ResponseCache
+from tools.structured_output import (
+    JSONStreamExtractor,
+    StructuredOutputError,
+    compile_schema,
+    extract_json_candidates,
+    parse_structured,
+)
+
+SCHEMA = {
+    "title": {"type": "string"},
+    "tags": {"type": "array", "items": {"type": "string"}},
+    "priority": {"type": "string", "enum": ["low", "medium", "high"]},
+}
+
+
+def test_extracts_from_fences_prose_and_multiple_objects():
+    text = (
+        'Here is {some} context.\n```json\n{"title": "Fenced", "tags": [], "priority": "low"}\n```\n'
+        'Alternatively {"title": "Inline } brace", "tags": ["a"], "priority": "high"} trailing text'
+    )
+    candidates = extract_json_candidates(text)
+    assert candidates[0].startswith('{"title": "Fenced"')
+    assert '{"title": "Inline } brace", "tags": ["a"], "priority": "high"}' in candidates
+    assert parse_structured(text, SCHEMA)["title"] == "Fenced"
+
+
+def test_first_schema_match_wins_and_trailing_commas_are_repaired():
+    text = 'Draft: {"title": 1} Final: {"title": "Ok", "tags": ["x",], "priority": "medium",}'
+    assert parse_structured(text, SCHEMA) == {"title": "Ok", "tags": ["x"], "priority": "medium"}
+
+
+def test_stray_brace_in_prose_does_not_hide_json():
+    text = 'Note the { in this sentence. {"title": "t", "tags": [], "priority": "low"}'
+    assert parse_structured(text, SCHEMA)["title"] == "t"
+
+
+def test_validation_errors_name_the_field():
+    with pytest.raises(StructuredOutputError, match="priority"):
+        parse_structured('{"title": "t", "tags": [], "priority": "urgent"}', SCHEMA)
+    with pytest.raises(StructuredOutputError, match="no JSON object"):
+        parse_structured("no json here", SCHEMA)
+
+
+def test_stream_extractor_completes_objects_across_chunks():
+    extractor = JSONStreamExtractor()
+    stream = 'ok [1, {"a": "}\\""}] then {"b": 2}'
+    completed = []
+    for i in range(0, len(stream), 3):
+        completed.extend(extractor.feed(stream[i:i + 3]))
+    assert completed == ['[1, {"a": "}\\""}]', '{"b": 2}']
+
+
+def test_schemas_compile_once():
+    assert compile_schema(dict(SCHEMA)) is compile_schema(dict(reversed(list(SCHEMA.items()))))
+    json_schema = {"type": "object", "properties": {"n": {"type": "integer"}}, "required": []}
+    assert compile_schema(json_schema).validate({}) == {"n": None}
+
+
+class FakeCompletions:
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.calls = []
+
+    async def create(self, **kwargs):
+        self.calls.append(kwargs)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=self.responses.pop(0)))])
+
+
+@pytest.fixture
+def fake_chat(monkeypatch):
+    def install(*responses):
+        completions = FakeCompletions(responses)
+        client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+        monkeypatch.setattr(llm, "get_llm_client", lambda: client)
+        return completions
+    return install
+
+
+@pytest.mark.asyncio
+async def test_generate_structured_output_uses_json_mode(fake_chat):
+    completions = fake_chat('{"title": "T", "tags": ["eudr"], "priority": "high"}')
+    result = await llm.generate_structured_output("Summarize", SCHEMA, cache=False)
+
+    assert result == {"title": "T", "tags": ["eudr"], "priority": "high"}
+    assert completions.calls[0]["response_format"] == {"type": "json_object"}
+
+
+@pytest.mark.asyncio
+async def test_invalid_output_gets_one_repair_attempt(fake_chat):
+    completions = fake_chat('{"title": "T"}', 'Fixed:\n```json\n{"title": "T", "tags": [], "priority": "low"}\n```')
+    result = await llm.generate_structured_output("Summarize", SCHEMA, cache=False)
+
+    assert result["priority"] == "low"
+    assert len(completions.calls) == 2
+    assert "did not match the schema" in completions.calls[1]["messages"][0]["content"]
+
+
+@pytest.mark.asyncio
+async def test_only_valid_responses_are_cached(fake_chat, monkeypatch):
+    cache = ResponseCache(LRUBackend(max_entries=8, ttl=60))
+    monkeypatch.setattr(llm, "get_response_cache", lambda: cache)
+    valid = '{"title": "T", "tags": [], "priority": "low"}'
+    completions = fake_chat('{"title": "T"}', valid, valid)
+
+    assert (await llm.generate_structured_output("Summarize", SCHEMA))["priority"] == "low"
+    assert len(cache.backend) == 0
+
+    # The invalid first reply was not cached, so this asks again and caches the valid one
+    await llm.generate_structured_output("Summarize", SCHEMA)
+    assert len(completions.calls) == 3 and len(cache.backend) == 1
+    assert (await llm.generate_structured_output("Summarize", SCHEMA))["title"] == "T"
+    assert len(completions.calls) == 3
+
+
+@pytest.mark.asyncio
+async def test_exhausted_repairs_raise_when_asked(fake_chat):
+    fake_chat("nope", "still nope")
+    with pytest.raises(StructuredOutputError):
+        await llm.generate_structured_output("Summarize", SCHEMA, cache=False, raise_on_failure=True)
+
+
+@pytest.mark.asyncio
+async def test_provider_failure_is_not_repaired(fake_chat):
+    completions = fake_chat()  # Every call raises
+    with pytest.raises(StructuredOutputError, match="LLM generation failed"):
+        await llm.generate_structured_output("Summarize", SCHEMA, cache=False, raise_on_failure=True)
+    assert len(completions.calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_anthropic_forced_tool_use(monkeypatch):
+    calls = []
+
+    async def create(**kwargs):
+        calls.append(kwargs)
+        block = SimpleNamespace(type="tool_use", input={"title": "T", "tags": [], "priority": "medium"})
+        return SimpleNamespace(content=[block])
+
+    monkeypatch.setattr(llm, "get_llm_client", lambda: SimpleNamespace(messages=SimpleNamespace(create=create)))
+    result = await llm.generate_structured_output("Summarize", SCHEMA, cache=False)
+
+    assert result["priority"] == "medium"
+    assert calls[0]["tool_choice"] == {"type": "tool", "name": "structured_output"}
+    assert calls[0]["tools"][0]["input_schema"]["required"] == ["title", "tags", "priority"]
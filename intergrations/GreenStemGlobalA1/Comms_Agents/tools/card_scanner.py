@@ -0,0 +1,139 @@
+"""
+Field extraction for issue cards and policy documents.
+
+Every pattern is compiled once at import. Case-insensitive markers (tags,
+priority, sources) are matched case-sensitively against a lowercased copy
+of ASCII content, which lets the regex engine jump straight to literal
+prefixes instead of trying every position; captured values are sliced
+from the original text so their case is kept. Non-ASCII content, where
+lowercasing can shift offsets, uses the IGNORECASE patterns instead.
+"""
+
+import re
+from pathlib import Path
+from typing import Any, Dict, Iterable, List
+
+_TAG_PATTERNS = (
+    r"#(\w+)",  # Hashtags
+    r"\[(\w+)\]",  # Bracketed tags
+    r"tags?:\s*([^\n]+)",  # Explicit tag declarations
+)
+_SOURCE_PATTERNS = (
+    r"sources?:\s*([^\n]+)",
+    r"references?:\s*([^\n]+)",
+    r"cited?:\s*([^\n]+)",
+)
+_PRIORITY_LEVEL_PATTERN = r"priority:\s*(high|medium|low|urgent)"
+_PRIORITY_SCORE_PATTERN = r"priority:\s*(\d+)"
+# Keyword rules in precedence order, after explicit levels and scores
+_PRIORITY_KEYWORDS = ((r"urgent|critical", "high"), (r"important", "medium"))
+
+
+def _compile_markers(flags: int) -> Dict[str, Any]:
+    return {
+        "tags": tuple(re.compile(p, flags) for p in _TAG_PATTERNS),
+        "sources": tuple(re.compile(p, flags) for p in _SOURCE_PATTERNS),
+        "priority_level": re.compile(_PRIORITY_LEVEL_PATTERN, flags),
+        "priority_score": re.compile(_PRIORITY_SCORE_PATTERN, flags),
+        "priority_keywords": tuple((re.compile(p, flags), value) for p, value in _PRIORITY_KEYWORDS),
+    }
+
+
+# Used on content.lower() for ASCII content, and on the raw content otherwise
+_FOLDED_MARKERS = _compile_markers(0)
+_IGNORECASE_MARKERS = _compile_markers(re.IGNORECASE)
+
+_TITLE_PATTERN = re.compile(r"^#\s+(.+)$", re.MULTILINE)
+_LINK_PATTERN = re.compile(r"https?://[^\s\)]+")
+# Same matches as r"\b[A-Z][a-z]+...": the lookbehind replaces the leading \b
+# so the engine can skip ahead to capital letters
+_ENTITY_PATTERN = re.compile(r"[A-Z](?<!\w[A-Z])[a-z]+(?:\s+[A-Z][a-z]+)*\b")
+_COMMON_WORDS = frozenset(
+    {"The", "This", "That", "These", "Those", "And", "Or", "But", "In", "On", "At", "To", "For", "Of", "With", "By"}
+)
+
+LINK_TRAILING_PUNCTUATION = ".,;:!?"
+TLDR_MIN_LENGTH = 20
+
+
+def dedupe(values: Iterable[str], lower: bool = False) -> List[str]:
+    """Strip, optionally lowercase, drop empties and duplicates; keeps first-seen order."""
+    cleaned = (value.strip().lower() if lower else value.strip() for value in values)
+    return list(dict.fromkeys(value for value in cleaned if value))
+
+
+def _captures(patterns, haystack: str, content: str) -> Iterable[str]:
+    """Group 1 of every match, pattern by pattern, sliced from the original content."""
+    for pattern in patterns:
+        for match in pattern.finditer(haystack):
+            start, end = match.span(1)
+            yield content[start:end]
+
+
+def _priority(markers: Dict[str, Any], haystack: str) -> str:
+    match = markers["priority_level"].search(haystack)
+    if match:
+        return match.group(1).lower()
+    match = markers["priority_score"].search(haystack)
+    if match:
+        score = int(match.group(1))
+        return "high" if score >= 8 else "medium" if score >= 5 else "low"
+    for pattern, value in markers["priority_keywords"]:
+        if pattern.search(haystack):
+            return value
+    return "medium"  # Default priority
+
+
+def scan_card(content: str) -> Dict[str, Any]:
+    """
+    Extract title heading, TL;DR, links, tags, priority and sources.
+
+    Args:
+        content: Raw file content
+
+    Returns:
+        Dictionary with title (None when there is no "# " heading), tldr,
+        links, tags, priority and sources
+    """
+    if content.isascii():
+        markers, haystack = _FOLDED_MARKERS, content.lower()
+    else:
+        markers, haystack = _IGNORECASE_MARKERS, content
+
+    heading = _TITLE_PATTERN.search(content) if "#" in content else None
+
+    return {
+        "title": heading.group(1).strip() if heading else None,
+        "tldr": extract_tldr(content),
+        "links": [link.rstrip(LINK_TRAILING_PUNCTUATION) for link in _LINK_PATTERN.findall(content)],
+        "tags": dedupe(_captures(markers["tags"], haystack, content), lower=True),
+        "priority": _priority(markers, haystack),
+        "sources": dedupe(_captures(markers["sources"], haystack, content)),
+    }
+
+
+def extract_tldr(content: str) -> str:
+    """First substantial line that is not a heading or a bare link."""
+    for line in content.splitlines():
+        cleaned = line.strip()
+        if cleaned and not cleaned.startswith("#") and not cleaned.startswith("http"):
+            if len(cleaned) > TLDR_MIN_LENGTH:
+                return cleaned
+    return "No TL;DR available"
+
+
+def fallback_title(path: Path) -> str:
+    """Title derived from a file name."""
+    return path.stem.replace("_", " ").title()
+
+
+def extract_entities(content: str, limit: int = 20) -> List[str]:
+    """Capitalised phrases that look like named entities."""
+    entities = []
+    for match in _ENTITY_PATTERN.finditer(content):
+        entity = match.group(0)
+        if entity not in _COMMON_WORDS and len(entity) > 2:
+            entities.append(entity)
+            if len(entities) == limit:
+                break
+    return entities
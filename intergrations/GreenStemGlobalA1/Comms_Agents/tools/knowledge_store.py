@@ -0,0 +1,287 @@
+"""
+Persistent knowledge index backed by SQLite FTS5.
+
+The store holds document text and embeddings; ranking is done by
+tools.search_index.SearchIndex, which the retriever builds from it.
+
+Each file is recorded with its mtime, size and content hash so re-indexing
+skips unchanged files without reading them, and only re-extracts files
+whose content actually changed.
+"""
+
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PATTERNS = ("*.md", "*.txt")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    mtime REAL NOT NULL,
+    size INTEGER NOT NULL,
+    content_hash TEXT NOT NULL,
+    tags TEXT NOT NULL,
+    entities TEXT NOT NULL,
+    content_length INTEGER NOT NULL,
+    file_type TEXT NOT NULL,
+    last_indexed TEXT NOT NULL,
+    embedding BLOB
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts USING fts5(
+    content, tags, entities, tokenize = 'porter unicode61'
+);
+"""
+
+# Extractor signature: content -> {"tags": [...], "entities": [...]}
+Extractor = Callable[[str], Dict[str, List[str]]]
+
+
+def _content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+class KnowledgeStore:
+    """
+    On-disk document index keyed by path.
+
+    Args:
+        db_path: SQLite database file (":memory:" for tests)
+        extractor: Produces tags and entities for changed files
+    """
+
+    def __init__(self, db_path: str, extractor: Extractor):
+        if db_path != ":memory:":
+            Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self.db_path = db_path
+        self.extractor = extractor
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    @staticmethod
+    def _to_record(row: sqlite3.Row) -> Dict[str, Any]:
+        return {
+            "path": row["path"],
+            "mtime": row["mtime"],
+            "content_hash": row["content_hash"],
+            "tags": json.loads(row["tags"]),
+            "entities": json.loads(row["entities"]),
+            "content_length": row["content_length"],
+            "file_type": row["file_type"],
+            "last_indexed": row["last_indexed"],
+        }
+
+    def get(self, path: str) -> Optional[Dict[str, Any]]:
+        """Stored record for a path, or None."""
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM documents WHERE path = ?", (path,)).fetchone()
+        return self._to_record(row) if row else None
+
+    def get_text(self, path: str) -> Optional[str]:
+        """Indexed content of a path, or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT f.content FROM documents d JOIN documents_fts f ON f.rowid = d.id "
+                "WHERE d.path = ?",
+                (path,),
+            ).fetchone()
+        return row[0] if row else None
+
+    def index_file(
+        self,
+        path: str,
+        tags: Optional[List[str]] = None,
+        embedding: Optional[Iterable[float]] = None,
+        force: bool = False,
+    ) -> Tuple[str, Optional[Dict[str, Any]], Optional[str]]:
+        """
+        Index one file if it changed.
+
+        Args:
+            path: File path (used as the key)
+            tags: Explicit tags; extracted from the content when omitted
+            embedding: Optional document embedding to store; without one, a
+                stored embedding is kept only while the content is unchanged
+            force: Re-extract even when the file looks unchanged
+
+        Returns:
+            Tuple of (status, record, content). status is "added", "updated",
+            "unchanged" or "missing"; content is only returned when the file
+            was read.
+        """
+        file_path = Path(path)
+        try:
+            stat = file_path.stat()
+        except FileNotFoundError:
+            return "missing", None, None
+
+        existing = self.get(path)
+        reusable = (
+            existing is not None
+            and not force
+            and embedding is None
+            and (tags is None or tags == existing["tags"])
+        )
+        # Cheap check first: same mtime and size means the file was not touched
+        if reusable:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT mtime, size FROM documents WHERE path = ?", (path,)
+                ).fetchone()
+            if row and row["mtime"] == stat.st_mtime and row["size"] == stat.st_size:
+                return "unchanged", existing, None
+
+        data = file_path.read_bytes()
+        digest = _content_hash(data)
+        if reusable and existing["content_hash"] == digest:
+            # Touched but identical: refresh the stat so the next run skips the read
+            with self._lock, self._conn:
+                self._conn.execute(
+                    "UPDATE documents SET mtime = ?, size = ? WHERE path = ?",
+                    (stat.st_mtime, stat.st_size, path),
+                )
+            return "unchanged", existing, None
+
+        content = data.decode("utf-8")
+        extracted = self.extractor(content)
+        tags = tags if tags is not None else extracted.get("tags", [])
+        entities = extracted.get("entities", [])
+        vector = np.asarray(embedding, dtype=np.float32).tobytes() if embedding is not None else None
+        record = {
+            "path": path,
+            "mtime": stat.st_mtime,
+            "content_hash": digest,
+            "tags": tags,
+            "entities": entities,
+            "content_length": len(content),
+            "file_type": file_path.suffix,
+            "last_indexed": datetime.now(timezone.utc).isoformat(),
+        }
+
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                INSERT INTO documents (path, mtime, size, content_hash, tags, entities,
+                                       content_length, file_type, last_indexed, embedding)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(path) DO UPDATE SET
+                    mtime = excluded.mtime, size = excluded.size,
+                    content_hash = excluded.content_hash, tags = excluded.tags,
+                    entities = excluded.entities, content_length = excluded.content_length,
+                    file_type = excluded.file_type, last_indexed = excluded.last_indexed,
+                    embedding = CASE WHEN excluded.content_hash = documents.content_hash
+                                     THEN COALESCE(excluded.embedding, documents.embedding)
+                                     ELSE excluded.embedding END
+                """,
+                (
+                    path, stat.st_mtime, stat.st_size, digest, json.dumps(tags),
+                    json.dumps(entities), len(content), file_path.suffix,
+                    record["last_indexed"], vector,
+                ),
+            )
+            doc_id = self._conn.execute(
+                "SELECT id FROM documents WHERE path = ?", (path,)
+            ).fetchone()[0]
+            self._conn.execute("DELETE FROM documents_fts WHERE rowid = ?", (doc_id,))
+            self._conn.execute(
+                "INSERT INTO documents_fts (rowid, content, tags, entities) VALUES (?, ?, ?, ?)",
+                (doc_id, content, " ".join(tags), " ".join(entities)),
+            )
+
+        return ("updated" if existing else "added"), record, content
+
+    def set_embeddings(self, embeddings: Dict[str, Iterable[float]]) -> None:
+        """Store document embeddings by path (cleared again when a file's content changes)."""
+        rows = [(np.asarray(vector, dtype=np.float32).tobytes(), path) for path, vector in embeddings.items()]
+        with self._lock, self._conn:
+            self._conn.executemany("UPDATE documents SET embedding = ? WHERE path = ?", rows)
+
+    def remove(self, path: str) -> bool:
+        """Drop a path from the index."""
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT id FROM documents WHERE path = ?", (path,)).fetchone()
+            if row is None:
+                return False
+            self._conn.execute("DELETE FROM documents_fts WHERE rowid = ?", (row[0],))
+            self._conn.execute("DELETE FROM documents WHERE id = ?", (row[0],))
+        return True
+
+    def paths(self, prefix: str = "") -> List[str]:
+        """Indexed paths, optionally under a prefix."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT path FROM documents WHERE substr(path, 1, ?) = ? ORDER BY path",
+                (len(prefix), prefix),
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def sync_directory(
+        self, root: str, patterns: Iterable[str] = DEFAULT_PATTERNS
+    ) -> Dict[str, List[str]]:
+        """
+        Bring the index in line with the files under a directory.
+
+        Returns:
+            Paths grouped by "added", "updated", "unchanged" and "removed"
+        """
+        result: Dict[str, List[str]] = {"added": [], "updated": [], "unchanged": [], "removed": []}
+        root_path = Path(root)
+        seen = set()
+        for pattern in patterns:
+            for file_path in sorted(root_path.rglob(pattern)):
+                if not file_path.is_file():
+                    continue
+                path = str(file_path)
+                if path in seen:
+                    continue
+                seen.add(path)
+                try:
+                    status, _, _ = self.index_file(path)
+                except (OSError, UnicodeDecodeError) as e:
+                    logger.error(f"Failed to index {path}: {e}")
+                    continue
+                if status != "missing":  # deleted while walking
+                    result[status].append(path)
+
+        prefix = str(root_path).rstrip("/") + "/"
+        for path in self.paths(prefix):
+            if path not in seen and self.remove(path):
+                result["removed"].append(path)
+
+        logger.info(
+            f"Synced {root}: {len(result['added'])} added, {len(result['updated'])} updated, "
+            f"{len(result['unchanged'])} unchanged, {len(result['removed'])} removed"
+        )
+        return result
+
+    def iter_documents(self) -> Iterator[Dict[str, Any]]:
+        """Every record with its content and stored embedding (if any)."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT d.*, f.content FROM documents d JOIN documents_fts f ON f.rowid = d.id"
+            ).fetchall()
+        for row in rows:
+            record = self._to_record(row)
+            record["content"] = row["content"]
+            record["embedding"] = (
+                np.frombuffer(row["embedding"], dtype=np.float32) if row["embedding"] else None
+            )
+            yield record
@@ -3,14 +3,37 @@ LLM tool for AI model interactions in Comms Agents.
 """
 
 import os
+import asyncio
 import logging
-from typing import Dict, Any, List, Optional, Union
+from functools import lru_cache
+from typing import Dict, Any, AsyncIterator, Callable, List, Optional, Union
 import json
 
+import numpy as np
+
+from .embedding_cache import EmbeddingCache, embedding_key
+from .llm_cache import cache_key, get_response_cache
+from .rate_limiter import LLM_RATE_LIMITER, call_with_limits
+from .structured_output import StructuredOutputError, compile_schema
+
 logger = logging.getLogger(__name__)
 
+# Embedding configuration
+DEFAULT_EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-ada-002")
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "data/embedding_cache.db")
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "256"))
+EMBEDDING_CONCURRENCY = int(os.getenv("EMBEDDING_CONCURRENCY", "4"))
+
+# SDK-level retries; off when the rate limiter retries (it honours shared pauses)
+LLM_CLIENT_MAX_RETRIES = 0 if LLM_RATE_LIMITER != "off" else 2
+
+# Structured output: repair attempts after an invalid response
+STRUCTURED_OUTPUT_RETRIES = int(os.getenv("STRUCTURED_OUTPUT_RETRIES", "1"))
+STRUCTURED_OUTPUT_TOOL = "structured_output"
+
 # LLM client cache
 _llm_client = None
+_embedding_cache = None
 
 
 def get_llm_client():
@@ -36,6 +59,19 @@ def get_llm_client():
         return None
 
 
+def reset_llm_client():
+    """
+    Drop the cached LLM client and embedding cache.
+    
+    Called in a freshly forked worker: the parent's HTTP connection pool
+    and SQLite handle must not be shared, so the next call builds new ones.
+    """
+    global _llm_client, _embedding_cache
+    
+    _llm_client = None
+    _embedding_cache = None
+
+
 def _initialize_llm_client():
     """Initialize the appropriate LLM client based on configuration."""
     # Check for OpenAI
@@ -73,7 +109,8 @@ def _init_openai_client():
         
         client = AsyncOpenAI(
             api_key=api_key,
-            base_url=base_url
+            base_url=base_url,
+            max_retries=LLM_CLIENT_MAX_RETRIES
         )
         
         logger.info("OpenAI client initialized")
@@ -95,7 +132,8 @@ def _init_anthropic_client():
         api_key = os.getenv("ANTHROPIC_API_KEY")
         
         client = AsyncAnthropic(
-            api_key=api_key
+            api_key=api_key,
+            max_retries=LLM_CLIENT_MAX_RETRIES
         )
         
         logger.info("Anthropic client initialized")
@@ -138,7 +176,8 @@ def _init_groq_client():
         api_key = os.getenv("GROQ_API_KEY")
         
         client = AsyncGroq(
-            api_key=api_key
+            api_key=api_key,
+            max_retries=LLM_CLIENT_MAX_RETRIES
         )
         
         logger.info("Groq client initialized")
@@ -207,74 +246,243 @@ class GeminiClient:
         return prompt.strip()
 
 
+class LLMGenerationError(RuntimeError):
+    """No text could be generated: no usable client, or the provider call failed."""
+
+
 async def generate_text(
     prompt: str,
     model: Optional[str] = None,
     max_tokens: int = 1000,
     temperature: float = 0.7,
+    cache: bool = True,
+    cache_if: Optional[Callable[[str], bool]] = None,
     **kwargs
 ) -> str:
     """
     Generate text using the configured LLM.
     
+    Responses are cached on (model, prompt, parameters) and identical
+    concurrent requests share one provider call (see tools.llm_cache).
+    Placeholder text returned on failure is never cached.
+    
     Args:
         prompt: Input prompt
         model: Model to use (optional, uses default if not specified)
         max_tokens: Maximum tokens to generate
         temperature: Sampling temperature
+        cache: Use the response cache (disable for deliberately varied output)
+        cache_if: Only cache responses this returns True for
         **kwargs: Additional parameters
         
     Returns:
         Generated text
     """
+    try:
+        return await _generate_text_or_raise(
+            prompt, model, max_tokens, temperature, cache=cache, cache_if=cache_if, **kwargs
+        )
+    except LLMGenerationError as e:
+        logger.error(f"{e}, returning placeholder text")
+        return _generate_placeholder_text(prompt)
+
+
+async def _generate_text_or_raise(
+    prompt: str,
+    model: Optional[str] = None,
+    max_tokens: int = 1000,
+    temperature: float = 0.7,
+    cache: bool = True,
+    cache_if: Optional[Callable[[str], bool]] = None,
+    **kwargs
+) -> str:
+    """generate_text without the placeholder fallback; raises LLMGenerationError."""
     client = get_llm_client()
     
     if not client:
-        logger.warning("No LLM client available, returning placeholder text")
-        return _generate_placeholder_text(prompt)
+        raise LLMGenerationError("No LLM client available")
+    
+    if not any(hasattr(client, attr) for attr in ('chat', 'messages', 'generate_content')):
+        raise LLMGenerationError(f"Unknown LLM client type {type(client).__name__}")
+    
+    model = model or _get_default_model(client)
+    
+    async def call() -> str:
+        return await call_with_limits(
+            _provider_name(client), model,
+            lambda: _complete(client, prompt, model, max_tokens, temperature, **kwargs),
+        )
     
     try:
-        if hasattr(client, 'chat'):
-            # OpenAI, Anthropic, Groq style
-            messages = [{"role": "user", "content": prompt}]
-            response = await client.chat.completions.create(
-                model=model or _get_default_model(client),
-                messages=messages,
-                max_tokens=max_tokens,
-                temperature=temperature,
-                **kwargs
-            )
-            return response.choices[0].message.content
-            
-        elif hasattr(client, 'generate_content'):
-            # Gemini style
-            response = await client.generate_content(
-                prompt,
-                generation_config={
-                    "max_output_tokens": max_tokens,
-                    "temperature": temperature,
-                    **kwargs
-                }
-            )
-            return response.text
-            
-        else:
-            logger.warning("Unknown LLM client type, using fallback")
-            return _generate_placeholder_text(prompt)
+        response_cache = get_response_cache() if cache else None
+        if response_cache is None:
+            return await call()
+        key = cache_key(model, prompt, {"max_tokens": max_tokens, "temperature": temperature, **kwargs})
+        return await response_cache.get_or_compute(key, call, cache_if)
             
     except Exception as e:
-        logger.error(f"Text generation failed: {e}")
-        return _generate_placeholder_text(prompt)
+        raise LLMGenerationError(f"Text generation failed: {e}") from e
+
+
+async def _complete(client, prompt: str, model: str, max_tokens: int, temperature: float, **kwargs) -> str:
+    """One provider call; raises on failure."""
+    if hasattr(client, 'messages'):
+        # Anthropic style
+        response = await client.messages.create(
+            model=model,
+            messages=[{"role": "user", "content": prompt}],
+            max_tokens=max_tokens,
+            temperature=temperature,
+            **kwargs
+        )
+        # Forced tool use (structured output) returns the arguments, not text
+        for block in response.content:
+            if block.type == "tool_use":
+                return json.dumps(block.input)
+        return "".join(block.text for block in response.content if block.type == "text")
+    
+    if hasattr(client, 'chat'):
+        # OpenAI, Anthropic, Groq style
+        messages = [{"role": "user", "content": prompt}]
+        response = await client.chat.completions.create(
+            model=model,
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            **kwargs
+        )
+        return response.choices[0].message.content
+    
+    # Gemini style
+    response = await client.generate_content(
+        prompt,
+        generation_config={
+            "max_output_tokens": max_tokens,
+            "temperature": temperature,
+            **kwargs
+        }
+    )
+    return response.text
+
+
+def _provider_name(client) -> str:
+    """Provider of a client ("openai", "anthropic", "groq", "gemini"), for rate limits."""
+    if isinstance(client, GeminiClient):
+        return "gemini"
+    return type(client).__module__.split(".")[0]
+
+
+def _supports_streaming(client) -> bool:
+    """Whether the client has a streaming chat API (OpenAI, Groq, Anthropic)."""
+    return hasattr(client, 'messages') or hasattr(getattr(client, 'chat', None), 'completions')
+
+
+async def stream_text(
+    prompt: str,
+    model: Optional[str] = None,
+    max_tokens: int = 1000,
+    temperature: float = 0.7,
+    cache: bool = True,
+    **kwargs
+) -> AsyncIterator[str]:
+    """
+    Stream generated text as the provider produces it.
+    
+    Shares the response cache with generate_text: a cached completion is
+    yielded as a single chunk, and a fully streamed one is stored. Clients
+    without a streaming API (and fallback mode) yield generate_text's result
+    as one chunk.
+    
+    Args:
+        prompt: Input prompt
+        model: Model to use (optional, uses default if not specified)
+        max_tokens: Maximum tokens to generate
+        temperature: Sampling temperature
+        cache: Use the response cache
+        **kwargs: Additional parameters
+        
+    Yields:
+        Text deltas
+        
+    Raises:
+        Exception: If the provider fails after part of the text was yielded
+    """
+    client = get_llm_client()
+    
+    if not client or not _supports_streaming(client):
+        yield await generate_text(prompt, model, max_tokens, temperature, cache=cache, **kwargs)
+        return
+    
+    model = model or _get_default_model(client)
+    response_cache = get_response_cache() if cache else None
+    key = cache_key(model, prompt, {"max_tokens": max_tokens, "temperature": temperature, **kwargs})
+    if response_cache is not None:
+        cached = await response_cache.get(key)
+        if cached is not None:
+            yield cached
+            return
+    
+    parts = []
+    try:
+        async for delta in _stream_completion(client, prompt, model, max_tokens, temperature, **kwargs):
+            parts.append(delta)
+            yield delta
+    except Exception as e:
+        if parts:
+            # The caller already has partial text; a placeholder would corrupt it
+            logger.error(f"Text streaming failed after {len(parts)} chunks: {e}")
+            raise
+        logger.error(f"Text streaming failed: {e}")
+        yield _generate_placeholder_text(prompt)
+        return
+    
+    if response_cache is not None:
+        await response_cache.set(key, "".join(parts))
+
+
+async def _stream_completion(client, prompt: str, model: str, max_tokens: int, temperature: float, **kwargs) -> AsyncIterator[str]:
+    """Text deltas from one streaming provider call; raises on failure."""
+    messages = [{"role": "user", "content": prompt}]
+    # Only opening the stream is rate limited and retried, never a partial stream
+    provider = _provider_name(client)
+    
+    if hasattr(client, 'messages'):
+        # Anthropic style: typed events, text arrives in content_block_delta
+        stream = await call_with_limits(provider, model, lambda: client.messages.create(
+            model=model,
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            stream=True,
+            **kwargs
+        ))
+        async for event in stream:
+            if event.type == "content_block_delta" and getattr(event.delta, "text", None):
+                yield event.delta.text
+        return
+    
+    # OpenAI, Groq style: chunks carry a delta per choice
+    stream = await call_with_limits(provider, model, lambda: client.chat.completions.create(
+        model=model,
+        messages=messages,
+        max_tokens=max_tokens,
+        temperature=temperature,
+        stream=True,
+        **kwargs
+    ))
+    async for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
 
 
 def _get_default_model(client) -> str:
     """Get default model for the client type."""
-    if hasattr(client, 'models'):
+    if hasattr(client, 'messages'):
+        # Anthropic style (checked first: recent Anthropic clients also have .models)
+        return "claude-3-sonnet-20240229"
+    elif hasattr(client, 'models'):
         # OpenAI style
         return "gpt-3.5-turbo"
-    elif hasattr(client, 'messages'):
-        # Anthropic style
-        return "claude-3-sonnet-20240229"
     elif hasattr(client, 'generate_content'):
         # Gemini style
         return "gemini-pro"
@@ -295,25 +503,91 @@ def _generate_placeholder_text(prompt: str) -> str:
         return "This is placeholder content. Please configure an LLM client for AI-generated content."
 
 
+@lru_cache(maxsize=16)
+def _token_encoding(model: Optional[str]):
+    """tiktoken encoding for a model, or None when tiktoken is unavailable."""
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model) if model else tiktoken.get_encoding("cl100k_base")
+    except KeyError:
+        # Non-OpenAI models: cl100k is a close enough approximation for accounting
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    """
+    Count tokens in text for usage accounting.
+    
+    Uses tiktoken when installed, otherwise estimates ~4 characters per token.
+    
+    Args:
+        text: Text to count
+        model: Model whose tokenizer to use (optional)
+        
+    Returns:
+        Number of tokens
+    """
+    if not text:
+        return 0
+    encoding = _token_encoding(model)
+    if encoding is None:
+        return max(1, len(text) // 4)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def _json_mode_kwargs(client, json_schema: Dict[str, Any]) -> Dict[str, Any]:
+    """Provider-native JSON parameters: forced tool use (Anthropic) or JSON mode (OpenAI, Groq)."""
+    if hasattr(client, 'messages'):
+        return {
+            "tools": [{
+                "name": STRUCTURED_OUTPUT_TOOL,
+                "description": "Record the response in the required structure.",
+                "input_schema": json_schema,
+            }],
+            "tool_choice": {"type": "tool", "name": STRUCTURED_OUTPUT_TOOL},
+        }
+    if hasattr(getattr(client, 'chat', None), 'completions'):
+        return {"response_format": {"type": "json_object"}}
+    return {}
+
+
 async def generate_structured_output(
     prompt: str,
     output_schema: Dict[str, Any],
+    json_mode: bool = True,
+    retries: int = STRUCTURED_OUTPUT_RETRIES,
+    raise_on_failure: bool = False,
+    cache: bool = True,
     **kwargs
 ) -> Dict[str, Any]:
     """
     Generate structured output using the configured LLM.
     
+    Uses the provider's JSON mode or forced tool use where available. The
+    response is searched for JSON (fenced blocks, surrounding prose, several
+    objects) and validated against the schema, which is compiled once. An
+    invalid response gets up to `retries` repair attempts that quote the
+    validation error back to the model. Only responses that validate are
+    cached, and repair attempts bypass the cache.
+    
     Args:
         prompt: Input prompt
-        output_schema: Expected output schema
+        output_schema: Expected output schema (JSON Schema or agent shorthand)
+        json_mode: Use provider-native JSON output when supported
+        retries: Repair attempts after an invalid response
+        raise_on_failure: Raise StructuredOutputError instead of returning
+            fallback values, so callers can tell the two apart
+        cache: Use the response cache for the first attempt
         **kwargs: Additional parameters
         
     Returns:
         Structured output matching the schema
     """
-    try:
-        # Add schema instructions to prompt
-        schema_prompt = f"""
+    validator = compile_schema(output_schema)
+    schema_prompt = f"""
 {prompt}
 
 Please provide your response in the following JSON format:
@@ -321,30 +595,44 @@ Please provide your response in the following JSON format:
 
 Ensure the response is valid JSON and matches the schema exactly.
 """
-        
-        # Generate text
-        response_text = await generate_text(schema_prompt, **kwargs)
-        
-        # Try to extract JSON from response
+    
+    client = get_llm_client()
+    if client and json_mode:
+        kwargs = {**_json_mode_kwargs(client, validator.json_schema), **kwargs}
+    
+    def is_valid(text: str) -> bool:
         try:
-            # Look for JSON in the response
-            json_start = response_text.find('{')
-            json_end = response_text.rfind('}') + 1
-            
-            if json_start >= 0 and json_end > json_start:
-                json_text = response_text[json_start:json_end]
-                return json.loads(json_text)
-            else:
-                logger.warning("No JSON found in LLM response")
-                return _create_fallback_output(output_schema)
-                
-        except json.JSONDecodeError as e:
-            logger.warning(f"Failed to parse JSON from LLM response: {e}")
-            return _create_fallback_output(output_schema)
-            
-    except Exception as e:
-        logger.error(f"Structured output generation failed: {e}")
-        return _create_fallback_output(output_schema)
+            validator.parse(text)
+        except StructuredOutputError:
+            return False
+        return True
+    
+    error = StructuredOutputError("no LLM client available")
+    attempt_prompt = schema_prompt
+    for attempt in range(retries + 1 if client else 0):
+        # A repair prompt quotes this attempt's error, so its reply is not reusable
+        try:
+            response_text = await _generate_text_or_raise(
+                attempt_prompt, cache=cache and attempt == 0, cache_if=is_valid, **kwargs
+            )
+        except LLMGenerationError as e:
+            # The provider failed rather than the model; a repair prompt cannot help
+            error = StructuredOutputError(f"LLM generation failed: {e}")
+            break
+        try:
+            return validator.parse(response_text)
+        except StructuredOutputError as e:
+            error = e
+            logger.warning(f"Structured output attempt {attempt + 1} invalid: {e}")
+            attempt_prompt = (
+                f"{schema_prompt}\nYour previous response did not match the schema ({e}). "
+                "Reply with only the corrected JSON object."
+            )
+    
+    if raise_on_failure:
+        raise error
+    logger.error(f"Structured output generation failed, using fallback values: {error}")
+    return _create_fallback_output(output_schema)
 
 
 def _create_fallback_output(schema: Dict[str, Any]) -> Dict[str, Any]:
@@ -367,6 +655,109 @@ def _create_fallback_output(schema: Dict[str, Any]) -> Dict[str, Any]:
     return fallback
 
 
+class EmbeddingError(RuntimeError):
+    """Embeddings could not be produced; raised instead of returning zero vectors."""
+
+
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    """Get the embedding cache at EMBEDDING_CACHE_PATH, or None when set to "off"."""
+    global _embedding_cache
+    
+    if _embedding_cache is None and EMBEDDING_CACHE_PATH and EMBEDDING_CACHE_PATH != "off":
+        _embedding_cache = EmbeddingCache(EMBEDDING_CACHE_PATH)
+    return _embedding_cache
+
+
+async def _embed_batch(client, model: str, batch: List[str]) -> np.ndarray:
+    """One embeddings API call; rows come back in input order."""
+    try:
+        response = await call_with_limits(
+            _provider_name(client), model, lambda: client.embeddings.create(model=model, input=batch)
+        )
+    except Exception as e:
+        raise EmbeddingError(f"Embedding request for {len(batch)} texts failed: {e}") from e
+    
+    data = sorted(response.data, key=lambda item: item.index)
+    if len(data) != len(batch):
+        raise EmbeddingError(f"Expected {len(batch)} embeddings, got {len(data)}")
+    return np.asarray([item.embedding for item in data], dtype=np.float32)
+
+
+async def embed_texts(
+    texts: List[str],
+    model: Optional[str] = None,
+    batch_size: int = EMBEDDING_BATCH_SIZE,
+    concurrency: int = EMBEDDING_CONCURRENCY,
+    cache: Optional[EmbeddingCache] = None
+) -> np.ndarray:
+    """
+    Generate embeddings for many texts.
+    
+    Texts already in the embedding cache are not sent to the provider;
+    the rest are deduplicated, split into batches of at most batch_size
+    and embedded with up to concurrency requests in flight. Each batch is
+    cached as soon as it arrives, so a failed run keeps its progress.
+    
+    Args:
+        texts: Texts to embed (must be non-empty strings)
+        model: Embedding model to use
+        batch_size: Inputs per API call
+        concurrency: Maximum concurrent API calls
+        cache: Embedding cache (defaults to get_embedding_cache())
+        
+    Returns:
+        float32 array of shape (len(texts), dim)
+        
+    Raises:
+        EmbeddingError: No client supports embeddings, or a request failed
+    """
+    model = model or DEFAULT_EMBEDDING_MODEL
+    cache = cache if cache is not None else get_embedding_cache()
+    empty = [i for i, text in enumerate(texts) if not text or not text.strip()]
+    if empty:
+        raise EmbeddingError(f"Cannot embed empty texts (positions {empty[:10]})")
+    if not texts:
+        return np.empty((0, 0), dtype=np.float32)
+    
+    keys = [embedding_key(model, text) for text in texts]
+    vectors = cache.get_many(set(keys)) if cache is not None else {}
+    pending = {key: text for key, text in zip(keys, texts) if key not in vectors}
+    
+    if pending:
+        client = get_llm_client()
+        if client is None or not hasattr(client, 'embeddings'):
+            raise EmbeddingError("No LLM client with embeddings support is configured")
+        
+        pending_keys = list(pending)
+        batches = [pending_keys[i:i + batch_size] for i in range(0, len(pending_keys), batch_size)]
+        semaphore = asyncio.Semaphore(concurrency)
+        
+        async def run(batch_keys: List[str]):
+            async with semaphore:
+                rows = await _embed_batch(client, model, [pending[key] for key in batch_keys])
+            embedded = dict(zip(batch_keys, rows))
+            if cache is not None:
+                cache.put_many(model, embedded)
+            vectors.update(embedded)
+        
+        logger.info(
+            f"Embedding {len(pending)} of {len(texts)} texts in {len(batches)} batches "
+            f"({len(texts) - len(pending)} cached)"
+        )
+        # Let every batch finish (and be cached) before surfacing a failure
+        results = await asyncio.gather(*(run(batch) for batch in batches), return_exceptions=True)
+        failures = [result for result in results if isinstance(result, BaseException)]
+        if failures:
+            if not isinstance(failures[0], EmbeddingError):
+                raise EmbeddingError(f"Embedding failed: {failures[0]}") from failures[0]
+            raise failures[0]
+    
+    dims = {vectors[key].shape[0] for key in keys}
+    if len(dims) != 1:
+        raise EmbeddingError(f"Embeddings have mixed dimensions {sorted(dims)}; was the model changed?")
+    return np.stack([vectors[key] for key in keys])
+
+
 async def embed_text(text: str, model: Optional[str] = None) -> List[float]:
     """
     Generate embeddings for text.
@@ -377,39 +768,12 @@ async def embed_text(text: str, model: Optional[str] = None) -> List[float]:
         
     Returns:
         Embedding vector
+        
+    Raises:
+        EmbeddingError: Embeddings are unavailable or the request failed
     """
-    client = get_llm_client()
-    
-    if not client:
-        logger.warning("No LLM client available for embeddings")
-        return [0.0] * 1536  # Default embedding size
-    
-    try:
-        if hasattr(client, 'embeddings'):
-            # OpenAI style
-            response = await client.embeddings.create(
-                model=model or "text-embedding-ada-002",
-                input=text
-            )
-            return response.data[0].embedding
-            
-        elif hasattr(client, 'messages'):
-            # Anthropic style
-            response = await client.messages.create(
-                model=model or "claude-3-sonnet-20240229",
-                max_tokens=1000,
-                messages=[{"role": "user", "content": text}]
-            )
-            # This is a placeholder - Anthropic doesn't have embeddings in the same way
-            return [0.0] * 1536
-            
-        else:
-            logger.warning("Embeddings not supported by this client")
-            return [0.0] * 1536
-            
-    except Exception as e:
-        logger.error(f"Embedding generation failed: {e}")
-        return [0.0] * 1536
+    vectors = await embed_texts([text], model=model)
+    return vectors[0].tolist()
 
 
 def get_available_models() -> List[str]:
@@ -433,8 +797,6 @@ def get_available_models() -> List[str]:
 
 if __name__ == "__main__":
     # Test the LLM tool
-    import asyncio
-    
     async def test():
         print("Testing LLM tool...")
         
@@ -454,8 +816,11 @@ if __name__ == "__main__":
         print(f"Structured output: {json.dumps(structured, indent=2)}")
         
         # Test embeddings
-        embedding = await embed_text("test text")
-        print(f"Embedding length: {len(embedding)}")
+        try:
+            embedding = await embed_text("test text")
+            print(f"Embedding length: {len(embedding)}")
+        except EmbeddingError as e:
+            print(f"Embeddings unavailable: {e}")
         
         # Show available models
         models = get_available_models()
@@ -0,0 +1,232 @@
+"""
+Response cache for LLM completions.
+
+Responses are keyed on (model, prompt, params). Two backends are provided:
+an in-process LRU with TTL, and Redis for sharing responses between
+workers. Identical requests that arrive while one is already in flight
+wait for that call instead of issuing their own.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+LLM_CACHE = os.getenv("LLM_CACHE", "memory")  # memory | redis | off
+LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", "3600"))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1024"))
+LLM_CACHE_PREFIX = "llm:response:"
+
+
+def cache_key(model: str, prompt: str, params: Dict[str, Any]) -> str:
+    """Stable key for one completion request."""
+    payload = json.dumps({"model": model, "prompt": prompt, "params": params}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class CacheStats:
+    """Counters for cache effectiveness."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.counts = {"hits": 0, "misses": 0, "coalesced": 0, "errors": 0}
+
+    def incr(self, name: str):
+        with self._lock:
+            self.counts[name] += 1
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            counts = dict(self.counts)
+        requests = counts["hits"] + counts["misses"] + counts["coalesced"]
+        counts["requests"] = requests
+        # Upstream calls avoided by the cache and by coalescing
+        counts["saved"] = counts["hits"] + counts["coalesced"]
+        return counts
+
+
+class LRUBackend:
+    """In-process LRU with per-entry expiry."""
+
+    def __init__(self, max_entries: int = LLM_CACHE_MAX_ENTRIES, ttl: int = LLM_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    async def set(self, key: str, value: Any):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    async def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class RedisBackend:
+    """Shared cache in Redis; entries expire after the TTL."""
+
+    def __init__(self, url: Optional[str] = None, ttl: int = LLM_CACHE_TTL, prefix: str = LLM_CACHE_PREFIX):
+        import redis.asyncio as aioredis
+
+        self.ttl = ttl
+        self.prefix = prefix
+        self._client = aioredis.from_url(url or os.getenv("REDIS_URL", "redis://localhost:6379/0"))
+
+    async def get(self, key: str) -> Optional[Any]:
+        raw = await self._client.get(self.prefix + key)
+        return json.loads(raw) if raw is not None else None
+
+    async def set(self, key: str, value: Any):
+        await self._client.set(self.prefix + key, json.dumps(value), ex=self.ttl)
+
+    async def clear(self):
+        async for key in self._client.scan_iter(match=self.prefix + "*"):
+            await self._client.delete(key)
+
+
+class ResponseCache:
+    """
+    Cache front-end with in-flight request coalescing.
+
+    Args:
+        backend: LRUBackend, RedisBackend or anything with async get/set
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.stats = CacheStats()
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    async def get_or_compute(
+        self,
+        key: str,
+        compute: Callable[[], Awaitable[Any]],
+        cacheable: Optional[Callable[[Any], bool]] = None,
+    ) -> Any:
+        """
+        Return the cached value for key, or compute and store it.
+
+        Concurrent callers with the same key share one compute() call. If
+        it raises, every waiter receives the exception and nothing is cached.
+        A computed value that cacheable() rejects is returned but not stored.
+        Backend errors are logged and treated as misses.
+        """
+        loop = asyncio.get_running_loop()
+        pending = self._inflight.get(key)
+        # Futures are bound to their loop; celery tasks may each run their own
+        if pending is not None and pending.get_loop() is loop:
+            self.stats.incr("coalesced")
+            try:
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                if not pending.cancelled():
+                    raise
+                # The caller that owned the request was cancelled, not us
+                return await self.get_or_compute(key, compute, cacheable)
+
+        # Registered before the first await so concurrent callers coalesce
+        future = loop.create_future()
+        self._inflight[key] = future
+        try:
+            value = await self._backend_get(key)
+            if value is not None:
+                self.stats.incr("hits")
+            else:
+                self.stats.incr("misses")
+                value = await compute()
+                if cacheable is None or cacheable(value):
+                    await self._backend_set(key, value)
+            future.set_result(value)
+            return value
+        except BaseException as e:
+            if isinstance(e, asyncio.CancelledError):
+                future.cancel()
+            else:
+                future.set_exception(e)
+                future.exception()  # Mark retrieved when nobody was waiting
+            raise
+        finally:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+    async def get(self, key: str) -> Optional[Any]:
+        """Cached value for key (None on a miss), counted in the stats."""
+        value = await self._backend_get(key)
+        self.stats.incr("hits" if value is not None else "misses")
+        return value
+
+    async def set(self, key: str, value: Any):
+        """Store a value computed outside get_or_compute (e.g. a finished stream)."""
+        await self._backend_set(key, value)
+
+    async def _backend_get(self, key: str) -> Optional[Any]:
+        try:
+            return await self.backend.get(key)
+        except Exception as e:
+            self.stats.incr("errors")
+            logger.warning(f"LLM cache lookup failed: {e}")
+            return None
+
+    async def _backend_set(self, key: str, value: Any):
+        try:
+            await self.backend.set(key, value)
+        except Exception as e:
+            self.stats.incr("errors")
+            logger.warning(f"LLM cache store failed: {e}")
+
+
+_response_cache: Optional[ResponseCache] = None
+_response_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """Cache selected by LLM_CACHE, or None when set to "off"."""
+    global _response_cache
+
+    with _response_cache_lock:
+        if _response_cache is None and LLM_CACHE != "off":
+            try:
+                backend = RedisBackend() if LLM_CACHE == "redis" else LRUBackend()
+            except ImportError:
+                logger.warning("redis package not installed, using in-memory LLM cache")
+                backend = LRUBackend()
+            _response_cache = ResponseCache(backend)
+        return _response_cache
+
+
+def get_cache_stats() -> Dict[str, int]:
+    """Hit, miss and coalescing counters of the active cache."""
+    cache = get_response_cache()
+    if cache is None:
+        return {"hits": 0, "misses": 0, "coalesced": 0, "errors": 0, "requests": 0, "saved": 0}
+    return cache.stats.snapshot()
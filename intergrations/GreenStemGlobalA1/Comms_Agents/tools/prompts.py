@@ -0,0 +1,104 @@
+"""
+Prompt template store for Comms Agents.
+
+Templates are read once and kept in memory. A lookup re-checks the file's
+mtime at most every PROMPT_RELOAD_SECONDS, so edited prompts are picked up
+without restarting workers and steady-state lookups never touch the disk.
+"""
+
+import os
+import time
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+PROMPTS_DIR = os.getenv("PROMPTS_DIR", "prompts")
+PROMPT_RELOAD_SECONDS = float(os.getenv("PROMPT_RELOAD_SECONDS", "2"))
+
+
+class PromptStore:
+    """
+    In-memory prompt templates with mtime-based hot reload.
+
+    Args:
+        prompts_dir: Directory holding <name>.md templates
+        reload_interval: Minimum seconds between mtime checks per template
+    """
+
+    def __init__(self, prompts_dir: str = PROMPTS_DIR, reload_interval: float = PROMPT_RELOAD_SECONDS):
+        self.prompts_dir = Path(prompts_dir)
+        self.reload_interval = reload_interval
+        self._lock = threading.Lock()
+        # name -> (text, mtime_ns, next check at)
+        self._templates: Dict[str, Tuple[Optional[str], Optional[int], float]] = {}
+
+    def _path(self, name: str) -> Path:
+        return self.prompts_dir / f"{name}.md"
+
+    def _load(self, name: str) -> Tuple[Optional[str], Optional[int]]:
+        path = self._path(name)
+        try:
+            mtime_ns = path.stat().st_mtime_ns
+            text = path.read_text(encoding="utf-8")
+        except FileNotFoundError:
+            return None, None
+        return text, mtime_ns
+
+    def preload(self) -> int:
+        """Load every template in the directory; returns how many were loaded."""
+        loaded = 0
+        for path in sorted(self.prompts_dir.glob("*.md")):
+            self.get(path.stem)
+            loaded += 1
+        logger.info(f"Preloaded {loaded} prompt templates from {self.prompts_dir}")
+        return loaded
+
+    def get(self, name: str, default: Optional[str] = None) -> Optional[str]:
+        """
+        Template text by name (file stem), or default when the file is missing.
+
+        Args:
+            name: Template name, e.g. "scribe.system"
+            default: Returned when no template file exists
+        """
+        now = time.monotonic()
+        entry = self._templates.get(name)
+        if entry is not None and now < entry[2]:
+            return entry[0] if entry[0] is not None else default
+
+        with self._lock:
+            entry = self._templates.get(name)
+            try:
+                mtime_ns = self._path(name).stat().st_mtime_ns
+            except FileNotFoundError:
+                mtime_ns = None
+            if entry is None or entry[1] != mtime_ns:
+                text, mtime_ns = self._load(name)
+                if entry is not None:
+                    logger.info(f"Reloaded prompt template {name}")
+            else:
+                text = entry[0]
+            self._templates[name] = (text, mtime_ns, now + self.reload_interval)
+        return text if text is not None else default
+
+    def invalidate(self, name: Optional[str] = None):
+        """Force the next lookup (of one template or all) to re-read from disk."""
+        with self._lock:
+            if name is None:
+                self._templates.clear()
+            else:
+                self._templates.pop(name, None)
+
+
+_store: Optional[PromptStore] = None
+
+
+def get_prompt_store() -> PromptStore:
+    """Process-wide prompt store."""
+    global _store
+    if _store is None:
+        _store = PromptStore()
+    return _store
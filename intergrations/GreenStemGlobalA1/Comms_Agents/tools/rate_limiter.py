@@ -0,0 +1,405 @@
+"""
+Rate limiting for LLM provider calls.
+
+Every provider call goes through call_with_limits, which:
+
+- caps concurrent calls per (provider, model) in this process,
+- takes a token from a per-(provider, model) token bucket. With Redis the
+  bucket is shared by every worker, so the cluster as a whole stays under the
+  provider quota,
+- on 429/529 responses, pauses that (provider, model) cluster-wide for the
+  Retry-After (or rate-limit reset) time, halves this process's rate until
+  calls succeed again, and retries with jittered exponential backoff.
+
+Limits are configured as LLM_RATE_LIMITS="openai=3500/m,openai:gpt-4o=500/m".
+A "provider:model" entry takes precedence over a "provider" entry.
+"""
+
+import os
+import re
+import time
+import random
+import asyncio
+import logging
+import threading
+import weakref
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Dict, Mapping, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+LLM_RATE_LIMITER = os.getenv("LLM_RATE_LIMITER", "memory")  # memory | redis | off
+LLM_RATE_LIMITS = os.getenv("LLM_RATE_LIMITS", "")
+LLM_DEFAULT_RATE_LIMIT = os.getenv("LLM_DEFAULT_RATE_LIMIT", "")  # e.g. 60/m; empty = no bucket
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "5"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "0.5"))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "60"))
+LLM_RATE_LIMIT_PREFIX = "llm:ratelimit:"
+
+# Throttling responses: pause the key cluster-wide and slow down
+THROTTLED_STATUSES = {429, 529}
+# Transient failures: retry with backoff, no cluster-wide pause
+RETRYABLE_STATUSES = {408, 409, 500, 502, 503, 504}
+
+_PERIODS = {"s": 1.0, "m": 60.0, "h": 3600.0}
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+
+
+def parse_rate(spec: str) -> Optional[float]:
+    """Requests per second from "500/m", "10/s" or "3000/h" (None if empty or zero)."""
+    spec = spec.strip()
+    if not spec:
+        return None
+    count, _, period = spec.partition("/")
+    rate = float(count) / _PERIODS[period.strip().lower() or "s"]
+    return rate if rate > 0 else None
+
+
+def parse_limits(spec: str) -> Dict[str, float]:
+    """Key -> requests per second from "openai=3500/m,openai:gpt-4o=500/m"."""
+    limits = {}
+    for entry in filter(None, (part.strip() for part in spec.split(","))):
+        key, _, rate = entry.partition("=")
+        parsed = parse_rate(rate)
+        if parsed:
+            limits[key.strip()] = parsed
+    return limits
+
+
+def _parse_duration(value: str) -> Optional[float]:
+    """Seconds from "20ms", "1s", "6m0s" or "1h2m3.5s"."""
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+    scale = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+    return sum(float(amount) * scale[unit] for amount, unit in parts)
+
+
+def _seconds_until(value: str) -> Optional[float]:
+    """Seconds until an RFC 3339 or HTTP date, or a bare number of seconds."""
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        moment = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        try:
+            moment = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return max(0.0, (moment - datetime.now(timezone.utc)).total_seconds())
+
+
+def retry_after_seconds(headers: Optional[Mapping[str, str]]) -> Optional[float]:
+    """
+    How long the provider asked us to wait, from response headers.
+
+    Checks retry-after-ms and retry-after, then the reset time of any
+    exhausted OpenAI/Groq (x-ratelimit-*) or Anthropic
+    (anthropic-ratelimit-*) limit.
+    """
+    if not headers:
+        return None
+    headers = {key.lower(): value for key, value in headers.items()}
+
+    if "retry-after-ms" in headers:
+        try:
+            return float(headers["retry-after-ms"]) / 1000
+        except ValueError:
+            pass
+    if "retry-after" in headers:
+        seconds = _seconds_until(headers["retry-after"])
+        if seconds is not None:
+            return seconds
+
+    waits = []
+    for kind in ("requests", "tokens", "input-tokens", "output-tokens"):
+        for remaining_key, reset_key, parse in (
+            (f"x-ratelimit-remaining-{kind}", f"x-ratelimit-reset-{kind}", _parse_duration),
+            (f"anthropic-ratelimit-{kind}-remaining", f"anthropic-ratelimit-{kind}-reset", _seconds_until),
+        ):
+            if headers.get(remaining_key) == "0" and reset_key in headers:
+                seconds = parse(headers[reset_key])
+                if seconds is not None:
+                    waits.append(seconds)
+    return max(waits) if waits else None
+
+
+def error_status(error: BaseException) -> Optional[int]:
+    """HTTP status of a provider SDK error (openai, anthropic, groq, httpx)."""
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def error_headers(error: BaseException) -> Optional[Mapping[str, str]]:
+    return getattr(getattr(error, "response", None), "headers", None)
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Throttling, transient server errors, and connection failures or timeouts."""
+    status = error_status(error)
+    if status is not None:
+        return status in THROTTLED_STATUSES or status in RETRYABLE_STATUSES
+    name = type(error).__name__
+    return isinstance(error, (ConnectionError, asyncio.TimeoutError)) or "Connection" in name or "Timeout" in name
+
+
+def backoff_delay(attempt: int, retry_after: Optional[float] = None) -> float:
+    """
+    Seconds to wait before retry number attempt (0-based).
+
+    Full jitter on exponential backoff. When the provider gave a wait time we
+    wait at least that long, plus up to 10% (min 0.1s) jitter to spread out
+    callers that were all told the same time.
+    """
+    if retry_after is not None:
+        return min(LLM_BACKOFF_MAX, retry_after + random.uniform(0, max(0.1, retry_after * 0.1)))
+    return random.uniform(0, min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * 2 ** attempt))
+
+
+class MemoryBackend:
+    """Per-process token buckets and pauses."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets: Dict[str, Tuple[float, float]] = {}  # key -> (tokens, updated at)
+        self._paused_until: Dict[str, float] = {}
+
+    async def acquire(self, key: str, rate: Optional[float], capacity: float) -> float:
+        """Take a token; returns 0 on success, else seconds to wait before retrying."""
+        with self._lock:
+            now = time.monotonic()
+            paused = self._paused_until.get(key, 0.0)
+            if paused > now:
+                return paused - now
+            if rate is None:
+                return 0.0
+            tokens, updated = self._buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * rate)
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+                return 0.0
+            self._buckets[key] = (tokens, now)
+            return (1 - tokens) / rate
+
+    async def pause(self, key: str, seconds: float):
+        """Refuse tokens for key for the next seconds (extends, never shortens)."""
+        with self._lock:
+            until = time.monotonic() + seconds
+            self._paused_until[key] = max(until, self._paused_until.get(key, 0.0))
+
+
+# Token bucket in one round trip, timed by the Redis server clock so every
+# worker sees the same time. Returns seconds to wait as a string (Lua numbers
+# are truncated to integers in replies).
+_ACQUIRE_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local paused = tonumber(redis.call('GET', KEYS[2]) or '0')
+if paused > now then return tostring(paused - now) end
+local rate = tonumber(ARGV[1])
+if rate <= 0 then return '0' end
+local capacity = tonumber(ARGV[2])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local wait = 0
+if tokens >= 1 then tokens = tokens - 1 else wait = (1 - tokens) / rate end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return tostring(wait)
+"""
+
+_PAUSE_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local untl = now + tonumber(ARGV[1])
+if untl > tonumber(redis.call('GET', KEYS[1]) or '0') then
+  redis.call('SET', KEYS[1], tostring(untl), 'EX', math.ceil(tonumber(ARGV[1])) + 1)
+end
+return 1
+"""
+
+
+class RedisBackend:
+    """Token buckets and pauses shared by every worker through Redis."""
+
+    def __init__(self, url: Optional[str] = None, prefix: str = LLM_RATE_LIMIT_PREFIX):
+        import redis.asyncio as aioredis
+
+        self.client = aioredis.from_url(url or os.getenv("REDIS_URL", "redis://localhost:6379/0"))
+        self.prefix = prefix
+        self._acquire = self.client.register_script(_ACQUIRE_SCRIPT)
+        self._pause = self.client.register_script(_PAUSE_SCRIPT)
+
+    async def acquire(self, key: str, rate: Optional[float], capacity: float) -> float:
+        keys = [f"{self.prefix}bucket:{key}", f"{self.prefix}pause:{key}"]
+        return float(await self._acquire(keys=keys, args=[rate or 0, capacity]))
+
+    async def pause(self, key: str, seconds: float):
+        await self._pause(keys=[f"{self.prefix}pause:{key}"], args=[seconds])
+
+
+class RateLimiter:
+    """
+    Concurrency cap, token bucket and adaptive backoff per (provider, model).
+
+    Args:
+        backend: MemoryBackend, RedisBackend or anything with async acquire/pause
+        limits: Key ("provider" or "provider:model") -> requests per second
+        default_rate: Requests per second for keys without a limit (None = no bucket)
+        max_concurrency: Concurrent calls per key in this process
+    """
+
+    def __init__(
+        self,
+        backend,
+        limits: Optional[Dict[str, float]] = None,
+        default_rate: Optional[float] = None,
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+    ):
+        self.backend = backend
+        self.limits = limits or {}
+        self.default_rate = default_rate
+        self.max_concurrency = max_concurrency
+        # Multiplier on the configured rate: halved on throttling, recovers on success
+        self._factor: Dict[str, float] = {}
+        # Semaphores are bound to their event loop; celery tasks may each run their own
+        self._semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Semaphore]]" = (
+            weakref.WeakKeyDictionary()
+        )
+
+    def _key_and_rate(self, provider: str, model: str) -> Tuple[str, Optional[float]]:
+        for key in (f"{provider}:{model}", provider):
+            if key in self.limits:
+                return key, self.limits[key]
+        return f"{provider}:{model}", self.default_rate
+
+    def _semaphore(self, key: str) -> asyncio.Semaphore:
+        semaphores = self._semaphores.setdefault(asyncio.get_running_loop(), {})
+        if key not in semaphores:
+            semaphores[key] = asyncio.Semaphore(self.max_concurrency)
+        return semaphores[key]
+
+    async def acquire(self, provider: str, model: str):
+        """Wait until a call to (provider, model) is allowed."""
+        key, rate = self._key_and_rate(provider, model)
+        if rate is not None:
+            rate *= self._factor.get(key, 1.0)
+        capacity = max(1.0, rate or 1.0)
+        while True:
+            try:
+                wait = await self.backend.acquire(key, rate, capacity)
+            except Exception as e:
+                # Never block provider calls on a limiter outage
+                logger.warning(f"Rate limiter unavailable, not limiting {key}: {e}")
+                return
+            if wait <= 0:
+                return
+            # Jitter so waiters released together do not burst
+            await asyncio.sleep(wait + random.uniform(0, min(1.0, wait * 0.1)))
+
+    @asynccontextmanager
+    async def slot(self, provider: str, model: str):
+        """Hold a concurrency slot and a bucket token for one call."""
+        key, _ = self._key_and_rate(provider, model)
+        async with self._semaphore(key):
+            await self.acquire(provider, model)
+            yield
+
+    async def throttled(self, provider: str, model: str, seconds: float):
+        """Record a throttling response: pause the key everywhere and slow down here."""
+        key, rate = self._key_and_rate(provider, model)
+        if rate is not None:
+            self._factor[key] = max(0.1, self._factor.get(key, 1.0) / 2)
+        try:
+            await self.backend.pause(key, seconds)
+        except Exception as e:
+            logger.warning(f"Rate limiter unavailable, pause for {key} is local only: {e}")
+
+    def succeeded(self, provider: str, model: str):
+        """Record a successful call (additive recovery of the rate)."""
+        key, _ = self._key_and_rate(provider, model)
+        factor = self._factor.get(key)
+        if factor is not None:
+            factor = min(1.0, factor + 0.05)
+            if factor >= 1.0:
+                del self._factor[key]
+            else:
+                self._factor[key] = factor
+
+
+_limiter: Optional[RateLimiter] = None
+_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> Optional[RateLimiter]:
+    """Limiter selected by LLM_RATE_LIMITER, or None when set to "off"."""
+    global _limiter
+
+    with _limiter_lock:
+        if _limiter is None and LLM_RATE_LIMITER != "off":
+            try:
+                backend = RedisBackend() if LLM_RATE_LIMITER == "redis" else MemoryBackend()
+            except ImportError:
+                logger.warning("redis package not installed, using per-process rate limits")
+                backend = MemoryBackend()
+            _limiter = RateLimiter(backend, parse_limits(LLM_RATE_LIMITS), parse_rate(LLM_DEFAULT_RATE_LIMIT))
+        return _limiter
+
+
+async def call_with_limits(
+    provider: str,
+    model: str,
+    call: Callable[[], Awaitable[Any]],
+    max_retries: int = LLM_MAX_RETRIES,
+) -> Any:
+    """
+    Run one provider call under the rate limiter, retrying transient failures.
+
+    Args:
+        provider: Provider name, e.g. "openai"
+        model: Model name
+        call: Zero-argument coroutine function making the request
+        max_retries: Retries after the first attempt
+
+    Returns:
+        The call's result
+
+    Raises:
+        The last error when it is not retryable or retries are exhausted
+    """
+    limiter = get_rate_limiter()
+    if limiter is None:
+        return await call()
+
+    for attempt in range(max_retries + 1):
+        try:
+            async with limiter.slot(provider, model):
+                result = await call()
+        except Exception as e:
+            if attempt >= max_retries or not is_retryable(e):
+                raise
+            status = error_status(e)
+            delay = backoff_delay(attempt, retry_after_seconds(error_headers(e)))
+            logger.warning(
+                f"{provider}:{model} call failed ({status or type(e).__name__}), "
+                f"retry {attempt + 1}/{max_retries} in {delay:.2f}s"
+            )
+            if status in THROTTLED_STATUSES:
+                # Other callers wait on the shared pause; we wait in acquire() too
+                await limiter.throttled(provider, model, delay)
+            else:
+                await asyncio.sleep(delay)
+            continue
+        limiter.succeeded(provider, model)
+        return result
@@ -4,21 +4,54 @@ Retriever tool for accessing knowledge base and issue cards.
 
 import os
 import logging
+import threading
 from pathlib import Path
-from typing import Dict, Any, List, Optional
+from collections import OrderedDict
+from typing import Callable, Dict, Any, List, Optional, Tuple
 import json
-import re
+from datetime import datetime, timezone
+
+from .card_scanner import extract_entities, fallback_title, scan_card
+from .knowledge_store import KnowledgeStore
+from .llm import embed_texts
+from .search_index import SearchIndex
 
 logger = logging.getLogger(__name__)
 
-# Global index cache
+# Directory the search index is persisted to (disabled when unset)
+INDEX_DIR = os.getenv("RETRIEVER_INDEX_DIR")
+
+# SQLite file recording indexed files by path, mtime and content hash
+# (set to an empty string to keep the index in memory only)
+KNOWLEDGE_DB_PATH = os.getenv("KNOWLEDGE_DB_PATH", "data/knowledge_index.db")
+
+# Document vectors in the search index: "hash" (built-in, offline) or "model"
+# (embed_texts, computed by sync_knowledge_base and kept in the knowledge store)
+KNOWLEDGE_EMBEDDINGS = os.getenv("KNOWLEDGE_EMBEDDINGS", "hash")
+
+# Characters of each document sent to the embedding model
+KNOWLEDGE_EMBEDDING_CHARS = int(os.getenv("KNOWLEDGE_EMBEDDING_CHARS", "16000"))
+
+METADATA_FIELDS = ("tags", "entities", "content_length", "file_type", "last_indexed")
+
+# Global index cache: per-path metadata plus the hybrid search index
 _INDEX = {}
+_SEARCH_INDEX: Optional[SearchIndex] = None
+_STORE: Optional[KnowledgeStore] = None
+
+# Parsed issue cards by path, with the (mtime_ns, size) they were parsed at
+CONTEXT_CACHE_SIZE = int(os.getenv("CONTEXT_CACHE_SIZE", "512"))
+_CONTEXT_CACHE: "OrderedDict[str, Tuple[Tuple[int, int], Dict[str, Any]]]" = OrderedDict()
+_CONTEXT_LOCK = threading.Lock()
 
 
 def retrieve_context(issue_card_path: str) -> Dict[str, Any]:
     """
     Retrieve context from an issue card file.
     
+    Parsed cards are cached by path and reused until the file's mtime or
+    size changes, so repeated runs against one card only cost a stat().
+    
     Args:
         issue_card_path: Path to the issue card file
         
@@ -32,7 +65,9 @@ def retrieve_context(issue_card_path: str) -> Dict[str, Any]:
         
         path = Path(issue_card_path)
         
-        if not path.exists():
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
             logger.warning(f"Issue card not found: {issue_card_path}")
             return {
                 "title": "Unknown Issue",
@@ -42,12 +77,25 @@ def retrieve_context(issue_card_path: str) -> Dict[str, Any]:
                 "priority": "medium"
             }
         
+        key = str(path)
+        version = (stat.st_mtime_ns, stat.st_size)
+        with _CONTEXT_LOCK:
+            cached = _CONTEXT_CACHE.get(key)
+            if cached is not None and cached[0] == version:
+                _CONTEXT_CACHE.move_to_end(key)
+                return _copy_context(cached[1])
+        
         # Read and parse the file
         content = path.read_text(encoding="utf-8")
         parsed = _parse_issue_card(content, path)
+        with _CONTEXT_LOCK:
+            _CONTEXT_CACHE[key] = (version, parsed)
+            _CONTEXT_CACHE.move_to_end(key)
+            while len(_CONTEXT_CACHE) > CONTEXT_CACHE_SIZE:
+                _CONTEXT_CACHE.popitem(last=False)
         
         logger.info(f"Retrieved context from {issue_card_path}")
-        return parsed
+        return _copy_context(parsed)
         
     except Exception as e:
         logger.error(f"Failed to retrieve context from {issue_card_path}: {e}")
@@ -60,10 +108,18 @@ def retrieve_context(issue_card_path: str) -> Dict[str, Any]:
         }
 
 
+def _copy_context(parsed: Dict[str, Any]) -> Dict[str, Any]:
+    """Copy of a cached context whose lists callers can modify safely."""
+    return {key: list(value) if isinstance(value, list) else value for key, value in parsed.items()}
+
+
 def _parse_issue_card(content: str, path: Path) -> Dict[str, Any]:
     """
     Parse issue card content to extract structured information.
     
+    Title, TL;DR, links, tags, priority and sources come from a single
+    scan of the content (see tools.card_scanner).
+    
     Args:
         content: Raw file content
         path: Path to the file
@@ -71,176 +127,93 @@ def _parse_issue_card(content: str, path: Path) -> Dict[str, Any]:
     Returns:
         Parsed issue card data
     """
-    lines = [line.strip() for line in content.splitlines() if line.strip()]
-    
-    # Extract title from filename or first heading
-    title = _extract_title(content, path)
-    
-    # Extract TL;DR (first paragraph that's not a heading)
-    tldr = _extract_tldr(lines)
-    
-    # Extract links
-    links = _extract_links(content)
+    scanned = scan_card(content)
     
-    # Extract tags
-    tags = _extract_tags(content)
-    
-    # Extract priority
-    priority = _extract_priority(content)
-    
-    # Extract sources
-    sources = _extract_sources(content)
+    # Extract title from first heading or filename
+    title = scanned["title"] if scanned["title"] is not None else fallback_title(path)
     
     return {
         "title": title,
-        "tldr": tldr,
-        "links": links,
-        "tags": tags,
-        "priority": priority,
-        "sources": sources,
+        "tldr": scanned["tldr"],
+        "links": scanned["links"],
+        "tags": scanned["tags"],
+        "priority": scanned["priority"],
+        "sources": scanned["sources"],
         "file_path": str(path),
         "content_length": len(content)
     }
 
 
-def _extract_title(content: str, path: Path) -> str:
-    """Extract title from content or filename."""
-    # Look for first heading
-    heading_match = re.search(r'^#\s+(.+)$', content, re.MULTILINE)
-    if heading_match:
-        return heading_match.group(1).strip()
-    
-    # Fallback to filename
-    return path.stem.replace("_", " ").title()
-
-
-def _extract_tldr(lines: List[str]) -> str:
-    """Extract TL;DR from first non-heading paragraph."""
-    for line in lines:
-        if line and not line.startswith('#') and not line.startswith('http'):
-            # Clean up the line
-            cleaned = line.strip()
-            if len(cleaned) > 20:  # Ensure it's substantial
-                return cleaned
-    
-    return "No TL;DR available"
-
-
-def _extract_links(content: str) -> List[str]:
-    """Extract HTTP links from content."""
-    url_pattern = r'https?://[^\s\)]+'
-    links = re.findall(url_pattern, content)
-    return [link.rstrip('.,;:!?') for link in links]
-
-
-def _extract_tags(content: str) -> List[str]:
-    """Extract tags from content."""
-    # Look for tag patterns like #tag or [tag]
-    tag_patterns = [
-        r'#(\w+)',  # Hashtags
-        r'\[(\w+)\]',  # Bracketed tags
-        r'tags?:\s*([^\n]+)',  # Explicit tag declarations
-    ]
-    
-    tags = []
-    for pattern in tag_patterns:
-        matches = re.findall(pattern, content, re.IGNORECASE)
-        tags.extend(matches)
-    
-    # Clean and deduplicate tags
-    cleaned_tags = []
-    for tag in tags:
-        cleaned = tag.strip().lower()
-        if cleaned and cleaned not in cleaned_tags:
-            cleaned_tags.append(cleaned)
-    
-    return cleaned_tags
-
-
-def _extract_priority(content: str) -> str:
-    """Extract priority from content."""
-    priority_patterns = [
-        (r'priority:\s*(high|medium|low|urgent)', r'\1'),
-        (r'priority:\s*(\d+)', lambda m: 'high' if int(m.group(1)) >= 8 else 'medium' if int(m.group(1)) >= 5 else 'low'),
-        (r'urgent|critical', 'high'),
-        (r'important', 'medium'),
-    ]
-    
-    for pattern, replacement in priority_patterns:
-        match = re.search(pattern, content, re.IGNORECASE)
-        if match:
-            if callable(replacement):
-                return replacement(match)
-            else:
-                return replacement
-    
-    return "medium"  # Default priority
-
-
-def _extract_sources(content: str) -> List[str]:
-    """Extract source references from content."""
-    source_patterns = [
-        r'source[s]?:\s*([^\n]+)',
-        r'reference[s]?:\s*([^\n]+)',
-        r'cite[d]?:\s*([^\n]+)',
-    ]
-    
-    sources = []
-    for pattern in source_patterns:
-        matches = re.findall(pattern, content, re.IGNORECASE)
-        sources.extend(matches)
-    
-    # Clean sources
-    cleaned_sources = []
-    for source in sources:
-        cleaned = source.strip()
-        if cleaned and cleaned not in cleaned_sources:
-            cleaned_sources.append(cleaned)
-    
-    return cleaned_sources
-
-
-def index_path(path: str, tags: Optional[List[str]] = None) -> tuple[List[str], int]:
+def index_path(
+    path: str,
+    tags: Optional[List[str]] = None,
+    embedding: Optional[List[float]] = None,
+) -> tuple[List[str], int]:
     """
-    Index a file path for vector search.
+    Index a file path for keyword and vector search.
+    
+    With the knowledge store enabled, unchanged files (same mtime/size or
+    content hash) are not re-read or re-extracted.
     
     Args:
         path: Path to the file to index
         tags: Optional tags for categorization
+        embedding: Optional precomputed document embedding
         
     Returns:
         Tuple of (entities, vector_count)
     """
     try:
-        file_path = Path(path)
-        
-        if not file_path.exists():
-            logger.warning(f"File not found for indexing: {path}")
-            return [], 0
+        search_index = _get_search_index()
+        if embedding is not None and search_index.dim not in (None, len(embedding)):
+            # Checked before the store records the vector, or every rebuild would fail
+            raise ValueError(
+                f"Embedding has dimension {len(embedding)} but the search index holds "
+                f"{search_index.dim}-dimensional vectors"
+            )
         
-        # Read file content
-        content = file_path.read_text(encoding="utf-8")
+        store = _get_store()
         
-        # Extract entities (basic implementation)
-        entities = _extract_entities(content)
+        if store is not None:
+            status, record, content = store.index_file(path, tags=tags or None, embedding=embedding)
+            if status == "missing":
+                logger.warning(f"File not found for indexing: {path}")
+                return [], 0
+        else:
+            file_path = Path(path)
+            
+            if not file_path.exists():
+                logger.warning(f"File not found for indexing: {path}")
+                return [], 0
+            
+            # Read file content and extract entities/tags
+            content = file_path.read_text(encoding="utf-8")
+            extracted = _extract_metadata(content)
+            status = "updated"
+            record = {
+                "tags": tags or extracted["tags"],
+                "entities": extracted["entities"],
+                "content_length": len(content),
+                "file_type": file_path.suffix,
+                "last_indexed": datetime.now(timezone.utc).isoformat(),
+            }
         
-        # Generate tags if not provided
-        if not tags:
-            tags = _extract_tags(content)
+        metadata = {key: record[key] for key in METADATA_FIELDS}
+        tags, entities = metadata["tags"], metadata["entities"]
+        _INDEX[path] = metadata
         
-        # Store in index
-        _INDEX[path] = {
-            "tags": tags,
-            "entities": entities,
-            "content_length": len(content),
-            "file_type": file_path.suffix,
-            "last_indexed": "now"  # In production, use actual timestamp
-        }
+        if store is not None and embedding is None and KNOWLEDGE_EMBEDDINGS == "model":
+            # Added to the search index once the next sync has embedded it
+            content = None
+        elif content is None and path not in search_index:
+            content = store.get_text(path)
+        if content is not None:
+            search_index.add(path, _search_text(content, metadata), metadata, embedding=embedding)
         
         # Return entities and vector count (placeholder)
         vector_count = len(entities) + len(tags)
         
-        logger.info(f"Indexed {path} with {len(entities)} entities and {vector_count} vectors")
+        logger.info(f"Indexed {path} ({status}) with {len(entities)} entities and {vector_count} vectors")
         return entities, vector_count
         
     except Exception as e:
@@ -248,91 +221,275 @@ def index_path(path: str, tags: Optional[List[str]] = None) -> tuple[List[str],
         return [], 0
 
 
-def _extract_entities(content: str) -> List[str]:
-    """Extract entities from content (basic implementation)."""
-    # This is a simple entity extraction
-    # In production, you'd use NER models or LLM-based extraction
+def sync_knowledge_base(roots: List[str], save: bool = True) -> Dict[str, int]:
+    """
+    Incrementally re-index directories through the knowledge store.
     
-    # Look for capitalized phrases that might be entities
-    entity_pattern = r'\b[A-Z][a-z]+(?:\s+[A-Z][a-z]+)*\b'
-    entities = re.findall(entity_pattern, content)
+    Only added or changed files are re-extracted; files deleted from disk
+    are dropped from both the store and the search index. With
+    KNOWLEDGE_EMBEDDINGS=model, new and changed documents only enter the
+    search index once the caller awaits embed_knowledge_base().
     
-    # Filter out common words and short entities
-    common_words = {'The', 'This', 'That', 'These', 'Those', 'And', 'Or', 'But', 'In', 'On', 'At', 'To', 'For', 'Of', 'With', 'By'}
-    filtered_entities = [
-        entity for entity in entities 
-        if entity not in common_words and len(entity) > 2
-    ]
+    Args:
+        roots: Directories to sync
+        save: Persist the search index afterwards (when INDEX_DIR is set)
+        
+    Returns:
+        Counts of added, updated, unchanged and removed files
+    """
+    store = _get_store()
+    if store is None:
+        raise RuntimeError("Knowledge store is disabled (KNOWLEDGE_DB_PATH is empty)")
+    
+    model_embeddings = KNOWLEDGE_EMBEDDINGS == "model"
+    search_index = _get_search_index()
+    totals = {"added": 0, "updated": 0, "unchanged": 0, "removed": 0}
+    for root in roots:
+        result = store.sync_directory(root)
+        for path in result["added"] + result["updated"]:
+            record = store.get(path)
+            metadata = {key: record[key] for key in METADATA_FIELDS}
+            _INDEX[path] = metadata
+            if not model_embeddings:
+                search_index.add(path, _search_text(store.get_text(path), metadata), metadata)
+        for path in result["removed"]:
+            _INDEX.pop(path, None)
+            search_index.remove(path)
+        for status, paths in result.items():
+            totals[status] += len(paths)
+    
+    if save and INDEX_DIR and any(count for status, count in totals.items() if status != "unchanged"):
+        save_index()
+    
+    logger.info(f"Knowledge base sync complete: {totals}")
+    return totals
+
+
+async def embed_knowledge_base(save: bool = True) -> int:
+    """
+    Embed stored documents that have no model embedding yet.
     
-    # Limit to reasonable number
-    return filtered_entities[:20]
-
-
-def search_knowledge(query: str, tags: Optional[List[str]] = None, limit: int = 10) -> List[Dict[str, Any]]:
+    Vectors from embed_texts are saved in the knowledge store and added to
+    the search index. An index holding vectors of another dimension (hash
+    embeddings from before KNOWLEDGE_EMBEDDINGS=model) is rebuilt from the
+    store so it keeps a single embedding space.
+    
+    Args:
+        save: Persist the search index afterwards (when INDEX_DIR is set)
+        
+    Returns:
+        Number of documents embedded
+        
+    Raises:
+        EmbeddingError: Embeddings could not be produced; the documents
+            stay pending and are retried by the next sync
+    """
+    global _SEARCH_INDEX
+    
+    store = _get_store()
+    if store is None:
+        raise RuntimeError("Knowledge store is disabled (KNOWLEDGE_DB_PATH is empty)")
+    
+    pending = [record for record in store.iter_documents() if record["embedding"] is None]
+    if not pending:
+        return 0
+    
+    documents = []
+    for record in pending:
+        metadata = {key: record[key] for key in METADATA_FIELDS}
+        documents.append((record["path"], _search_text(record["content"], metadata), metadata))
+    # The path stands in for empty files, which cannot be embedded
+    vectors = await embed_texts([
+        text[:KNOWLEDGE_EMBEDDING_CHARS] if text.strip() else path for path, text, _ in documents
+    ])
+    store.set_embeddings({path: vector for (path, _, _), vector in zip(documents, vectors)})
+    
+    search_index = _get_search_index()
+    if search_index.dim not in (None, vectors.shape[1]):
+        logger.info(
+            f"Rebuilding search index: {search_index.dim}-dimensional vectors replaced by "
+            f"{vectors.shape[1]}-dimensional model embeddings"
+        )
+        _SEARCH_INDEX = _build_from_store(store)
+    else:
+        for (path, text, metadata), vector in zip(documents, vectors):
+            search_index.add(path, text, metadata, embedding=vector)
+    
+    if save and INDEX_DIR:
+        save_index()
+    
+    logger.info(f"Embedded {len(documents)} knowledge documents")
+    return len(documents)
+
+
+def _extract_metadata(content: str) -> Dict[str, List[str]]:
+    """Tags and entities for the knowledge store."""
+    return {"tags": scan_card(content)["tags"], "entities": extract_entities(content)}
+
+
+def _search_text(content: str, metadata: Dict[str, Any]) -> str:
+    """Tags and entities are appended so they match keyword queries too."""
+    return "\n".join([content, " ".join(metadata["tags"]), " ".join(metadata["entities"])])
+
+
+def _get_search_index() -> SearchIndex:
+    """Return the search index, loading it from INDEX_DIR on first use."""
+    global _SEARCH_INDEX
+    
+    if _SEARCH_INDEX is None:
+        if INDEX_DIR and (Path(INDEX_DIR) / "docs.json").exists():
+            try:
+                _SEARCH_INDEX = SearchIndex.load(INDEX_DIR)
+                for doc_id in _SEARCH_INDEX.doc_ids:
+                    _INDEX.setdefault(doc_id, _SEARCH_INDEX.get(doc_id))
+            except Exception as e:
+                logger.error(f"Failed to load search index from {INDEX_DIR}: {e}")
+        if _SEARCH_INDEX is None:
+            store = _get_store()
+            # No snapshot: rebuild from the store without touching the files
+            _SEARCH_INDEX = _build_from_store(store) if store is not None else SearchIndex()
+    
+    return _SEARCH_INDEX
+
+
+def _build_from_store(store: KnowledgeStore) -> SearchIndex:
+    """
+    Search index over every stored document.
+    
+    With model embeddings the stored vectors are used and documents still
+    waiting for one are left out; otherwise every document gets a hash
+    embedding, so the index never mixes embedding spaces.
+    """
+    search_index = SearchIndex()
+    model_embeddings = KNOWLEDGE_EMBEDDINGS == "model"
+    for record in store.iter_documents():
+        metadata = {key: record[key] for key in METADATA_FIELDS}
+        _INDEX[record["path"]] = metadata
+        if model_embeddings and record["embedding"] is None:
+            continue
+        search_index.add(
+            record["path"],
+            _search_text(record["content"], metadata),
+            metadata,
+            embedding=record["embedding"] if model_embeddings else None,
+        )
+    return search_index
+
+
+def _get_store() -> Optional[KnowledgeStore]:
+    """Return the persistent knowledge store, or None when disabled."""
+    global _STORE
+    
+    if _STORE is None and KNOWLEDGE_DB_PATH:
+        _STORE = KnowledgeStore(KNOWLEDGE_DB_PATH, extractor=_extract_metadata)
+    
+    return _STORE
+
+
+def search_knowledge(
+    query: str,
+    tags: Optional[List[str]] = None,
+    limit: int = 10,
+    query_embedding: Optional[List[float]] = None,
+    mode: str = "hybrid",
+) -> List[Dict[str, Any]]:
     """
     Search knowledge base for relevant content.
     
+    Ranks documents with BM25 and embedding cosine similarity, fused by
+    reciprocal rank.
+    
     Args:
         query: Search query
-        tags: Optional tags to filter by
+        tags: Optional tags to filter by (any match)
         limit: Maximum number of results
+        query_embedding: Optional precomputed query embedding; with
+            KNOWLEDGE_EMBEDDINGS=model, hybrid queries without one (see
+            tools.llm.embed_text) are ranked by BM25
+        mode: "hybrid", "bm25" or "vector"
         
     Returns:
         List of relevant documents
     """
     try:
-        # Simple keyword-based search
-        # In production, this would use vector similarity search
+        if query_embedding is None and mode == "hybrid" and KNOWLEDGE_EMBEDDINGS == "model":
+            mode = "bm25"
         
-        results = []
-        query_terms = query.lower().split()
+        hits = _get_search_index().search(
+            query,
+            limit=limit,
+            query_embedding=query_embedding,
+            mode=mode,
+            filter_fn=_tag_filter(tags),
+        )
         
-        for path, index_data in _INDEX.items():
-            # Calculate relevance score
-            score = _calculate_relevance(query_terms, index_data)
-            
-            if score > 0:
-                results.append({
-                    "path": path,
-                    "score": score,
-                    "tags": index_data.get("tags", []),
-                    "entities": index_data.get("entities", []),
-                    "content_length": index_data.get("content_length", 0),
-                    "file_type": index_data.get("file_type", ""),
-                })
-        
-        # Sort by relevance and limit results
-        results.sort(key=lambda x: x["score"], reverse=True)
-        return results[:limit]
+        return [
+            {
+                "path": hit["id"],
+                "score": hit["score"],
+                "bm25": hit["bm25"],
+                "cosine": hit["cosine"],
+                "tags": hit["metadata"].get("tags", []),
+                "entities": hit["metadata"].get("entities", []),
+                "content_length": hit["metadata"].get("content_length", 0),
+                "file_type": hit["metadata"].get("file_type", ""),
+            }
+            for hit in hits
+        ]
         
     except Exception as e:
         logger.error(f"Knowledge search failed: {e}")
         return []
 
 
-def _calculate_relevance(query_terms: List[str], index_data: Dict[str, Any]) -> float:
-    """Calculate relevance score for search results."""
-    score = 0.0
+def _tag_filter(tags: Optional[List[str]]) -> Optional[Callable[[Dict[str, Any]], bool]]:
+    """Metadata predicate matching any of the tags (case-insensitive), or None."""
+    if not tags:
+        return None
+    wanted = {tag.lower() for tag in tags}
+    
+    def matches(metadata: Dict[str, Any]) -> bool:
+        return bool(wanted.intersection(t.lower() for t in metadata.get("tags", [])))
     
-    # Score based on tag matches
-    tags = index_data.get("tags", [])
-    for term in query_terms:
-        for tag in tags:
-            if term in tag.lower():
-                score += 2.0
+    return matches
+
+
+def save_index(directory: Optional[str] = None) -> Optional[str]:
+    """
+    Persist the search index.
     
-    # Score based on entity matches
-    entities = index_data.get("entities", [])
-    for term in query_terms:
-        for entity in entities:
-            if term in entity.lower():
-                score += 1.5
+    Args:
+        directory: Target directory (defaults to RETRIEVER_INDEX_DIR)
+        
+    Returns:
+        The directory written to, or None when no directory is configured
+    """
+    directory = directory or INDEX_DIR
+    if not directory:
+        logger.warning("No index directory configured, search index not saved")
+        return None
+    _get_search_index().save(directory)
+    return directory
+
+
+def load_index(directory: Optional[str] = None) -> int:
+    """
+    Replace the in-memory index with one persisted by save_index.
     
-    # Bonus for exact matches
-    if any(term in str(index_data).lower() for term in query_terms):
-        score += 0.5
+    Args:
+        directory: Source directory (defaults to RETRIEVER_INDEX_DIR)
+        
+    Returns:
+        Number of documents loaded
+    """
+    global _SEARCH_INDEX
     
-    return score
+    directory = directory or INDEX_DIR
+    _SEARCH_INDEX = SearchIndex.load(directory)
+    _INDEX.clear()
+    for doc_id in _SEARCH_INDEX.doc_ids:
+        _INDEX[doc_id] = _SEARCH_INDEX.get(doc_id)
+    return len(_SEARCH_INDEX)
 
 
 def get_index_stats() -> Dict[str, Any]:
@@ -354,8 +511,11 @@ def get_index_stats() -> Dict[str, Any]:
 
 def clear_index():
     """Clear the in-memory index."""
-    global _INDEX
+    global _INDEX, _SEARCH_INDEX
     _INDEX.clear()
+    _SEARCH_INDEX = SearchIndex()
+    with _CONTEXT_LOCK:
+        _CONTEXT_CACHE.clear()
     logger.info("Knowledge index cleared")
 
 
@@ -0,0 +1,287 @@
+"""
+Write-behind logging of agent runs.
+
+Agents call log_agent_run(), which only appends a record to an in-process
+queue. A background task on the running event loop writes the queue in
+batches: when RUN_LOG_BATCH_SIZE records are waiting, or every
+RUN_LOG_FLUSH_MS otherwise. Each batch is one multi-row INSERT, so a
+request no longer waits on its audit-log write.
+
+If a write fails (database down), the batch is appended to a JSONL file in
+RUN_LOG_SPILL_DIR. Further batches go straight to disk for
+RUN_LOG_RETRY_SECONDS. Spilled runs are replayed once writes succeed
+again. close_run_logger() flushes on shutdown; anything still queued when
+the interpreter exits is spilled rather than lost.
+"""
+
+import os
+import json
+import time
+import atexit
+import asyncio
+import logging
+from collections import deque
+from datetime import datetime, timezone
+from glob import glob
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+from uuid import UUID, uuid4
+
+logger = logging.getLogger(__name__)
+
+RUN_LOG = os.getenv("RUN_LOG", "buffered")  # buffered | off
+RUN_LOG_BATCH_SIZE = int(os.getenv("RUN_LOG_BATCH_SIZE", "100"))
+RUN_LOG_FLUSH_MS = int(os.getenv("RUN_LOG_FLUSH_MS", "500"))
+RUN_LOG_MAX_QUEUE = int(os.getenv("RUN_LOG_MAX_QUEUE", "10000"))
+RUN_LOG_RETRY_SECONDS = float(os.getenv("RUN_LOG_RETRY_SECONDS", "5"))
+RUN_LOG_SPILL_DIR = os.getenv("RUN_LOG_SPILL_DIR", "data/run_log")
+
+Writer = Callable[[List[Dict[str, Any]]], Awaitable[int]]
+
+
+async def _insert_runs(records: List[Dict[str, Any]]) -> int:
+    from app.database import insert_agent_runs
+    return await insert_agent_runs(records)
+
+
+def _revive(record: Dict[str, Any]) -> Dict[str, Any]:
+    """Undo the JSON encoding of a spilled record."""
+    record["id"] = UUID(record["id"])
+    for key in ("started_at", "completed_at"):
+        if record.get(key):
+            record[key] = datetime.fromisoformat(record[key])
+    return record
+
+
+class AgentRunLogger:
+    """
+    In-process queue of agent runs, written to the database in batches.
+
+    Args:
+        writer: Async callable that stores a list of records and returns the
+            count (defaults to app.database.insert_agent_runs)
+        batch_size: Records per write; a full batch is flushed immediately
+        flush_interval: Seconds between flushes of a partial batch
+        max_queue: Queued records kept in memory; older ones are spilled
+        spill_dir: Directory for runs that could not be written
+    """
+
+    def __init__(
+        self,
+        writer: Optional[Writer] = None,
+        batch_size: int = RUN_LOG_BATCH_SIZE,
+        flush_interval: float = RUN_LOG_FLUSH_MS / 1000,
+        max_queue: int = RUN_LOG_MAX_QUEUE,
+        spill_dir: str = RUN_LOG_SPILL_DIR,
+    ):
+        self.writer = writer or _insert_runs
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self.spill_dir = spill_dir
+        self._pending: Deque[Dict[str, Any]] = deque()
+        self._retry_at = 0.0
+        self._spilled = bool(self._spill_files())
+        # Loop-bound state, recreated when used from a different event loop
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._lock: Optional[asyncio.Lock] = None
+
+    def log(self, record: Dict[str, Any]) -> None:
+        """Queue one run record; never waits on the database."""
+        self._pending.append(record)
+        if len(self._pending) > self.max_queue:
+            self._spill(self._take())
+        try:
+            self._bind_loop()
+        except RuntimeError:
+            return  # No running loop: written by the next flush or spilled at exit
+        if len(self._pending) >= self.batch_size:
+            self._wake.set()
+
+    @property
+    def pending(self) -> int:
+        """Records queued in memory."""
+        return len(self._pending)
+
+    def _bind_loop(self, start: bool = True) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop, self._task = loop, None
+            self._wake, self._lock = asyncio.Event(), asyncio.Lock()
+        if start and (self._task is None or self._task.done()):
+            self._task = loop.create_task(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            # A timer rather than wait_for, which can swallow close()'s cancel
+            timer = self._loop.call_later(self.flush_interval, self._wake.set)
+            try:
+                await self._wake.wait()
+            finally:
+                timer.cancel()
+            self._wake.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Agent run log flush failed: {e}")
+
+    def _take(self) -> List[Dict[str, Any]]:
+        count = min(self.batch_size, len(self._pending))
+        return [self._pending.popleft() for _ in range(count)]
+
+    def _backing_off(self) -> bool:
+        return time.monotonic() < self._retry_at
+
+    async def flush(self) -> int:
+        """
+        Write every queued run now (spilled runs first, once writes succeed).
+
+        Returns:
+            Number of runs written to the database
+        """
+        self._bind_loop(start=False)
+        async with self._lock:
+            written = 0
+            if self._spilled and not self._backing_off():
+                written += await self._replay()
+            while self._pending:
+                batch = self._take()
+                if self._backing_off():
+                    self._spill(batch)
+                    continue
+                try:
+                    written += await self.writer(batch)
+                except Exception as e:
+                    logger.warning(f"Agent run log write failed, spilling {len(batch)} runs to disk: {e}")
+                    self._retry_at = time.monotonic() + RUN_LOG_RETRY_SECONDS
+                    self._spill(batch)
+            return written
+
+    async def close(self) -> int:
+        """Stop the background task and flush what is queued."""
+        self._bind_loop(start=False)
+        task, self._task = self._task, None
+        if task is not None and not task.done():
+            # Cancel between flushes, never while a batch is being written
+            async with self._lock:
+                task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        return await self.flush()
+
+    # Disk spill
+
+    def _spill_path(self) -> str:
+        return os.path.join(self.spill_dir, f"agent_runs-{os.getpid()}.jsonl")
+
+    def _spill_files(self) -> List[str]:
+        return sorted(glob(os.path.join(self.spill_dir, "agent_runs-*.jsonl")))
+
+    def _spill(self, records: List[Dict[str, Any]]) -> None:
+        if not records:
+            return
+        os.makedirs(self.spill_dir, exist_ok=True)
+        with open(self._spill_path(), "a", encoding="utf-8") as f:
+            f.write("".join(json.dumps(record, default=str) + "\n" for record in records))
+        self._spilled = True
+
+    async def _replay(self) -> int:
+        written = 0
+        for path in self._spill_files():
+            # Claim the file so two processes never replay the same runs
+            claimed = f"{path}.{os.getpid()}.replay"
+            try:
+                os.rename(path, claimed)
+            except OSError:
+                continue
+            with open(claimed, encoding="utf-8") as f:
+                records = [_revive(json.loads(line)) for line in f if line.strip()]
+            done = 0
+            try:
+                for start in range(0, len(records), self.batch_size):
+                    batch = records[start:start + self.batch_size]
+                    written += await self.writer(batch)
+                    done += len(batch)
+            except Exception as e:
+                logger.warning(f"Replaying spilled agent runs failed: {e}")
+                self._retry_at = time.monotonic() + RUN_LOG_RETRY_SECONDS
+                self._spill(records[done:])
+                os.remove(claimed)
+                return written
+            os.remove(claimed)
+            logger.info(f"Replayed {done} spilled agent runs from {path}")
+        self._spilled = bool(self._spill_files())
+        return written
+
+    def spill_pending(self) -> None:
+        """Write everything still queued to disk (interpreter exit)."""
+        while self._pending:
+            self._spill(self._take())
+
+
+_run_logger: Optional[AgentRunLogger] = None
+_run_logger_pid: Optional[int] = None
+
+
+def get_run_logger() -> AgentRunLogger:
+    """This process's run logger (a forked child starts with an empty queue)."""
+    global _run_logger, _run_logger_pid
+    if _run_logger is None or _run_logger_pid != os.getpid():
+        _run_logger, _run_logger_pid = AgentRunLogger(), os.getpid()
+    return _run_logger
+
+
+def log_agent_run(
+    agent_name: str,
+    input_data: Dict[str, Any],
+    output_data: Dict[str, Any],
+    status: str = "completed",
+    execution_time_ms: Optional[float] = None,
+    error_message: Optional[str] = None,
+) -> None:
+    """
+    Record an agent run without waiting for the database.
+
+    Args:
+        agent_name: e.g. "scribe"
+        input_data: The run's input payload
+        output_data: The run's output
+        status: "completed" or "failed"
+        execution_time_ms: Wall time of the run
+        error_message: Failure reason, if any
+    """
+    if RUN_LOG == "off":
+        return
+    now = datetime.now(timezone.utc)
+    started_at = now
+    if execution_time_ms is not None:
+        started_at = datetime.fromtimestamp(now.timestamp() - execution_time_ms / 1000, timezone.utc)
+    get_run_logger().log({
+        "id": uuid4(),
+        "agent_name": agent_name,
+        # Round-trip through JSON: snapshots the caller's dicts (which may
+        # change before the flush) and makes enums/datetimes JSON-safe
+        "input_data": json.loads(json.dumps(input_data, default=str)),
+        "output_data": json.loads(json.dumps(output_data, default=str)),
+        "status": status,
+        "started_at": started_at,
+        "completed_at": now,
+        "execution_time_ms": None if execution_time_ms is None else int(execution_time_ms),
+        "error_message": error_message,
+    })
+
+
+async def close_run_logger() -> None:
+    """Flush queued runs; call from application and worker shutdown hooks."""
+    if _run_logger is not None and _run_logger_pid == os.getpid():
+        await _run_logger.close()
+
+
+@atexit.register
+def _spill_at_exit() -> None:
+    if _run_logger is not None and _run_logger_pid == os.getpid() and _run_logger.pending:
+        logger.warning(f"Spilling {_run_logger.pending} unflushed agent runs to {_run_logger.spill_dir}")
+        _run_logger.spill_pending()
@@ -0,0 +1,426 @@
+"""
+Hybrid retrieval index for the knowledge base.
+
+Keyword search uses an inverted index scored with BM25; semantic search
+uses an L2-normalised embeddings matrix with cosine top-k. The two
+rankings are fused with reciprocal rank fusion (RRF).
+"""
+
+import json
+import logging
+import re
+import zlib
+from collections import Counter
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the "
+    "this to was were will with".split()
+)
+
+# Dimension of the built-in hashing embedder used when no model is configured
+HASH_EMBEDDING_DIM = 256
+
+# Rebuild postings once this share of documents has been replaced or removed
+COMPACT_RATIO = 0.25
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens without stopwords."""
+    return [t for t in TOKEN_PATTERN.findall(text.lower()) if t not in STOPWORDS]
+
+
+@lru_cache(maxsize=1 << 16)
+def _token_hash(token: str) -> int:
+    return zlib.crc32(token.encode("utf-8"))
+
+
+def hash_embedding(text: str, dim: int = HASH_EMBEDDING_DIM) -> np.ndarray:
+    """
+    Deterministic bag-of-words embedding via the hashing trick.
+
+    Used when no embedding model is configured so the semantic side of the
+    index still works offline; pass real model vectors for better recall.
+
+    Args:
+        text: Text to embed
+        dim: Embedding dimension
+
+    Returns:
+        L2-normalised float32 vector
+    """
+    counts = Counter(tokenize(text))
+    if not counts:
+        return np.zeros(dim, dtype=np.float32)
+    hashes = np.fromiter((_token_hash(t) for t in counts), dtype=np.int64, count=len(counts))
+    signs = np.where(hashes & 0x80000000, 1.0, -1.0)
+    weights = signs * (1.0 + np.log(np.fromiter(counts.values(), dtype=np.float64, count=len(counts))))
+    vector = np.bincount(hashes % dim, weights=weights, minlength=dim).astype(np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k highest scores, best first, via argpartition."""
+    if k <= 0 or scores.size == 0:
+        return np.empty(0, dtype=np.int64)
+    if k < scores.size:
+        candidates = np.argpartition(-scores, k - 1)[:k]
+    else:
+        candidates = np.arange(scores.size)
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+
+class SearchIndex:
+    """
+    Inverted BM25 index plus an embeddings matrix over the same documents.
+
+    Documents are addressed by a string id. Re-adding an id replaces the
+    document; replaced and removed rows are tombstoned and compacted in bulk.
+
+    All vectors in one index share a single embedding space: a document
+    whose vector has a different dimension is rejected, and a query vector
+    of the wrong dimension falls back to BM25 ranking.
+    """
+
+    def __init__(
+        self,
+        embedder: Optional[Callable[[str], np.ndarray]] = None,
+        k1: float = 1.5,
+        b: float = 0.75,
+    ):
+        self.embedder = embedder or hash_embedding
+        self.k1 = k1
+        self.b = b
+        self._reset()
+
+    def _reset(self):
+        self.doc_ids: List[str] = []
+        self.metadata: List[Dict[str, Any]] = []
+        self._row_of: Dict[str, int] = {}
+        self._alive: List[bool] = []
+        self._doc_len: List[int] = []
+        self._postings: Dict[str, List[List[int]]] = {}  # term -> [rows, tfs]
+        self._vectors: List[np.ndarray] = []
+        self._dead = 0
+        self._frozen: Optional[Dict[str, Any]] = None
+
+    def __len__(self) -> int:
+        return len(self._row_of)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self._row_of
+
+    @property
+    def dim(self) -> Optional[int]:
+        """Dimension of the indexed vectors, or None while the index is empty."""
+        return self._vectors[0].shape[0] if self._vectors else None
+
+    def add(
+        self,
+        doc_id: str,
+        text: str,
+        metadata: Optional[Dict[str, Any]] = None,
+        embedding: Optional[Sequence[float]] = None,
+    ):
+        """
+        Add or replace a document.
+
+        Args:
+            doc_id: Unique document id (e.g. file path)
+            text: Text to index for keyword search
+            metadata: Stored with the document and returned by search
+            embedding: Precomputed vector; the index embedder is used when omitted
+        """
+        if doc_id in self._row_of:
+            self.remove(doc_id)
+
+        vector = np.asarray(
+            embedding if embedding is not None else self.embedder(text), dtype=np.float32
+        )
+        norm = np.linalg.norm(vector)
+        if norm:
+            vector = vector / norm
+        if self.dim is not None and vector.shape != (self.dim,):
+            raise ValueError(
+                f"Embedding for {doc_id} has dimension {vector.shape[-1]} but the index holds "
+                f"{self.dim}-dimensional vectors; embed every document with the same model"
+            )
+
+        row = len(self.doc_ids)
+        tokens = tokenize(text)
+        for term, tf in Counter(tokens).items():
+            rows_tfs = self._postings.setdefault(term, [[], []])
+            rows_tfs[0].append(row)
+            rows_tfs[1].append(tf)
+
+        self.doc_ids.append(doc_id)
+        self.metadata.append(metadata or {})
+        self._alive.append(True)
+        self._doc_len.append(len(tokens))
+        self._vectors.append(vector)
+        self._row_of[doc_id] = row
+        self._frozen = None
+
+    def add_many(self, docs: Iterable[Dict[str, Any]]):
+        """Add documents given as dicts with id, text and optional metadata/embedding."""
+        for doc in docs:
+            self.add(doc["id"], doc["text"], doc.get("metadata"), doc.get("embedding"))
+
+    def remove(self, doc_id: str) -> bool:
+        """Remove a document; returns False if it was not indexed."""
+        row = self._row_of.pop(doc_id, None)
+        if row is None:
+            return False
+        self._alive[row] = False
+        self._dead += 1
+        self._frozen = None
+        if self._dead > COMPACT_RATIO * max(len(self.doc_ids), 1):
+            self._compact()
+        return True
+
+    def get(self, doc_id: str) -> Optional[Dict[str, Any]]:
+        row = self._row_of.get(doc_id)
+        return None if row is None else self.metadata[row]
+
+    def _compact(self):
+        """Drop tombstoned rows and rebuild postings with dense row numbers."""
+        keep = [row for row, alive in enumerate(self._alive) if alive]
+        remap = {old: new for new, old in enumerate(keep)}
+        postings = {}
+        for term, (rows, tfs) in self._postings.items():
+            pairs = [(remap[r], tf) for r, tf in zip(rows, tfs) if r in remap]
+            if pairs:
+                postings[term] = [[r for r, _ in pairs], [tf for _, tf in pairs]]
+        self.doc_ids = [self.doc_ids[r] for r in keep]
+        self.metadata = [self.metadata[r] for r in keep]
+        self._doc_len = [self._doc_len[r] for r in keep]
+        self._vectors = [self._vectors[r] for r in keep]
+        self._alive = [True] * len(keep)
+        self._row_of = {doc_id: row for row, doc_id in enumerate(self.doc_ids)}
+        self._postings = postings
+        self._dead = 0
+        self._frozen = None
+
+    def _freeze(self) -> Dict[str, Any]:
+        """NumPy views of the index, rebuilt lazily after writes."""
+        if self._frozen is None:
+            alive = np.array(self._alive, dtype=bool)
+            doc_len = np.array(self._doc_len, dtype=np.float32)
+            live_lengths = doc_len[alive]
+            avg_len = max(float(live_lengths.mean()), 1.0) if live_lengths.size else 1.0
+            self._frozen = {
+                "alive": alive,
+                "n_docs": int(alive.sum()),
+                # Per-document BM25 length normalisation term
+                "norm": self.k1 * (1 - self.b + self.b * doc_len / avg_len),
+                "vectors": np.vstack(self._vectors) if self._vectors else np.zeros((0, 0), np.float32),
+                "postings": {},
+            }
+        return self._frozen
+
+    def _term_postings(self, frozen: Dict[str, Any], term: str):
+        cached = frozen["postings"].get(term)
+        if cached is None and term in self._postings:
+            rows, tfs = self._postings[term]
+            rows = np.array(rows, dtype=np.int64)
+            tfs = np.array(tfs, dtype=np.float32)
+            mask = frozen["alive"][rows]
+            cached = (rows[mask], tfs[mask])
+            frozen["postings"][term] = cached
+        return cached
+
+    def bm25_scores(self, query: str) -> np.ndarray:
+        """BM25 score of every row for the query (0 for non-matching rows)."""
+        frozen = self._freeze()
+        scores = np.zeros(len(self.doc_ids), dtype=np.float32)
+        n_docs = frozen["n_docs"]
+        for term in set(tokenize(query)):
+            postings = self._term_postings(frozen, term)
+            if postings is None or postings[0].size == 0:
+                continue
+            rows, tfs = postings
+            df = rows.size
+            idf = np.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+            # Rows are unique within a posting list, so fancy-index += is safe
+            scores[rows] += idf * tfs * (self.k1 + 1) / (tfs + frozen["norm"][rows])
+        return scores
+
+    def cosine_scores(self, query_embedding: Sequence[float]) -> np.ndarray:
+        """Cosine similarity of every row to the query vector."""
+        frozen = self._freeze()
+        vectors = frozen["vectors"]
+        if vectors.size == 0:
+            return np.zeros(0, dtype=np.float32)
+        query = np.asarray(query_embedding, dtype=np.float32)
+        if query.shape != (vectors.shape[1],):
+            raise ValueError(
+                f"Query embedding has dimension {query.shape[-1]} but the index holds "
+                f"{vectors.shape[1]}-dimensional vectors"
+            )
+        norm = np.linalg.norm(query)
+        scores = vectors @ (query / norm if norm else query)
+        scores[~frozen["alive"]] = -np.inf
+        return scores
+
+    def search(
+        self,
+        query: str,
+        limit: int = 10,
+        query_embedding: Optional[Sequence[float]] = None,
+        mode: str = "hybrid",
+        rrf_k: int = 60,
+        candidates: int = 100,
+        filter_fn: Optional[Callable[[Dict[str, Any]], bool]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Search the index.
+
+        Args:
+            query: Query text
+            limit: Maximum number of results
+            query_embedding: Query vector; the index embedder is used when omitted
+            mode: "hybrid" (BM25 + cosine fused by RRF), "bm25" or "vector";
+                a query vector of the wrong dimension ranks by BM25 alone
+            rrf_k: RRF constant; larger values flatten the rank contribution
+            candidates: Results taken from each ranking before fusion
+            filter_fn: Optional predicate over document metadata
+
+        Returns:
+            Results with id, score, bm25, cosine and metadata, best first
+        """
+        if mode not in ("hybrid", "bm25", "vector") or not self._row_of:
+            return []
+
+        depth = max(limit, candidates)
+        if filter_fn is not None:
+            # Filtered rows are excluded before ranking, so search deeper
+            depth = len(self.doc_ids)
+        rankings = []
+        bm25 = cosine = None
+
+        if mode in ("hybrid", "vector"):
+            if query_embedding is None:
+                query_embedding = self.embedder(query)
+            query_embedding = np.asarray(query_embedding, dtype=np.float32)
+            if query_embedding.shape != (self.dim,):
+                logger.warning(
+                    f"Query embedding has dimension {query_embedding.shape[-1]} but the index holds "
+                    f"{self.dim}-dimensional vectors; ranking by BM25 only"
+                )
+                mode = "bm25"
+
+        if mode in ("hybrid", "bm25"):
+            bm25 = self.bm25_scores(query)
+            ranked = _top_k(bm25, min(depth, int(np.count_nonzero(bm25))))
+            rankings.append(ranked)
+        if mode in ("hybrid", "vector"):
+            cosine = self.cosine_scores(query_embedding)
+            # Like BM25, only rows with some similarity are candidates;
+            # removed rows score -inf and drop out here too
+            rankings.append(_top_k(cosine, min(depth, int(np.count_nonzero(cosine > 0)))))
+
+        fused: Dict[int, float] = {}
+        for ranked in rankings:
+            rank = 0
+            for row in ranked.tolist():
+                if filter_fn is not None and not filter_fn(self.metadata[row]):
+                    continue
+                rank += 1
+                if rank > max(limit, candidates):
+                    break
+                fused[row] = fused.get(row, 0.0) + 1.0 / (rrf_k + rank)
+
+        ordered = sorted(fused.items(), key=lambda item: item[1], reverse=True)[:limit]
+        return [
+            {
+                "id": self.doc_ids[row],
+                "score": score,
+                "bm25": float(bm25[row]) if bm25 is not None else None,
+                "cosine": float(cosine[row]) if cosine is not None else None,
+                "metadata": self.metadata[row],
+            }
+            for row, score in ordered
+        ]
+
+    def save(self, directory: str):
+        """
+        Persist the index to a directory.
+
+        Postings are flattened into offset arrays so loading is a few
+        NumPy reads rather than JSON parsing of every posting list.
+        """
+        if self._dead:
+            self._compact()
+        path = Path(directory)
+        path.mkdir(parents=True, exist_ok=True)
+
+        terms = sorted(self._postings)
+        lengths = [len(self._postings[t][0]) for t in terms]
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        rows = np.fromiter(
+            (r for t in terms for r in self._postings[t][0]), dtype=np.int64, count=int(offsets[-1])
+        )
+        tfs = np.fromiter(
+            (tf for t in terms for tf in self._postings[t][1]), dtype=np.int32, count=int(offsets[-1])
+        )
+        vectors = np.vstack(self._vectors) if self._vectors else np.zeros((0, 0), np.float32)
+
+        tmp_arrays = path / "arrays.tmp.npz"
+        with open(tmp_arrays, "wb") as f:
+            np.savez(
+                f,
+                offsets=offsets,
+                rows=rows,
+                tfs=tfs,
+                doc_len=np.array(self._doc_len, dtype=np.int32),
+                vectors=vectors,
+            )
+        tmp_docs = path / "docs.tmp.json"
+        tmp_docs.write_text(
+            json.dumps(
+                {
+                    "k1": self.k1,
+                    "b": self.b,
+                    "terms": terms,
+                    "doc_ids": self.doc_ids,
+                    "metadata": self.metadata,
+                }
+            ),
+            encoding="utf-8",
+        )
+        tmp_arrays.replace(path / "arrays.npz")
+        tmp_docs.replace(path / "docs.json")
+        logger.info(f"Saved search index with {len(self)} documents to {directory}")
+
+    @classmethod
+    def load(
+        cls, directory: str, embedder: Optional[Callable[[str], np.ndarray]] = None
+    ) -> "SearchIndex":
+        """Load an index written by save()."""
+        path = Path(directory)
+        docs = json.loads((path / "docs.json").read_text(encoding="utf-8"))
+        arrays = np.load(path / "arrays.npz")
+
+        index = cls(embedder=embedder, k1=docs["k1"], b=docs["b"])
+        offsets, rows, tfs = arrays["offsets"], arrays["rows"], arrays["tfs"]
+        index._postings = {
+            term: [rows[offsets[i]:offsets[i + 1]].tolist(), tfs[offsets[i]:offsets[i + 1]].tolist()]
+            for i, term in enumerate(docs["terms"])
+        }
+        index.doc_ids = docs["doc_ids"]
+        index.metadata = docs["metadata"]
+        index._doc_len = arrays["doc_len"].tolist()
+        index._alive = [True] * len(index.doc_ids)
+        index._row_of = {doc_id: row for row, doc_id in enumerate(index.doc_ids)}
+        index._vectors = list(arrays["vectors"])
+        logger.info(f"Loaded search index with {len(index)} documents from {directory}")
+        return index
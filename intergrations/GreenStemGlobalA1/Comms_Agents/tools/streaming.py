@@ -0,0 +1,141 @@
+"""
+Streaming helpers for Comms Agents.
+
+Agents ask the LLM for "### Heading" delimited sections. SectionParser splits
+streamed text into those sections as they finish, so callers can act on (or
+send) a complete LinkedIn post while the X thread is still being generated.
+"""
+
+import re
+import json
+import logging
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from .llm import stream_text
+from .structured_output import JSONStreamExtractor, compile_schema
+
+logger = logging.getLogger(__name__)
+
+_HEADING = re.compile(r"^\s*#{2,3}\s*(.+?)\s*:?\s*$")
+_ITEM_MARKER = re.compile(r"^\s*(?:[-*•]|\d+\s*[./)])\s*")
+
+
+class SectionParser:
+    """
+    Incrementally split streamed text into named sections.
+
+    Args:
+        sections: Heading text (case-insensitive) -> section name, e.g.
+            {"linkedin post": "linkedin_post"}. Unknown headings are kept as
+            content of the current section; text before the first known
+            heading is ignored.
+    """
+
+    def __init__(self, sections: Dict[str, str]):
+        self._names = {heading.lower(): name for heading, name in sections.items()}
+        self._line = ""
+        self._current = None
+        self._lines: List[str] = []
+        self.sections: Dict[str, str] = {}
+
+    def feed(self, chunk: str) -> List[Tuple[str, str]]:
+        """Consume a chunk; returns the sections it completed as (name, text)."""
+        completed = []
+        self._line += chunk
+        *lines, self._line = self._line.split("\n")
+        for line in lines:
+            completed.extend(self._process(line))
+        return completed
+
+    def close(self) -> List[Tuple[str, str]]:
+        """Flush the last (partial) line and finish the open section."""
+        completed = self._process(self._line) if self._line else []
+        self._line = ""
+        completed.extend(self._finish())
+        return completed
+
+    def _process(self, line: str) -> List[Tuple[str, str]]:
+        match = _HEADING.match(line)
+        name = self._names.get(match.group(1).lower().strip("*")) if match else None
+        if name is None:
+            if self._current is not None:
+                self._lines.append(line)
+            return []
+        completed = self._finish()
+        self._current = name
+        return completed
+
+    def _finish(self) -> List[Tuple[str, str]]:
+        if self._current is None:
+            return []
+        name, text = self._current, "\n".join(self._lines).strip()
+        self._current, self._lines = None, []
+        self.sections[name] = text
+        return [(name, text)]
+
+
+def split_items(text: str) -> List[str]:
+    """One item per non-empty line, with bullet or numbering markers removed."""
+    items = (_ITEM_MARKER.sub("", line, count=1).strip() for line in text.splitlines())
+    return [item for item in items if item]
+
+
+async def stream_sections(prompt: str, sections: Dict[str, str], **kwargs) -> AsyncIterator[Tuple[str, Any]]:
+    """
+    Stream an LLM completion as token and section events.
+
+    Args:
+        prompt: Input prompt
+        sections: Heading -> section name mapping (see SectionParser)
+        **kwargs: Passed to tools.llm.stream_text
+
+    Yields:
+        ("token", text delta) as text arrives and ("section", (name, text))
+        as soon as each section is complete
+    """
+    parser = SectionParser(sections)
+    async for delta in stream_text(prompt, **kwargs):
+        yield "token", delta
+        for section in parser.feed(delta):
+            yield "section", section
+    for section in parser.close():
+        yield "section", section
+
+
+async def stream_json_objects(
+    prompt: str,
+    schema: Optional[Dict[str, Any]] = None,
+    **kwargs
+) -> AsyncIterator[Any]:
+    """
+    Yield each JSON object or array in a streamed completion once it closes.
+
+    Useful for list-style outputs ("one JSON object per idea") where the
+    first item can be used before the last is generated.
+
+    Args:
+        prompt: Input prompt
+        schema: Validate objects against this schema; non-matching ones are skipped
+        **kwargs: Passed to tools.llm.stream_text
+    """
+    extractor = JSONStreamExtractor()
+    validator = compile_schema(schema) if schema else None
+    async for delta in stream_text(prompt, **kwargs):
+        for text in extractor.feed(delta):
+            try:
+                yield validator.validate_json(text) if validator else json.loads(text)
+            except ValueError as e:
+                logger.warning(f"Skipping streamed JSON that did not validate: {e}")
+
+
+def parse_sections(text: str, sections: Dict[str, str]) -> Dict[str, str]:
+    """Split a complete response into sections (the non-streaming path)."""
+    parser = SectionParser(sections)
+    parser.feed(text)
+    parser.close()
+    return parser.sections
+
+
+def sse_event(event: str, data: Any) -> str:
+    """Format one server-sent event with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
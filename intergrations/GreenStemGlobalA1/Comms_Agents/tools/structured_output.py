@@ -0,0 +1,277 @@
+"""
+Structured (JSON) output parsing for Comms Agents.
+
+LLM replies wrap JSON in prose, code fences, or several objects. The
+extractor scans text once (incrementally, when streaming) and yields every
+balanced top-level JSON object or array. Candidates are then validated
+against the requested schema. Each schema is compiled once into a pydantic
+model, whose Rust core parses and validates the JSON in a single pass.
+
+Schemas may be JSON Schema ({"type": "object", "properties": ...}) or the
+shorthand used across the agents ({"title": {"type": "string"}, ...}). Keys
+listed in "required" are required; without a "required" list, all keys are.
+"""
+
+import re
+import json
+import logging
+from typing import Any, Dict, Iterator, List, Literal, Tuple, Union
+
+from pydantic import ConfigDict, Field, ValidationError, create_model
+
+logger = logging.getLogger(__name__)
+
+_FENCE = re.compile(r"```[ \t]*(?:json[a-z]*)?[ \t]*\n(.*?)```", re.DOTALL | re.IGNORECASE)
+_TRAILING_COMMA = re.compile(r",\s*([}\]])")
+# The only characters the extractor has to look at
+_SPECIAL = re.compile(r'[{}\[\]"\\]')
+
+_TYPES = {"string": str, "number": float, "integer": int, "boolean": bool, "null": type(None)}
+
+
+class StructuredOutputError(ValueError):
+    """No JSON in the response matched the schema."""
+
+
+class JSONStreamExtractor:
+    """
+    Incrementally find balanced top-level JSON objects/arrays in text.
+
+    Brackets inside JSON strings (with escapes) are ignored. Text outside
+    JSON, such as prose or code fences, is skipped.
+    """
+
+    def __init__(self):
+        self._buffer: List[str] = []
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+
+    def feed(self, chunk: str) -> List[str]:
+        """Consume a chunk; returns the JSON texts it completed."""
+        return self._feed(chunk, first_only=False)
+
+    def _feed(self, chunk: str, first_only: bool) -> List[str]:
+        completed = []
+        start = 0 if self._depth else None
+        # An escape at the end of the previous chunk applies to our first character
+        skip = 0 if self._escaped else -1
+        self._escaped = False
+        for match in _SPECIAL.finditer(chunk):
+            i = match.start()
+            if i == skip:
+                continue
+            char = chunk[i]
+            if self._depth == 0:
+                if char in "{[":
+                    self._depth, start = 1, i
+            elif self._in_string:
+                if char == "\\":
+                    if i + 1 == len(chunk):
+                        self._escaped = True
+                    else:
+                        skip = i + 1
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in "{[":
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    self._buffer.append(chunk[start:i + 1])
+                    completed.append("".join(self._buffer))
+                    self._buffer, start = [], None
+                    if first_only:
+                        return completed
+        if self._depth and start is not None:
+            self._buffer.append(chunk[start:])
+        return completed
+
+    @property
+    def pending(self) -> str:
+        """Text of an unfinished candidate (e.g. a truncated response)."""
+        return "".join(self._buffer)
+
+
+def extract_json_candidates(text: str) -> List[str]:
+    """
+    Candidate JSON texts in a response, most likely first.
+
+    Fenced code blocks come first, then objects/arrays anywhere in the text,
+    including balanced spans that are not valid JSON (e.g. trailing commas)
+    so they can still be repaired.
+    """
+    return [candidate for candidate, _ in _candidates(text)]
+
+
+_DECODER = json.JSONDecoder()
+_UNPARSED = object()
+
+
+def _candidates(text: str) -> Iterator[Tuple[str, Any]]:
+    """(text, decoded value or _UNPARSED) for each candidate, fenced blocks first."""
+    seen = set()
+    for block in _FENCE.findall(text):
+        for item in _scan(block):
+            seen.add(item[0])
+            yield item
+    # Lazy: a parser that accepted a fenced block never scans the whole text
+    for item in _scan(text):
+        if item[0] not in seen:
+            yield item
+
+
+def _next_open(text: str, start: int) -> int:
+    brace, bracket = text.find("{", start), text.find("[", start)
+    if brace < 0 or bracket < 0:
+        return max(brace, bracket)
+    return min(brace, bracket)
+
+
+def _scan(text: str) -> Iterator[Tuple[str, Any]]:
+    i = _next_open(text, 0)
+    while i >= 0:
+        try:
+            # C decoder: stops at the end of the value, ignoring trailing text
+            value, end = _DECODER.raw_decode(text, i)
+        except json.JSONDecodeError as e:
+            value = _UNPARSED
+            if e.pos > i + 1:
+                # Failed past the opener, so this looks like JSON with a defect.
+                # The most common one is trailing commas: repair the rest and retry
+                repaired = text[:i] + _TRAILING_COMMA.sub(r"\1", text[i:])
+                try:
+                    value, end = _DECODER.raw_decode(repaired, i)
+                    text = repaired
+                except json.JSONDecodeError:
+                    pass
+            if value is _UNPARSED:
+                # Keep the balanced span as a candidate, then try the next opener
+                span = JSONStreamExtractor()._feed(text[i:], first_only=True)
+                if span:
+                    yield span[0], _UNPARSED
+                i = _next_open(text, i + 1)
+                continue
+        yield text[i:end], value
+        i = _next_open(text, end)
+
+
+def _annotation(spec: Any, name: str) -> Any:
+    if not isinstance(spec, dict) or ("type" not in spec and "properties" not in spec):
+        return Any
+    if "enum" in spec:
+        return Literal[tuple(spec["enum"])]
+    kind = spec.get("type", "object")
+    if isinstance(kind, list):
+        return Union[tuple(_annotation({**spec, "type": k}, name) for k in kind)]
+    if kind == "array":
+        item = _annotation(spec.get("items"), name + "_item")
+        return List[item]
+    if kind == "object":
+        properties = spec.get("properties")
+        if not properties:
+            return Dict[str, Any]
+        return _model(name, properties, spec.get("required", list(properties)))
+    return _TYPES.get(kind, Any)
+
+
+def _model(name: str, properties: Dict[str, Any], required: List[str]):
+    # Aliases let any JSON key (spaces, leading underscores) become a field
+    fields = {
+        f"field_{i}": (
+            _annotation(spec, f"{name}_{i}"),
+            Field(... if key in required else None, alias=key),
+        )
+        for i, (key, spec) in enumerate(properties.items())
+    }
+    return create_model(name, __config__=ConfigDict(extra="allow"), **fields)
+
+
+class SchemaValidator:
+    """
+    A schema compiled for repeated validation.
+
+    Args:
+        schema: JSON Schema or agent shorthand schema
+    """
+
+    def __init__(self, schema: Dict[str, Any]):
+        self.schema = schema
+        if schema.get("type") == "object" or "properties" in schema:
+            properties = schema.get("properties", {})
+            self.model = _model("StructuredOutput", properties, schema.get("required", list(properties)))
+            self.json_schema = schema
+        else:
+            self.model = _model("StructuredOutput", schema, list(schema))
+            self.json_schema = self.model.model_json_schema(by_alias=True)
+
+    def validate_json(self, text: str) -> Dict[str, Any]:
+        """Parse and validate one JSON text; raises ValidationError."""
+        return self.model.model_validate_json(text).model_dump(by_alias=True)
+
+    def validate(self, value: Any) -> Dict[str, Any]:
+        """Validate an already-parsed value (e.g. a tool call's input)."""
+        return self.model.model_validate(value).model_dump(by_alias=True)
+
+    def parse(self, text: str) -> Dict[str, Any]:
+        """
+        First candidate in a response that matches the schema.
+
+        Raises:
+            StructuredOutputError: With the reason the best candidate failed
+        """
+        # Fast path: the whole response is the object (JSON modes, most replies)
+        stripped = text.strip()
+        if stripped.startswith("{") and stripped.endswith("}"):
+            try:
+                return self.validate_json(stripped)
+            except ValidationError:
+                pass
+
+        errors: List[ValidationError] = []
+        for candidate, value in _candidates(text):
+            if not candidate.startswith("{"):
+                continue
+            try:
+                if value is _UNPARSED:
+                    return self.validate_json(_TRAILING_COMMA.sub(r"\1", candidate))
+                return self.validate(value)
+            except ValidationError as e:
+                errors.append(e)
+        if not errors:
+            raise StructuredOutputError("no JSON object found in response")
+        # A schema mismatch says more than "{see below}" not being JSON
+        best = min(errors, key=lambda e: any(item["type"] == "json_invalid" for item in e.errors()))
+        raise StructuredOutputError(_summarize(best))
+
+
+def _summarize(error: ValidationError, limit: int = 3) -> str:
+    parts = []
+    for item in error.errors()[:limit]:
+        location = ".".join(str(part) for part in item["loc"]) or "response"
+        parts.append(f"{location}: {item['msg']}")
+    return "; ".join(parts)
+
+
+_COMPILED_MAX = 128
+_compiled: Dict[str, SchemaValidator] = {}
+
+
+def compile_schema(schema: Dict[str, Any]) -> SchemaValidator:
+    """Validator for a schema, compiled on first use and cached."""
+    # Keyed on sorted JSON, built from the original so field order is kept
+    key = json.dumps(schema, sort_keys=True)
+    validator = _compiled.get(key)
+    if validator is None:
+        validator = SchemaValidator(schema)
+        if len(_compiled) >= _COMPILED_MAX:
+            _compiled.pop(next(iter(_compiled)))
+        _compiled[key] = validator
+    return validator
+
+
+def parse_structured(text: str, schema: Dict[str, Any]) -> Dict[str, Any]:
+    """Extract and validate the JSON object in a response (see SchemaValidator.parse)."""
+    return compile_schema(schema).parse(text)